@@ -4,14 +4,25 @@ See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
 
 Barcode printer driver.
 """
+from collections import OrderedDict
+from datetime import datetime
 import logging
 import os
 from subprocess import PIPE
 from subprocess import Popen
+from threading import Lock
+
+from pyramid.threadlocal import get_current_registry
+
+from thelma.interfaces import IBarcodeSpoolTransport
 
 
 __docformat__ = "reStructuredText en"
-__all__ = ['BarcodePrinter',
+__all__ = ['LprSpoolTransport',
+           'FileSpoolTransport',
+           'RenderedBarcodeCache',
+           'BarcodeSpooler',
+           'BarcodePrinter',
            'SatoBarcode',
            'UniTwoLabelRackBarcode',
            'LocationBarcode',
@@ -20,71 +31,211 @@ __all__ = ['BarcodePrinter',
            'print_location_barcode']
 
 
+class LprSpoolTransport(object):
+    """
+    Submits print streams to the unix-lpd system (one `lpr` call per stream).
+    """
+    #: The default CUPS server.
+    DEFAULT_HOST = '192.168.1.33:631'
+
+    def __init__(self, host=None):
+        """
+        @param host: The CUPS server (host:port) to submit the jobs to.
+        @type host: L{str} or L{NoneType}
+        """
+        if host is None:
+            host = self.DEFAULT_HOST
+        self.host = host
+
+    def submit(self, printer_name, print_stream):
+        """
+        Submits the given print stream to the given printer. Streams for
+        dummy printers (names ending with "DUMMY") are discarded.
+
+        @raise OSError: if the lpr command fails
+        """
+        if not printer_name.upper().endswith('DUMMY'):
+            cmd = ['lpr', '-H%s' % self.host, '-P%s' % printer_name, '-#1']
+            child = Popen(cmd, stdin=PIPE, stdout=PIPE, stderr=PIPE)
+            str_error = child.communicate(print_stream)[1]
+            if child.returncode != 0:
+                raise OSError(str_error)
+
+
+class FileSpoolTransport(object):
+    """
+    Writes print streams into files in a local spool directory (for tests
+    and dummy printers).
+    """
+    def __init__(self, directory):
+        """
+        @param directory: The spool directory (created if missing).
+        @type directory: L{str}
+        """
+        self.directory = directory
+        self.__counter = 0
+        self.__lock = Lock()
+
+    def submit(self, printer_name, print_stream):
+        """
+        Writes the given print stream into a new file named after the printer
+        and returns the file path.
+        """
+        with self.__lock:
+            self.__counter += 1
+            counter = self.__counter
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        file_name = '%s_%s_%04d.prn' \
+                    % (printer_name, datetime.now().strftime('%Y%m%d%H%M%S'),
+                       counter)
+        file_path = os.path.join(self.directory, file_name)
+        with open(file_path, 'wb') as spool_file:
+            spool_file.write(print_stream)
+        return file_path
+
+
+class RenderedBarcodeCache(object):
+    """
+    Thread-safe least-recently-used cache for rendered barcode format
+    strings (see L{SatoBarcode.get_cache_key}).
+    """
+    #: The default maximum number of cached format strings.
+    MAX_SIZE = 5000
+
+    def __init__(self, max_size=None):
+        if max_size is None:
+            max_size = self.MAX_SIZE
+        self.__max_size = max_size
+        self.__formats = OrderedDict()
+        self.__lock = Lock()
+
+    def render(self, barcode):
+        """
+        Returns the format string for the given barcode, rendering it only if
+        it is not cached yet.
+        """
+        key = barcode.get_cache_key()
+        if key is None:
+            return barcode.render()
+        with self.__lock:
+            bc_string = self.__formats.pop(key, None)
+            if not bc_string is None:
+                self.__formats[key] = bc_string
+        if bc_string is None:
+            bc_string = barcode.render()
+            with self.__lock:
+                self.__formats[key] = bc_string
+                if len(self.__formats) > self.__max_size:
+                    self.__formats.popitem(last=False)
+        return bc_string
+
+    def clear(self):
+        """
+        Removes all entries from the cache.
+        """
+        with self.__lock:
+            self.__formats.clear()
+
+    def __len__(self):
+        return len(self.__formats)
+
+
+class BarcodeSpooler(object):
+    """
+    Collects the barcodes of a print request and submits them to the printer
+    as one concatenated print stream.
+    """
+    #: The process-wide cache for rendered barcode format strings.
+    render_cache = RenderedBarcodeCache()
+
+    def __init__(self, barcode_printer_name, transport=None):
+        """
+        @param barcode_printer_name: The name of the printer. If None or "",
+          the print stream is only logged.
+        @type barcode_printer_name: L{str} or L{NoneType}
+        @param transport: The transport used to submit the print stream. If
+          this is None, the transport registered for
+          L{IBarcodeSpoolTransport} (or a L{LprSpoolTransport}) is used.
+        """
+        self.barcode_printer_name = barcode_printer_name
+        if transport is None:
+            reg = get_current_registry()
+            transport = reg.queryUtility(IBarcodeSpoolTransport)
+            if transport is None:
+                transport = LprSpoolTransport()
+        self.transport = transport
+        self.__bc_strings = []
+
+    def add_barcode(self, barcode):
+        """
+        Renders the given barcode and adds it to the print stream.
+
+        @type barcode: L{SatoBarcode}
+        """
+        self.__bc_strings.append(self.render_cache.render(barcode))
+
+    def spool(self):
+        """
+        Submits the collected barcodes in one print stream and resets the
+        spooler.
+
+        @return: the number of submitted barcodes
+        """
+        num_barcodes = len(self.__bc_strings)
+        if num_barcodes > 0:
+            print_stream = ''.join(self.__bc_strings)
+            if self.barcode_printer_name:
+                self.transport.submit(self.barcode_printer_name, print_stream)
+            logger = logging.getLogger()
+            logger.info('Sent %d barcode(s) to barcode printer %s',
+                        num_barcodes, self.barcode_printer_name)
+            logger.debug('Print stream for barcode printer %s: %r',
+                         self.barcode_printer_name, print_stream)
+            self.__bc_strings = []
+        return num_barcodes
+
+    def __len__(self):
+        return len(self.__bc_strings)
+
+
 class BarcodePrinter(object):
     """
     Print a barcode to a barcode printer.
     """
-    def __init__(self, barcode_printer_name):
+    def __init__(self, barcode_printer_name, transport=None):
         """
         @param barcode_printer_name: The name of a printer in the unix-lpd
           system. If None or "", then the barcode is printed to the terminal.
         @type barcode_printer_name: L{str} or L{NoneType}
+        @param transport: The transport used to submit the print stream
+          (see L{BarcodeSpooler}).
         """
         self.barcode_printer_name = barcode_printer_name
+        self.__spooler = BarcodeSpooler(barcode_printer_name,
+                                        transport=transport)
 
     def print_barcode(self, barcode):
         """
         @param barcode: Barcode-instance that renders a string for the printer
         @type barcode: L{SatoBarcode}
         """
-        bc_string = barcode.render()
-        if self.barcode_printer_name and \
-               not self.barcode_printer_name.upper().endswith('DUMMY'):
-            cmd = 'lpr -H192.168.1.33:631 -P%s -#%d' \
-                  % (self.barcode_printer_name, 1)
-            self._run_command(cmd, input_string=bc_string)
-        logging.getLogger().info('Sent format string %r to barcode printer %s'
-                                 % (bc_string, self.barcode_printer_name))
+        self.print_barcodes([barcode])
+
+    def print_barcodes(self, barcodes):
+        """
+        Prints all given barcodes with a single spool call.
+
+        @param barcodes: Barcode-instances that render strings for the printer
+        @type barcodes: iterable of L{SatoBarcode}
+        """
+        for barcode in barcodes:
+            self.__spooler.add_barcode(barcode)
+        self.__spooler.spool()
 
     def get_printer_name(self):
         return self.barcode_printer_name
 
-    def _run_command(self, cmd, suppress_errors=False, input_string=None,
-                   environment=None):
-        """
-        Runs the given command string in a command shell.
-
-        Uses L{os.popen3}).
-
-        @param cmd_string: command to execute
-        @type cmd_string: string
-        @param input_string: input to pass to C{sys.stdin} of the process
-        @type input_string: string
-        @param suppress_errors: if set, errors happening during the execution
-          of the command are only printed to C{sys.stdout}
-        @type suppress_errors: Boolean
-        @param environment: mapping to use as the environment for the
-          subprocess
-        @type environment: dictionary
-        @raise OSError: if an error happens during command execution and
-          L{suppressError} is not set
-        @return: output to C{sys.stdout} from the command
-        """
-        if environment is None:
-            environment = os.environ
-        child = Popen(cmd, shell=True, env=environment,
-                       stdin=PIPE, stdout=PIPE, stderr=PIPE)
-        if not input_string is None:
-            child.stdin.write(input_string)
-            child.stdin.close()
-        if child.wait() != 0:
-            str_error = child.stderr.read()
-            if not suppress_errors:
-                raise OSError(str_error)
-            else:
-                print 'error during command execution: %s' % str_error
-        return child.stdout.read()
-
 
 class SatoBarcode(object):
     """
@@ -109,6 +260,13 @@ class SatoBarcode(object):
         """
         pass
 
+    def get_cache_key(self):
+        """
+        Returns a key identifying the rendered format string (used by the
+        L{RenderedBarcodeCache}) or None if the format must not be cached.
+        """
+        return None
+
     #--- internal methods ----
 
     def _esc(self, char):
@@ -228,6 +386,10 @@ class SatoUniTwoLabelRackBarcode(SatoBarcode):
         self.label_row_1 = label_row_1 or ''
         self.label_row_2 = label_row_2 or ''
 
+    def get_cache_key(self):
+        return (self.__class__.__name__, self.barcode, self.label_row_1,
+                self.label_row_2)
+
     def render(self):
         profile = self._LABEL_PROFILES['RACK']
         text_label = (self._start()
@@ -278,6 +440,9 @@ class SatoUniLocationBarcode(SatoBarcode):
         self.barcode = barcode
         self.label_row_1 = label_row_1 or ''
 
+    def get_cache_key(self):
+        return (self.__class__.__name__, self.barcode, self.label_row_1)
+
     def render(self):
         profile = self._LABEL_PROFILES['LOCATION']
         return (self._start()
@@ -314,6 +479,9 @@ class SatoEmptyBarcode(SatoBarcode):
                              'value %d' % (quantity, self.MAX_QUANTITY))
         self.quantity = quantity
 
+    def get_cache_key(self):
+        return (self.__class__.__name__, self.quantity)
+
     def render(self):
         return (self._start()
                 + self._print_speed(1)
@@ -0,0 +1,209 @@
+"""
+This file is part of the TheLMA (THe Laboratory Management Application) project.
+See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
+
+HTTP level caching of semiconstant resources (rack shapes, specs, item
+statuses etc.).
+
+The representations of these resources get ETags derived from the change
+counters of the underlying tables (maintained by database triggers, see the
+*table_change_counter* table), from a generation number that is bumped
+when a resource is updated through its member resource and from the content
+type of the representation. Rendered representations are kept in an
+in-process cache; requests for a cached representation carrying a matching
+*If-None-Match* header are answered with a 304 response before any view is
+looked up (and, hence, before the ORM is accessed).
+"""
+from threading import Lock
+
+from pyramid.httpexceptions import HTTPNotModified
+from pyramid.response import Response
+from pyramid.security import authenticated_userid
+from pyramid.threadlocal import get_current_registry
+from sqlalchemy.sql.expression import text
+import transaction
+
+from everest.repositories.rdb.session import ScopedSessionMaker as Session
+from thelma.interfaces import IRepresentationCache
+from zope.interface import implementer # pylint: disable=E0611,F0401
+
+
+__docformat__ = 'reStructuredText en'
+__all__ = ['SEMICONSTANT_TABLES',
+           'RepresentationCache',
+           'invalidate_representation_cache',
+           'representation_cache_tween_factory',
+           ]
+
+
+#: The tables the cached representations are built from (the change
+#: counters of these tables are summed up to determine the ETags). Besides
+#: the semiconstant tables themselves, this comprises the rack specs -
+#: container specs association (tube specs of rack specs and vice versa) and
+#: the tables behind the molecule type modification view.
+SEMICONSTANT_TABLES = ['chemical_structure', 'container_specs', 'device',
+                       'device_type', 'item_status', 'molecule_design',
+                       'molecule_design_structure', 'molecule_type',
+                       'organization', 'pipetting_specs', 'rack_shape',
+                       'rack_specs', 'rack_specs_container_specs',
+                       'reservoir_specs', 'species']
+
+
+@implementer(IRepresentationCache)
+class RepresentationCache(object):
+    """
+    In-process cache for the rendered representations of semiconstant
+    resources.
+
+    All entries belong to the same ETag; entries are dropped as soon as a
+    different ETag is encountered.
+    """
+    #: The root names of the collections whose members and collections are
+    #: cached.
+    COLLECTION_NAMES = frozenset(['container-specs', 'device-types',
+                                  'devices', 'item-statuses',
+                                  'molecule-types', 'pipetting-specs',
+                                  'plate-specs', 'rack-shapes', 'rack-specs',
+                                  'reservoir-specs', 'species',
+                                  'tube-rack-specs', 'tube-specs',
+                                  'well-specs'])
+    #: The maximum number of cached representations.
+    MAX_ENTRIES = 512
+    #: Sums up the change counters of the semiconstant tables.
+    CHANGE_COUNT_QUERY = '''
+    SELECT coalesce(sum(change_count), 0) AS change_count
+    FROM table_change_counter
+    WHERE table_name IN (%s)
+    ''' % ', '.join(["'%s'" % tbl_name for tbl_name in SEMICONSTANT_TABLES])
+
+    def __init__(self):
+        self.__lock = Lock()
+        #: Bumped whenever a semiconstant resource is updated in this
+        #: process.
+        self.__generation = 0
+        #: The ETag the cached entries belong to.
+        self.__etag = None
+        #: Maps (status, header list, body) tuples onto (path, accept
+        #: header) keys.
+        self.__entries = {}
+
+    def is_cached_path(self, path):
+        """
+        Checks whether the representations for the given request path are
+        cached.
+        """
+        root_name = path.lstrip('/').split('/', 1)[0]
+        return root_name in self.COLLECTION_NAMES
+
+    def get_etag(self, engine):
+        """
+        Returns the current base ETag (without quotes and without the
+        content type part, see :func:`make_etag`).
+
+        The change counters are only maintained in PostgreSQL databases;
+        in other databases, only the in-process generation is used.
+        """
+        if engine.dialect.name == 'postgresql':
+            conn = engine.connect()
+            try:
+                change_count = \
+                        conn.execute(text(self.CHANGE_COUNT_QUERY)).scalar()
+            finally:
+                conn.close()
+        else:
+            change_count = 0
+        return 'sc-%i-%i' % (change_count, self.__generation)
+
+    def make_etag(self, base_etag, content_type):
+        """
+        Returns the ETag (without quotes) for a representation of the given
+        content type; each representation of a resource gets its own ETag.
+        """
+        return '%s-%s' % (base_etag, content_type)
+
+    def get(self, etag, key):
+        """
+        Returns the (status, header list, body) tuple cached for the given
+        key (*None* if there is no entry or the entry is outdated).
+        """
+        with self.__lock:
+            if etag == self.__etag:
+                value = self.__entries.get(key)
+            else:
+                value = None
+        return value
+
+    def set(self, etag, key, value):
+        """
+        Stores the (status, header list, body) tuple for the given key.
+        """
+        with self.__lock:
+            if etag != self.__etag or len(self.__entries) >= self.MAX_ENTRIES:
+                self.__entries = {}
+                self.__etag = etag
+            self.__entries[key] = value
+
+    def invalidate(self):
+        """
+        Drops all cached representations and changes the ETag.
+        """
+        with self.__lock:
+            self.__generation += 1
+            self.__entries = {}
+            self.__etag = None
+
+
+def invalidate_representation_cache():
+    """
+    Invalidates the representation cache (if one is registered). This is
+    done immediately and again after the current transaction has been
+    committed, so representations rendered in the meantime are not kept.
+    """
+    cache = get_current_registry().queryUtility(IRepresentationCache)
+    if not cache is None:
+        cache.invalidate()
+        transaction.get().addAfterCommitHook(
+                                    lambda success: cache.invalidate())
+
+
+def representation_cache_tween_factory(handler, registry):
+    """
+    Tween factory for the HTTP level caching of semiconstant resources.
+
+    Only GET requests from authenticated users are served from the cache;
+    all other requests are passed on unchanged. Since the representation
+    depends on the *Accept* header, all responses carry a *Vary: Accept*
+    header.
+    """
+    cache = registry.queryUtility(IRepresentationCache)
+    if cache is None:
+        return handler
+
+    def representation_cache_tween(request):
+        if request.method != 'GET' \
+           or not cache.is_cached_path(request.path_info) \
+           or authenticated_userid(request) is None:
+            return handler(request)
+        base_etag = cache.get_etag(Session().get_bind())
+        key = (request.path_qs, request.headers.get('Accept'))
+        value = cache.get(base_etag, key)
+        if value is None:
+            response = handler(request)
+            if response.status_int == 200 \
+               and response.headers.get('x-tm') != 'abort':
+                cache.set(base_etag, key,
+                          (response.status, list(response.headerlist),
+                           response.body))
+        else:
+            status, headerlist, body = value
+            response = Response(body=body, status=status,
+                                headerlist=list(headerlist))
+        if response.status_int == 200:
+            etag = cache.make_etag(base_etag, response.content_type)
+            if etag in request.if_none_match:
+                response = HTTPNotModified()
+            response.headers['ETag'] = '"%s"' % etag
+        response.vary = ('Accept',)
+        return response
+
+    return representation_cache_tween
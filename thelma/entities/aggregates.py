@@ -6,13 +6,23 @@ Aggregate implementations.
 
 Created Sep 25, 2011
 """
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import class_mapper
+from sqlalchemy.orm import joinedload_all
+from sqlalchemy.orm import subqueryload_all
+from sqlalchemy.sql import select
+from sqlalchemy.sql import text
 from sqlalchemy.sql.expression import and_
 
 from everest.querying.base import EXPRESSION_KINDS
 from everest.repositories.rdb.aggregate import RdbAggregate as Aggregate
+from everest.repositories.rdb.session import ScopedSessionMaker as Session
 from everest.utils import get_filter_specification_visitor
 from thelma.entities.container import Tube
+from thelma.entities.experiment import Experiment
+from thelma.entities.experiment import ExperimentMetadata
+from thelma.entities.iso import Iso
+from thelma.entities.iso import LabIsoRequest
+from thelma.entities.job import IsoJob
 from thelma.entities.location import BarcodedLocation
 from thelma.entities.moleculedesign import MoleculeDesignPool
 from thelma.entities.rack import Plate
@@ -24,7 +34,10 @@ from thelma.entities.suppliermoleculedesign import SupplierMoleculeDesign
 
 
 __docformat__ = 'reStructuredText en'
-__all__ = ['ThelmaRdbAggregate',
+__all__ = ['ACCESS_PATHS',
+           'EagerLoadingPlan',
+           'KeysetIterator',
+           'ThelmaRdbAggregate',
            ]
 
 
@@ -36,7 +49,14 @@ class ThelmaRdbAggregate(Aggregate):
     TheLMA-specific query, filter, and order information.
     """
     def _query_optimizer(self, query, key):
-        gen_query = _QueryOptimizers.get(self.entity_class, query, key)
+        if not key is None:
+            access_path = ACCESS_PATHS.KEYED
+        elif not self._relationship is None:
+            access_path = ACCESS_PATHS.SUBCOLLECTION
+        else:
+            access_path = ACCESS_PATHS.ITERATION
+        gen_query = _EagerLoadingPlans.get(self.entity_class, query,
+                                           access_path)
         if gen_query is None:
             gen_query = super(ThelmaRdbAggregate, # pylint: disable=W0212
                               self)._query_optimizer(query, key)
@@ -57,31 +77,243 @@ class ThelmaRdbAggregate(Aggregate):
         return vst
 
 
-class _QueryOptimizers(object):
-    @classmethod
-    def _rack_query_generator(cls, query, key):
-        if key is None: # iteration over full collection
-            opt_query = query.options(joinedload(Rack._location), # pylint: disable=W0212,E1101
-                                      joinedload(Rack.specs),
-                                      joinedload(Rack.status))
-        else:
-            opt_query = query.op
-        return opt_query
+class ACCESS_PATHS(object):
+    """
+    The ways in which an aggregate accesses its entities. Eager loading plans
+    are declared per access path.
+    """
+    #: Iteration over a full (root) collection.
+    ITERATION = 'ITERATION'
+    #: Lookup of a single entity by ID or slug.
+    KEYED = 'KEYED'
+    #: Traversal of a sub-collection (relationship aggregate).
+    SUBCOLLECTION = 'SUBCOLLECTION'
 
-    __map = {TubeRack:'_rack_query_generator',
-             Plate:'_rack_query_generator'
-             }
+
+class EagerLoadingPlan(object):
+    """
+    Declares the related entities to be loaded together with the entities of
+    an aggregate query.
+
+    Single-valued attributes (and dotted attribute paths) are loaded with a
+    join; collections are loaded with one additional query each.
+    """
+    def __init__(self, joined=None, subquery=None):
+        """
+        Constructor.
+
+        :param tuple joined: Attribute paths to load with a join.
+        :param tuple subquery: Attribute paths to load with a separate
+            query.
+        """
+        self.joined = tuple(joined or ())
+        self.subquery = tuple(subquery or ())
+
+    def extend(self, joined=None, subquery=None):
+        """
+        Returns a new plan comprising the attribute paths of this plan and
+        the given ones.
+        """
+        return EagerLoadingPlan(joined=self.joined + tuple(joined or ()),
+                                subquery=self.subquery + tuple(subquery or ()))
+
+    def apply(self, query):
+        """
+        Adds the loader options of this plan to the given query.
+        """
+        opts = [joinedload_all(attr_path) for attr_path in self.joined] \
+               + [subqueryload_all(attr_path) for attr_path in self.subquery]
+        return query.options(*opts)
+
+    def __repr__(self):
+        str_format = '<%s joined: %s, subquery: %s>'
+        params = (self.__class__.__name__, self.joined, self.subquery)
+        return str_format % params
+
+
+class _EagerLoadingPlans(object):
+    """
+    Registry of the eager loading plans for each entity class and access
+    path. Plans are inherited by subclasses of the registered entity
+    classes.
+    """
+    # Plans are defined in the class body to be available in the map.
+    __rack_plan = EagerLoadingPlan(joined=('_location', 'specs', 'status'))
+    __tube_plan = EagerLoadingPlan(joined=('specs', 'status', 'sample',
+                                           'location.rack'))
+    __stock_sample_plan = EagerLoadingPlan(joined=('molecule_design_pool',
+                                                   'supplier',
+                                                   'molecule_type',
+                                                   'container'))
+    __iso_plan = EagerLoadingPlan(joined=('iso_request', 'rack_layout',
+                                          'iso_job'))
+    __lab_iso_request_plan = EagerLoadingPlan(
+                                joined=('requester', 'rack_layout',
+                                        'experiment_metadata',
+                                        'iso_plate_reservoir_specs'))
+    __iso_job_plan = EagerLoadingPlan(joined=('user',), subquery=('isos',))
+    __experiment_plan = EagerLoadingPlan(joined=('job', 'source_rack',
+                                                 'experiment_design'))
+    __experiment_metadata_plan = EagerLoadingPlan(
+                                joined=('subproject', 'lab_iso_request',
+                                        'experiment_design',
+                                        'experiment_metadata_type'))
+
+    __map = {
+        Rack : {ACCESS_PATHS.ITERATION : __rack_plan,
+                ACCESS_PATHS.KEYED : __rack_plan,
+                ACCESS_PATHS.SUBCOLLECTION : __rack_plan},
+        Tube : {ACCESS_PATHS.ITERATION : __tube_plan,
+                ACCESS_PATHS.KEYED :
+                        __tube_plan.extend(joined=('location.position',)),
+                ACCESS_PATHS.SUBCOLLECTION : __tube_plan},
+        StockSample : {ACCESS_PATHS.ITERATION : __stock_sample_plan,
+                       ACCESS_PATHS.KEYED : __stock_sample_plan,
+                       ACCESS_PATHS.SUBCOLLECTION : __stock_sample_plan},
+        Iso : {ACCESS_PATHS.ITERATION : __iso_plan,
+               ACCESS_PATHS.KEYED :
+                    __iso_plan.extend(joined=('molecule_design_pool_set',),
+                                      subquery=('iso_stock_racks',
+                                                'iso_sector_stock_racks',
+                                                'iso_aliquot_plates',
+                                                'iso_preparation_plates')),
+               ACCESS_PATHS.SUBCOLLECTION : __iso_plan},
+        LabIsoRequest : {ACCESS_PATHS.ITERATION : __lab_iso_request_plan,
+                         ACCESS_PATHS.KEYED :
+                            __lab_iso_request_plan.extend(
+                                                    subquery=('isos',)),
+                         ACCESS_PATHS.SUBCOLLECTION : __lab_iso_request_plan},
+        IsoJob : {ACCESS_PATHS.ITERATION : __iso_job_plan,
+                  ACCESS_PATHS.KEYED :
+                        __iso_job_plan.extend(
+                                subquery=('iso_job_stock_racks',
+                                          'iso_job_preparation_plates')),
+                  ACCESS_PATHS.SUBCOLLECTION : __iso_job_plan},
+        Experiment : {ACCESS_PATHS.ITERATION : __experiment_plan,
+                      ACCESS_PATHS.KEYED :
+                        __experiment_plan.extend(
+                                        subquery=('experiment_racks',)),
+                      ACCESS_PATHS.SUBCOLLECTION : __experiment_plan},
+        ExperimentMetadata : {
+                ACCESS_PATHS.ITERATION : __experiment_metadata_plan,
+                ACCESS_PATHS.KEYED : __experiment_metadata_plan,
+                ACCESS_PATHS.SUBCOLLECTION : __experiment_metadata_plan},
+        }
+
+    @classmethod
+    def get_plan(cls, entity_class, access_path):
+        """
+        Returns the eager loading plan for the given entity class and access
+        path (*None* if there is no plan).
+        """
+        plan = None
+        for base_cls in entity_class.__mro__:
+            plans = _EagerLoadingPlans.__map.get(base_cls)
+            if not plans is None:
+                plan = plans.get(access_path)
+                break
+        return plan
 
     @classmethod
-    def get(cls, entity_class, query, key):
-        gen_attr = _QueryOptimizers.__map.get(entity_class)
-        if not gen_attr is None:
-            res = getattr(cls, gen_attr)(query, key)
+    def get(cls, entity_class, query, access_path):
+        plan = cls.get_plan(entity_class, access_path)
+        if not plan is None:
+            res = plan.apply(query)
         else:
             res = None
         return res
 
 
+class KeysetIterator(object):
+    """
+    Iterates over the entities of an entity class in the order of a unique,
+    indexed key attribute (e.g., the ID or the barcode).
+
+    The entities are fetched in chunks. Each chunk is selected with a range
+    condition on the key of the last entity seen (keyset pagination) instead
+    of an OFFSET, so the cost of fetching a chunk does not depend on its
+    position in the table, and is read from a server-side cursor. The
+    iteration eager loading plan of the entity class is applied to every
+    chunk. Entities with a *None* key are skipped.
+
+    The iterator does not hold references to the entities it has returned;
+    since the session identity map is weak-referencing, memory use does not
+    grow with the number of entities iterated over.
+
+    By default, the entities are fetched with the scoped session; pass a
+    *session* to use a session whose lifecycle is managed by the caller.
+    """
+    #: The default number of entities fetched per query.
+    CHUNK_SIZE = 1000
+
+    def __init__(self, entity_class, key_attribute, after=None, limit=None,
+                 chunk_size=None, session=None):
+        """
+        Constructor.
+
+        :param entity_class: The class of the entities to iterate over.
+        :param str key_attribute: The name of the (mapped) key attribute.
+        :param after: Only entities with a key greater than this are
+            returned (optional).
+        :param int limit: The maximum number of entities to return (*None*
+            for no limit).
+        :param int chunk_size: The number of entities to fetch per query
+            (default: :attr:`CHUNK_SIZE`).
+        :param session: The session to fetch the entities with (default:
+            the scoped session).
+        """
+        #: The class of the entities to iterate over.
+        self.entity_class = entity_class
+        #: The name of the key attribute.
+        self.key_attribute = key_attribute
+        #: The exclusive lower bound for the keys of the returned entities.
+        self.after = after
+        #: The maximum number of entities to return.
+        self.limit = limit
+        if chunk_size is None:
+            chunk_size = self.CHUNK_SIZE
+        #: The number of entities to fetch per query.
+        self.chunk_size = chunk_size
+        #: The session to fetch the entities with (*None* for the scoped
+        #: session).
+        self.session = session
+
+    def __iter__(self):
+        session = self.session
+        if session is None:
+            session = Session()
+        key_col = getattr(self.entity_class, self.key_attribute)
+        last_key = self.after
+        remaining = self.limit
+        while remaining is None or remaining > 0:
+            if remaining is None:
+                size = self.chunk_size
+            else:
+                size = min(self.chunk_size, remaining)
+            query = session.query(self.entity_class) \
+                                .filter(key_col != None)
+            if not last_key is None:
+                query = query.filter(key_col > last_key)
+            query = query.order_by(key_col).limit(size)
+            opt_query = _EagerLoadingPlans.get(self.entity_class, query,
+                                               ACCESS_PATHS.ITERATION)
+            if not opt_query is None:
+                query = opt_query
+            # The stream_results option makes psycopg2 use a named
+            # server-side cursor.
+            query = query.execution_options(stream_results=True) \
+                                                            .yield_per(size)
+            cnt = 0
+            for entity in query:
+                last_key = getattr(entity, self.key_attribute)
+                cnt += 1
+                yield entity
+            if cnt < size:
+                break
+            if not remaining is None:
+                remaining -= cnt
+
+
 class _FilterVisitorFactories(object):
     @classmethod
     def _location_filter_visitor_factory(cls, session): # pylint: disable=W0613
@@ -114,31 +346,78 @@ class _FilterVisitorFactories(object):
         visitor_cls = get_filter_specification_visitor(EXPRESSION_KINDS.SQL)
         return visitor_cls(rack_cls, custom_clause_factories)
 
+    #: The triggers maintaining the stock product lookup table (created by
+    #: the migration script; schemas created from the table metadata only
+    #: lack them).
+    STOCK_PRODUCT_LOOKUP_TRIGGERS = ('stock_sample_product_lookup',
+                                     'sample_product_lookup',
+                                     'smd_product_lookup',
+                                     'psmd_product_lookup')
+    STOCK_PRODUCT_LOOKUP_QUERY = \
+        'select count(distinct t.tgname) from pg_trigger t' \
+        ' where t.tgname in (%s)' \
+        ' and exists (select * from pg_class c' \
+        '  where c.relname=\'stock_product_lookup\' and c.relkind=\'r\')' \
+        % ', '.join(["'%s'" % name for name in STOCK_PRODUCT_LOOKUP_TRIGGERS])
+
     @classmethod
-    def _tube_filter_visitor_factory(cls, session): # pylint: disable=W0613
-        # FIXME: This is necessary because we build our query expressions
-        #        from the instrumented attributes of the entity class -
-        #        which is Sample, not StockSample.
+    def _tube_filter_visitor_factory(cls, session):
         def sample_product_id_expr(product_id):
-            # Using hidden instrumented attributes pylint: disable=E1101
-            return Tube.sample.has(
-                and_(StockSample.sample_id == Sample.sample_id,
-                     StockSample.molecule_design_pool.has(
-                         MoleculeDesignPool.supplier_molecule_designs.any(
-                             and_(SupplierMoleculeDesign.product_id ==
-                                        product_id,
-                                  SupplierMoleculeDesign.supplier_id ==
-                                        StockSample.supplier_id,
-                                  SupplierMoleculeDesign.is_current)
-                                                                   ))))
-            # pylint: enable=E1101
-
+            return cls._sample_product_id_expr(session, product_id)
         custom_clause_factories = {
             ('sample.product_id', 'equal_to') : sample_product_id_expr,
             }
         visitor_cls = get_filter_specification_visitor(EXPRESSION_KINDS.SQL)
         return visitor_cls(Tube, custom_clause_factories)
 
+    @classmethod
+    def _sample_product_id_expr(cls, session, product_id):
+        # The indexed lookup table is only used if its triggers are
+        # installed; otherwise, it might be incomplete.
+        if cls._has_stock_product_lookup(session):
+            expr = cls._sample_product_id_lookup_expr(product_id)
+        else:
+            expr = cls._sample_product_id_join_expr(product_id)
+        return expr
+
+    @classmethod
+    def _has_stock_product_lookup(cls, session):
+        if session.get_bind().dialect.name == 'postgresql':
+            trigger_count = session.execute(
+                        text(cls.STOCK_PRODUCT_LOOKUP_QUERY)).scalar()
+            has_lookup = \
+                    trigger_count == len(cls.STOCK_PRODUCT_LOOKUP_TRIGGERS)
+        else:
+            has_lookup = False
+        return has_lookup
+
+    @staticmethod
+    def _sample_product_id_lookup_expr(product_id):
+        # The trigger-maintained stock product lookup table maps current
+        # product IDs to stock sample containers.
+        lookup_tbl = class_mapper(Tube).local_table.metadata.tables[
+                                                'stock_product_lookup']
+        return Tube.id.in_(select([lookup_tbl.c.container_id],
+                                  lookup_tbl.c.product_id == product_id))
+
+    @staticmethod
+    def _sample_product_id_join_expr(product_id):
+        # FIXME: This is necessary because we build our query expressions
+        #        from the instrumented attributes of the entity class -
+        #        which is Sample, not StockSample.
+        # Using hidden instrumented attributes pylint: disable=E1101
+        return Tube.sample.has(
+            and_(StockSample.sample_id == Sample.sample_id,
+                 StockSample.molecule_design_pool.has(
+                     MoleculeDesignPool.supplier_molecule_designs.any(
+                         and_(SupplierMoleculeDesign.product_id ==
+                                    product_id,
+                              SupplierMoleculeDesign.supplier_id ==
+                                    StockSample.supplier_id,
+                              SupplierMoleculeDesign.is_current)
+                                                               ))))
+        # pylint: enable=E1101
+
     __map = {BarcodedLocation:'_location_filter_visitor_factory',
              TubeRack:'_tube_rack_filter_visitor_factory',
              Plate:'_plate_filter_visitor_factory',
@@ -539,6 +539,30 @@ class PlannedWorklist(Entity):
     index = property(__get_index, __set_index)
     worklist_series = property(__get_worklist_series, __set_worklist_series)
 
+    @property
+    def content_digest(self):
+        """
+        An md5 encoded string derived from the transfer type, the pipetting
+        specs and the planned liquid transfers of the worklist. Worklists
+        with equal content (regardless of the label and the order of the
+        planned liquid transfers) have equal content digests.
+        """
+        return self.get_content_digest(self.transfer_type,
+                                       self.pipetting_specs,
+                                       self.planned_liquid_transfers)
+
+    @classmethod
+    def get_content_digest(cls, transfer_type, pipetting_specs,
+                           planned_liquid_transfers):
+        """
+        Returns the content digest for the passed values (see
+        :attr:`content_digest`).
+        """
+        values = [transfer_type, pipetting_specs.name] \
+                 + sorted([plt.hash_value
+                           for plt in planned_liquid_transfers])
+        return md5(';'.join(values)).hexdigest()
+
     def __iter__(self):
         return iter(self.planned_liquid_transfers)
 
@@ -596,6 +620,18 @@ class WorklistSeries(Entity):
             if wsm.index == wl_index: return wsm.planned_worklist
         raise ValueError('There is no worklist for index %i!' % (wl_index))
 
+    @property
+    def content_digest(self):
+        """
+        An md5 encoded string derived from the index, the label and the
+        content digest (see :attr:`PlannedWorklist.content_digest`) of each
+        worklist in the series.
+        """
+        member_strs = ['%i:%s:%s' % (wsm.index, wsm.planned_worklist.label,
+                                     wsm.planned_worklist.content_digest)
+                       for wsm in self.worklist_series_members]
+        return md5(';'.join(sorted(member_strs))).hexdigest()
+
     def get_sorted_worklists(self):
         """
         Returns the worklists of this series sorted by index.
@@ -6,10 +6,19 @@ Rack layout entity classes.
 
 Created Nov 26, 2010
 """
+from md5 import md5
+import base64
+import json
+import zlib
+
 from everest.entities.base import Entity
+from thelma.entities.tagging import Tag
+from thelma.entities.utils import decode_index_tuples
+from thelma.entities.utils import encode_index_tuples
 
 __docformat__ = "reStructuredText en"
-__all__ = ['RackLayout']
+__all__ = ['RackLayout',
+           'RackLayoutPayload']
 
 
 class RackLayout(Entity):
@@ -25,8 +34,13 @@ class RackLayout(Entity):
     shape = None
     #: List of tagged rack position sets.
     tagged_rack_position_sets = None
+    #: Compact, denormalised representation of the tag and position maps
+    #: (:class:`RackLayoutPayload` string; written on flush). Optional.
+    payload = None
 
-    __initialized = False
+    #: Identifies the state the maps have been created from (*None* if the
+    #: maps have not been created yet).
+    __maps_signature = None
 
     def __init__(self, shape=None, tagged_rack_position_sets=None, **kw):
         Entity.__init__(self, **kw)
@@ -34,6 +48,7 @@ class RackLayout(Entity):
         if tagged_rack_position_sets is None:
             tagged_rack_position_sets = []
         self.tagged_rack_position_sets = tagged_rack_position_sets
+        self.payload = None
         self.__tag_to_positions_map = None
         self.__position_to_tags_map = None
         self.__all_tags = None
@@ -47,10 +62,10 @@ class RackLayout(Entity):
         @type tagged_rack_position_set:
                 :class:`thelma.entities.tagging.TaggedRackPositionSet`
         """
-        if not self.__initialized:
-            self.__initialize()
+        self.__initialize()
         self.tagged_rack_position_sets.append(tagged_rack_position_set)
         self.__process_tagged_rack_position_set(tagged_rack_position_set)
+        self.__maps_signature = self.__get_maps_signature()
 
     def get_tags(self):
         """
@@ -58,8 +73,7 @@ class RackLayout(Entity):
 
         :rtype: set of :class:`thelma.entities.tagging.Tag`
         """
-        if not self.__initialized:
-            self.__initialize()
+        self.__initialize()
         return self.__all_tags
 
     def get_positions(self):
@@ -68,8 +82,7 @@ class RackLayout(Entity):
 
         :rtype: set of :py:class:`thelma.entities.rack.RackPosition`
         """
-        if not self.__initialized:
-            self.__initialize()
+        self.__initialize()
         return self.__all_positions
 
     def get_tags_for_position(self, position):
@@ -82,8 +95,7 @@ class RackLayout(Entity):
             no tag associated with the given position).
         :rtype: set of :py:class:`thelma.entities.tagging.Tag`
         """
-        if not self.__initialized:
-            self.__initialize()
+        self.__initialize()
         tags = self.__position_to_tags_map.get(position)
         if tags is None:
             tags = set()
@@ -99,8 +111,7 @@ class RackLayout(Entity):
             no position associated with the given tag).
         :rtype: set of :class:`thelma.entities.rack.RackPosition`
         """
-        if not self.__initialized:
-            self.__initialize()
+        self.__initialize()
         poss = self.__tag_to_positions_map.get(tag)
         if poss is None:
             poss = set()
@@ -113,8 +124,7 @@ class RackLayout(Entity):
         :return: Test result.
         :rtype: bool
         """
-        if not self.__initialized:
-            self.__initialize()
+        self.__initialize()
         return len(self.__all_positions) > 0
 
     def has_tags(self):
@@ -124,10 +134,53 @@ class RackLayout(Entity):
         :return: Test result.
         :rtype: bool
         """
-        if not self.__initialized:
-            self.__initialize()
+        self.__initialize()
         return len(self.__all_tags) > 0
 
+    @property
+    def content_digest(self):
+        """
+        An md5 encoded string derived from the shape and the tag and position
+        maps of the layout. Layouts assigning the same tags to the same
+        positions have equal content digests (regardless of how the positions
+        are grouped into tagged rack position sets).
+        """
+        self.__initialize()
+        tag_strs = []
+        for tag, poss in self.__tag_to_positions_map.iteritems():
+            pos_strs = ['%i_%i' % (pos.row_index, pos.column_index)
+                        for pos in sorted(poss, key=lambda pos:
+                                          (pos.row_index, pos.column_index))]
+            tag_strs.append('%s:%s=%s@%s' % (tag.domain, tag.predicate,
+                                             tag.value, ','.join(pos_strs)))
+        shape_name = None if self.shape is None else self.shape.name
+        value_str = ';'.join(['%s' % shape_name] + sorted(tag_strs))
+        if isinstance(value_str, unicode):
+            value_str = value_str.encode('utf-8')
+        return md5(value_str).hexdigest()
+
+    def update_payload(self):
+        """
+        Recreates the :attr:`payload` from the tagged rack position sets.
+        """
+        payload = RackLayoutPayload.from_tagged_rack_position_sets(
+                                            self.tagged_rack_position_sets)
+        self.payload = payload.to_string()
+
+    def check_payload_consistency(self):
+        """
+        Checks whether the :attr:`payload` agrees with the tagged rack
+        position sets.
+
+        :return: List of inconsistency messages (empty if the representations
+            agree or if there is no payload).
+        :rtype: :class:`list`
+        """
+        if self.payload is None:
+            return []
+        payload = RackLayoutPayload.from_string(self.payload)
+        return payload.get_inconsistencies(self.tagged_rack_position_sets)
+
     def __str__(self):
         return '%s' % (self.id)
 
@@ -137,13 +190,48 @@ class RackLayout(Entity):
                   len(self.tagged_rack_position_sets))
         return str_format % params
 
+    def __get_maps_signature(self):
+        # The payload is only used as long as the tagged rack position sets
+        # have not been loaded (and thus cannot have been modified).
+        if not self.payload is None \
+                and not 'tagged_rack_position_sets' in self.__dict__:
+            sig = ('payload', self.payload)
+        else:
+            # Tags are added to the sets in place (see
+            # :func:`thelma.entities.tagging.Tagged.add_tag`), hence the
+            # tags of each set are part of the signature.
+            sig = tuple([(id(trps), id(trps.rack_position_set),
+                          frozenset(trps.tags))
+                         for trps in self.tagged_rack_position_sets])
+        return sig
+
     def __initialize(self):
+        sig = self.__get_maps_signature()
+        if sig == self.__maps_signature:
+            return
         self.__all_tags = set()
         self.__all_positions = set()
         self.__position_to_tags_map = {}
         self.__tag_to_positions_map = {}
-        for trps in self.tagged_rack_position_sets:
-            self.__process_tagged_rack_position_set(trps)
+        if len(sig) > 0 and sig[0] == 'payload':
+            self.__initialize_from_payload()
+        else:
+            for trps in self.tagged_rack_position_sets:
+                self.__process_tagged_rack_position_set(trps)
+        self.__maps_signature = sig
+
+    def __initialize_from_payload(self):
+        payload = RackLayoutPayload.from_string(self.payload)
+        for tag, poss in payload.get_tag_to_positions_map().iteritems():
+            self.__tag_to_positions_map[tag] = poss
+            self.__all_positions.update(poss)
+            for rack_pos in poss:
+                rptags = self.__position_to_tags_map.get(rack_pos)
+                if rptags is None:
+                    self.__position_to_tags_map[rack_pos] = set([tag])
+                else:
+                    rptags.add(tag)
+            self.__all_tags.add(tag)
 
     def __process_tagged_rack_position_set(self, tagged_rack_position_set):
         tags = tagged_rack_position_set.tags
@@ -162,3 +250,133 @@ class RackLayout(Entity):
             else:
                 rptags.update(tags)
         self.__all_tags.update(tags)
+
+
+class RackLayoutPayload(object):
+    """
+    Compact, denormalised representation of the tag and position maps of a
+    :class:`RackLayout`.
+
+    The payload comprises a tag dictionary (domain, predicate, and value of
+    each tag) and the positions of each tag as run length encoded pattern
+    (see :func:`thelma.entities.utils.encode_index_tuples`). The string
+    representation is the compressed (zlib) and base64 encoded JSON
+    document.
+    """
+    #: The version of the payload format.
+    VERSION = 1
+
+    def __init__(self, tag_triples, position_patterns):
+        """
+        Constructor.
+
+        :param list tag_triples: (domain, predicate, value) tuples.
+        :param list position_patterns: Run length encoded position pattern
+            for each tag triple.
+        """
+        self.__tag_triples = tag_triples
+        self.__position_patterns = position_patterns
+
+    @classmethod
+    def from_tagged_rack_position_sets(cls, tagged_rack_position_sets):
+        """
+        Creates the payload for the given tagged rack position sets.
+        """
+        index_map = cls.__create_index_map(tagged_rack_position_sets)
+        tag_triples = sorted(index_map.keys())
+        position_patterns = [encode_index_tuples(index_map[triple])
+                             for triple in tag_triples]
+        return cls(tag_triples, position_patterns)
+
+    @classmethod
+    def from_string(cls, payload_string):
+        """
+        Restores a payload from its string representation.
+
+        :raises ValueError: If the payload has an unknown format version.
+        """
+        data = json.loads(zlib.decompress(base64.b64decode(payload_string)))
+        if data['version'] != cls.VERSION:
+            msg = 'Unsupported rack layout payload version: %s.' \
+                  % (data['version'])
+            raise ValueError(msg)
+        return cls([tuple(triple) for triple in data['tags']],
+                   data['positions'])
+
+    def to_string(self):
+        """
+        Returns the string representation of this payload.
+        """
+        data = dict(version=self.VERSION,
+                    tags=[list(triple) for triple in self.__tag_triples],
+                    positions=self.__position_patterns)
+        return base64.b64encode(zlib.compress(json.dumps(data)))
+
+    def get_tag_to_index_tuples_map(self):
+        """
+        Returns a map with a (domain, predicate, value) tuple as key and the
+        set of (row index, column index) tuples of its positions as value.
+        """
+        return dict([(triple, decode_index_tuples(pattern))
+                     for (triple, pattern) in zip(self.__tag_triples,
+                                                  self.__position_patterns)])
+
+    def get_tag_to_positions_map(self):
+        """
+        Returns a map with tags (:class:`thelma.entities.tagging.Tag`) as
+        keys and sets of rack positions
+        (:class:`thelma.entities.rack.RackPosition`) as values.
+        """
+        index_map = self.get_tag_to_index_tuples_map()
+        all_coords = set()
+        for coords in index_map.itervalues():
+            all_coords.update(coords)
+        # Imported here to avoid a circular import (the semiconstants module
+        # imports entity modules).
+        from thelma.tools.semiconstants import get_rack_position_from_indices
+        rack_positions = dict([(coord, get_rack_position_from_indices(*coord))
+                               for coord in all_coords])
+        tag_map = dict()
+        for triple, coords in index_map.iteritems():
+            tag_map[Tag(*triple)] = set([rack_positions[coord]
+                                         for coord in coords])
+        return tag_map
+
+    def get_inconsistencies(self, tagged_rack_position_sets):
+        """
+        Compares this payload to the given tagged rack position sets.
+
+        :return: List of messages describing the differences (empty if
+            both representations agree).
+        :rtype: :class:`list`
+        """
+        msgs = []
+        payload_map = self.get_tag_to_index_tuples_map()
+        trps_map = self.__create_index_map(tagged_rack_position_sets)
+        for triple in sorted(set(payload_map).difference(trps_map)):
+            msgs.append('Tag %s:%s=%s is only present in the payload.'
+                        % triple)
+        for triple in sorted(set(trps_map).difference(payload_map)):
+            msgs.append('Tag %s:%s=%s is missing in the payload.' % triple)
+        for triple in sorted(set(trps_map).intersection(payload_map)):
+            if payload_map[triple] != trps_map[triple]:
+                msgs.append('The positions for tag %s:%s=%s differ.'
+                            % triple)
+        return msgs
+
+    @classmethod
+    def __create_index_map(cls, tagged_rack_position_sets):
+        index_map = dict()
+        for trps in tagged_rack_position_sets:
+            coords = set([(rack_pos.row_index, rack_pos.column_index)
+                          for rack_pos in trps.rack_position_set])
+            if len(coords) < 1:
+                continue
+            for tag in trps.tags:
+                triple = (tag.domain, tag.predicate, tag.value)
+                tag_coords = index_map.get(triple)
+                if tag_coords is None:
+                    index_map[triple] = coords.copy()
+                else:
+                    tag_coords.update(coords)
+        return index_map
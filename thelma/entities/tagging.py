@@ -35,7 +35,7 @@ class Tag(Entity):
         Entity.__init__(self, **kw)
         self.domain = domain
         self.predicate = predicate
-        self.value = self.__strip_value(value)
+        self.value = self.normalize_value(value)
 
     def is_similar(self, other):
         """
@@ -74,7 +74,11 @@ class Tag(Entity):
                   self.value)
         return str_format % params
 
-    def __strip_value(self, value):
+    @staticmethod
+    def normalize_value(value):
+        """
+        Converts the given value into the string stored as tag value.
+        """
         # Remove the '.0' from numeric values.
         # FIXME: This looks VERY much like a hack. # pylint:disable=W0511
         value = str(value)
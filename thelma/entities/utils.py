@@ -20,7 +20,8 @@ __all__ = ['get_current_user',
            'label_from_number',
            'number_from_label',
            'BinaryRunLengthEncoder',
-           'encode_index_tuples'
+           'encode_index_tuples',
+           'decode_index_tuples'
            ]
 
 def get_current_user():
@@ -195,7 +196,10 @@ class BinaryRunLengthEncoder(object):
         """
         Determines the largest row and column indices of all positive
         wells and derives the dimension of the scanning pattern from this.
+        An empty pattern has a (0, 0) dimension.
         """
+        if len(col_map) < 1:
+            return 0, 0
         max_row = 0
         max_column = max(col_map.keys())
         for row_list in col_map.values():
@@ -260,3 +264,38 @@ class BinaryRunLengthEncoder(object):
 def encode_index_tuples(position_set):
     encoder = BinaryRunLengthEncoder(position_set)
     return encoder.encode_as_run_length_string()
+
+
+def decode_index_tuples(run_length_string):
+    """
+    Reverses :func:`encode_index_tuples`: converts a run length encoded
+    string back into a set of positions (row_index (:class:`int`),
+    column_index (:class:`int`)).
+
+    :param run_length_string: run length encoded string as generated by
+        the :class:`BinaryRunLengthEncoder`
+    :type run_length_string: :class:`string`
+    :return: set of (row_index, column_index) tuples
+    """
+    rl_string, row_number = run_length_string.rsplit('_', 1)
+    row_number = int(row_number)
+    s62_map = dict([(str(c), i)
+                    for (i, c) in enumerate(BinaryRunLengthEncoder.S62_NUMBERS)])
+    index_tuples = set()
+    linear_index = 0
+    is_positive = True
+    i = 0
+    while i < len(rl_string):
+        if rl_string[i] == BinaryRunLengthEncoder.TWO_PLACE_MARKER:
+            counter = s62_map[rl_string[i + 1]] * 62 \
+                      + s62_map[rl_string[i + 2]]
+            i += 3
+        else:
+            counter = s62_map[rl_string[i]]
+            i += 1
+        if is_positive:
+            for idx in range(linear_index, linear_index + counter):
+                index_tuples.add((idx % row_number, idx // row_number))
+        linear_index += counter
+        is_positive = not is_positive
+    return index_tuples
@@ -10,6 +10,7 @@ from zope.interface import Interface # pylint: disable=E0611,F0401
 __docformat__ = 'reStructuredText en'
 
 __all__ = ['IBarcodePrintJob',
+           'IBarcodeSpoolTransport',
            'IChemicalStructure',
            'IChemicalStructureType',
            'IContainer',
@@ -49,6 +50,7 @@ __all__ = ['IBarcodePrintJob',
            'IRackLayout',
            'IRackShape',
            'IRackSpecs',
+           'IRepresentationCache',
            'ISample',
            'ISampleMolecule',
            'ISeriesMember',
@@ -77,6 +79,13 @@ class IBarcodePrintJob(Interface):
     """
 
 
+class IBarcodeSpoolTransport(Interface):
+    """
+    Marker interface by which you can get the registered transport for
+    barcode print streams.
+    """
+
+
 class IChemicalStructureType(Interface):
     """
     Marker interface indicating participation in chemical structure type
@@ -453,6 +462,13 @@ class IRackSpecs(Interface):
     """
 
 
+class IRepresentationCache(Interface):
+    """
+    Marker interface by which you can get the registered cache for the
+    rendered representations of semiconstant resources.
+    """
+
+
 class IReservoirSpecs(Interface):
     """
     Marker interface indicating participation in reservoir specs resources.
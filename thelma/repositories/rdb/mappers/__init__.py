@@ -227,6 +227,8 @@ def initialize_mappers(tables, views):
     tag.create_mapper(tables['tag'], tables['tag_domain'],
                       tables['tag_predicate'], tables['tag_value'],
                       tables['tagging'])
+    tag.TagFlushResolver(tables['tag'], tables['tag_domain'],
+                         tables['tag_predicate'], tables['tag_value']).listen()
     tagged_mapper = tagged.create_mapper(tables['tagged'], tables['tagging'])
     taggedrackpositionset.create_mapper(tagged_mapper,
                                         tables['tagged_rack_position_set'])
@@ -234,6 +236,7 @@ def initialize_mappers(tables, views):
                                         tables['rack_position_set_member'])
     rackposition.create_mapper(tables['rack_position'])
     racklayout.create_mapper(tables['rack_layout'])
+    racklayout.listen_payload_updates()
 
     job_mapper = job.create_mapper(tables['new_job'])
 
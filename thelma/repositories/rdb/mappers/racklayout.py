@@ -4,16 +4,22 @@ See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
 
 Rack layout mapper.
 """
+from itertools import chain
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
 from sqlalchemy.orm import relationship
 
 from everest.repositories.rdb.utils import mapper
 from thelma.entities.rack import RackShape
 from thelma.entities.racklayout import RackLayout
 from thelma.entities.tagging import TaggedRackPositionSet
+from thelma.entities.tagging import Tagging
 
 
 __docformat__ = "reStructuredText en"
-__all__ = ['create_mapper']
+__all__ = ['create_mapper',
+           'listen_payload_updates']
 
 
 def create_mapper(rack_layout_tbl):
@@ -31,4 +37,40 @@ def create_mapper(rack_layout_tbl):
                                     cascade='all,delete,delete-orphan'),
                      ),
                )
+    event.listen(m, 'before_insert', update_payload)
+    event.listen(m, 'before_update', update_payload)
     return m
+
+
+def update_payload(mapper, connection, target): # pylint: disable=W0613
+    """
+    Writes the compact layout payload before a rack layout is flushed.
+    """
+    target.update_payload()
+
+
+def update_changed_payloads(session, flush_context, instances): # pylint: disable=W0613
+    """
+    Rewrites the payload of all rack layouts whose tagged rack position sets
+    (or the taggings of these sets) are changed by the coming flush. These
+    changes do not necessarily touch the rack layout record itself.
+    """
+    layouts = dict()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Tagging):
+            obj = obj.tagged
+        if isinstance(obj, TaggedRackPositionSet):
+            layout = obj.layout
+            if not layout is None:
+                layouts[id(layout)] = layout
+    for layout in layouts.itervalues():
+        if not layout in session.deleted:
+            layout.update_payload()
+
+
+def listen_payload_updates():
+    """
+    Installs the session event listener keeping the rack layout payloads up
+    to date. This must be called exactly once, when the mappers are set up.
+    """
+    event.listen(Session, 'before_flush', update_changed_payloads)
@@ -4,21 +4,302 @@ See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
 
 Tag mapper.
 """
+from collections import OrderedDict
+from threading import Lock
+from weakref import WeakKeyDictionary
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
 from sqlalchemy.orm import column_property
 from sqlalchemy.orm import relationship
 from sqlalchemy.orm.deprecated_interfaces import MapperExtension
 from sqlalchemy.sql import select
 from sqlalchemy.sql.expression import func
 from sqlalchemy.sql.expression import insert
+from sqlalchemy.sql.expression import tuple_
 
 from everest.repositories.rdb.utils import as_slug_expression
 from everest.repositories.rdb.utils import mapper
 from thelma.entities.tagging import Tag
 from thelma.entities.tagging import Tagged
+from thelma.entities.tagging import Tagging
 
 
 __docformat__ = "reStructuredText en"
-__all__ = ['create_mapper']
+__all__ = ['TagIdCache',
+           'TagFlushResolver',
+           'create_mapper']
+
+
+class TagIdCache(object):
+    """
+    Thread-safe least-recently-used cache for resolved tag dictionary and
+    tag IDs.
+
+    Only IDs of committed records may be cached (IDs of records inserted
+    during a transaction that is rolled back become invalid).
+    """
+    #: The default maximum number of cached IDs.
+    MAX_SIZE = 10000
+
+    def __init__(self, max_size=None):
+        if max_size is None:
+            max_size = self.MAX_SIZE
+        self.__max_size = max_size
+        self.__ids = OrderedDict()
+        self.__lock = Lock()
+
+    def get(self, key):
+        """
+        Returns the ID cached for the given key (or *None*) and marks the key
+        as recently used.
+        """
+        with self.__lock:
+            id_value = self.__ids.pop(key, None)
+            if not id_value is None:
+                self.__ids[key] = id_value
+        return id_value
+
+    def set(self, key, id_value):
+        """
+        Caches the given ID, discarding the least recently used entry if the
+        cache is full.
+        """
+        with self.__lock:
+            self.__ids.pop(key, None)
+            self.__ids[key] = id_value
+            if len(self.__ids) > self.__max_size:
+                self.__ids.popitem(last=False)
+
+    def discard(self, key):
+        """
+        Removes the given key from the cache (if present).
+        """
+        with self.__lock:
+            self.__ids.pop(key, None)
+
+    def clear(self):
+        """
+        Removes all entries from the cache.
+        """
+        with self.__lock:
+            self.__ids.clear()
+
+    def __len__(self):
+        return len(self.__ids)
+
+
+class TagFlushResolver(object):
+    """
+    Resolves all pending tags of a session in bulk before it is flushed.
+
+    The `tag_domain`, `tag_predicate`, and `tag_value` dictionary records
+    are looked up (and inserted, if missing) with one set-based statement
+    per table and the IDs are assigned to the new tags. Pending tags which
+    are equal to an existing `tag` record (or to another pending tag) are
+    replaced by that tag in their taggings and removed from the session, so
+    that duplicate tag records are not inserted.
+
+    IDs looked up during a transaction are held per session and only moved
+    to the process-wide :attr:`id_cache` when the outermost transaction of
+    the session commits (releasing a savepoint does not count); they are
+    discarded when the session (or a savepoint) is rolled back, since the
+    records they refer to may have been inserted by the rolled back
+    transaction.
+    """
+    #: The process-wide ID cache (keys are (table name, value) tuples for
+    #: dictionary records and (domain, predicate, value) tuples for tags).
+    id_cache = TagIdCache()
+
+    def __init__(self, tag_tbl, tag_domain_tbl, tag_predicate_tbl,
+                 tag_value_tbl):
+        self.__tag_tbl = tag_tbl
+        #: Dictionary tables together with ID and value column names in the
+        #: order of the tag triple (domain, predicate, value).
+        self.__dict_specs = [(tag_domain_tbl, 'tag_domain_id', 'domain'),
+                             (tag_predicate_tbl, 'tag_predicate_id',
+                              'predicate'),
+                             (tag_value_tbl, 'tag_value_id', 'value')]
+        #: Maps sessions to the IDs looked up in their current transaction.
+        self.__session_ids = WeakKeyDictionary()
+
+    def listen(self):
+        """
+        Installs the session event listeners for this resolver. This must be
+        called exactly once, when the mappers are set up.
+        """
+        event.listen(Session, 'before_flush', self.__before_flush)
+        event.listen(Session, 'after_commit', self.__after_commit)
+        event.listen(Session, 'after_soft_rollback',
+                     self.__after_soft_rollback)
+
+    def __before_flush(self, session, flush_context, instances): # pylint:disable=W0613
+        self.resolve(session)
+
+    def __after_commit(self, session):
+        # This is also called when a savepoint is released; the IDs have to
+        # wait for the outermost transaction in this case.
+        transaction = session.transaction
+        if not transaction is None and transaction.nested:
+            return
+        session_ids = self.__session_ids.pop(session, None)
+        if not session_ids is None:
+            for key, id_value in session_ids.iteritems():
+                self.id_cache.set(key, id_value)
+
+    def __after_soft_rollback(self, session, previous_transaction): # pylint:disable=W0613
+        self.__session_ids.pop(session, None)
+
+    def __get_id(self, session, key):
+        id_value = self.id_cache.get(key)
+        if id_value is None:
+            id_value = self.__session_ids.get(session, {}).get(key)
+        return id_value
+
+    def __set_id(self, session, key, id_value):
+        self.__session_ids.setdefault(session, {})[key] = id_value
+
+    def __discard_id(self, session, key):
+        self.id_cache.discard(key)
+        self.__session_ids.get(session, {}).pop(key, None)
+
+    def resolve(self, session):
+        """
+        Resolves the pending tags in the given session.
+        """
+        pending_tags = []
+        pending_taggings = []
+        for obj in session.new:
+            if isinstance(obj, Tag):
+                if obj.tag_domain_id is None:
+                    pending_tags.append(obj)
+            elif isinstance(obj, Tagging):
+                pending_taggings.append(obj)
+        if len(pending_tags) < 1:
+            return
+        pending_taggings.extend([obj for obj in session.dirty
+                                 if isinstance(obj, Tagging)])
+        conn = session.connection()
+        # Tags are equal if their triples are equal, so pending tags must
+        # be tracked by identity (and not in tag keyed maps).
+        triple_tags = []
+        repr_tags = dict()
+        for tag in pending_tags:
+            triple = (tag.domain, tag.predicate, tag.value)
+            triple_tags.append((triple, tag))
+            repr_tags.setdefault(triple, tag)
+        existing_tags = self.__fetch_existing_tags(session, conn,
+                                                   repr_tags.keys())
+        new_tags = dict([(triple, tag)
+                         for (triple, tag) in repr_tags.iteritems()
+                         if not triple in existing_tags])
+        repr_tags.update(existing_tags)
+        tagging_map = dict()
+        for tagging in pending_taggings:
+            tagging_map.setdefault(id(tagging.tag), []).append(tagging)
+        for triple, tag in triple_tags:
+            repl_tag = repr_tags[triple]
+            if repl_tag is tag:
+                continue
+            for tagging in tagging_map.get(id(tag), []):
+                tagging.tag = repl_tag
+            if tag in session:
+                session.expunge(tag)
+        if len(new_tags) > 0:
+            dict_id_maps = self.__resolve_dictionary_ids(session, conn,
+                                                         new_tags.keys())
+            for triple, tag in new_tags.iteritems():
+                tag.tag_domain_id = dict_id_maps[0][triple[0]]
+                tag.tag_predicate_id = dict_id_maps[1][triple[1]]
+                tag.tag_value_id = dict_id_maps[2][triple[2]]
+
+    def __fetch_existing_tags(self, session, conn, triples):
+        # Returns a map triple -> persistent tag for all triples which
+        # already have a tag record.
+        tag_id_map = dict()
+        lookup_triples = []
+        for triple in triples:
+            tag_id = self.__get_id(session, triple)
+            if tag_id is None:
+                lookup_triples.append(triple)
+            else:
+                tag_id_map[triple] = tag_id
+        if len(lookup_triples) > 0:
+            dict_id_maps = self.__resolve_dictionary_ids(session, conn,
+                                                         lookup_triples,
+                                                         insert_missing=False)
+            id_triples = dict()
+            for triple in lookup_triples:
+                try:
+                    id_triple = tuple([dict_id_maps[i][triple[i]]
+                                       for i in range(3)])
+                except KeyError:
+                    # At least one dictionary record is missing - this must
+                    # be a new tag.
+                    continue
+                id_triples[id_triple] = triple
+            if len(id_triples) > 0:
+                tbl = self.__tag_tbl
+                id_cols = [getattr(tbl.c, spec[1])
+                           for spec in self.__dict_specs]
+                sel = select([tbl.c.tag_id] + id_cols,
+                             tuple_(*id_cols).in_(id_triples.keys()))
+                for row in conn.execute(sel):
+                    triple = id_triples[tuple(row)[1:]]
+                    tag_id_map[triple] = row.tag_id
+                    self.__set_id(session, triple, row.tag_id)
+        existing_tags = dict()
+        if len(tag_id_map) > 0:
+            tag_ids = set(tag_id_map.values())
+            tags = session.query(Tag) \
+                        .filter(self.__tag_tbl.c.tag_id.in_(tag_ids)).all()
+            for tag in tags:
+                existing_tags[(tag.domain, tag.predicate, tag.value)] = tag
+            for triple in tag_id_map:
+                if not triple in existing_tags:
+                    self.__discard_id(session, triple)
+        return existing_tags
+
+    def __resolve_dictionary_ids(self, session, conn, triples,
+                                 insert_missing=True):
+        # Returns one value -> ID map for each dictionary table.
+        id_maps = []
+        for idx, (tbl, id_col_name, val_col_name) in \
+                                            enumerate(self.__dict_specs):
+            id_map = dict()
+            lookup_values = set()
+            for val in set([triple[idx] for triple in triples]):
+                ref_id = self.__get_id(session, (tbl.name, val))
+                if ref_id is None:
+                    lookup_values.add(val)
+                else:
+                    id_map[val] = ref_id
+            if len(lookup_values) > 0:
+                found = self.__select_dictionary_ids(conn, tbl, id_col_name,
+                                                     val_col_name,
+                                                     lookup_values)
+                for val, ref_id in found.iteritems():
+                    self.__set_id(session, (tbl.name, val), ref_id)
+                id_map.update(found)
+                missing_values = lookup_values.difference(found)
+                if insert_missing and len(missing_values) > 0:
+                    conn.execute(insert(tbl),
+                                 [{val_col_name:val}
+                                  for val in missing_values])
+                    id_map.update(
+                        self.__select_dictionary_ids(conn, tbl, id_col_name,
+                                                     val_col_name,
+                                                     missing_values))
+            id_maps.append(id_map)
+        return id_maps
+
+    def __select_dictionary_ids(self, conn, tbl, id_col_name, val_col_name,
+                                values):
+        val_col = getattr(tbl.c, val_col_name)
+        sel = select([getattr(tbl.c, id_col_name), val_col],
+                     val_col.in_(values))
+        return dict([(row[val_col_name], row[id_col_name])
+                     for row in conn.execute(sel)])
 
 
 class TagMapperExtension(MapperExtension):
@@ -27,6 +308,10 @@ class TagMapperExtension(MapperExtension):
     Mapper extension to take care of inserting/updating the non-mapped
     `tag_domain`, `tag_predicate`, and `tag_value` records when a `tag`
     record is created/updated.
+
+    Tags resolved in bulk by the :class:`TagFlushResolver` already have
+    their dictionary IDs set; for all others, the dictionary records are
+    fetched or inserted one by one.
     """
     def __init__(self, tag_domain_tbl, tag_predicate_tbl, tag_value_tbl):
         MapperExtension.__init__(self)
@@ -35,6 +320,10 @@ class TagMapperExtension(MapperExtension):
         self.__tag_value_tbl = tag_value_tbl
 
     def before_insert(self, tag_mapper, connection, instance): # pylint:disable=W0613
+        if not (instance.tag_domain_id is None
+                or instance.tag_predicate_id is None
+                or instance.tag_value_id is None):
+            return
         tn_id = self.__fetch_or_insert(connection,
                                        self.__tag_domain_tbl,
                                        'tag_domain_id',
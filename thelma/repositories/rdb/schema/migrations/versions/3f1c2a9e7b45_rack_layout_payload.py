@@ -0,0 +1,27 @@
+"""rack layout payload
+
+Revision ID: 3f1c2a9e7b45
+Revises: 1d6d30bd88b6
+Create Date: 2026-10-19 10:12:31.402117
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a9e7b45'
+down_revision = '1d6d30bd88b6'
+
+from alembic import op
+import sqlalchemy as sa
+
+# op module has magic attributes pylint: disable=E1101
+
+def upgrade():
+    # The payload is optional; existing layouts are served from the tagging
+    # tables until they are saved again.
+    op.add_column('rack_layout', sa.Column('payload', sa.String))
+
+
+def downgrade():
+    op.drop_column('rack_layout', 'payload')
+
+# pylint: enable=E1101
@@ -0,0 +1,159 @@
+"""stock product lookup
+
+Revision ID: 52b8e1d4c6a3
+Revises: 3f1c2a9e7b45
+Create Date: 2026-10-19 11:02:47.118532
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '52b8e1d4c6a3'
+down_revision = '3f1c2a9e7b45'
+
+from alembic import op
+import sqlalchemy as sa
+
+# op module has magic attributes pylint: disable=E1101
+
+LOOKUP_SELECT = \
+    'select ss.sample_id, smd.supplier_molecule_design_id,' \
+    '       smd.product_id, s.container_id' \
+    ' from stock_sample ss' \
+    ' inner join sample s on s.sample_id=ss.sample_id' \
+    ' inner join pooled_supplier_molecule_design psmd' \
+    '  on psmd.molecule_design_set_id=ss.molecule_design_set_id' \
+    ' inner join supplier_molecule_design smd' \
+    '  on smd.supplier_molecule_design_id=psmd.supplier_molecule_design_id' \
+    ' where smd.supplier_id=ss.supplier_id and smd.is_current'
+
+LOOKUP_INSERT = \
+    'insert into stock_product_lookup' \
+    ' (sample_id, supplier_molecule_design_id, product_id, container_id) '
+
+
+def upgrade():
+    op.create_table(
+        'stock_product_lookup',
+        sa.Column('sample_id', sa.Integer,
+                  sa.ForeignKey('stock_sample.sample_id',
+                                onupdate='CASCADE', ondelete='CASCADE'),
+                  primary_key=True),
+        sa.Column('supplier_molecule_design_id', sa.Integer,
+                  sa.ForeignKey(
+                    'supplier_molecule_design.supplier_molecule_design_id',
+                    onupdate='CASCADE', ondelete='CASCADE'),
+                  primary_key=True),
+        sa.Column('product_id', sa.String, nullable=False),
+        sa.Column('container_id', sa.Integer, nullable=False),
+        )
+    op.execute(LOOKUP_INSERT + LOOKUP_SELECT)
+    op.create_index('ix_stock_product_lookup_product_id',
+                    'stock_product_lookup', ['product_id'])
+    op.create_index('ix_stock_product_lookup_container_id',
+                    'stock_product_lookup', ['container_id'])
+    # Functions refreshing the lookup records for one stock sample or one
+    # supplier molecule design.
+    op.execute('create function refresh_stock_product_lookup_for_sample'
+               ' (p_sample_id integer) returns void as $$'
+               ' begin'
+               '  delete from stock_product_lookup'
+               '   where sample_id=p_sample_id;'
+               '  ' + LOOKUP_INSERT + LOOKUP_SELECT +
+               '   and ss.sample_id=p_sample_id;'
+               ' end;'
+               ' $$ language plpgsql')
+    op.execute('create function refresh_stock_product_lookup_for_smd'
+               ' (p_smd_id integer) returns void as $$'
+               ' begin'
+               '  delete from stock_product_lookup'
+               '   where supplier_molecule_design_id=p_smd_id;'
+               '  ' + LOOKUP_INSERT + LOOKUP_SELECT +
+               '   and smd.supplier_molecule_design_id=p_smd_id;'
+               ' end;'
+               ' $$ language plpgsql')
+    # Trigger functions. All run in the transaction of the triggering
+    # statement.
+    op.execute('create function stock_sample_product_lookup_trigger()'
+               ' returns trigger as $$'
+               ' begin'
+               '  if TG_OP=\'DELETE\' then'
+               '   delete from stock_product_lookup'
+               '    where sample_id=OLD.sample_id;'
+               '  else'
+               '   perform refresh_stock_product_lookup_for_sample('
+               '                                          NEW.sample_id);'
+               '   if TG_OP=\'UPDATE\' and OLD.sample_id<>NEW.sample_id then'
+               '    delete from stock_product_lookup'
+               '     where sample_id=OLD.sample_id;'
+               '   end if;'
+               '  end if;'
+               '  return null;'
+               ' end;'
+               ' $$ language plpgsql')
+    op.execute('create function sample_product_lookup_trigger()'
+               ' returns trigger as $$'
+               ' begin'
+               '  update stock_product_lookup'
+               '   set container_id=NEW.container_id'
+               '   where sample_id=NEW.sample_id;'
+               '  return null;'
+               ' end;'
+               ' $$ language plpgsql')
+    op.execute('create function smd_product_lookup_trigger()'
+               ' returns trigger as $$'
+               ' begin'
+               '  perform refresh_stock_product_lookup_for_smd('
+               '                          NEW.supplier_molecule_design_id);'
+               '  return null;'
+               ' end;'
+               ' $$ language plpgsql')
+    op.execute('create function psmd_product_lookup_trigger()'
+               ' returns trigger as $$'
+               ' begin'
+               '  if TG_OP<>\'INSERT\' then'
+               '   perform refresh_stock_product_lookup_for_smd('
+               '                          OLD.supplier_molecule_design_id);'
+               '  end if;'
+               '  if TG_OP<>\'DELETE\' then'
+               '   perform refresh_stock_product_lookup_for_smd('
+               '                          NEW.supplier_molecule_design_id);'
+               '  end if;'
+               '  return null;'
+               ' end;'
+               ' $$ language plpgsql')
+    op.execute('create trigger stock_sample_product_lookup'
+               ' after insert or update or delete on stock_sample'
+               ' for each row'
+               ' execute procedure stock_sample_product_lookup_trigger()')
+    op.execute('create trigger sample_product_lookup'
+               ' after update of container_id on sample'
+               ' for each row'
+               ' execute procedure sample_product_lookup_trigger()')
+    op.execute('create trigger smd_product_lookup'
+               ' after insert or update of is_current, product_id,'
+               '  supplier_id on supplier_molecule_design'
+               ' for each row'
+               ' execute procedure smd_product_lookup_trigger()')
+    op.execute('create trigger psmd_product_lookup'
+               ' after insert or update or delete'
+               '  on pooled_supplier_molecule_design'
+               ' for each row'
+               ' execute procedure psmd_product_lookup_trigger()')
+
+
+def downgrade():
+    op.execute('drop trigger psmd_product_lookup'
+               ' on pooled_supplier_molecule_design')
+    op.execute('drop trigger smd_product_lookup on supplier_molecule_design')
+    op.execute('drop trigger sample_product_lookup on sample')
+    op.execute('drop trigger stock_sample_product_lookup on stock_sample')
+    op.execute('drop function psmd_product_lookup_trigger()')
+    op.execute('drop function smd_product_lookup_trigger()')
+    op.execute('drop function sample_product_lookup_trigger()')
+    op.execute('drop function stock_sample_product_lookup_trigger()')
+    op.execute('drop function refresh_stock_product_lookup_for_smd(integer)')
+    op.execute('drop function'
+               ' refresh_stock_product_lookup_for_sample(integer)')
+    op.drop_table('stock_product_lookup')
+
+# pylint: enable=E1101
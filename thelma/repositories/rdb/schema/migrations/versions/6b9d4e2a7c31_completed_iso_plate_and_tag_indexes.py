@@ -0,0 +1,34 @@
+"""completed iso plate and tag indexes
+
+Revision ID: 6b9d4e2a7c31
+Revises: 52b8e1d4c6a3
+Create Date: 2026-10-19 14:05:48.215390
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '6b9d4e2a7c31'
+down_revision = '52b8e1d4c6a3'
+
+from alembic import op
+
+# op module has magic attributes pylint: disable=E1101
+
+def upgrade():
+    # Support the set-based lookups for completed ISO plates (by ISO
+    # request and status) and experiment metadata tags (by experiment
+    # metadata). The remaining joins are covered by primary keys.
+    op.create_index('iso_iso_request_id_status_idx', 'iso',
+                    ['iso_request_id', 'status'])
+    op.create_index('iso_plate_iso_id_iso_plate_type_idx', 'iso_plate',
+                    ['iso_id', 'iso_plate_type'])
+    op.create_index('experiment_design_experiment_metadata_id_idx',
+                    'experiment_design', ['experiment_metadata_id'])
+
+
+def downgrade():
+    op.drop_index('experiment_design_experiment_metadata_id_idx')
+    op.drop_index('iso_plate_iso_id_iso_plate_type_idx')
+    op.drop_index('iso_iso_request_id_status_idx')
+
+# pylint: enable=E1101
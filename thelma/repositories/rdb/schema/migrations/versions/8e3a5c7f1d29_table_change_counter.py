@@ -0,0 +1,63 @@
+"""table change counter
+
+Revision ID: 8e3a5c7f1d29
+Revises: 6b9d4e2a7c31
+Create Date: 2026-10-19 16:21:09.554812
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '8e3a5c7f1d29'
+down_revision = '6b9d4e2a7c31'
+
+from alembic import op
+import sqlalchemy as sa
+
+# op module has magic attributes pylint: disable=E1101
+
+#: The tables holding semiconstant data (keep in sync with
+#: :const:`thelma.caching.SEMICONSTANT_TABLES`; later revisions add more
+#: tables).
+COUNTED_TABLES = ['container_specs', 'device', 'device_type',
+                  'item_status', 'molecule_type', 'organization',
+                  'pipetting_specs', 'rack_shape', 'rack_specs',
+                  'reservoir_specs', 'species']
+
+
+def upgrade():
+    op.create_table(
+        'table_change_counter',
+        sa.Column('table_name', sa.String, primary_key=True),
+        sa.Column('change_count', sa.BigInteger, nullable=False,
+                  server_default='0'),
+        )
+    for table_name in COUNTED_TABLES:
+        op.execute('insert into table_change_counter (table_name)'
+                   ' values (\'%s\')' % table_name)
+    # One counter update per write statement (not per row); the update
+    # runs in the transaction of the triggering statement.
+    op.execute('create function table_change_counter_trigger()'
+               ' returns trigger as $$'
+               ' begin'
+               '  update table_change_counter'
+               '   set change_count=change_count+1'
+               '   where table_name=TG_TABLE_NAME;'
+               '  return null;'
+               ' end;'
+               ' $$ language plpgsql')
+    for table_name in COUNTED_TABLES:
+        op.execute('create trigger %s_change_counter'
+                   ' after insert or update or delete or truncate on %s'
+                   ' for each statement'
+                   ' execute procedure table_change_counter_trigger()'
+                   % (table_name, table_name))
+
+
+def downgrade():
+    for table_name in COUNTED_TABLES:
+        op.execute('drop trigger %s_change_counter on %s'
+                   % (table_name, table_name))
+    op.execute('drop function table_change_counter_trigger()')
+    op.drop_table('table_change_counter')
+
+# pylint: enable=E1101
@@ -0,0 +1,43 @@
+"""more table change counters
+
+Revision ID: b3f7d2a9c4e1
+Revises: 8e3a5c7f1d29
+Create Date: 2026-10-19 18:42:37.104251
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'b3f7d2a9c4e1'
+down_revision = '8e3a5c7f1d29'
+
+from alembic import op
+
+# op module has magic attributes pylint: disable=E1101
+
+#: Additional tables the cached semiconstant representations depend on: the
+#: rack specs - container specs association and the tables behind the
+#: molecule_type_modification_view (keep in sync with
+#: :const:`thelma.caching.SEMICONSTANT_TABLES`).
+COUNTED_TABLES = ['chemical_structure', 'molecule_design',
+                  'molecule_design_structure', 'rack_specs_container_specs']
+
+
+def upgrade():
+    for table_name in COUNTED_TABLES:
+        op.execute('insert into table_change_counter (table_name)'
+                   ' values (\'%s\')' % table_name)
+        op.execute('create trigger %s_change_counter'
+                   ' after insert or update or delete or truncate on %s'
+                   ' for each statement'
+                   ' execute procedure table_change_counter_trigger()'
+                   % (table_name, table_name))
+
+
+def downgrade():
+    for table_name in COUNTED_TABLES:
+        op.execute('drop trigger %s_change_counter on %s'
+                   % (table_name, table_name))
+        op.execute('delete from table_change_counter'
+                   ' where table_name=\'%s\'' % table_name)
+
+# pylint: enable=E1101
@@ -80,6 +80,7 @@ from thelma.repositories.rdb.schema.tables import samplemolecule
 from thelma.repositories.rdb.schema.tables import sampleregistration
 from thelma.repositories.rdb.schema.tables import singlesuppliermoleculedesign
 from thelma.repositories.rdb.schema.tables import species
+from thelma.repositories.rdb.schema.tables import stockproductlookup
 from thelma.repositories.rdb.schema.tables import stockrack
 from thelma.repositories.rdb.schema.tables import stocksample
 from thelma.repositories.rdb.schema.tables import stocksamplecreationiso
@@ -87,6 +88,7 @@ from thelma.repositories.rdb.schema.tables import stocksamplecreationisorequest
 from thelma.repositories.rdb.schema.tables import subproject
 from thelma.repositories.rdb.schema.tables import suppliermoleculedesign
 from thelma.repositories.rdb.schema.tables import supplierstructureannotation
+from thelma.repositories.rdb.schema.tables import tablechangecounter
 from thelma.repositories.rdb.schema.tables import tag
 from thelma.repositories.rdb.schema.tables import tagged
 from thelma.repositories.rdb.schema.tables import taggedrackpositionset
@@ -162,8 +164,10 @@ def initialize_tables(metadata):
     sampleregistration.create_table(metadata, sample_tbl)
     sample_molecule_tbl = samplemolecule.create_table(metadata, sample_tbl,
                                                       molecule_tbl)
-    stocksample.create_table(metadata, sample_tbl, organization_tbl,
-                             molecule_design_set_tbl, molecule_type_tbl)
+    stock_sample_tbl = stocksample.create_table(metadata, sample_tbl,
+                                                organization_tbl,
+                                                molecule_design_set_tbl,
+                                                molecule_type_tbl)
     compound_tbl = compound.create_table(metadata, molecule_design_tbl)
 
     species_tbl = species.create_table(metadata)
@@ -189,6 +193,8 @@ def initialize_tables(metadata):
     pooledsuppliermoleculedesign.create_table(metadata,
                                               supplier_molecule_design_tbl,
                                               molecule_design_set_tbl)
+    stockproductlookup.create_table(metadata, stock_sample_tbl,
+                                    supplier_molecule_design_tbl)
     supplierstructureannotation.create_table(metadata,
                                              supplier_molecule_design_tbl,
                                              chemical_structure_tbl)
@@ -329,4 +335,6 @@ def initialize_tables(metadata):
     iso_library_plate_tbl = labisolibraryplate.create_table(metadata, iso_tbl,
                                                             library_plate_tbl)
 
+    tablechangecounter.create_table(metadata)
+
 #pylint: enable=W0612
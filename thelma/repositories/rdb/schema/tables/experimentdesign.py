@@ -6,6 +6,7 @@ Experiment design table.
 """
 from sqlalchemy import Column
 from sqlalchemy import ForeignKey
+from sqlalchemy import Index
 from sqlalchemy import Integer
 from sqlalchemy import String
 from sqlalchemy import Table
@@ -29,4 +30,6 @@ def create_table(metadata, rack_shape_tbl, experiment_metadata_tbl):
                                   onupdate='CASCADE', ondelete='CASCADE'),
                        nullable=False)
                 )
+    Index('experiment_design_experiment_metadata_id_idx',
+          tbl.c.experiment_metadata_id)
     return tbl
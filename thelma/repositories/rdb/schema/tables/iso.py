@@ -7,6 +7,7 @@ ISO table.
 from sqlalchemy import CheckConstraint
 from sqlalchemy import Column
 from sqlalchemy import ForeignKey
+from sqlalchemy import Index
 from sqlalchemy import Integer
 from sqlalchemy import String
 from sqlalchemy import Table
@@ -42,4 +43,6 @@ def create_table(metadata, iso_request_tbl, rack_layout_tbl):
                 Column('optimizer_excluded_racks', String, nullable=True),
                 Column('optimizer_requested_tubes', String, nullable=True)
                 )
+    Index('iso_iso_request_id_status_idx', tbl.c.iso_request_id,
+          tbl.c.status)
     return tbl
@@ -7,6 +7,7 @@ ISO plate table.
 from sqlalchemy import CheckConstraint
 from sqlalchemy import Column
 from sqlalchemy import ForeignKey
+from sqlalchemy import Index
 from sqlalchemy import Integer
 from sqlalchemy import String
 from sqlalchemy import Table
@@ -38,4 +39,6 @@ def create_table(metadata, iso_tbl, rack_tbl):
                             ISO_PLATE_TYPES.SECTOR_PREPARATION)),
                        nullable=False)
                 )
+    Index('iso_plate_iso_id_iso_plate_type_idx', tbl.c.iso_id,
+          tbl.c.iso_plate_type)
     return tbl
@@ -22,5 +22,8 @@ def create_table(metadata, rack_shape_tbl):
                 Column('rack_shape_name', String,
                        ForeignKey(rack_shape_tbl.c.rack_shape_name),
                        nullable=False),
+                # Optional compact representation of the tag and position
+                # maps (see :class:`thelma.entities.racklayout.RackLayoutPayload`).
+                Column('payload', String),
                 )
     return tbl
@@ -0,0 +1,38 @@
+"""
+This file is part of the TheLMA (THe Laboratory Management Application) project.
+See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
+
+Stock product lookup table.
+
+Maps the product IDs of current supplier molecule designs to the stock
+samples (and their containers) they apply to. In PostgreSQL databases the
+table is maintained by triggers on the stock sample, sample, supplier
+molecule design, and pooled supplier molecule design tables.
+"""
+from sqlalchemy import Column
+from sqlalchemy import ForeignKey
+from sqlalchemy import Integer
+from sqlalchemy import String
+from sqlalchemy import Table
+
+
+__docformat__ = 'reStructuredText en'
+__all__ = ['create_table']
+
+
+def create_table(metadata, stock_sample_tbl, supplier_molecule_design_tbl):
+    "Table factory."
+    tbl = Table('stock_product_lookup', metadata,
+            Column('sample_id', Integer,
+                   ForeignKey(stock_sample_tbl.c.sample_id,
+                              onupdate='CASCADE', ondelete='CASCADE'),
+                   primary_key=True),
+            Column('supplier_molecule_design_id', Integer,
+                   ForeignKey(supplier_molecule_design_tbl.c.\
+                                            supplier_molecule_design_id,
+                              onupdate='CASCADE', ondelete='CASCADE'),
+                   primary_key=True),
+            Column('product_id', String, nullable=False, index=True),
+            Column('container_id', Integer, nullable=False, index=True),
+            )
+    return tbl
@@ -0,0 +1,29 @@
+"""
+This file is part of the TheLMA (THe Laboratory Management Application) project.
+See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
+
+Table change counter table.
+
+Counts the write statements on the tables holding semiconstant data (rack
+shapes, specs, item statuses etc.). In PostgreSQL databases the counters are
+maintained by statement level triggers on the counted tables; they are used
+to derive the ETags of the cached resource representations.
+"""
+from sqlalchemy import BigInteger
+from sqlalchemy import Column
+from sqlalchemy import String
+from sqlalchemy import Table
+
+
+__docformat__ = 'reStructuredText en'
+__all__ = ['create_table']
+
+
+def create_table(metadata):
+    "Table factory."
+    tbl = Table('table_change_counter', metadata,
+            Column('table_name', String, primary_key=True),
+            Column('change_count', BigInteger, nullable=False,
+                   server_default='0'),
+            )
+    return tbl
@@ -48,8 +48,8 @@ class BarcodePrintJobCollection(Collection):
             labels = member.labels.split(",")
         else:
             labels = [''] * len(barcodes)
-        i = 0
-        for barcode in barcodes:
+        print_barcodes = []
+        for i, barcode in enumerate(barcodes):
             if barcode_type == "UNIRACK":
                 barcode = UniTwoLabelRackBarcode(barcode, labels[i],
                                                  label_row_2=barcode)
@@ -61,6 +61,6 @@ class BarcodePrintJobCollection(Collection):
             else:
                 raise ValueError('"%s" is not a valid barcode type'
                                  % barcode_type)
-            bcp = BarcodePrinter(printer_name)
-            bcp.print_barcode(barcode)
-            i += 1
+            print_barcodes.append(barcode)
+        bcp = BarcodePrinter(printer_name)
+        bcp.print_barcodes(print_barcodes)
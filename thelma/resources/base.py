@@ -4,11 +4,27 @@ See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
 
 Resource base classes.
 """
+from everest.resources.base import Member
+from thelma.caching import invalidate_representation_cache
 
 
 __docformat__ = "reStructuredText en"
 __all__ = ['RELATION_BASE_URL',
+           'SemiconstantMember',
            ]
 
 
 RELATION_BASE_URL = 'http://relations.thelma.org'
+
+
+class SemiconstantMember(Member):
+    """
+    Base class for the members of semiconstant resources (specs, shapes,
+    item statuses etc.).
+
+    The representations of these resources are cached (see
+    :mod:`thelma.caching`); updates invalidate the cache.
+    """
+    def update(self, data):
+        Member.update(self, data)
+        invalidate_representation_cache()
@@ -7,7 +7,6 @@ Container specs resource.
 from everest.constants import CARDINALITIES
 from everest.querying.specifications import AscendingOrderSpecification
 from everest.resources.base import Collection
-from everest.resources.base import Member
 from everest.resources.descriptors import attribute_alias
 from everest.resources.descriptors import collection_attribute
 from everest.resources.descriptors import member_attribute
@@ -15,6 +14,7 @@ from everest.resources.descriptors import terminal_attribute
 from thelma.interfaces import IOrganization
 from thelma.interfaces import IRackSpecs
 from thelma.resources.base import RELATION_BASE_URL
+from thelma.resources.base import SemiconstantMember
 
 
 __docformat__ = 'reStructuredText en'
@@ -25,7 +25,7 @@ __all__ = ['ContainerSpecsCollection',
            ]
 
 
-class ContainerSpecsMember(Member):
+class ContainerSpecsMember(SemiconstantMember):
     relation = "%s/container-specs" % RELATION_BASE_URL
     title = attribute_alias('label')
     label = terminal_attribute(str, 'label')
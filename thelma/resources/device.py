@@ -6,13 +6,13 @@ Device resource.
 """
 from everest.querying.specifications import AscendingOrderSpecification
 from everest.resources.base import Collection
-from everest.resources.base import Member
 from everest.resources.descriptors import attribute_alias
 from everest.resources.descriptors import member_attribute
 from everest.resources.descriptors import terminal_attribute
 from thelma.interfaces import IDeviceType
 from thelma.interfaces import IOrganization
 from thelma.resources.base import RELATION_BASE_URL
+from thelma.resources.base import SemiconstantMember
 
 __docformat__ = 'reStructuredText en'
 __all__ = ['DeviceCollection',
@@ -20,7 +20,7 @@ __all__ = ['DeviceCollection',
            ]
 
 
-class DeviceMember(Member):
+class DeviceMember(SemiconstantMember):
     relation = "%s/device" % RELATION_BASE_URL
     title = attribute_alias('label')
     name = terminal_attribute(str, 'name')
@@ -6,12 +6,12 @@ Device type resource.
 """
 from everest.querying.specifications import AscendingOrderSpecification
 from everest.resources.base import Collection
-from everest.resources.base import Member
 from everest.resources.descriptors import attribute_alias
 from everest.resources.descriptors import collection_attribute
 from everest.resources.descriptors import terminal_attribute
 from thelma.interfaces import IDevice
 from thelma.resources.base import RELATION_BASE_URL
+from thelma.resources.base import SemiconstantMember
 
 
 __docformat__ = 'reStructuredText en'
@@ -20,7 +20,7 @@ __all__ = ['DeviceTypeCollection',
            ]
 
 
-class DeviceTypeMember(Member):
+class DeviceTypeMember(SemiconstantMember):
     relation = "%s/device-type" % RELATION_BASE_URL
     title = attribute_alias('label')
     name = terminal_attribute(str, 'name')
@@ -12,6 +12,7 @@ from pyramid.httpexceptions import HTTPBadRequest
 from everest.querying.specifications import AscendingOrderSpecification
 from everest.querying.specifications import DescendingOrderSpecification
 from everest.querying.specifications import cntd
+from everest.repositories.rdb.session import ScopedSessionMaker as Session
 from everest.representers.dataelements import DataElementAttributeProxy
 from everest.representers.interfaces import IDataElement
 from everest.resources.base import Collection
@@ -41,6 +42,7 @@ from thelma.interfaces import ISubproject
 from thelma.interfaces import ITag
 from thelma.resources.base import RELATION_BASE_URL
 from thelma.tools.experiment import get_writer
+from thelma.tools.metadata.base import ExperimentMetadataTagQuery
 from thelma.tools.metadata.ticket \
     import IsoRequestTicketDescriptionUpdater
 from thelma.tools.metadata.ticket import IsoRequestTicketActivator
@@ -148,14 +150,10 @@ class ExperimentMetadataMember(Member):
 
     def __getitem__(self, name):
         if name == 'tags':
-            tags_dict = {}
-            design_racks = self.__get_design_racks()
-            for rack in design_racks:
-                for tp in rack.rack_layout.tagged_rack_position_sets:
-                    for tag in tp.tags:
-                        tags_dict[tag.get_entity().slug] = tag
+            query = ExperimentMetadataTagQuery(self.id)
+            query.run(Session())
             tag_coll = get_root_collection(ITag)
-            tag_coll.filter = cntd(id=[tag.id for tag in tags_dict.values()])
+            tag_coll.filter = cntd(id=query.get_query_results())
             result = tag_coll
         elif name == 'experiment-design-racks':
             result = self.__get_design_racks()
@@ -12,6 +12,7 @@ from everest.entities.interfaces import IEntity
 from everest.querying.specifications import AscendingOrderSpecification
 from everest.querying.specifications import DescendingOrderSpecification
 from everest.querying.specifications import cntd
+from everest.repositories.rdb.session import ScopedSessionMaker as Session
 from everest.representers.dataelements import DataElementAttributeProxy
 from everest.representers.interfaces import IDataElement
 from everest.resources.base import Collection
@@ -42,6 +43,8 @@ from thelma.tools.iso import get_job_creator
 from thelma.tools.iso import lab
 from thelma.tools.iso.lab import get_stock_rack_recyler
 from thelma.tools.iso.lab import get_worklist_executor
+from thelma.tools.iso.lab.base import CompletedIsoPlateQuery
+from thelma.tools.iso.lab.processing import LabIsoProcessingData
 from thelma.tools.iso.lab.tracreporting import LabIsoStockTransferReporter
 from thelma.tools.metadata.ticket import IsoRequestTicketAccepter
 from thelma.tools.metadata.ticket import IsoRequestTicketReassigner
@@ -159,11 +162,11 @@ class LabIsoRequestMember(IsoRequestMember):
         if name == 'completed-iso-plates' and self.iso_type == ISO_TYPES.LAB:
             # These are the plates that can be used as input for experiment
             # job scheduling.
-            iso_plate_bcs = []
-            for iso in self.isos:
-                if iso.status == ISO_STATUS.DONE:
-                    for plt in self.__get_completed_iso_plates_for_iso(iso):
-                        iso_plate_bcs.append(plt.barcode)
+            is_library = self.experiment_metadata.experiment_metadata_type.id \
+                         == EXPERIMENT_METADATA_TYPES.LIBRARY
+            query = CompletedIsoPlateQuery(self.id, is_library)
+            query.run(Session())
+            iso_plate_bcs = query.get_query_results()
             iso_plates = get_root_collection(IPlate)
             iso_plates.filter = cntd(barcode=iso_plate_bcs)
             result = iso_plates
@@ -188,18 +191,27 @@ class LabIsoRequestMember(IsoRequestMember):
                 pass
             else:
                 self.delivery_date = new_delivery_date
+            # All ISOs and ISO jobs pipetted in this update share their
+            # converted layouts. The stock transfers are only reported to
+            # Trac after all DB updates have succeeded, so a failing entity
+            # does not leave tickets referring to rolled back executions.
+            processing_data = LabIsoProcessingData()
+            executors = []
             try:
                 jobs = prx.jobs
             except AttributeError:
                 pass
             else:
-                self.__process_iso_jobs(jobs)
+                self.__process_iso_jobs(jobs, processing_data, executors)
             try:
                 isos = prx.isos
             except AttributeError:
                 pass
             else:
-                self.__process_isos(isos)
+                self.__process_isos(isos, processing_data, executors)
+            for executor in executors:
+                trac_updater = LabIsoStockTransferReporter(executor=executor)
+                run_trac_tool(trac_updater)
 
     def create_xl20_worklist(self, entity, rack_barcodes,
                              optimizer_excluded_racks=None,
@@ -253,7 +265,7 @@ class LabIsoRequestMember(IsoRequestMember):
             run_trac_tool(trac_tool)
         self.owner = new_owner
 
-    def __process_iso_jobs(self, iso_jobs_prx):
+    def __process_iso_jobs(self, iso_jobs_prx, processing_data, executors):
         for iso_job_prx in iso_jobs_prx:
             status = iso_job_prx.status
             iso_job_id = iso_job_prx.id
@@ -262,11 +274,13 @@ class LabIsoRequestMember(IsoRequestMember):
                 self.__update_stock_racks(iso_job, status)
             elif status == 'PIPETTING':
                 # Transfer from job stock racks.
-                self.__pipetting_iso_or_iso_job(iso_job)
+                executors.append(
+                        self.__pipetting_iso_or_iso_job(iso_job,
+                                                        processing_data))
             else:
                 raise ValueError('Unknown ISO job status "%s".' % status)
 
-    def __process_isos(self, isos_prx):
+    def __process_isos(self, isos_prx, processing_data, executors):
         number_of_new_isos = 0
         optimizer_excluded_racks = None
         optimizer_requested_tubes = None
@@ -288,7 +302,9 @@ class LabIsoRequestMember(IsoRequestMember):
                 if status.startswith('UPDATE_STOCK_RACKS'):
                     self.__update_stock_racks(iso, status)
                 elif status == 'PIPETTING':
-                    self.__pipetting_iso_or_iso_job(iso)
+                    executors.append(
+                            self.__pipetting_iso_or_iso_job(iso,
+                                                            processing_data))
                 elif status == 'CLOSE_ISO':
                     self.__update_iso_status(iso, ISO_STATUS.DONE)
                 elif status == 'CANCEL_ISO':
@@ -341,14 +357,12 @@ class LabIsoRequestMember(IsoRequestMember):
 #        IsoJob(label='ISO Job %d' % job_num, user=get_current_user(),
 #               isos=new_isos)
 
-    def __pipetting_iso_or_iso_job(self, iso_or_iso_job):
+    def __pipetting_iso_or_iso_job(self, iso_or_iso_job, processing_data):
         user = get_current_user()
-        executor = get_worklist_executor(iso_or_iso_job, user)
-        result = run_tool(executor,
-                          error_prefix='Errors during pipetting. --')
-        trac_updater = LabIsoStockTransferReporter(executor=executor)
-        run_trac_tool(trac_updater)
-        return result
+        executor = get_worklist_executor(iso_or_iso_job, user,
+                                         processing_data=processing_data)
+        run_tool(executor, error_prefix='Errors during pipetting. --')
+        return executor
 
     def __update_stock_racks(self, iso_or_iso_job, status):
         stock_rack_barcodes = status[len('UPDATE_STOCK_RACKS'):].split(';')
@@ -392,19 +406,6 @@ class LabIsoRequestMember(IsoRequestMember):
                    if iso_job.id == iso_job_id]
         return result
 
-    def __get_completed_iso_plates_for_iso(self, iso):
-        if self.experiment_metadata.experiment_metadata_type.id == \
-                                        EXPERIMENT_METADATA_TYPES.LIBRARY:
-            racks = [lp.rack for lp in iso.library_plates]
-        else:
-            # If we have aliquot plates, use them; if not, use the
-            # preparation plates.
-            if len(iso.aliquot_plates) > 0:
-                racks = [ap for ap in iso.aliquot_plates]
-            else:
-                racks = [pp for pp in iso.preparation_plates]
-        return racks
-
 
 class StockSampleCreationIsoRequestMember(IsoRequestMember):
     relation = "%s/stock-sample-creation-iso-request" % RELATION_BASE_URL
@@ -6,17 +6,17 @@ Item status resource.
 """
 from everest.querying.specifications import DescendingOrderSpecification
 from everest.resources.base import Collection
-from everest.resources.base import Member
 from everest.resources.descriptors import attribute_alias
 from everest.resources.descriptors import terminal_attribute
 from thelma.resources.base import RELATION_BASE_URL
+from thelma.resources.base import SemiconstantMember
 
 
 __docformat__ = 'reStructuredText en'
 __all__ = ['ItemStatusCollection',
            'ItemStatusMember']
 
-class ItemStatusMember(Member):
+class ItemStatusMember(SemiconstantMember):
     id = terminal_attribute(str, 'id') # IDs are strings for item status
     relation = "%s/item-status" % RELATION_BASE_URL
     title = attribute_alias('name')
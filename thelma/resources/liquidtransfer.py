@@ -11,6 +11,7 @@ from everest.resources.descriptors import terminal_attribute
 from thelma.interfaces import IRackPosition
 from thelma.interfaces import IRackShape
 from thelma.resources.base import RELATION_BASE_URL
+from thelma.resources.base import SemiconstantMember
 
 
 __docformat__ = 'reStructuredText en'
@@ -19,7 +20,7 @@ __all__ = ['ReservoirSpecsCollection',
            'PipettingSpecsMember']
 
 
-class ReservoirSpecsMember(Member):
+class ReservoirSpecsMember(SemiconstantMember):
     relation = '%s/reservoirspecs' % RELATION_BASE_URL
     name = terminal_attribute(str, 'name')
     rack_shape = member_attribute(IRackShape, 'rack_shape')
@@ -33,7 +34,7 @@ class ReservoirSpecsCollection(Collection):
     description = 'Manage Reservoir Specs'
 
 
-class PipettingSpecsMember(Member):
+class PipettingSpecsMember(SemiconstantMember):
     relation = '%s/pipettingspecs' % RELATION_BASE_URL
     name = terminal_attribute(str, 'name')
     min_transfer_volume = terminal_attribute(float, 'min_transfer_volume')
@@ -6,12 +6,12 @@ Molecule type resource.
 """
 from everest.querying.specifications import AscendingOrderSpecification
 from everest.resources.base import Collection
-from everest.resources.base import Member
 from everest.resources.descriptors import attribute_alias
 from everest.resources.descriptors import collection_attribute
 from everest.resources.descriptors import terminal_attribute
 from thelma.interfaces import IChemicalStructure
 from thelma.resources.base import RELATION_BASE_URL
+from thelma.resources.base import SemiconstantMember
 
 
 __docformat__ = 'reStructuredText en'
@@ -20,7 +20,7 @@ __all__ = ['MoleculeTypeCollection',
            ]
 
 
-class MoleculeTypeMember(Member):
+class MoleculeTypeMember(SemiconstantMember):
     relation = "%s/molecule-type" % RELATION_BASE_URL
     title = attribute_alias('name')
     name = terminal_attribute(str, 'name')
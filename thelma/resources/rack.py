@@ -21,6 +21,7 @@ from thelma.interfaces import IRackSpecs
 from thelma.interfaces import ITube
 from thelma.interfaces import IWell
 from thelma.resources.base import RELATION_BASE_URL
+from thelma.resources.base import SemiconstantMember
 
 
 __docformat__ = 'reStructuredText en'
@@ -106,7 +107,7 @@ class TubeRackCollection(RackCollection):
     root_name = 'tube-racks'
 
 
-class RackShapeMember(Member):
+class RackShapeMember(SemiconstantMember):
     relation = "%s/rack-shape" % RELATION_BASE_URL
     id = terminal_attribute(str, 'id') # rack shape IDs are *strings*.
     name = terminal_attribute(str, 'name')
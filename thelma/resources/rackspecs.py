@@ -7,7 +7,6 @@ Rack specs resource.
 from everest.constants import CARDINALITIES
 from everest.querying.specifications import AscendingOrderSpecification
 from everest.resources.base import Collection
-from everest.resources.base import Member
 from everest.resources.descriptors import attribute_alias
 from everest.resources.descriptors import collection_attribute
 from everest.resources.descriptors import member_attribute
@@ -17,6 +16,7 @@ from thelma.interfaces import IRackShape
 from thelma.interfaces import ITubeSpecs
 from thelma.interfaces import IWellSpecs
 from thelma.resources.base import RELATION_BASE_URL
+from thelma.resources.base import SemiconstantMember
 
 
 __docformat__ = 'reStructuredText en'
@@ -29,7 +29,7 @@ __all__ = ['PlateSpecsCollection',
            ]
 
 
-class RackSpecsMember(Member):
+class RackSpecsMember(SemiconstantMember):
     relation = "%s/rack-specs" % RELATION_BASE_URL
     title = attribute_alias('label')
     label = terminal_attribute(str, 'label')
@@ -6,10 +6,10 @@ Species resource.
 """
 from everest.querying.specifications import AscendingOrderSpecification
 from everest.resources.base import Collection
-from everest.resources.base import Member
 from everest.resources.descriptors import attribute_alias
 from everest.resources.descriptors import terminal_attribute
 from thelma.resources.base import RELATION_BASE_URL
+from thelma.resources.base import SemiconstantMember
 
 
 __docformat__ = 'reStructuredText en'
@@ -18,7 +18,7 @@ __all__ = ['SpeciesCollection',
            ]
 
 
-class SpeciesMember(Member):
+class SpeciesMember(SemiconstantMember):
     relation = "%s/species" % RELATION_BASE_URL
     title = attribute_alias('common_name')
     genus_name = terminal_attribute(str, 'genus_name')
@@ -8,6 +8,11 @@ from tractor import make_api_from_config
 
 from everest.configuration import Configurator
 from everest.root import RootFactory
+from thelma.barcodeprinter import FileSpoolTransport
+from thelma.barcodeprinter import LprSpoolTransport
+from thelma.caching import RepresentationCache
+from thelma.interfaces import IBarcodeSpoolTransport
+from thelma.interfaces import IRepresentationCache
 from thelma.interfaces import ITractor
 
 
@@ -31,6 +36,17 @@ def create_config(settings, package='thelma', registry=None):
     tractor_config_file = settings['tractor_config_file']
     tractor_api = make_api_from_config(tractor_config_file)
     config.registry.registerUtility(tractor_api, ITractor) # pylint: disable=E1103
+    # barcode spool transport registration
+    barcode_spool_dir = settings.get('barcode_spool_dir')
+    if barcode_spool_dir:
+        transport = FileSpoolTransport(barcode_spool_dir)
+    else:
+        transport = LprSpoolTransport(host=settings.get('barcode_spool_host'))
+    config.registry.registerUtility(transport, IBarcodeSpoolTransport) # pylint: disable=E1103
+    # HTTP level caching of semiconstant resources
+    config.registry.registerUtility(RepresentationCache(), # pylint: disable=E1103
+                                    IRepresentationCache)
+    config.add_tween('thelma.caching.representation_cache_tween_factory')
     return config
 
 
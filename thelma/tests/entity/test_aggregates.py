@@ -0,0 +1,148 @@
+import pytest
+from sqlalchemy import event
+
+from everest.entities.utils import get_entity_class
+from everest.entities.utils import get_root_aggregate
+from everest.repositories.rdb.session import ScopedSessionMaker as Session
+from thelma.entities.aggregates import KeysetIterator
+from thelma.entities.aggregates import _FilterVisitorFactories
+from thelma.entities.container import Tube
+from thelma.entities.moleculedesign import MoleculeDesignPool
+from thelma.entities.suppliermoleculedesign import SupplierMoleculeDesign
+from thelma.interfaces import IExperiment
+from thelma.interfaces import IIsoJob
+from thelma.interfaces import ILabIso
+from thelma.interfaces import ILabIsoRequest
+from thelma.interfaces import IPlate
+from thelma.interfaces import IStockSample
+from thelma.interfaces import ITube
+from thelma.interfaces import ITubeRack
+from thelma.tests.entity.conftest import TestEntityBase
+
+
+class QueryCounter(object):
+    """
+    Counts the statements sent to the database while active.
+    """
+    def __init__(self, engine):
+        self.__engine = engine
+        self.count = 0
+
+    def __enter__(self):
+        event.listen(self.__engine, 'before_cursor_execute', self.__count)
+        return self
+
+    def __exit__(self, ext_type, value, tb):
+        event.remove(self.__engine, 'before_cursor_execute', self.__count)
+
+    def __count(self, *args): # pylint: disable=W0613
+        self.count += 1
+
+
+def traverse(entity, attr_path):
+    value = entity
+    for attr in attr_path.split('.'):
+        if value is None:
+            break
+        value = getattr(value, attr)
+    return value
+
+
+class TestEagerLoadingPlans(TestEntityBase):
+    @pytest.mark.parametrize('ifc,attr_paths',
+                             [(ITubeRack, ['location', 'specs', 'status']),
+                              (IPlate, ['location', 'specs', 'status']),
+                              (ITube, ['specs', 'status', 'sample',
+                                       'location.rack']),
+                              (IStockSample, ['molecule_design_pool',
+                                              'supplier', 'molecule_type',
+                                              'container']),
+                              (ILabIso, ['iso_request', 'rack_layout',
+                                         'iso_job']),
+                              (ILabIsoRequest, ['requester', 'rack_layout',
+                                                'experiment_metadata']),
+                              (IIsoJob, ['user', 'isos']),
+                              (IExperiment, ['job', 'source_rack',
+                                             'experiment_design']),
+                              ])
+    def test_iteration_without_lazy_loads(self, ifc, attr_paths):
+        agg = get_root_aggregate(ifc)
+        agg.slice = slice(0, 10)
+        entities = list(agg.iterator())
+        with QueryCounter(Session().get_bind()) as counter:
+            for entity in entities:
+                for attr_path in attr_paths:
+                    traverse(entity, attr_path)
+        assert counter.count == 0
+
+
+class TestKeysetIterator(TestEntityBase):
+    @pytest.mark.parametrize('ifc,key_attribute',
+                             [(ITube, 'barcode'),
+                              (ITubeRack, 'barcode'),
+                              (IStockSample, 'id'),
+                              ])
+    def test_iteration(self, ifc, key_attribute):
+        entity_cls = get_entity_class(ifc)
+        key_col = getattr(entity_cls, key_attribute)
+        query = Session().query(key_col).filter(key_col != None) \
+                                        .order_by(key_col).limit(20)
+        exp_keys = [record[0] for record in query]
+        it = KeysetIterator(entity_cls, key_attribute, limit=20,
+                            chunk_size=3)
+        assert [getattr(ent, key_attribute) for ent in it] == exp_keys
+        it = KeysetIterator(entity_cls, key_attribute, after=exp_keys[4],
+                            limit=10, chunk_size=4)
+        assert [getattr(ent, key_attribute) for ent in it] \
+                == exp_keys[5:15]
+
+
+class TestTubeProductIdFilter(TestEntityBase):
+    def _get_product_ids(self, session):
+        # Using hidden instrumented attributes pylint: disable=E1101
+        query = session.query(SupplierMoleculeDesign.product_id) \
+                    .filter(SupplierMoleculeDesign.is_current,
+                            SupplierMoleculeDesign.molecule_design_pool.has(
+                                MoleculeDesignPool.stock_samples.any())) \
+                    .order_by(SupplierMoleculeDesign.product_id).limit(5)
+        # pylint: enable=E1101
+        product_ids = [record[0] for record in query]
+        assert len(product_ids) > 0
+        return product_ids + ['no such product']
+
+    def _get_tube_ids(self, session, expr):
+        query = session.query(Tube.id).filter(expr).order_by(Tube.id)
+        return [record[0] for record in query]
+
+    def _check_product_id_expr(self, session):
+        for product_id in self._get_product_ids(session):
+            exp_ids = self._get_tube_ids(
+                session,
+                _FilterVisitorFactories._sample_product_id_join_expr(
+                                                            product_id))
+            assert self._get_tube_ids(
+                session,
+                _FilterVisitorFactories._sample_product_id_expr(
+                                                session, product_id)) \
+                   == exp_ids
+
+    def test_lookup(self):
+        session = Session()
+        if session.get_bind().dialect.name != 'postgresql':
+            pytest.skip('The stock product lookup requires PostgreSQL.')
+        assert _FilterVisitorFactories._has_stock_product_lookup(session)
+        self._check_product_id_expr(session)
+
+    def test_lookup_without_triggers(self):
+        session = Session()
+        if session.get_bind().dialect.name != 'postgresql':
+            assert not \
+                _FilterVisitorFactories._has_stock_product_lookup(session)
+        else:
+            # The dropped trigger is restored when the test transaction is
+            # rolled back.
+            session.execute('drop trigger stock_sample_product_lookup'
+                            ' on stock_sample')
+            assert not \
+                _FilterVisitorFactories._has_stock_product_lookup(session)
+        self._check_product_id_expr(session)
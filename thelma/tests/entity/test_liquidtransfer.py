@@ -58,6 +58,23 @@ class TestPlannedWorklistEntity(TestEntityBase):
         pwl = planned_worklist_fac()
         persist(nested_session, pwl, planned_worklist_fac.init_kw, True)
 
+    def test_content_digest(self, planned_worklist_fac,
+                            planned_sample_dilution_fac):
+        pwl = planned_worklist_fac()
+        plts = pwl.planned_liquid_transfers
+        exp_digest = \
+            md5.md5(';'.join([pwl.transfer_type, pwl.pipetting_specs.name,
+                              plts[0].hash_value])).hexdigest()
+        assert pwl.content_digest == exp_digest
+        pwl2 = planned_worklist_fac(label='other label',
+                                    planned_liquid_transfers=list(plts))
+        assert pwl2.content_digest == pwl.content_digest
+        psd = planned_sample_dilution_fac(volume=1e-5)
+        pwl3 = planned_worklist_fac(planned_liquid_transfers=[psd] + plts)
+        pwl4 = planned_worklist_fac(planned_liquid_transfers=plts + [psd])
+        assert pwl3.content_digest == pwl4.content_digest
+        assert pwl3.content_digest != pwl.content_digest
+
     def test_persist_all_attributes(self, nested_session,
                                     worklist_series_member_fac,
                                     executed_worklist_fac):
@@ -1,5 +1,8 @@
 from everest.repositories.rdb.testing import persist
 from thelma.entities.racklayout import RackLayout
+from thelma.entities.racklayout import RackLayoutPayload
+from thelma.entities.utils import decode_index_tuples
+from thelma.entities.utils import encode_index_tuples
 from thelma.tests.entity.conftest import TestEntityBase
 
 
@@ -121,3 +124,76 @@ class TestRackLayoutEntity(TestEntityBase):
         matching_pos = rack_layout.get_positions_for_tag(tag2)
         pos66 = list(rack_position_set_6_6.positions)[0]
         assert not pos66 in matching_pos
+
+    def test_content_digest(self, rack_layout_fac, rack_shape_8x12,
+                            tagged_rack_position_set_fac, tag1, tag2, tag3,
+                            rack_position_set_0_3, rack_position_set_6_6):
+        rl1 = rack_layout_fac(shape=rack_shape_8x12,
+                              tagged_rack_position_sets=[])
+        rl1.add_tagged_rack_position_set(
+            tagged_rack_position_set_fac(tags=set([tag1, tag2]),
+                                         rack_position_set=
+                                                    rack_position_set_0_3))
+        rl2 = rack_layout_fac(shape=rack_shape_8x12,
+                              tagged_rack_position_sets=[])
+        for tag in (tag2, tag1):
+            rl2.add_tagged_rack_position_set(
+                tagged_rack_position_set_fac(tags=set([tag]),
+                                             rack_position_set=
+                                                    rack_position_set_0_3))
+        assert rl1.content_digest == rl2.content_digest
+        rl2.add_tagged_rack_position_set(
+            tagged_rack_position_set_fac(tags=set([tag3]),
+                                         rack_position_set=
+                                                    rack_position_set_6_6))
+        assert rl1.content_digest != rl2.content_digest
+
+    def test_tags_added_in_place(self, rack_layout, tag4, user_cenixadm):
+        trps = rack_layout.tagged_rack_position_sets[0]
+        rpos = list(trps.rack_position_set)[0]
+        assert not tag4 in rack_layout.get_tags_for_position(rpos)
+        trps.add_tag(tag4, user_cenixadm)
+        assert tag4 in rack_layout.get_tags()
+        assert tag4 in rack_layout.get_tags_for_position(rpos)
+        assert rack_layout.get_positions_for_tag(tag4) == \
+                    set(trps.rack_position_set)
+
+
+class TestRackLayoutPayload(TestEntityBase):
+
+    def test_index_tuples_roundtrip(self):
+        coords = set([(0, 0), (0, 1), (0, 2), (1, 0), (3, 5), (3, 6),
+                      (15, 23)])
+        assert decode_index_tuples(encode_index_tuples(coords)) == coords
+        assert decode_index_tuples(encode_index_tuples(set())) == set()
+
+    def test_payload_follows_tag_changes(self, nested_session, rack_layout,
+                                         tag4, user_cenixadm):
+        nested_session.add(rack_layout)
+        nested_session.flush()
+        assert rack_layout.check_payload_consistency() == []
+        old_payload = rack_layout.payload
+        # Adding a tag to a set does not change the rack layout record.
+        trps = rack_layout.tagged_rack_position_sets[0]
+        trps.add_tag(tag4, user_cenixadm)
+        nested_session.flush()
+        assert rack_layout.payload != old_payload
+        assert rack_layout.check_payload_consistency() == []
+        payload = RackLayoutPayload.from_string(rack_layout.payload)
+        assert (tag4.domain, tag4.predicate, tag4.value) in \
+                    payload.get_tag_to_index_tuples_map()
+
+    def test_roundtrip(self, rack_layout, tagged_rack_position_set_fac, tag4,
+                       rack_position_set_6_6):
+        rack_layout.add_tagged_rack_position_set(
+                tagged_rack_position_set_fac(tags=set([tag4]),
+                                             rack_position_set=
+                                                    rack_position_set_6_6))
+        trpss = rack_layout.tagged_rack_position_sets
+        payload = RackLayoutPayload.from_tagged_rack_position_sets(trpss)
+        restored = RackLayoutPayload.from_string(payload.to_string())
+        assert restored.get_inconsistencies(trpss) == []
+        tag_map = restored.get_tag_to_positions_map()
+        assert set(tag_map.keys()) == rack_layout.get_tags()
+        for tag, positions in tag_map.iteritems():
+            assert positions == rack_layout.get_positions_for_tag(tag)
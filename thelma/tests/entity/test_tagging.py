@@ -1,6 +1,8 @@
 from everest.entities.utils import slug_from_string
 from everest.repositories.rdb.testing import check_attributes
 from everest.repositories.rdb.testing import persist
+from thelma.entities.tagging import Tag
+from thelma.repositories.rdb.mappers.tag import TagFlushResolver
 from thelma.tests.entity.conftest import TestEntityBase
 
 
@@ -29,6 +31,82 @@ class TestTagEntity(TestEntityBase):
         assert not tag.is_similar(diff_tag)
 
 
+class TestTagFlushResolver(TestEntityBase):
+    triple = ('test_domain', 'test_tag_flush_resolver', 'test_value')
+
+    def _flush_tagged(self, session, tag_fac, tagged_fac):
+        tag = tag_fac(domain=self.triple[0], predicate=self.triple[1],
+                      value=self.triple[2])
+        tagged = tagged_fac(tags=set([tag]))
+        session.add(tagged)
+        session.flush()
+        return tagged.taggings[0].tag
+
+    def test_reuse_tag(self, nested_session, tag_fac, tagged_fac):
+        tag1 = self._flush_tagged(nested_session, tag_fac, tagged_fac)
+        assert not tag1.id is None
+        tag2 = self._flush_tagged(nested_session, tag_fac, tagged_fac)
+        assert tag2 is tag1
+        assert nested_session.query(Tag) \
+                    .filter_by(domain=self.triple[0],
+                               predicate=self.triple[1],
+                               value=self.triple[2]).count() == 1
+
+    def _flush_equal_tags(self, session, tag_fac, tagged_fac, number):
+        # Flushes the given number of tagged entities, each with its own
+        # (equal) pending tag.
+        taggeds = [tagged_fac(tags=set([tag_fac(domain=self.triple[0],
+                                                predicate=self.triple[1],
+                                                value=self.triple[2])]))
+                   for _ in range(number)]
+        session.add_all(taggeds)
+        session.flush()
+        return [tagged.taggings[0].tag for tagged in taggeds]
+
+    def _count_tags(self, session):
+        return session.query(Tag).filter_by(domain=self.triple[0],
+                                            predicate=self.triple[1],
+                                            value=self.triple[2]).count()
+
+    def test_equal_pending_tags(self, nested_session, tag_fac, tagged_fac):
+        tags = self._flush_equal_tags(nested_session, tag_fac, tagged_fac, 3)
+        assert not tags[0].id is None
+        assert tags[1] is tags[0] and tags[2] is tags[0]
+        assert self._count_tags(nested_session) == 1
+
+    def test_equal_pending_tags_and_existing_tag(self, nested_session,
+                                                 tag_fac, tagged_fac):
+        existing_tag = self._flush_tagged(nested_session, tag_fac,
+                                          tagged_fac)
+        tags = self._flush_equal_tags(nested_session, tag_fac, tagged_fac, 4)
+        for tag in tags:
+            assert tag is existing_tag
+        assert self._count_tags(nested_session) == 1
+
+    def test_savepoint_release(self, nested_session, tag_fac, tagged_fac):
+        nested_session.begin_nested()
+        self._flush_tagged(nested_session, tag_fac, tagged_fac)
+        self._flush_tagged(nested_session, tag_fac, tagged_fac)
+        nested_session.commit()
+        # The outer transaction has not been committed yet.
+        assert TagFlushResolver.id_cache.get(self.triple) is None
+        assert TagFlushResolver.id_cache.get(
+                            ('tag_predicate', self.triple[1])) is None
+
+    def test_rollback(self, nested_session, tag_fac, tagged_fac):
+        nested_session.begin_nested()
+        self._flush_tagged(nested_session, tag_fac, tagged_fac)
+        # The second flush finds the tag inserted by the first one.
+        self._flush_tagged(nested_session, tag_fac, tagged_fac)
+        nested_session.rollback()
+        assert TagFlushResolver.id_cache.get(self.triple) is None
+        assert TagFlushResolver.id_cache.get(
+                            ('tag_predicate', self.triple[1])) is None
+        tag = self._flush_tagged(nested_session, tag_fac, tagged_fac)
+        assert not tag.id is None
+        assert nested_session.query(Tag).get(tag.id) is tag
+
+
 class TestTaggedEntity(TestEntityBase):
 
     def test_init(self, tagged_fac):
@@ -0,0 +1,54 @@
+"""
+Benchmark for the query backed sub-resources of lab ISO requests and
+experiment metadata.
+
+Not collected by default; run with ::
+
+    py.test -s thelma/tests/functional/benchmark_subresources.py
+
+Created on Oct 19, 2026.
+"""
+import time
+
+from pyramid.httpexceptions import HTTPOk
+
+from everest.resources.utils import get_root_collection
+from everest.resources.utils import resource_to_url
+from thelma.interfaces import IExperimentMetadata
+from thelma.interfaces import ILabIsoRequest
+from thelma.tests.functional.conftest import TestFunctionalBase
+
+
+__docformat__ = 'reStructuredText en'
+__all__ = ['TestSubresourceBenchmark',
+           ]
+
+
+class TestSubresourceBenchmark(TestFunctionalBase):
+    setup_rdb_context = True
+    #: The number of entities to request the sub-resources for.
+    NUM_ENTITIES = 20
+    #: The number of requests per sub-resource.
+    NUM_REPEATS = 3
+
+    def test_completed_iso_plates(self, app_creator):
+        self.__run(app_creator, ILabIsoRequest, 'completed-iso-plates')
+
+    def test_experiment_metadata_tags(self, app_creator):
+        self.__run(app_creator, IExperimentMetadata, 'tags')
+
+    def __run(self, app_creator, ifc, subresource_name):
+        coll = get_root_collection(ifc)
+        coll.slice = slice(0, self.NUM_ENTITIES)
+        urls = ['%s%s' % (resource_to_url(mb), subresource_name)
+                for mb in coll]
+        timings = []
+        for url in urls:
+            for _ in range(self.NUM_REPEATS):
+                start = time.time()
+                app_creator.get(url, status=HTTPOk.code)
+                timings.append(time.time() - start)
+        if len(timings) > 0:
+            print '\n%s: %i requests, mean %.3f s, max %.3f s' \
+                  % (subresource_name, len(timings),
+                     sum(timings) / len(timings), max(timings))
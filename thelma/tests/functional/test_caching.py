@@ -0,0 +1,88 @@
+"""
+Functional tests for the HTTP level caching of semiconstant resources.
+
+Created on Oct 19, 2026.
+"""
+import json
+
+from pyramid.httpexceptions import HTTPNotModified
+from pyramid.httpexceptions import HTTPOk
+
+from everest.mime import JsonMime
+from everest.mime import XmlMime
+from thelma.tests.functional.conftest import TestFunctionalBase
+
+
+__docformat__ = 'reStructuredText en'
+__all__ = ['TestRepresentationCache',
+           ]
+
+
+class TestRepresentationCache(TestFunctionalBase):
+    path = '/rack-shapes'
+    setup_rdb_context = True
+
+    def test_etag(self, app_creator):
+        rsp = app_creator.get(self.path, status=HTTPOk.code)
+        etag = rsp.headers['ETag']
+        assert len(etag) > 2
+        rsp = app_creator.get(self.path, headers={'If-None-Match': etag},
+                              status=HTTPNotModified.code)
+        assert rsp.headers['ETag'] == etag
+
+    def test_cached_representation(self, app_creator):
+        rsp1 = app_creator.get(self.path, status=HTTPOk.code)
+        rsp2 = app_creator.get(self.path, status=HTTPOk.code)
+        assert rsp2.headers['ETag'] == rsp1.headers['ETag']
+        assert rsp2.content_type == rsp1.content_type
+        assert rsp2.body == rsp1.body
+
+    def test_etag_per_content_type(self, app_creator):
+        json_rsp = app_creator.get(self.path,
+                                   headers={'Accept':
+                                            JsonMime.mime_type_string},
+                                   status=HTTPOk.code)
+        xml_rsp = app_creator.get(self.path,
+                                  headers={'Accept': XmlMime.mime_type_string},
+                                  status=HTTPOk.code)
+        json_etag = json_rsp.headers['ETag']
+        assert json_etag != xml_rsp.headers['ETag']
+        assert json_rsp.headers['Vary'] == 'Accept'
+        # A JSON ETag must not validate a cached XML representation.
+        rsp = app_creator.get(self.path,
+                              headers={'Accept': XmlMime.mime_type_string,
+                                       'If-None-Match': json_etag},
+                              status=HTTPOk.code)
+        assert rsp.content_type == XmlMime.mime_type_string
+        rsp = app_creator.get(self.path,
+                              headers={'Accept': JsonMime.mime_type_string,
+                                       'If-None-Match': json_etag},
+                              status=HTTPNotModified.code)
+        assert rsp.headers['Vary'] == 'Accept'
+
+    def test_cached_headers(self, app_creator):
+        rsp1 = app_creator.get(self.path, status=HTTPOk.code)
+        rsp2 = app_creator.get(self.path, status=HTTPOk.code)
+        assert sorted(rsp2.headerlist) == sorted(rsp1.headerlist)
+
+    def test_update_changes_etag(self, app_creator):
+        path = '/device-types/printer'
+        hdrs = {'Accept': JsonMime.mime_type_string}
+        rsp = app_creator.get(path, headers=hdrs, status=HTTPOk.code)
+        etag = rsp.headers['ETag']
+        data = json.loads(rsp.body)
+        new_label = data['label'] + ' (updated)'
+        data['label'] = new_label
+        app_creator.put(path, params=json.dumps(data),
+                        content_type=JsonMime.mime_type_string,
+                        status=HTTPOk.code)
+        rsp = app_creator.get(path,
+                              headers=dict(hdrs, **{'If-None-Match': etag}),
+                              status=HTTPOk.code)
+        assert rsp.headers['ETag'] != etag
+        assert json.loads(rsp.body)['label'] == new_label
+
+    def test_non_cached_resource(self, app_creator):
+        rsp = app_creator.get('/tube-racks', params=dict(size=1),
+                              status=HTTPOk.code)
+        assert not 'ETag' in rsp.headers
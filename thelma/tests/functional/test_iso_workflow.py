@@ -116,6 +116,116 @@ class TestIsoWorkflow(TestFunctionalBase):
                                              4, patch_body, app_creator,
                                              tube_rack_specs_matrix)
 
+    @pytest.mark.parametrize(
+        'xls_filename,scenario',
+        [(resource_filename('thelma.tests.functional',
+                            os.path.join('data',
+                                         'association_direct.xls')),
+          EXPERIMENT_SCENARIOS.SCREENING)])
+    def test_batch_pipetting(self, app_creator, tube_rack_specs_matrix,
+                             xls_filename, scenario, monkeypatch):
+        # Pipetting an ISO job and one of its ISOs in one update must have
+        # the same effect as pipetting them in two updates.
+        repo_mgr = \
+            app_creator.config.get_registered_utility(IRepositoryManager)
+        repo = repo_mgr.get_default()
+        self.__session = repo.session_factory()
+        emd_url = self._upload_metadata(xls_filename, scenario, app_creator)
+        emd = url_to_resource(emd_url)
+        self._accept_iso_request(emd.iso_request, app_creator)
+        # Raising the threshold that controls when to use the Cybio above
+        # the number of positions of any plate makes the planner abort the
+        # Cybio use; the job is then processed first (with its own stock
+        # racks).
+        monkeypatch.setattr(LabIsoPlanner, '_MIN_CYBIO_TRANSFER_NUMBER',
+                            10000)
+        self._generate_isos(emd.iso_request, app_creator)
+        assert emd.iso_request.process_job_first
+        iso_jobs = [iso_job for iso_job in emd.iso_request.iso_jobs
+                    if iso_job.number_stock_racks > 0]
+        assert len(iso_jobs) > 0
+        iso_job = iso_jobs[0]
+        iso = next(iter(iso_job.isos))
+        self._assemble_stock_racks(iso_job, 1, app_creator,
+                                   tube_rack_specs_matrix)
+        self._assemble_stock_racks(iso, 4, app_creator,
+                                   tube_rack_specs_matrix)
+        job_body = self.__get_representation_from_file(
+                                        'transfer_to_iso_job.xml') % iso_job.id
+        iso_body = self.__get_representation_from_file(
+                                        'transfer_to_iso.xml') % iso.id
+        batch_body = self.__get_representation_from_file(
+                                        'transfer_to_iso_job_and_iso.xml') \
+                     % (iso_job.id, iso.id)
+        iso_request_url = resource_to_url(emd.iso_request)
+        # Both entities in one update.
+        self.__session.begin_nested()
+        app_creator.patch(iso_request_url,
+                          params=batch_body,
+                          content_type=XmlMime.mime_type_string,
+                          status=HTTPOk.code)
+        batch_state = self.__get_processing_state(iso_job.get_entity(),
+                                                  iso.get_entity())
+        self.__session.rollback()
+        # One update per entity.
+        self.__session.begin_nested()
+        for patch_body in (job_body, iso_body):
+            app_creator.patch(iso_request_url,
+                              params=patch_body,
+                              content_type=XmlMime.mime_type_string,
+                              status=HTTPOk.code)
+        separate_state = self.__get_processing_state(iso_job.get_entity(),
+                                                     iso.get_entity())
+        self.__session.rollback()
+        assert batch_state == separate_state
+
+    @pytest.mark.parametrize(
+        'xls_filename,scenario',
+        [(resource_filename('thelma.tests.functional',
+                            os.path.join('data',
+                                         'association_direct.xls')),
+          EXPERIMENT_SCENARIOS.SCREENING)])
+    def test_metadata_reupload(self, app_creator, xls_filename, scenario):
+        # Re-uploading the metadata file must keep the design racks (and
+        # worklist series) that are not changed by the upload and
+        # regenerate the others.
+        repo_mgr = \
+            app_creator.config.get_registered_utility(IRepositoryManager)
+        repo = repo_mgr.get_default()
+        self.__session = repo.session_factory()
+        emd_url = self._upload_metadata(xls_filename, scenario, app_creator)
+        design = url_to_resource(emd_url).get_entity().experiment_design
+        design_racks = sorted(design.experiment_design_racks,
+                              key=lambda design_rack: design_rack.label)
+        assert len(design_racks) > 1
+        rack_map = dict([(design_rack.label, (design_rack.id,
+                                              design_rack.worklist_series))
+                         for design_rack in design_racks])
+        series_id = design.worklist_series.id
+        # Outdate the layout of the first design rack so that the upload
+        # has to regenerate it.
+        changed_rack = design_racks[0]
+        changed_rack.rack_layout = \
+                        RackLayout(shape=changed_rack.rack_layout.shape)
+        self.__session.commit()
+        self._put_metadata_file(emd_url, xls_filename, app_creator)
+        design = url_to_resource(emd_url).get_entity().experiment_design
+        new_design_racks = dict([(design_rack.label, design_rack)
+                                 for design_rack
+                                 in design.experiment_design_racks])
+        assert sorted(new_design_racks) == sorted(rack_map)
+        for label, (rack_id, worklist_series) in rack_map.iteritems():
+            design_rack = new_design_racks[label]
+            if label == changed_rack.label:
+                assert design_rack.id != rack_id
+                assert design_rack.rack_layout.has_tags()
+            else:
+                assert design_rack.id == rack_id
+                if not worklist_series is None:
+                    assert design_rack.worklist_series.id == \
+                                                        worklist_series.id
+        assert design.worklist_series.id == series_id
+
     def _create_iso_candidates(self, tube_rack_fac, tube_rack_specs_matrix,
                                tube_fac, item_status_managed,
                                organization_cenix, stock_sample_fac):
@@ -166,6 +276,10 @@ class TestIsoWorkflow(TestFunctionalBase):
         self.__session.commit()
         mb_url = res.headers['Location']
         # Now, PUT the excel meta data file.
+        self._put_metadata_file(mb_url, xls_filename, app)
+        return mb_url
+
+    def _put_metadata_file(self, mb_url, xls_filename, app):
         self.__session.begin_nested()
         with open(xls_filename, 'rb') as xls_file:
             res = app.put(mb_url,
@@ -182,7 +296,6 @@ class TestIsoWorkflow(TestFunctionalBase):
                               status=HTTPOk.code)
         self.__session.commit()
         assert res.status.endswith(HTTPOk.title)
-        return mb_url
 
     def _accept_iso_request(self, iso_request, app):
         patch_rpr = \
@@ -215,14 +328,8 @@ class TestIsoWorkflow(TestFunctionalBase):
     def _process_iso_or_iso_job(self, iso_or_iso_job, iso_request,
                                 num_barcodes, patch_body,
                                 app, tube_rack_specs_matrix):
-        # Create XL20 worklist.
-        barcodes = \
-            self.__get_empty_rack_barcode_params(num_barcodes,
-                                                 tube_rack_specs_matrix)
-        dummy_wl = self._create_xl20_worklist(iso_or_iso_job, barcodes, app)
-        assert not dummy_wl is None
-        # Intermediate step: Run XL20 worklist output to move tubes.
-        self._run_xl20_executor(dummy_wl)
+        self._assemble_stock_racks(iso_or_iso_job, num_barcodes, app,
+                                   tube_rack_specs_matrix)
         # Get processing worklist.
         self.__session.begin_nested()
         zip_map = self._create_processing_worklist(iso_or_iso_job, dict(),
@@ -237,6 +344,17 @@ class TestIsoWorkflow(TestFunctionalBase):
         assert not res is None
         self.__session.commit()
 
+    def _assemble_stock_racks(self, iso_or_iso_job, num_barcodes, app,
+                              tube_rack_specs_matrix):
+        # Create XL20 worklist.
+        barcodes = \
+            self.__get_empty_rack_barcode_params(num_barcodes,
+                                                 tube_rack_specs_matrix)
+        dummy_wl = self._create_xl20_worklist(iso_or_iso_job, barcodes, app)
+        assert not dummy_wl is None
+        # Intermediate step: Run XL20 worklist output to move tubes.
+        self._run_xl20_executor(dummy_wl)
+
     def _create_xl20_worklist(self, rc, params, app):
         params['type'] = 'XL20'
         params['include_dummy_output'] = 'true'
@@ -268,6 +386,34 @@ class TestIsoWorkflow(TestFunctionalBase):
         zip_map = read_zip_archive(NativeIO(res.body))
         return zip_map
 
+    def __get_processing_state(self, iso_job, iso):
+        # Collects the ISO status, the number of executions of each planned
+        # worklist and the samples of all plates involved.
+        state = dict(iso_status=iso.status)
+        worklist_series = [iso.iso_request.worklist_series] \
+                          + [sr.worklist_series
+                             for sr in iso_job.iso_job_stock_racks
+                                       + iso.stock_racks]
+        state['worklists'] = \
+            sorted([(pwl.label, len(pwl.executed_worklists))
+                    for ws in worklist_series if not ws is None
+                    for pwl in ws.get_sorted_worklists()])
+        racks = [ipp.rack for ipp in iso_job.iso_job_preparation_plates] \
+                + [ipp.rack for ipp in iso.iso_preparation_plates] \
+                + [fp.rack for fp in iso.final_plates]
+        for rack in racks:
+            samples = []
+            for container in rack.containers:
+                sample = container.sample
+                if sample is None:
+                    continue
+                sms = sorted([(sm.molecule.id, round(sm.concentration, 12))
+                              for sm in sample.sample_molecules])
+                samples.append((container.position.label,
+                                round(sample.volume, 12), sms))
+            state[rack.barcode] = sorted(samples)
+        return state
+
     def __get_representation_from_file(self, filename):
         fn = resource_filename(self.__class__.__module__,
                                os.path.join('data', filename))
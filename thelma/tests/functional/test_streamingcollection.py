@@ -0,0 +1,61 @@
+"""
+Functional tests for the streaming collection view.
+
+Created on Oct 19, 2026.
+"""
+import json
+
+from pyramid.httpexceptions import HTTPBadRequest
+from pyramid.httpexceptions import HTTPOk
+
+from everest.repositories.rdb.session import ScopedSessionMaker as Session
+from thelma.entities.container import Tube
+
+from thelma.tests.functional.conftest import TestFunctionalBase
+from thelma.views.streamingcollection import GetStreamingCollectionView
+
+
+__docformat__ = 'reStructuredText en'
+__all__ = ['TestStreamingCollectionView',
+           ]
+
+
+class TestStreamingCollectionView(TestFunctionalBase):
+    setup_rdb_context = True
+
+    def test_stream_tubes(self, app_creator, monkeypatch):
+        # Force several keyset chunks per request.
+        monkeypatch.setattr(GetStreamingCollectionView, 'CHUNK_SIZE', 3)
+        rsp = app_creator.get('/tubes/stream',
+                              params=dict(size=10),
+                              status=HTTPOk.code)
+        assert rsp.headers['X-Keyset-Key'] == 'barcode'
+        members = json.loads(rsp.body)
+        assert len(members) == 10
+        rsp = app_creator.get('/tubes/stream',
+                              params=dict(size=4),
+                              status=HTTPOk.code)
+        assert json.loads(rsp.body) == members[:4]
+
+    def test_stream_stock_samples(self, app_creator):
+        rsp = app_creator.get('/stock-samples/stream',
+                              params=dict(after=0, size=5),
+                              status=HTTPOk.code)
+        assert rsp.headers['X-Keyset-Key'] == 'id'
+        assert len(json.loads(rsp.body)) == 5
+
+    def test_stream_keeps_request_session(self, app_creator):
+        # The stream must not close the (transaction managed) scoped
+        # session.
+        session = Session()
+        tube = session.query(Tube).first()
+        rsp = app_creator.get('/tubes/stream',
+                              params=dict(size=2),
+                              status=HTTPOk.code)
+        assert len(json.loads(rsp.body)) == 2
+        assert tube in session
+
+    def test_stream_invalid_size(self, app_creator):
+        app_creator.get('/stock-samples/stream',
+                        params=dict(size='all'),
+                        status=HTTPBadRequest.code)
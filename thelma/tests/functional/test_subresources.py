@@ -0,0 +1,112 @@
+"""
+Functional tests for the query backed sub-resources of lab ISO requests and
+experiment metadata.
+
+Created on Oct 19, 2026.
+"""
+from pyramid.httpexceptions import HTTPOk
+
+from everest.entities.utils import get_root_aggregate
+from everest.repositories.rdb.session import ScopedSessionMaker as Session
+from everest.resources.utils import get_root_collection
+from everest.resources.utils import resource_to_url
+from thelma.entities.experiment import EXPERIMENT_METADATA_TYPES
+from thelma.entities.iso import ISO_STATUS
+from thelma.interfaces import IExperimentMetadata
+from thelma.interfaces import ILabIsoRequest
+from thelma.tests.entity.test_aggregates import QueryCounter
+from thelma.tests.functional.conftest import TestFunctionalBase
+from thelma.tools.iso.lab.base import CompletedIsoPlateQuery
+from thelma.tools.metadata.base import ExperimentMetadataTagQuery
+
+
+__docformat__ = 'reStructuredText en'
+__all__ = ['TestSubresourceQueries',
+           ]
+
+
+def _get_expected_completed_iso_plate_barcodes(iso_request):
+    """
+    Returns the barcodes of the completed ISO plates of the given lab ISO
+    request (found by traversing the entity graph).
+    """
+    is_library = iso_request.experiment_metadata.\
+        experiment_metadata_type.id == EXPERIMENT_METADATA_TYPES.LIBRARY
+    exp_bcs = set()
+    for iso in iso_request.isos:
+        if not iso.status == ISO_STATUS.DONE:
+            continue
+        if is_library:
+            racks = [lp.rack for lp in iso.library_plates]
+        elif len(iso.aliquot_plates) > 0:
+            racks = iso.aliquot_plates
+        else:
+            racks = iso.preparation_plates
+        exp_bcs.update([rack.barcode for rack in racks])
+    return exp_bcs
+
+
+def _get_expected_experiment_metadata_tag_ids(experiment_metadata):
+    """
+    Returns the IDs of the tags of the given experiment metadata (found by
+    traversing the entity graph).
+    """
+    exp_ids = set()
+    if not experiment_metadata.experiment_design is None:
+        for rack in \
+                experiment_metadata.experiment_design.experiment_design_racks:
+            for trps in rack.rack_layout.tagged_rack_position_sets:
+                exp_ids.update([tag.id for tag in trps.tags])
+    return exp_ids
+
+
+class TestSubresourceQueries(TestFunctionalBase):
+    setup_rdb_context = True
+    #: The number of entities to check.
+    NUM_ENTITIES = 5
+
+    def test_completed_iso_plates_query(self):
+        agg = get_root_aggregate(ILabIsoRequest)
+        for iso_request in list(agg.iterator())[:self.NUM_ENTITIES]:
+            is_library = iso_request.experiment_metadata.\
+                experiment_metadata_type.id == EXPERIMENT_METADATA_TYPES.LIBRARY
+            query = CompletedIsoPlateQuery(iso_request.id, is_library)
+            # The plates of all ISOs are looked up with one statement.
+            session = Session()
+            with QueryCounter(session.get_bind()) as counter:
+                query.run(session)
+            assert counter.count == 1
+            assert set(query.get_query_results()) == \
+                   _get_expected_completed_iso_plate_barcodes(iso_request)
+
+    def test_experiment_metadata_tag_query(self):
+        agg = get_root_aggregate(IExperimentMetadata)
+        for em in list(agg.iterator())[:self.NUM_ENTITIES]:
+            query = ExperimentMetadataTagQuery(em.id)
+            # The tags of all design racks are looked up with one statement.
+            session = Session()
+            with QueryCounter(session.get_bind()) as counter:
+                query.run(session)
+            assert counter.count == 1
+            assert set(query.get_query_results()) == \
+                   _get_expected_experiment_metadata_tag_ids(em)
+
+    def test_get_completed_iso_plates(self, app_creator):
+        coll = get_root_collection(ILabIsoRequest)
+        coll.slice = slice(0, self.NUM_ENTITIES)
+        for mb in coll:
+            plates = mb['completed-iso-plates']
+            assert set([plate_mb.barcode for plate_mb in plates]) == \
+                _get_expected_completed_iso_plate_barcodes(mb.get_entity())
+            url = '%scompleted-iso-plates' % resource_to_url(mb)
+            app_creator.get(url, status=HTTPOk.code)
+
+    def test_get_experiment_metadata_tags(self, app_creator):
+        coll = get_root_collection(IExperimentMetadata)
+        coll.slice = slice(0, self.NUM_ENTITIES)
+        for mb in coll:
+            tags = mb['tags']
+            assert set([tag_mb.get_entity().id for tag_mb in tags]) == \
+                _get_expected_experiment_metadata_tag_ids(mb.get_entity())
+            url = '%stags' % resource_to_url(mb)
+            app_creator.get(url, status=HTTPOk.code)
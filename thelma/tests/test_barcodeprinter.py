@@ -0,0 +1,60 @@
+import logging
+import os
+
+from thelma.barcodeprinter import BarcodePrinter
+from thelma.barcodeprinter import EmptyBarcode
+from thelma.barcodeprinter import FileSpoolTransport
+from thelma.barcodeprinter import LocationBarcode
+from thelma.barcodeprinter import UniTwoLabelRackBarcode
+
+
+class _RecordingHandler(logging.Handler):
+
+    def __init__(self):
+        logging.Handler.__init__(self, level=logging.DEBUG)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class TestBarcodePrinter(object):
+
+    def _print(self, tmpdir, barcodes):
+        transport = FileSpoolTransport(str(tmpdir.join('spool')))
+        printer = BarcodePrinter('TEST_PRINTER', transport=transport)
+        handler = _RecordingHandler()
+        logger = logging.getLogger()
+        old_level = logger.level
+        logger.addHandler(handler)
+        logger.setLevel(logging.DEBUG)
+        try:
+            printer.print_barcodes(barcodes)
+        finally:
+            logger.removeHandler(handler)
+            logger.setLevel(old_level)
+        return transport.directory, handler.records
+
+    def test_single_spool_file(self, tmpdir):
+        barcodes = [UniTwoLabelRackBarcode('02481966', 'label 1', 'label 2'),
+                    LocationBarcode('12345678', 'location'),
+                    EmptyBarcode(quantity=2)]
+        spool_dir, _ = self._print(tmpdir, barcodes)
+        file_names = os.listdir(spool_dir)
+        assert len(file_names) == 1
+        assert file_names[0].startswith('TEST_PRINTER_')
+        with open(os.path.join(spool_dir, file_names[0]), 'rb') as spool_file:
+            print_stream = spool_file.read()
+        assert print_stream == ''.join([bc.render() for bc in barcodes])
+
+    def test_print_stream_only_logged_at_debug(self, tmpdir):
+        barcode = LocationBarcode('12345678', 'location')
+        _, records = self._print(tmpdir, [barcode])
+        info_msgs = [rec.getMessage() for rec in records
+                     if rec.levelno == logging.INFO]
+        debug_msgs = [rec.getMessage() for rec in records
+                      if rec.levelno == logging.DEBUG]
+        assert info_msgs == ['Sent 1 barcode(s) to barcode printer '
+                             'TEST_PRINTER']
+        assert len(debug_msgs) == 1
+        assert repr(barcode.render()) in debug_msgs[0]
@@ -0,0 +1,90 @@
+from sqlalchemy.sql.expression import text
+
+from thelma.entities.container import CONTAINER_TYPES
+from thelma.tools.semiconstants import get_rack_position_from_label
+from thelma.tools.stock.emptytuberegistrar import EmptyTubeRecord
+from thelma.tools.stock.emptytuberegistrar import EmptyTubeRegistrar
+from thelma.tests.entity.conftest import TestEntityBase
+
+
+class Fixtures(object):
+    scan_tube_rack = lambda tube_rack_fac, tube_rack_specs_matrix: \
+            tube_rack_fac(label='test_empty_tubes',
+                          specs=tube_rack_specs_matrix)
+
+
+class TestEmptyTubeRegistrar(TestEntityBase):
+    #: The scanned tubes (position label -> tube barcode).
+    scanned_tubes = {'B02' : '9100000001',
+                     'C03' : '9100000002',
+                     'H12' : '9100000003'}
+
+    def _prepare(self, session, tmpdir, tube_rack, tube_fac, scanned_tubes):
+        tube_rack.add_tube(tube_fac(barcode='9100000000'),
+                           get_rack_position_from_label('A1'))
+        session.add(tube_rack)
+        session.flush()
+        lines = ['Date & time of Trace = 23 Aug 2012 01:42:01 PM',
+                 'Rack Base Name: %s' % tube_rack.barcode,
+                 'D04;    No TrakMate']
+        for pos_label, tube_barcode in sorted(scanned_tubes.iteritems()):
+            lines.append('%s;    %s' % (pos_label, tube_barcode))
+        scan_dir = tmpdir.mkdir('scans')
+        scan_dir.join('scan.txt').write('\r\n'.join(lines) + '\r\n')
+        return str(scan_dir)
+
+    def test_register(self, nested_session, tmpdir, scan_tube_rack,
+                      tube_fac):
+        scan_dir = self._prepare(nested_session, tmpdir, scan_tube_rack,
+                                 tube_fac, self.scanned_tubes)
+        registrar = EmptyTubeRegistrar(scan_dir)
+        records = registrar.get_result()
+        assert not registrar.has_errors()
+        assert len(records) == len(self.scanned_tubes)
+        for record in records:
+            assert isinstance(record, EmptyTubeRecord)
+            assert record.rack_barcode == scan_tube_rack.barcode
+            assert record.rack_id == scan_tube_rack.id
+        assert sorted([(rec.rack_position.label, rec.tube_barcode)
+                       for rec in records]) == \
+               sorted([(get_rack_position_from_label(pos_label).label,
+                        tube_barcode)
+                       for (pos_label, tube_barcode)
+                       in self.scanned_tubes.iteritems()])
+        rows = nested_session.execute(
+                text('SELECT t.barcode, c.container_type, c.item_status, '
+                     'cs.name, tl.rack_id, rp.label '
+                     'FROM tube t '
+                     'INNER JOIN container c '
+                     'ON c.container_id = t.container_id '
+                     'INNER JOIN container_specs cs '
+                     'ON cs.container_specs_id = c.container_specs_id '
+                     'INNER JOIN tube_location tl '
+                     'ON tl.container_id = c.container_id '
+                     'INNER JOIN rack_position rp '
+                     'ON rp.rack_position_id = tl.rack_position_id '
+                     'WHERE t.barcode IN :barcodes'),
+                dict(barcodes=tuple(self.scanned_tubes.values()))).fetchall()
+        assert sorted([(row[0], row[5]) for row in rows]) == \
+               sorted([(rec.tube_barcode, rec.rack_position.label)
+                       for rec in records])
+        for row in rows:
+            assert row[1] == CONTAINER_TYPES.TUBE
+            assert row[2].lower() == EmptyTubeRegistrar.STATUS
+            assert row[3] == EmptyTubeRegistrar.SPECS
+            assert row[4] == scan_tube_rack.id
+
+    def test_occupied_position(self, nested_session, tmpdir, scan_tube_rack,
+                               tube_fac):
+        scanned_tubes = dict(self.scanned_tubes)
+        scanned_tubes['A01'] = '9100000004'
+        scan_dir = self._prepare(nested_session, tmpdir, scan_tube_rack,
+                                 tube_fac, scanned_tubes)
+        registrar = EmptyTubeRegistrar(scan_dir)
+        assert registrar.get_result() is None
+        assert registrar.has_errors()
+        rows = nested_session.execute(
+                text('SELECT t.barcode FROM tube t '
+                     'WHERE t.barcode IN :barcodes'),
+                dict(barcodes=tuple(scanned_tubes.values()))).fetchall()
+        assert rows == []
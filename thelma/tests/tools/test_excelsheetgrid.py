@@ -0,0 +1,168 @@
+from pkg_resources import resource_filename # pylint: disable=E0611
+from pyramid.compat import ascii_native_
+from pyramid.compat import string_types
+from xlrd import open_workbook
+import os
+
+from thelma.tools.parsers.base import ExcelSheetGrid
+from thelma.tools.utils.base import is_valid_number
+
+
+class _Sheet(object):
+    """
+    Minimal stand-in for a :class:`xlrd.sheet.Sheet` (the rows are padded
+    with empty strings like xlrd does for non-ragged sheets; merged cells
+    only hold a value in their top left cell).
+    """
+    def __init__(self, name, rows, merged_cells=None):
+        self.name = name
+        self.nrows = len(rows)
+        self.ncols = max([len(row) for row in rows] + [0])
+        self.__rows = [list(row) + [''] * (self.ncols - len(row))
+                       for row in rows]
+        if merged_cells is None:
+            merged_cells = []
+        #: (first row, last row + 1, first column, last column + 1) tuples.
+        self.merged_cells = merged_cells
+        for rlo, rhi, clo, chi in merged_cells:
+            for row_index in range(rlo, rhi):
+                for col_index in range(clo, chi):
+                    if (row_index, col_index) != (rlo, clo):
+                        self.__rows[row_index][col_index] = ''
+
+    def row_values(self, row_index):
+        return list(self.__rows[row_index])
+
+    def cell_value(self, row_index, column_index):
+        return self.__rows[row_index][column_index]
+
+
+class TestExcelSheetGrid(object):
+
+    def _get_old_cell_value(self, sheet, row_index, column_index):
+        # The conversion of the former per-cell access of the Excel parser
+        # (unconvertible cells are returned as grid markers).
+        cell_value = sheet.cell_value(row_index, column_index)
+        conv_value = None
+        if isinstance(cell_value, string_types):
+            try:
+                conv_value = ascii_native_(cell_value)
+            except UnicodeEncodeError:
+                conv_value = ExcelSheetGrid.UNKNOWN_CHARACTER
+            else:
+                if conv_value == '':
+                    conv_value = None
+                else:
+                    try:
+                        conv_value = int(conv_value)
+                    except ValueError:
+                        try:
+                            conv_value = float(conv_value)
+                        except ValueError:
+                            pass
+        elif isinstance(cell_value, (float, int)):
+            if is_valid_number(value=cell_value, is_integer=True):
+                conv_value = int(cell_value)
+            else:
+                conv_value = cell_value
+        else:
+            conv_value = ExcelSheetGrid.UNKNOWN_CONTENT
+        return conv_value
+
+    def _get_old_anchors(self, sheet):
+        # The former layout search visited every cell below the first row.
+        anchors = []
+        for row_index in range(1, sheet.nrows):
+            for col_index in range(sheet.ncols - 1):
+                if self._get_old_cell_value(sheet, row_index, col_index) \
+                        == 'A' and \
+                        self._get_old_cell_value(sheet, row_index - 1,
+                                                 col_index + 1) == 1:
+                    anchors.append((row_index, col_index))
+        return anchors
+
+    def _get_grid_anchors(self, grid):
+        return [(row_index, col_index)
+                for row_index in range(grid.row_number)
+                for col_index in grid.get_layout_anchor_columns(row_index)]
+
+    def _compare(self, sheet):
+        grid = ExcelSheetGrid(sheet)
+        assert grid.sheet_name == sheet.name
+        assert (grid.row_number, grid.column_number) == \
+               (sheet.nrows, sheet.ncols)
+        for row_index in range(sheet.nrows):
+            for col_index in range(sheet.ncols):
+                old_value = self._get_old_cell_value(sheet, row_index,
+                                                     col_index)
+                grid_value = grid.rows[row_index][col_index]
+                assert grid_value == old_value
+                assert type(grid_value) is type(old_value)
+        assert self._get_grid_anchors(grid) == self._get_old_anchors(sheet)
+        return grid
+
+    def test_cell_values(self):
+        sheet = _Sheet('values',
+                       [['text', 3.0, 2.5, '4', '4.5', ''],
+                        [u'n\xe4me', 0.0, -1.0, True, None, ' ']])
+        grid = self._compare(sheet)
+        assert grid.rows[0][:5] == ['text', 3, 2.5, 4, 4.5]
+        assert grid.rows[1][0] is ExcelSheetGrid.UNKNOWN_CHARACTER
+        assert grid.rows[1][4] is ExcelSheetGrid.UNKNOWN_CONTENT
+
+    def test_merged_cells(self):
+        sheet = _Sheet('merged',
+                       [['specifier', 'specifier', 1.0, 2.0],
+                        ['', 'A', 'x', 'y'],
+                        ['', 'B', 'merged', 'merged']],
+                       merged_cells=[(0, 1, 0, 2), (2, 3, 2, 4)])
+        grid = self._compare(sheet)
+        assert grid.rows[0][:2] == ['specifier', None]
+        assert grid.rows[2][2:] == ['merged', None]
+        assert grid.get_layout_anchor_columns(1) == [1]
+
+    def test_empty_trailing_rows_and_columns(self):
+        sheet = _Sheet('trailing',
+                       [['', 1.0, 2.0, '', ''],
+                        ['A', 'x', 'y', '', ''],
+                        ['B', 'z', '', '', ''],
+                        [''],
+                        ['', '', '', '', '']])
+        grid = self._compare(sheet)
+        assert grid.rows[3] == [None] * 5
+        assert grid.rows[4] == [None] * 5
+        assert grid.get_layout_anchor_columns(1) == [0]
+        for row_index in (3, 4, 10):
+            assert grid.get_layout_anchor_columns(row_index) == []
+
+    def test_missing_anchors(self):
+        sheet = _Sheet('missing',
+                       [['', 2.0, '', '', 1.0],
+                        # No 1 in the upper right cell.
+                        ['A', 'x', '', 'B', 'x'],
+                        # No "A" in the lower left cell; "A" in the last
+                        # column.
+                        ['', 1.0, '', '', 1.0],
+                        ['a', 'x', '', '', 'A']])
+        grid = self._compare(sheet)
+        assert self._get_grid_anchors(grid) == []
+
+    def test_duplicate_anchors(self):
+        sheet = _Sheet('duplicates',
+                       [['', 1.0, 2.0, '', 1.0, 2.0],
+                        ['A', 'x', 'y', 'A', 'x', 'y'],
+                        ['B', 'x', 'y', 'B', 'x', 'y'],
+                        ['', 1.0, 2.0, '', 1.0, 2.0],
+                        ['A', 'x', 'y', 'A', 'x', 'y']])
+        grid = self._compare(sheet)
+        assert grid.get_layout_anchor_columns(1) == [0, 3]
+        assert grid.get_layout_anchor_columns(4) == [0, 3]
+
+    def test_workbook(self):
+        xls_filename = resource_filename('thelma.tests.functional',
+                                         os.path.join(
+                                                'data',
+                                                'association_direct.xls'))
+        workbook = open_workbook(xls_filename)
+        for sheet in workbook.sheets():
+            self._compare(sheet)
@@ -0,0 +1,104 @@
+from StringIO import StringIO
+
+from thelma.tools.experiment import batch
+from thelma.tools.experiment.base import ExperimentDesignData
+from thelma.tools.experiment.base import SourceRackVerifier
+from thelma.tools.experiment.batch import ExperimentBatchWorklistWriter
+from thelma.tools.writers import read_zip_archive
+from thelma.tests.entity.conftest import TestEntityBase
+
+
+class Fixtures(object):
+    experiment_design = lambda experiment_design_fac: experiment_design_fac()
+    experiments = lambda experiment_fac, experiment_design: \
+            [experiment_fac(label='experiment %i' % (idx + 1),
+                            experiment_design=experiment_design)
+             for idx in range(3)]
+
+
+class _WorklistWriter(object):
+    """
+    Writer returning fixed file contents for an experiment (replaces the
+    experiment writers which need complete experiment data).
+    """
+    def __init__(self, experiment, design_data, parent=None):
+        self.experiment = experiment
+        self.design_data = design_data
+        self.parent = parent
+
+    def get_worklist_files(self):
+        label = self.experiment.label
+        return {'%s.csv' % label : StringIO(label),
+                'reservoir.csv' : StringIO(label)}
+
+
+class TestExperimentBatchWorklistWriter(TestEntityBase):
+
+    def _run(self, experiments, monkeypatch):
+        writers = []
+        def get_experiment_writer(**kw):
+            writer = _WorklistWriter(**kw)
+            writers.append(writer)
+            return writer
+        monkeypatch.setattr(batch, 'get_experiment_writer',
+                            get_experiment_writer)
+        tool = ExperimentBatchWorklistWriter(experiments)
+        zip_stream = tool.get_result()
+        assert not zip_stream is None
+        zip_stream.seek(0)
+        return read_zip_archive(zip_stream), writers
+
+    def test_duplicate_file_names(self, experiments, monkeypatch):
+        zip_map, _ = self._run(experiments, monkeypatch)
+        exp_fns = set(['%s.csv' % exp.label for exp in experiments]
+                      + ['reservoir.csv'])
+        assert set(zip_map.keys()) == exp_fns
+        for experiment in experiments:
+            assert zip_map['%s.csv' % experiment.label].read() \
+                   == experiment.label
+        # The file of the last experiment is kept.
+        assert zip_map['reservoir.csv'].read() == experiments[-1].label
+
+    def test_design_data_reuse(self, experiments, experiment_design,
+                               monkeypatch):
+        _, writers = self._run(experiments, monkeypatch)
+        assert len(writers) == len(experiments)
+        design_data = writers[0].design_data
+        assert isinstance(design_data, ExperimentDesignData)
+        assert design_data.experiment_design is experiment_design
+        for writer in writers[1:]:
+            assert writer.design_data is design_data
+
+
+class TestExperimentDesignData(TestEntityBase):
+
+    def test_init(self, experiment_design):
+        design_data = ExperimentDesignData(experiment_design)
+        assert design_data.design_series is experiment_design.worklist_series
+        assert design_data.design_rack_labels == \
+               [design_rack.label
+                for design_rack in experiment_design.experiment_design_racks]
+        assert design_data.design_rack_series_map == \
+               dict([(design_rack.label, design_rack.worklist_series)
+                     for design_rack
+                     in experiment_design.experiment_design_racks
+                     if not design_rack.worklist_series is None])
+        assert design_data.source_layout_data is None
+        assert design_data.design_rack_layouts == {}
+
+
+class TestSourceRackVerifier(TestEntityBase):
+
+    def test_shared_expected_layout(self, experiment_design, plate_fac):
+        design_data = ExperimentDesignData(experiment_design)
+        layout_data = (object(), dict())
+        design_data.source_layout_data = layout_data
+        verifier = SourceRackVerifier(source_plate=plate_fac(),
+                                      iso_request=None,
+                                      design_data=design_data)
+        # The shared layout is used without converting the ISO request
+        # layout (there is no ISO request to convert here).
+        verifier._fetch_expected_layout() # pylint:disable=W0212
+        assert (verifier._expected_layout, # pylint:disable=W0212
+                verifier._iso_map) == layout_data # pylint:disable=W0212
+        assert not verifier.has_errors()
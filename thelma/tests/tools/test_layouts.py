@@ -0,0 +1,64 @@
+from everest.repositories.rdb.session import ScopedSessionMaker as Session
+from thelma.tools.iso.base import StockRackParameters
+from thelma.tools.iso.base import StockRackPosition
+from thelma.tools.semiconstants import get_rack_position_from_label
+from thelma.tools.utils.layouts import LibraryBaseLayoutPosition
+from thelma.tools.utils.layouts import TransferTarget
+from thelma.tests.entity.conftest import TestEntityBase
+
+
+class Fixtures(object):
+    stock_rack_position = lambda molecule_design_pool_fac: \
+            StockRackPosition(get_rack_position_from_label('A1'),
+                              molecule_design_pool_fac(), '1000000001',
+                              [TransferTarget('B2', 5, 'a')])
+
+
+class TestWorkingPositionTagKeys(TestEntityBase):
+
+    def _get_targets_tag_key(self, stock_rack_position):
+        return stock_rack_position.get_parameter_tag_key(
+                                        StockRackParameters.TRANSFER_TARGETS)
+
+    def test_not_cached(self, stock_rack_position):
+        tag_keys = stock_rack_position.get_tag_keys()
+        assert not stock_rack_position.get_tag_keys() is tag_keys
+        assert stock_rack_position.get_tag_keys() == tag_keys
+        assert self._get_targets_tag_key(stock_rack_position) in tag_keys
+
+    def test_attribute_set(self):
+        pos = LibraryBaseLayoutPosition(get_rack_position_from_label('A1'))
+        assert len(pos.get_tag_keys()) == 1
+        pos.is_library_position = False
+        assert pos.get_tag_keys() == frozenset()
+
+    def test_add_transfer_target(self, stock_rack_position):
+        tag_keys = stock_rack_position.get_tag_keys()
+        stock_rack_position.add_transfer_target(TransferTarget('C3', 5, 'a'))
+        new_tag_keys = stock_rack_position.get_tag_keys()
+        assert not new_tag_keys == tag_keys
+        assert self._get_targets_tag_key(stock_rack_position) in new_tag_keys
+
+    def test_in_place_mutation(self, stock_rack_position):
+        tag_keys = stock_rack_position.get_tag_keys()
+        stock_rack_position.transfer_targets.append(
+                                            TransferTarget('C3', 5, 'a'))
+        new_tag_keys = stock_rack_position.get_tag_keys()
+        assert not new_tag_keys == tag_keys
+        assert self._get_targets_tag_key(stock_rack_position) in new_tag_keys
+
+    def test_pool_id_after_flush(self, stock_rack_position):
+        pool = stock_rack_position.molecule_design_pool
+        pool_param = StockRackParameters.MOLECULE_DESIGN_POOL
+        assert pool.id is None
+        tag_keys = stock_rack_position.get_tag_keys()
+        session = Session()
+        session.add(pool)
+        session.flush()
+        assert not pool.id is None
+        new_tag_keys = stock_rack_position.get_tag_keys()
+        assert not new_tag_keys == tag_keys
+        assert stock_rack_position.get_parameter_tag_key(pool_param) \
+                    in new_tag_keys
+        assert stock_rack_position.get_parameter_tag_key(pool_param)[2] \
+                    == str(pool.id)
@@ -0,0 +1,61 @@
+import logging
+
+from thelma.tools.messagerecorder import MessageRecorder
+
+
+class _TestRecorder(MessageRecorder):
+    NAME = 'Test Recorder'
+
+
+class TestMessageRecorder(object):
+
+    def _create_recorder(self, level):
+        recorder = _TestRecorder()
+        recorder._logger.setLevel(level) # pylint:disable=W0212
+        return recorder
+
+    def test_lazy_arguments(self):
+        recorder = self._create_recorder(logging.DEBUG)
+        recorder.add_warning('%i tubes in rack %s.', 3, '02481966')
+        recorder.add_info(lambda: 'Callable %s.' % 'message')
+        recorder.add_debug('No arguments (100 %).')
+        assert recorder.get_messages() == \
+                    ['Test Recorder - 3 tubes in rack 02481966.']
+        assert recorder.get_messages(logging.DEBUG) == \
+                    ['Test Recorder - 3 tubes in rack 02481966.',
+                     'Test Recorder - Callable message.',
+                     'Test Recorder - No arguments (100 %).']
+
+    def test_dropped_messages_are_not_formatted(self):
+        recorder = self._create_recorder(logging.INFO)
+        def fail():
+            raise AssertionError('Dropped message has been formatted.')
+        recorder.add_debug(fail)
+        recorder.add_debug('%s', _Unformattable())
+        assert recorder.get_messages(logging.DEBUG) == []
+        assert recorder.get_message_count(logging.DEBUG) == 2
+
+    def test_event_shape(self):
+        recorder = self._create_recorder(logging.INFO)
+        child = _TestRecorder(parent=recorder)
+        recorder.add_info('first')
+        child.add_error('second')
+        recorder.add_info('third')
+        # pylint:disable=W0212
+        evts = list(recorder._message_stack) \
+               + list(recorder._low_severity_messages)
+        # pylint:enable=W0212
+        assert sorted([(seq, lvl) for (seq, lvl, _) in evts]) == \
+                    [(0, logging.INFO), (1, logging.ERROR),
+                     (2, logging.INFO)]
+        assert recorder.get_messages(logging.INFO) == \
+                    ['Test Recorder - first',
+                     'Test Recorder->Test Recorder - second',
+                     'Test Recorder - third']
+        assert child.has_errors()
+
+
+class _Unformattable(object):
+
+    def __str__(self):
+        raise AssertionError('Dropped message has been formatted.')
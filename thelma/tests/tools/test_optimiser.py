@@ -0,0 +1,41 @@
+from thelma.tools.worklists.optimiser import ColumnPackingSolver
+
+
+class TestColumnPackingSolver(object):
+    bins = [(0, [0, 2, 4, 6]), (0, [1, 3, 5, 7]),
+            (1, [0, 2, 4, 6]), (1, [1, 3, 5, 7]),
+            (2, [0, 2, 4, 6]), (2, [1, 3, 5, 7])]
+    subcolumns = [[0, 1, 2], [3, 4, 5], [6, 7], [8, 9], [10], [11, 12, 13],
+                  [14]]
+
+    def _create_solver(self, subcolumns):
+        return ColumnPackingSolver(subcolumns=subcolumns, bins=self.bins,
+                                   target_subcolumns=subcolumns, row_step=2)
+
+    def test_solve(self):
+        solver = self._create_solver(self.subcolumns)
+        greedy_order = sorted(range(len(self.subcolumns)),
+                              key=lambda i: (-len(self.subcolumns[i]), i))
+        greedy_score = solver.evaluate(solver.pack(greedy_order))
+        positions, score = solver.solve(200)
+        assert score <= greedy_score
+        assert score == solver.evaluate(positions)
+        all_items = set([item_id for subcolumn in self.subcolumns
+                         for item_id in subcolumn])
+        assert set(positions.keys()) == all_items
+        assert len(set(positions.values())) == len(all_items)
+        free_positions = set([(row_index, column_index)
+                              for (column_index, row_indices) in self.bins
+                              for row_index in row_indices])
+        assert set(positions.values()).issubset(free_positions)
+
+    def test_solve_reproducible(self):
+        result1 = self._create_solver(self.subcolumns).solve(1000)
+        result2 = self._create_solver(self.subcolumns).solve(1000)
+        assert result1 == result2
+
+    def test_solve_no_fit(self):
+        subcolumns = [range(i * 4, i * 4 + 4) for i in range(7)]
+        solver = self._create_solver(subcolumns)
+        assert solver.pack(range(len(subcolumns))) is None
+        assert solver.solve(200) == (None, None)
@@ -0,0 +1,187 @@
+import logging
+
+from everest.entities.utils import get_root_aggregate
+from thelma.interfaces import IMoleculeDesignPool
+from thelma.interfaces import IRackShape
+from thelma.tools.platecreator import PlateCreator96To384
+from thelma.tools.semiconstants import get_rack_position_from_indices
+from thelma.tools.semiconstants import get_rack_position_from_label
+from thelma.tools.stock.tubepicking import \
+    DefaultConcentrationStockSampleQuery
+from thelma.tools.utils.racksector import RackSectorTranslator
+from thelma.tests.entity.conftest import TestEntityBase
+
+
+class Fixtures(object):
+    rack_shape_32x48 = lambda: \
+            get_root_aggregate(IRackShape).get_by_slug('32x48')
+    plate_384 = lambda plate_fac, plate_specs_fac, rack_shape_16x24: \
+            plate_fac(specs=plate_specs_fac(shape=rack_shape_16x24))
+    plate_1536 = lambda plate_fac, plate_specs_fac, rack_shape_32x48: \
+            plate_fac(specs=plate_specs_fac(shape=rack_shape_32x48))
+    pools = lambda: [get_root_aggregate(IMoleculeDesignPool).get_by_id(pool_id)
+                     for pool_id in (288282, 3349397)]
+    stock_tube_rack = lambda tube_rack_fac, tube_rack_specs_matrix: \
+            tube_rack_fac(label='test_plate_creator',
+                          specs=tube_rack_specs_matrix)
+
+
+class TestPlateCreatorSectorMapping(TestEntityBase):
+    # Row labels used by the previous quadrant mapping for 384-well targets.
+    ROW_LABELS = [chr(ord('A') + c) for c in range(16)]
+
+    def _translate(self, number_sectors, sector_index, row_index,
+                   column_index):
+        translator = RackSectorTranslator(
+                            number_sectors, 0, sector_index,
+                            behaviour=RackSectorTranslator.MANY_TO_ONE)
+        return translator.translate(
+                    get_rack_position_from_indices(row_index, column_index))
+
+    def test_384_quadrants(self):
+        for sector_index in range(4):
+            offset_row, offset_col = divmod(sector_index, 2)
+            for row_index in range(8):
+                for column_index in range(12):
+                    label = '%s%d' \
+                        % (self.ROW_LABELS[row_index * 2 + offset_row],
+                           column_index * 2 + offset_col + 1)
+                    assert self._translate(4, sector_index, row_index,
+                                           column_index) == \
+                           get_rack_position_from_label(label)
+
+    def test_1536_sectors(self):
+        for sector_index, offset in ((0, 0), (15, 3)):
+            for row_index, column_index in ((0, 0), (3, 5), (7, 11)):
+                rack_pos = self._translate(16, sector_index, row_index,
+                                           column_index)
+                assert rack_pos.row_index == row_index * 4 + offset
+                assert rack_pos.column_index == column_index * 4 + offset
+
+
+class TestPlateCreator(TestEntityBase):
+
+    def _create_stock_samples(self, session, stock_tube_rack, pools,
+                              tube_fac, stock_sample_fac,
+                              organization_cenix, concentration_factor=1):
+        stock_samples = []
+        for idx, pool in enumerate(pools):
+            tube = tube_fac(barcode='90000000%02i' % idx)
+            stock_tube_rack.add_tube(tube,
+                                     get_rack_position_from_indices(0, idx))
+            stock_samples.append(
+                stock_sample_fac(volume=1e-4, container=tube,
+                                 molecule_design_pool=pool,
+                                 supplier=organization_cenix,
+                                 molecule_type=pool.molecule_type,
+                                 concentration=
+                                        pool.default_stock_concentration
+                                        * concentration_factor))
+        session.add_all([stock_tube_rack] + stock_samples)
+        session.flush()
+        return stock_samples
+
+    def _write_layout_file(self, tmpdir, sector_index, pool_map):
+        lines = [','.join([''] + [str(i + 1) for i in range(12)])]
+        for row_index in range(8):
+            values = [chr(ord('A') + row_index)]
+            for column_index in range(12):
+                pool = pool_map.get((row_index, column_index))
+                values.append('' if pool is None else str(pool.id))
+            lines.append(','.join(values))
+        layout_file = tmpdir.join('layout_%02i.csv' % sector_index)
+        layout_file.write('\n'.join(lines) + '\n')
+        return str(layout_file)
+
+    def test_default_concentration_stock_sample_query(self, nested_session,
+                            stock_tube_rack, pools, tube_fac,
+                            stock_sample_fac, organization_cenix):
+        stock_samples = self._create_stock_samples(nested_session,
+                                stock_tube_rack, pools, tube_fac,
+                                stock_sample_fac, organization_cenix)
+        query = DefaultConcentrationStockSampleQuery(
+                                    pool_ids=[pool.id for pool in pools])
+        query.run(nested_session)
+        results = query.get_query_results()
+        for pool, stock_sample in zip(pools, stock_samples):
+            assert stock_sample.id in results[pool.id]
+
+    def test_default_concentration_stock_sample_query_other_concentration(
+                            self, nested_session, stock_tube_rack, pools,
+                            tube_fac, stock_sample_fac, organization_cenix):
+        stock_samples = self._create_stock_samples(nested_session,
+                                stock_tube_rack, pools, tube_fac,
+                                stock_sample_fac, organization_cenix,
+                                concentration_factor=2)
+        query = DefaultConcentrationStockSampleQuery(
+                                    pool_ids=[pool.id for pool in pools])
+        query.run(nested_session)
+        found_ids = set()
+        for sample_ids in query.get_query_results().itervalues():
+            found_ids.update(sample_ids)
+        assert found_ids.isdisjoint([ss.id for ss in stock_samples])
+
+    def test_1536(self, nested_session, tmpdir, plate_1536, stock_tube_rack,
+                  pools, tube_fac, stock_sample_fac, organization_cenix):
+        self._create_stock_samples(nested_session, stock_tube_rack, pools,
+                                   tube_fac, stock_sample_fac,
+                                   organization_cenix)
+        nested_session.add(plate_1536)
+        nested_session.flush()
+        pool_maps = dict([(sector_index, dict())
+                          for sector_index in range(16)])
+        pool_maps[0][(0, 0)] = pools[0]
+        pool_maps[15][(1, 1)] = pools[1]
+        layout_filenames = [self._write_layout_file(tmpdir, sector_index,
+                                                    pool_maps[sector_index])
+                            for sector_index in range(16)]
+        creator = PlateCreator96To384(iso_concentration=1000, iso_volume=5,
+                                      target_barcode=plate_1536.barcode,
+                                      layout_filenames=
+                                            ' , '.join(layout_filenames))
+        creator.get_result()
+        assert not creator.has_errors()
+        sample_map = dict([(pos.label, container.sample)
+                           for (pos, container)
+                           in plate_1536.container_positions.iteritems()
+                           if not container.sample is None])
+        assert sorted(sample_map.keys()) == ['A1', 'H8']
+        for label, pool in (('A1', pools[0]), ('H8', pools[1])):
+            sample = sample_map[label]
+            assert round(sample.volume * 1e6, 2) == 5
+            md_ids = set([sm.molecule.molecule_design.id
+                          for sm in sample.sample_molecules])
+            assert md_ids == set([md.id for md in pool.molecule_designs])
+
+    def test_unreadable_layout_files(self, nested_session, tmpdir, plate_384):
+        nested_session.add(plate_384)
+        nested_session.flush()
+        layout_filenames = [str(tmpdir.join('missing_%i.csv' % i))
+                            for i in range(4)]
+        creator = PlateCreator96To384(iso_concentration=1000, iso_volume=5,
+                                      target_barcode=plate_384.barcode,
+                                      layout_filenames=
+                                            ', '.join(layout_filenames))
+        creator.get_result()
+        assert creator.has_errors()
+        errors = creator.get_messages(logging_level=logging.ERROR)
+        assert len(errors) == 4
+        for layout_filename in layout_filenames:
+            assert any(['Could not read layout file %s' % layout_filename
+                        in msg for msg in errors])
+
+    def test_wrong_number_of_layout_files(self, nested_session, tmpdir,
+                                          plate_1536):
+        nested_session.add(plate_1536)
+        nested_session.flush()
+        layout_filenames = [self._write_layout_file(tmpdir, sector_index, {})
+                            for sector_index in range(4)]
+        creator = PlateCreator96To384(iso_concentration=1000, iso_volume=5,
+                                      target_barcode=plate_1536.barcode,
+                                      layout_filenames=
+                                            ','.join(layout_filenames))
+        creator.get_result()
+        assert creator.has_errors()
+        errors = creator.get_messages(logging_level=logging.ERROR)
+        assert 'The target rack has 16 sectors but 4 layout files have ' \
+               'been passed.' in errors[0]
@@ -0,0 +1,154 @@
+from thelma.tools.semiconstants import get_rack_position_from_label
+from thelma.tools.utils.racksamples import EntityRackSampleOperations
+from thelma.tools.utils.racksamples import RdbRackSampleOperations
+from thelma.tests.entity.conftest import TestEntityBase
+
+
+class Fixtures(object):
+    molecule = lambda molecule_fac: molecule_fac()
+    source_plate = lambda plate_fac: plate_fac(label='source plate')
+    memory_target_plate = lambda plate_fac: plate_fac(label='memory target')
+    rdb_target_plate = lambda plate_fac: plate_fac(label='rdb target')
+
+
+class TestRackSampleOperations(TestEntityBase):
+    labels = ['A1', 'B2', 'H12']
+
+    def _get_sample_state(self, rack):
+        state = dict()
+        for pos, container in rack.container_positions.iteritems():
+            sample = container.sample
+            if sample is None:
+                continue
+            sms = set([(sm.molecule.id, round(sm.concentration * 1e9, 2))
+                       for sm in sample.sample_molecules])
+            state[pos.label] = (round(sample.volume * 1e6, 2), sms)
+        return state
+
+    def _make_samples(self, rack, molecule):
+        for idx, label in enumerate(self.labels):
+            pos = get_rack_position_from_label(label)
+            container = rack.container_positions[pos]
+            sample = container.make_sample((idx + 1) * 1e-6)
+            sample.make_sample_molecule(molecule, (idx + 1) * 1e-6)
+
+    def _prepare(self, session, plates):
+        session.add_all(plates)
+        session.flush()
+        # Load the target samples into the session before running the
+        # operations (as the tools using the operations do).
+        for plate in plates:
+            self._get_sample_state(plate)
+
+    def test_copy_samples(self, nested_session, molecule, source_plate,
+                          memory_target_plate, rdb_target_plate):
+        self._make_samples(source_plate, molecule)
+        self._prepare(nested_session,
+                      [source_plate, memory_target_plate, rdb_target_plate])
+        cnt_mem = EntityRackSampleOperations().copy_samples(
+                                source_plate, [memory_target_plate], 2e-6)
+        cnt_rdb = RdbRackSampleOperations().copy_samples(
+                                source_plate, [rdb_target_plate], 2e-6)
+        nested_session.flush()
+        assert cnt_mem == cnt_rdb == len(self.labels)
+        mem_state = self._get_sample_state(memory_target_plate)
+        assert len(mem_state) == len(self.labels)
+        assert self._get_sample_state(rdb_target_plate) == mem_state
+
+    def test_erase_samples(self, nested_session, molecule,
+                           memory_target_plate, rdb_target_plate):
+        self._make_samples(memory_target_plate, molecule)
+        self._make_samples(rdb_target_plate, molecule)
+        self._prepare(nested_session,
+                      [memory_target_plate, rdb_target_plate])
+        cnt_mem = EntityRackSampleOperations().erase_samples(
+                                                [memory_target_plate])
+        cnt_rdb = RdbRackSampleOperations().erase_samples([rdb_target_plate])
+        nested_session.flush()
+        assert cnt_mem == cnt_rdb == len(self.labels)
+        assert self._get_sample_state(memory_target_plate) == {}
+        assert self._get_sample_state(rdb_target_plate) == {}
+
+    def test_stamp_samples(self, nested_session, molecule, tube_fac,
+                           memory_target_plate, rdb_target_plate):
+        tubes = []
+        for idx in range(len(self.labels)):
+            tube = tube_fac(barcode='10199999%02i' % idx)
+            sample = tube.make_sample(1e-4)
+            sample.make_sample_molecule(molecule, 5e-5)
+            tubes.append(tube)
+        self._prepare(nested_session,
+                      tubes + [memory_target_plate, rdb_target_plate])
+        pos_tube_map = dict([(get_rack_position_from_label(label),
+                              tube.barcode)
+                             for (label, tube) in zip(self.labels, tubes)])
+        cnt_mem = EntityRackSampleOperations().stamp_samples(
+                        memory_target_plate, pos_tube_map, 3e-6, 1e-6)
+        cnt_rdb = RdbRackSampleOperations().stamp_samples(
+                        rdb_target_plate, pos_tube_map, 3e-6, 1e-6)
+        nested_session.flush()
+        assert cnt_mem == cnt_rdb == len(self.labels)
+        mem_state = self._get_sample_state(memory_target_plate)
+        assert len(mem_state) == len(self.labels)
+        assert self._get_sample_state(rdb_target_plate) == mem_state
+
+    def _make_old_samples(self, rack, molecule):
+        # A1 is replaced by the operations, C3 is not.
+        for label in ('A1', 'C3'):
+            container = rack.container_positions[
+                                        get_rack_position_from_label(label)]
+            sample = container.make_sample(9e-6)
+            sample.make_sample_molecule(molecule, 9e-6)
+
+    def test_copy_samples_replace(self, nested_session, molecule,
+                                  source_plate, memory_target_plate,
+                                  rdb_target_plate):
+        self._make_samples(source_plate, molecule)
+        self._make_old_samples(memory_target_plate, molecule)
+        self._make_old_samples(rdb_target_plate, molecule)
+        self._prepare(nested_session,
+                      [source_plate, memory_target_plate, rdb_target_plate])
+        EntityRackSampleOperations().copy_samples(
+                                source_plate, [memory_target_plate], 2e-6)
+        RdbRackSampleOperations().copy_samples(
+                                source_plate, [rdb_target_plate], 2e-6)
+        nested_session.flush()
+        mem_state = self._get_sample_state(memory_target_plate)
+        assert mem_state['A1'][0] == 2
+        assert mem_state['C3'][0] == 9
+        assert self._get_sample_state(rdb_target_plate) == mem_state
+
+    def test_stamp_samples_replace(self, nested_session, molecule, tube_fac,
+                                   memory_target_plate, rdb_target_plate):
+        tube = tube_fac(barcode='1019999900')
+        sample = tube.make_sample(1e-4)
+        sample.make_sample_molecule(molecule, 5e-5)
+        self._make_old_samples(memory_target_plate, molecule)
+        self._make_old_samples(rdb_target_plate, molecule)
+        self._prepare(nested_session,
+                      [tube, memory_target_plate, rdb_target_plate])
+        pos_tube_map = {get_rack_position_from_label('A1') : tube.barcode}
+        EntityRackSampleOperations().stamp_samples(
+                        memory_target_plate, pos_tube_map, 3e-6, 1e-6)
+        RdbRackSampleOperations().stamp_samples(
+                        rdb_target_plate, pos_tube_map, 3e-6, 1e-6)
+        nested_session.flush()
+        mem_state = self._get_sample_state(memory_target_plate)
+        assert mem_state['A1'][0] == 3
+        assert self._get_sample_state(rdb_target_plate) == mem_state
+
+    def test_erase_samples_expunge(self, nested_session, molecule,
+                                   rdb_target_plate):
+        self._make_samples(rdb_target_plate, molecule)
+        self._prepare(nested_session, [rdb_target_plate])
+        samples = [container.sample for container
+                   in rdb_target_plate.container_positions.itervalues()
+                   if not container.sample is None]
+        sample_mols = [sm for sample in samples
+                       for sm in sample.sample_molecules]
+        assert len(sample_mols) == len(self.labels)
+        RdbRackSampleOperations().erase_samples([rdb_target_plate])
+        for obj in samples + sample_mols:
+            assert not obj in nested_session
+        nested_session.flush()
+        assert self._get_sample_state(rdb_target_plate) == {}
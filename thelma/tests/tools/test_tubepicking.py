@@ -0,0 +1,89 @@
+from random import Random
+
+from thelma.tools.iso.poolcreation.tubepicking import PoolCandidate
+from thelma.tools.iso.poolcreation.tubepicking import PoolCandidateAssigner
+from thelma.tools.stock.tubepicking import TubeCandidate
+
+
+class _MoleculeDesign(object):
+    def __init__(self, md_id):
+        self.id = md_id
+
+
+class _Pool(object):
+    def __init__(self, pool_id, md_ids):
+        self.id = pool_id
+        self.molecule_designs = [_MoleculeDesign(md_id) for md_id in md_ids]
+
+    def __iter__(self):
+        return iter(self.molecule_designs)
+
+
+class TestPoolCandidateAssigner(object):
+
+    def _create_assigner(self, pool_md_map, requested_tubes=None):
+        if requested_tubes is None:
+            requested_tubes = set()
+        return PoolCandidateAssigner(
+                    [PoolCandidate(_Pool(pool_id, md_ids))
+                     for (pool_id, md_ids) in sorted(pool_md_map.items())],
+                    requested_tubes)
+
+    def _create_tube_candidate(self, md_id, tube_barcode):
+        return TubeCandidate(pool_id=md_id, rack_barcode='09999999',
+                             rack_position='A1', tube_barcode=tube_barcode,
+                             concentration=5e-5, volume=1e-5)
+
+    def test_shared_design(self):
+        assigner = self._create_assigner({1 : [11, 12], 2 : [12, 13],
+                                          3 : [12, 14]})
+        assert sorted(assigner.get_molecule_design_ids()) == [11, 12, 13, 14]
+        for md_id, tube_barcode in [(12, '1001'), (12, '1002'), (11, '1003'),
+                                    (13, '1004'), (12, '1005'),
+                                    (12, '1006'), (14, '1007')]:
+            assigner.add_tube_candidate(
+                    md_id, self._create_tube_candidate(md_id, tube_barcode))
+        assert [pool_cand.pool_id
+                for pool_cand in assigner.completed_candidates] == [1, 2, 3]
+        assert [pool_cand.get_tube_barcodes()
+                for pool_cand in assigner.completed_candidates] == \
+                    [['1003', '1001'], ['1002', '1004'], ['1005', '1007']]
+
+    def test_requested_tube(self):
+        assigner = self._create_assigner({1 : [11], 2 : [11]},
+                                         requested_tubes=set(['1003']))
+        for tube_barcode in ['1001', '1002', '1003']:
+            assigner.add_tube_candidate(
+                        11, self._create_tube_candidate(11, tube_barcode))
+        assert [pool_cand.get_tube_barcodes()
+                for pool_cand in assigner.completed_candidates] == \
+                    [['1003'], ['1002']]
+
+    def test_library_scale(self):
+        # Scaled down version of a library: pools of three designs, every
+        # tenth pool shares a design with the others. Candidates arrive in
+        # random order.
+        number_pools = 2000
+        shared_md_id = 3 * number_pools
+        pool_md_map = dict()
+        for pool_id in range(number_pools):
+            md_ids = [3 * pool_id, 3 * pool_id + 1, 3 * pool_id + 2]
+            if pool_id % 10 == 0:
+                md_ids[2] = shared_md_id
+            pool_md_map[pool_id] = md_ids
+        assigner = self._create_assigner(pool_md_map)
+        tube_candidates = []
+        for md_ids in pool_md_map.itervalues():
+            for md_id in md_ids:
+                tube_barcode = str(1000000 + len(tube_candidates))
+                tube_candidates.append(
+                        (md_id, self._create_tube_candidate(md_id,
+                                                            tube_barcode)))
+        Random(0).shuffle(tube_candidates)
+        for md_id, tube_candidate in tube_candidates:
+            assigner.add_tube_candidate(md_id, tube_candidate)
+        assert len(assigner.completed_candidates) == number_pools
+        all_tube_barcodes = []
+        for pool_cand in assigner.completed_candidates:
+            all_tube_barcodes.extend(pool_cand.get_tube_barcodes())
+        assert len(set(all_tube_barcodes)) == 3 * number_pools
@@ -0,0 +1,90 @@
+from thelma.tools.experiment import base
+from thelma.tools.experiment.base import ReagentPreparationWriter
+from thelma.tools.semiconstants import get_rack_position_from_label
+from thelma.tools.worklists.biomek import BiomekWorklistRowWriter
+from thelma.tools.worklists.writers import WorklistRow
+from thelma.tests.entity.conftest import TestEntityBase
+
+
+# The expected streams are the output of the writers before worklists were
+# generated as rows (a Biomek transfer worklist, a Biomek dilution worklist
+# and the reagent preparation file parsed from the latter, with a dead
+# volume of 20 ul).
+TRANSFER_WORKLIST = \
+    'SourcePlateBarcode,SourcePlateWell,DestinationPlateBarcode,' \
+    'DestinationPlateWell,Volume\r\n' \
+    '02490001,A1,02490002,B2,5\r\n' \
+    '02490001,C3,02490002,D4,1.3\r\n' \
+    '02490001,A1,02490003,B2,0.1\r\n'
+
+DILUTION_WORKLIST = \
+    'SourcePlateBarcode,SourcePlateWell,DestinationPlateBarcode,' \
+    'DestinationPlateWell,Volume,DiluentInformation\r\n' \
+    'reservoir,A1,02490002,B2,7,RNAiMax (1400)\r\n' \
+    'reservoir,B1,02490002,B3,3.5,Lipofectamine (700)\r\n' \
+    'reservoir,A1,02490002,C2,7,RNAiMax (1400)\r\n' \
+    'reservoir,B1,02490003,B3,3.5,Lipofectamine (700)\r\n' \
+    'reservoir,A1,02490003,D5,10.3,RNAiMax (1400)\r\n'
+
+REAGENT_PREPARATION = \
+    'Rack Position,Reagent Name,Final Dilution Factor,' \
+    'Preparation Dilution Factor,Total Volume,Reagent Volume,' \
+    'Diluent Volume\r\n' \
+    'A1,RNAiMax,1400,100,50,0.5,49.5\r\n' \
+    'B1,Lipofectamine,700,50,30,0.6,29.4\r\n'
+
+
+class _ReservoirSpecs(object):
+    """
+    Reservoir specs with a fixed dead volume (the preparation volumes
+    depend on the dead volume stored in the DB).
+    """
+    max_dead_volume = 20e-6
+
+
+class Fixtures(object):
+    transfer_rows = lambda: \
+        [WorklistRow(source_rack_barcode, get_rack_position_from_label(sp),
+                     target_rack_barcode, get_rack_position_from_label(tp),
+                     volume)
+         for (source_rack_barcode, sp, target_rack_barcode, tp, volume)
+         in [('02490001', 'A1', '02490002', 'B2', 5.0),
+             ('02490001', 'C3', '02490002', 'D4', 1.25),
+             ('02490001', 'A1', '02490003', 'B2', 0.1)]]
+    dilution_rows = lambda: \
+        [WorklistRow('reservoir', get_rack_position_from_label(sp),
+                     target_rack_barcode, get_rack_position_from_label(tp),
+                     volume, diluent_info=diluent_info)
+         for (sp, target_rack_barcode, tp, volume, diluent_info)
+         in [('A1', '02490002', 'B2', 7.0, 'RNAiMax (1400)'),
+             ('B1', '02490002', 'B3', 3.45, 'Lipofectamine (700)'),
+             ('A1', '02490002', 'C2', 7.0, 'RNAiMax (1400)'),
+             ('B1', '02490003', 'B3', 3.45, 'Lipofectamine (700)'),
+             ('A1', '02490003', 'D5', 10.25, 'RNAiMax (1400)')]]
+
+
+class TestWorklistRowWriters(TestEntityBase):
+
+    def _get_content(self, writer):
+        stream = writer.get_result()
+        assert not stream is None
+        return stream.getvalue()
+
+    def test_biomek_transfer_worklist(self, transfer_rows):
+        writer = BiomekWorklistRowWriter(transfer_rows)
+        assert self._get_content(writer) == TRANSFER_WORKLIST
+
+    def test_biomek_dilution_worklist(self, dilution_rows):
+        writer = BiomekWorklistRowWriter(dilution_rows)
+        assert self._get_content(writer) == DILUTION_WORKLIST
+
+    def test_reagent_preparation(self, dilution_rows, monkeypatch):
+        monkeypatch.setattr(base, 'get_reservoir_spec',
+                            lambda name: _ReservoirSpecs())
+        writer = ReagentPreparationWriter(dilution_rows)
+        assert self._get_content(writer) == REAGENT_PREPARATION
+
+    def test_invalid_rows(self, transfer_rows):
+        writer = BiomekWorklistRowWriter(transfer_rows + ['A1'])
+        assert writer.get_result() is None
+        assert writer.has_errors()
@@ -25,11 +25,10 @@ from thelma.tools.metadata.worklist \
     import EXPERIMENT_WORKLIST_PARAMETERS
 from thelma.tools.metadata.worklist \
     import ExperimentWorklistGenerator
-from thelma.tools.worklists.biomek \
-    import SampleDilutionWorklistWriter
-from thelma.tools.worklists.biomek import BiomekWorklistWriter
+from thelma.tools.worklists.biomek import BiomekWorklistRowWriter
 from thelma.tools.worklists.series import SampleDilutionJob
 from thelma.tools.worklists.series import SerialWriterExecutorTool
+from thelma.tools.worklists.writers import WorklistRow
 from thelma.tools.writers import CsvColumnParameters
 from thelma.tools.writers import CsvWriter
 from thelma.tools.utils.base import VOLUME_CONVERSION_FACTOR
@@ -43,6 +42,7 @@ from thelma.entities.rack import Plate
 __docformat__ = 'reStructuredText en'
 
 __all__ = ['PRINT_SUPPORT_SCENARIOS',
+           'ExperimentDesignData',
            'ExperimentTool',
            'SourceRackVerifier',
            'ReagentPreparationWriter']
@@ -53,6 +53,45 @@ PRINT_SUPPORT_SCENARIOS = [EXPERIMENT_SCENARIOS.OPTIMISATION,
                            EXPERIMENT_SCENARIOS.LIBRARY]
 
 
+class ExperimentDesignData(object):
+    """
+    Stores experiment design data that is shared by all experiments of
+    a batch (worklist series, expected source plate layout and design
+    rack layouts). Each item is loaded or converted only once and then
+    reused by all :class:`ExperimentTool` instances the object is passed to.
+    """
+
+    def __init__(self, experiment_design):
+        """
+        Constructor.
+
+        :param experiment_design: The experiment design shared by the
+            experiments.
+        :type experiment_design:
+            :class:`thelma.entities.experiment.ExperimentDesign`
+        """
+        #: The experiment design shared by the experiments.
+        self.experiment_design = experiment_design
+        #: The worklist series of the experiment design.
+        self.design_series = experiment_design.worklist_series
+        #: The labels of all design racks.
+        self.design_rack_labels = []
+        #: The worklist series for the design racks mapped onto design
+        #: rack labels (design racks without worklist series are omitted).
+        self.design_rack_series_map = dict()
+        for design_rack in experiment_design.experiment_design_racks:
+            self.design_rack_labels.append(design_rack.label)
+            worklist_series = design_rack.worklist_series
+            if worklist_series is None: continue
+            self.design_rack_series_map[design_rack.label] = worklist_series
+        #: The expected source plate layout and the floating maps of the
+        #: ISOs (tuple, set by the first :class:`SourceRackVerifier`).
+        self.source_layout_data = None
+        #: The transfection layouts of the design racks mapped onto design
+        #: rack labels (set on first use).
+        self.design_rack_layouts = dict()
+
+
 class ExperimentTool(SerialWriterExecutorTool):
     """
     An abstract base class for tools dealing with experiment (fetching
@@ -88,18 +127,31 @@ class ExperimentTool(SerialWriterExecutorTool):
     #: The suffix for the file name of the reagent solution preparation file.
     #: The first part of the file name will be the experiment metadata label.
     FILE_SUFFIX_PREPARATION = '_reagent_instructions.csv'
+    #: Worklist rows are only serialised when the file map is built.
+    _SERIALIZE_WORKLISTS = False
 
-    def __init__(self, experiment, mode, user=None, parent=None, **kw):
+    def __init__(self, experiment, mode, user=None, design_data=None,
+                 parent=None, **kw):
         """
         Constructor.
 
         :param experiment: The experiment to process.
         :type experiment: :class:`thelma.entities.experiment.Experiment`
+        :param design_data: Experiment design data shared with other
+            experiments of the same design (optional).
+        :type design_data: :class:`ExperimentDesignData`
+        :default design_data: *None*
         """
         SerialWriterExecutorTool.__init__(self, mode,
                                           user=user, parent=parent, **kw)
         #: The experiment for which to generate the rack.
         self.experiment = experiment
+        #: Experiment design data shared with other experiments of the
+        #: same design (if *None* the data is loaded by the tool itself).
+        self.design_data = design_data
+        #: The experiment design data used for the current run
+        #: (:class:`ExperimentDesignData`).
+        self._design_data = None
         #: The experiment metadata type
         #: (:class:`thelma.entities.experiment.ExperimentMetadataType`).
         self._scenario = None
@@ -128,6 +180,9 @@ class ExperimentTool(SerialWriterExecutorTool):
         #: or worklist generation. The rack position are floating position
         #: for which there were no molecule design pools left anymore.
         self._ignored_floatings = None
+        #: The final worklist rows mapped onto file suffixes (print mode
+        #: only). They are serialised by :func:`_get_file_map`.
+        self._final_rows = None
         #: The final stream mapped onto file suffixes (print mode only).
         self._final_streams = None
 
@@ -136,6 +191,7 @@ class ExperimentTool(SerialWriterExecutorTool):
         Resets all attributes except for the initialisation values.
         """
         SerialWriterExecutorTool.reset(self)
+        self._design_data = None
         self._scenario = None
         self._design_series = None
         self._design_rack_series_map = dict()
@@ -146,6 +202,7 @@ class ExperimentTool(SerialWriterExecutorTool):
         self._source_layout = None
         self._ignored_positions = []
         self._ignored_floatings = set()
+        self._final_rows = dict()
         self._final_streams = dict()
 
     def _create_transfer_jobs(self):
@@ -166,6 +223,15 @@ class ExperimentTool(SerialWriterExecutorTool):
         """
         SerialWriterExecutorTool._check_input(self)
         self._check_input_class('experiment', self.experiment, Experiment)
+        if not self.has_errors() and not self.design_data is None and \
+                self._check_input_class('experiment design data',
+                                        self.design_data,
+                                        ExperimentDesignData):
+            if not self.design_data.experiment_design == \
+                                        self.experiment.experiment_design:
+                msg = 'The experiment design data belongs to a different ' \
+                      'experiment design!'
+                self.add_error(msg)
 
     def _check_experiment_type(self):
         """
@@ -206,16 +272,17 @@ class ExperimentTool(SerialWriterExecutorTool):
         """
         self.add_debug('Set transfer plans and experiment racks ...')
 
-        experiment_design = self.experiment.experiment_design
+        if self.design_data is None:
+            self._design_data = ExperimentDesignData(
+                                        self.experiment.experiment_design)
+        else:
+            self._design_data = self.design_data
         self._source_plate = self.experiment.source_rack
-        self._design_series = experiment_design.worklist_series
-
-        design_racks = self.experiment.experiment_design.experiment_design_racks
-        for design_rack in design_racks:
-            self._experiment_racks[design_rack.label] = []
-            worklist_series = design_rack.worklist_series
-            if worklist_series is None: continue
-            self._design_rack_series_map[design_rack.label] = worklist_series
+        self._design_series = self._design_data.design_series
+        for design_rack_label in self._design_data.design_rack_labels:
+            self._experiment_racks[design_rack_label] = []
+        self._design_rack_series_map.update(
+                                    self._design_data.design_rack_series_map)
 
         for experiment_rack in self.experiment.experiment_racks:
             design_rack_label = experiment_rack.design_rack.label
@@ -265,6 +332,7 @@ class ExperimentTool(SerialWriterExecutorTool):
 
         verifier = SourceRackVerifier(iso_request=iso_request,
                                       source_plate=self._source_plate,
+                                      design_data=self._design_data,
                                       parent=self)
         compatible = verifier.get_result()
         if compatible is None:
@@ -435,21 +503,20 @@ class ExperimentTool(SerialWriterExecutorTool):
 
     def _merge_streams(self, stream_map):
         """
-        Optimem and reagent streams extracted.
+        Optimem and reagent worklist rows are extracted.
         """
-        self._extract_mastermix_streams(stream_map)
+        self._extract_mastermix_rows()
         SerialWriterExecutorTool._merge_streams(self, stream_map)
 
-    def _extract_mastermix_streams(self, stream_map):
+    def _extract_mastermix_rows(self):
         """
-        Extracts the optimem and reagent stream from the stream map.
+        Extracts the optimem and reagent worklist rows from the
+        worklist row map.
         """
-        self._final_streams[self.FILE_SUFFIX_OPTIMEM] = \
-                                        stream_map[self.OPTIMEM_WORKLIST_INDEX]
-        self._final_streams[self.FILE_SUFFIX_REAGENT] = \
-                                        stream_map[self.REAGENT_WORKLIST_INDEX]
-        del stream_map[self.OPTIMEM_WORKLIST_INDEX]
-        del stream_map[self.REAGENT_WORKLIST_INDEX]
+        self._final_rows[self.FILE_SUFFIX_OPTIMEM] = \
+                    self._worklist_rows.pop(self.OPTIMEM_WORKLIST_INDEX)
+        self._final_rows[self.FILE_SUFFIX_REAGENT] = \
+                    self._worklist_rows.pop(self.REAGENT_WORKLIST_INDEX)
 
     # pylint: disable=W0613
     def _get_file_map(self, merged_stream_map, rack_transfer_stream):
@@ -460,6 +527,7 @@ class ExperimentTool(SerialWriterExecutorTool):
         """
         file_map = dict()
         self.__write_preparations_file()
+        self.__write_worklist_files()
 
         experiment_label = self.experiment.label
         for suffix, stream in self._final_streams.iteritems():
@@ -476,15 +544,28 @@ class ExperimentTool(SerialWriterExecutorTool):
         fn = '%s%s' % (self.experiment.label, suffix)
         file_map[fn] = stream
 
+    def __write_worklist_files(self):
+        """
+        Serialises the final worklist rows (this is the only place where
+        worklist files are written in printing mode).
+        """
+        for suffix, worklist_rows in self._final_rows.iteritems():
+            writer = BiomekWorklistRowWriter(worklist_rows, parent=self)
+            stream = writer.get_result()
+            if stream is None:
+                msg = 'Error when trying to write worklist file for ' \
+                      'suffix "%s".' % (suffix)
+                self.add_error(msg)
+                break
+            self._final_streams[suffix] = stream
+
     def __write_preparations_file(self):
         """
         Writes the stream for reagent solution preparation file.
         """
-        reagent_stream = self._final_streams[self.FILE_SUFFIX_REAGENT]
-        reagent_content = reagent_stream.read()
-        reagent_stream.seek(0)
+        reagent_rows = self._final_rows[self.FILE_SUFFIX_REAGENT]
         preparation_writer = ReagentPreparationWriter(
-                                    reagent_stream_content=reagent_content,
+                                    worklist_rows=reagent_rows,
                                     parent=self)
         prep_stream = preparation_writer.get_result()
         if prep_stream is None:
@@ -532,7 +613,8 @@ class SourceRackVerifier(BaseRackVerifier):
     _RACK_CLS = Plate
     _LAYOUT_CLS = TransfectionLayout
 
-    def __init__(self, source_plate, iso_request, parent=None):
+    def __init__(self, source_plate, iso_request, design_data=None,
+                 parent=None):
         """
         Constructor.
 
@@ -540,12 +622,18 @@ class SourceRackVerifier(BaseRackVerifier):
         :type iso_request: :class:`thelma.entities.iso.isoRequest`
         :param source_plate: The plate to be checked.
         :type source_plate: :class:`thelma.entities.rack.Plate`
+        :param design_data: If passed, the expected layout is taken from
+            (or stored in) the shared experiment design data.
+        :type design_data: :class:`ExperimentDesignData`
+        :default design_data: *None*
         """
         BaseRackVerifier.__init__(self, parent=parent)
         #: The ISO request the plate must represent.
         self.iso_request = iso_request
         #: The plate to be checked.
         self.source_plate = source_plate
+        #: Shared experiment design data (optional).
+        self.design_data = design_data
         #: Maps floating maps (molecule design pools for placeholders) onto ISO
         #: label - is only used when there are floating positions in the ISO
         #: layout.
@@ -571,6 +659,11 @@ class SourceRackVerifier(BaseRackVerifier):
         """
         self.add_debug('Get ISO layout ...')
 
+        if not self.design_data is None and \
+                        not self.design_data.source_layout_data is None:
+            self._expected_layout, self._iso_map = \
+                                        self.design_data.source_layout_data
+            return
         converter = TransfectionLayoutConverter(
                                 rack_layout=self.iso_request.rack_layout,
                                 parent=self)
@@ -582,6 +675,9 @@ class SourceRackVerifier(BaseRackVerifier):
             self._expected_layout.close()
             has_floatings = self._expected_layout.has_floatings()
             if has_floatings: self.__get_iso_map()
+        if not self.has_errors() and not self.design_data is None:
+            self.design_data.source_layout_data = (self._expected_layout,
+                                                   self._iso_map)
 
     def __get_iso_map(self):
         """
@@ -708,18 +804,18 @@ class ReagentPreparationWriter(CsvWriter):
     #: The index for the diluent volume column.
     DILUENT_VOL_INDEX = 6
 
-    def __init__(self, reagent_stream_content, parent=None):
+    def __init__(self, worklist_rows, parent=None):
         """
         Constructor.
 
-        :param str reagent_stream_content: The content of the reagent dilution
-            worklist stream.
+        :param list worklist_rows: The rows of the reagent dilution worklist
+            (:class:`thelma.tools.worklists.writers.WorklistRow`).
         """
         CsvWriter.__init__(self, parent=parent)
-        #: The content of the reagent dilution worklist stream.
-        self.reagent_stream_content = reagent_stream_content
-        #: The relevant data of the worklist (key: line index, values:
-        #: tuple (source pos, dilution volume, diluent info) .
+        #: The rows of the reagent dilution worklist.
+        self.worklist_rows = worklist_rows
+        #: The relevant data of the worklist (tuples (source pos label,
+        #: dilution volume, diluent info) in worklist order).
         self.__worklist_data = None
         #: The estimated dead volume in ul.
         self.__dead_volume = get_reservoir_spec(RESERVOIR_SPECS_NAMES.TUBE_24).\
@@ -738,7 +834,7 @@ class ReagentPreparationWriter(CsvWriter):
         Resets all values except for initialisation values.
         """
         CsvWriter.reset(self)
-        self.__worklist_data = dict()
+        self.__worklist_data = []
         self.__position_values = []
         self.__name_values = []
         self.__final_dil_factor_values = []
@@ -752,7 +848,7 @@ class ReagentPreparationWriter(CsvWriter):
         Creates the :attr:`_column_map_list`
         """
         self.__check_input()
-        if not self.has_errors(): self.__get_worklist_lines()
+        if not self.has_errors(): self.__get_worklist_data()
         if not self.has_errors(): self.__generate_column_values()
         if not self.has_errors(): self.__generate_columns()
 
@@ -761,43 +857,26 @@ class ReagentPreparationWriter(CsvWriter):
         Checks if the tools has obtained correct input values.
         """
         self.add_debug('Check input values ...')
-        self._check_input_class('reagent dilution worklist stream',
-                                self.reagent_stream_content, str)
+        self._check_input_list_classes('reagent dilution worklist row',
+                                       self.worklist_rows, WorklistRow)
 
-    def __get_worklist_lines(self):
+    def __get_worklist_data(self):
         """
-        Fetches the dilution layout from the rack layout of the plan.
+        Fetches source position, volume and diluent info from the
+        worklist rows.
         """
-        self.add_debug('Get worklist lines ...')
-
-        line_counter = 0
-        for wl_line in self.reagent_stream_content.split('\n'):
-            line_counter += 1
-            if line_counter == 1: continue # header
-            wl_line.strip()
-            if len(wl_line) < 1: continue
-            tokens = []
-            if ',' in wl_line: tokens = wl_line.split(',')
-            if ';' in wl_line: tokens = wl_line.split(';')
-
-            position = self.__extract_data_from_line_tokens(tokens,
-                        BiomekWorklistWriter.SOURCE_POS_INDEX)
-            volume = self.__extract_data_from_line_tokens(tokens,
-                        BiomekWorklistWriter.TRANSFER_VOLUME_INDEX)
-            volume = float(volume)
-            dil_info = self.__extract_data_from_line_tokens(tokens,
-                        SampleDilutionWorklistWriter.DILUENT_INFO_INDEX)
-            data_tuple = (position, volume, dil_info)
-            self.__worklist_data[line_counter] = data_tuple
+        self.add_debug('Get worklist data ...')
 
-    def __extract_data_from_line_tokens(self, tokens, data_index):
-        """
-        Extracts a certain information from a line token.
-        """
-        token = tokens[data_index]
-        if token.startswith('"'): token = token[1:]
-        if token.endswith('"'): token = token[:-1]
-        return token
+        for row in self.worklist_rows:
+            # Use the values as printed in the Biomek worklist (rounded
+            # volumes, empty diluent info for missing diluents).
+            volume = float(get_trimmed_string(row.volume))
+            if row.diluent_info is None:
+                dil_info = ''
+            else:
+                dil_info = str(row.diluent_info)
+            data_tuple = (row.source_position.label, volume, dil_info)
+            self.__worklist_data.append(data_tuple)
 
     def __generate_column_values(self):
         """
@@ -807,8 +886,7 @@ class ReagentPreparationWriter(CsvWriter):
 
         dil_data_map = self.__get_distinct_reagent_infos()
         used_dil_infos = set()
-        for line_number in sorted(self.__worklist_data.keys()):
-            data_tuple = self.__worklist_data[line_number]
+        for data_tuple in self.__worklist_data:
             dil_info = data_tuple[2]
             if dil_info in used_dil_infos: continue
             used_dil_infos.add(dil_info)
@@ -823,7 +901,7 @@ class ReagentPreparationWriter(CsvWriter):
         """
 
         dil_data_map = dict()
-        for data_tuple in self.__worklist_data.values():
+        for data_tuple in self.__worklist_data:
             dil_info = data_tuple[2]
             volume = data_tuple[1]
             if not dil_data_map.has_key(dil_info):
@@ -7,13 +7,15 @@ This module provides class to deal with experiment batch operations.
 AAB
 """
 from StringIO import StringIO
+import zipfile
+
 from thelma.tools.semiconstants import ITEM_STATUS_NAMES
 from thelma.tools.base import BaseTool
+from thelma.tools.experiment.base import ExperimentDesignData
 from thelma.tools.experiment.manual import ExperimentManualExecutor
 from thelma.tools.experiment.mastermix import get_experiment_executor
 from thelma.tools.experiment.mastermix import get_experiment_writer
-from thelma.tools.writers import create_zip_archive
-from thelma.tools.writers import read_zip_archive
+from thelma.tools.writers import add_zip_archive_entries
 from thelma.entities.experiment import Experiment
 from thelma.entities.user import User
 
@@ -45,10 +47,14 @@ class ExperimentBatchTool(BaseTool):
         self.experiments = experiments
         #: The experiment type of the experiment metadata.
         self._experiment_type = None
+        #: The experiment design data shared by all experiments
+        #: (:class:`ExperimentDesignData`).
+        self._design_data = None
 
     def reset(self):
         BaseTool.reset(self)
         self._experiment_type = None
+        self._design_data = None
 
     def run(self):
         """
@@ -96,6 +102,7 @@ class ExperimentBatchTool(BaseTool):
         if not self.has_errors():
             self._experiment_type = experiment_design.experiment_metadata.\
                                     experiment_metadata_type
+            self._design_data = ExperimentDesignData(experiment_design)
 
             if len(already_updated) > 0:
                 already_updated.sort()
@@ -143,7 +150,8 @@ class ExperimentBatchManualExecutor(ExperimentBatchTool):
         updated_experiments = []
         for experiment in self.experiments:
             executor = ExperimentManualExecutor(experiment, self.user,
-                                                parent=self)
+                                        design_data=self._design_data,
+                                        parent=self)
             updated_experiment = executor.get_result()
             if updated_experiment is None:
                 msg = 'Error when trying to update experiment "%s".' \
@@ -162,63 +170,62 @@ class ExperimentBatchWorklistWriter(ExperimentBatchTool):
     Writes robot worklists for all experiments that have not been updated
     so far.
 
+    The experiment writers share the experiment design data. Their files
+    are collected and written into one common archive (if several
+    experiments produce a file with the same name, the file of the last
+    experiment is kept).
+
     Return Value: zip stream
     """
     NAME = 'Experiment Batch Worklist Writer'
 
     def __init__(self, experiments, parent=None):
         ExperimentBatchTool.__init__(self, experiments, parent=parent)
-        #: Collects the zip streams for the experiments.
-        self.__zip_streams = None
+        #: The file streams of all experiments mapped onto file names.
+        self.__file_map = None
 
     def reset(self):
         ExperimentBatchTool.reset(self)
-        self.__zip_streams = []
+        self.__file_map = dict()
 
     def _execute_experiment_task(self):
         """
-        Runs worklist writers for all experiments and merges the files
-        into one zip file.
+        Runs worklist writers for all experiments and adds the files to
+        one zip file.
         """
         self.add_debug('Start batch worklist writing ...')
 
-        if not self.has_errors(): self.__write_streams()
+        self.__collect_files()
         if not self.has_errors():
-            self.return_value = self.__summarize_streams()
+            zip_stream = StringIO()
+            archive = zipfile.ZipFile(zip_stream, 'w', zipfile.ZIP_DEFLATED,
+                                      False)
+            try:
+                add_zip_archive_entries(archive, self.__file_map)
+            finally:
+                archive.close()
+            self.return_value = zip_stream
             self.add_info('Worklists writing completed.')
 
-    def __write_streams(self):
-        # Writes the zip streams for the :attr:`experiments`.
-        self.add_debug('Write streams ...')
+    def __collect_files(self):
+        # Collects the files for the :attr:`experiments`.
+        self.add_debug('Collect files ...')
         for experiment in self.experiments:
-            kw = dict(experiment=experiment, parent=self)
+            kw = dict(experiment=experiment, design_data=self._design_data,
+                      parent=self)
             writer = self._run_and_record_error(get_experiment_writer,
                     base_msg='Error when trying to fetch writer for ' \
                              'experiment "%s": ' % (experiment.label),
                     error_types=TypeError, **kw)
             if writer is None:
                 continue
-            zip_stream = writer.get_result()
-            if zip_stream is None:
+            file_map = writer.get_worklist_files()
+            if file_map is None:
                 msg = 'Error when trying to generate worklists for ' \
                       'experiment "%s".' % (experiment.label)
                 self.add_error(msg)
                 break
-            else:
-                self.__zip_streams.append(zip_stream)
-
-    def __summarize_streams(self):
-        # Reads the zip streams and generates a new common archive.
-        self.add_debug('Summarize zip archives ...')
-
-        zip_map = dict()
-        for zip_stream in self.__zip_streams:
-            file_map = read_zip_archive(zip_stream)
-            for fn, stream in file_map.iteritems(): zip_map[fn] = stream
-
-        final_stream = StringIO()
-        create_zip_archive(final_stream, zip_map)
-        return final_stream
+            self.__file_map.update(file_map)
 
 
 class ExperimentBatchExecutor(ExperimentBatchTool):
@@ -252,7 +259,8 @@ class ExperimentBatchExecutor(ExperimentBatchTool):
         updated_experiments = []
         if not self.has_errors():
             for experiment in self.experiments:
-                kw = dict(experiment=experiment, user=self.user, parent=self)
+                kw = dict(experiment=experiment, user=self.user,
+                          design_data=self._design_data, parent=self)
                 executor = self._run_and_record_error(get_experiment_executor,
                         base_msg='Error when trying to fetch executor for ' \
                         'experiment "%s": ' % (experiment.label),
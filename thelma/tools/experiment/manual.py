@@ -49,9 +49,10 @@ class ExperimentManualExecutor(ExperimentTool):
     FINAL_SAMPLE_VOLUME = TransfectionParameters.TRANSFER_VOLUME * \
                             TransfectionParameters.CELL_DILUTION_FACTOR
 
-    def __init__(self, experiment, user, parent=None):
+    def __init__(self, experiment, user, design_data=None, parent=None):
         ExperimentTool.__init__(self, experiment, ExperimentTool.MODE_EXECUTE,
-                                user=user, parent=parent)
+                                user=user, design_data=design_data,
+                                parent=parent)
         #: Maps molecules onto pools (or pool placeholders).
         self.__pool_molecule_map = None
         #: The final volume for the samples *in l*.
@@ -139,8 +140,12 @@ class ExperimentManualExecutor(ExperimentTool):
 
     def __fetch_design_rack_layout(self, design_rack):
         """
-        Fetches the transfection layouts for each design rack.
+        Fetches the transfection layouts for each design rack (converted
+        layouts are shared via the experiment design data).
         """
+        design_rack_layouts = self._design_data.design_rack_layouts
+        if design_rack_layouts.has_key(design_rack.label):
+            return design_rack_layouts[design_rack.label]
         converter = TransfectionLayoutConverter(design_rack.rack_layout,
                                                 is_iso_request_layout=False,
                                                 parent=self)
@@ -149,6 +154,8 @@ class ExperimentManualExecutor(ExperimentTool):
             msg = 'Could not get layout for design rack "%s"!' \
                   % (design_rack.label)
             self.add_error(msg)
+        else:
+            design_rack_layouts[design_rack.label] = tf_layout
         return tf_layout
 
     def __create_rack_samples(self, layout, design_rack):
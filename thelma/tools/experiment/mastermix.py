@@ -11,7 +11,6 @@ from thelma.tools.semiconstants import EXPERIMENT_SCENARIOS
 from thelma.tools.experiment.base import ExperimentTool
 from thelma.tools.worklists.series import RackSampleTransferJob
 from thelma.tools.worklists.series import SampleTransferJob
-from thelma.tools.writers import merge_csv_streams
 
 
 __all__ = ['ExperimentOptimisationWriterExecutor',
@@ -141,20 +140,14 @@ class ExperimentOptimisationWriterExecutor(ExperimentTool):
 
     def _merge_streams(self, stream_map):
         """
-        All transfer jobs are merged into one file. Optimem and reagent
-        stream are from the merged stream map, too.
+        The rows of all transfer jobs are merged into one file. Optimem and
+        reagent rows are extracted from the worklist row map, too.
         """
-        self._extract_mastermix_streams(stream_map)
-        transfer_streams = dict()
-        transfer_worklist = None
-        for job_index, stream in stream_map.iteritems():
-            transfer_streams[job_index] = stream
-            if transfer_worklist is None:
-                transfer_worklist = self._transfer_jobs[job_index].\
-                                    planned_worklist
-
-        transfer_stream = merge_csv_streams(transfer_streams)
-        self._final_streams[self.FILE_SUFFIX_TRANSFER] = transfer_stream
+        self._extract_mastermix_rows()
+        transfer_rows = []
+        for job_index in sorted(self._worklist_rows.keys()):
+            transfer_rows.extend(self._worklist_rows[job_index])
+        self._final_rows[self.FILE_SUFFIX_TRANSFER] = transfer_rows
         return dict()
 
 
@@ -10,6 +10,7 @@ from thelma.tools.iso.base import IsoRackContainer
 from thelma.tools.iso.base import _ISO_LABELS_BASE
 from thelma.tools.worklists.base import TRANSFER_ROLES
 from thelma.tools.writers import TxtWriter
+from thelma.tools.utils.base import CustomQuery
 from thelma.tools.utils.base import add_list_map_element
 from thelma.tools.utils.converters import TransferLayoutConverter
 from thelma.tools.utils.layouts import EMPTY_POSITION_TYPE
@@ -25,6 +26,8 @@ from thelma.tools.utils.layouts import TransferTarget
 from thelma.tools.utils.layouts import get_converted_number
 from thelma.tools.utils.layouts import get_trimmed_string
 from thelma.tools.utils.layouts import is_valid_number
+from thelma.entities.iso import ISO_PLATE_TYPES
+from thelma.entities.iso import ISO_STATUS
 from thelma.entities.iso import IsoSectorStockRack
 from thelma.entities.iso import LabIso
 from thelma.entities.iso import LabIsoRequest
@@ -52,7 +55,8 @@ __all__ = ['get_stock_takeout_volume',
            '_InstructionsWriter',
            '_LabIsoJobInstructionsWriter',
            '_LabIsoInstructionsWriter',
-           'create_instructions_writer']
+           'create_instructions_writer',
+           'CompletedIsoPlateQuery']
 
 
 def get_stock_takeout_volume(stock_concentration, final_volume, concentration):
@@ -1894,3 +1898,75 @@ def create_instructions_writer(entity, iso_request, rack_containers,
     kw = dict(entity=entity, iso_request=iso_request,
               rack_containers=rack_containers, parent=parent)
     return writer_cls(**kw)
+
+
+class CompletedIsoPlateQuery(CustomQuery):
+    """
+    Fetches the barcodes of the final plates of all completed ISOs of a lab
+    ISO request in one query. For library scenarios these are the library
+    plates. Otherwise these are the aliquot plates or, for ISOs without
+    aliquot plates, the preparation plates.
+    """
+    QUERY_TEMPLATE = \
+        'SELECT r.barcode AS rack_barcode ' \
+        'FROM iso i ' \
+        'INNER JOIN iso_plate ip ON ip.iso_id = i.iso_id ' \
+        'INNER JOIN rack r ON r.rack_id = ip.rack_id ' \
+        'WHERE i.iso_request_id = %i ' \
+        'AND i.status = \'%s\' ' \
+        'AND (ip.iso_plate_type = \'%s\' ' \
+             'OR (ip.iso_plate_type = \'%s\' ' \
+                 'AND NOT EXISTS (SELECT 1 FROM iso_plate ap ' \
+                                 'WHERE ap.iso_id = i.iso_id ' \
+                                 'AND ap.iso_plate_type = \'%s\'))) ' \
+        'ORDER BY r.barcode'
+
+    #: The query for library scenarios.
+    LIBRARY_QUERY_TEMPLATE = \
+        'SELECT r.barcode AS rack_barcode ' \
+        'FROM iso i ' \
+        'INNER JOIN lab_iso_library_plate lilp ON lilp.iso_id = i.iso_id ' \
+        'INNER JOIN library_plate lp ' \
+            'ON lp.library_plate_id = lilp.library_plate_id ' \
+        'INNER JOIN rack r ON r.rack_id = lp.rack_id ' \
+        'WHERE i.iso_request_id = %i ' \
+        'AND i.status = \'%s\' ' \
+        'ORDER BY r.barcode'
+
+    #: The query result column (required to parse the query results).
+    COLUMN_NAMES = ('rack_barcode',)
+    #: The index of the rack barcode within the query result.
+    RACK_BARCODE_INDEX = 0
+
+    def __init__(self, iso_request_id, is_library):
+        """
+        Constructor.
+
+        :param int iso_request_id: The ID of the lab ISO request.
+        :param bool is_library: Is this a library scenario?
+        """
+        CustomQuery.__init__(self)
+        #: The ID of the lab ISO request.
+        self.iso_request_id = iso_request_id
+        #: Is this a library scenario (library plates instead of ISO plates)?
+        self.is_library = is_library
+
+    def create_sql_statement(self):
+        params = self._get_params_for_sql_statement()
+        if self.is_library:
+            template = self.LIBRARY_QUERY_TEMPLATE
+        else:
+            template = self.QUERY_TEMPLATE
+        self.sql_statement = template % params
+
+    def _get_params_for_sql_statement(self):
+        if self.is_library:
+            params = (self.iso_request_id, ISO_STATUS.DONE)
+        else:
+            params = (self.iso_request_id, ISO_STATUS.DONE,
+                      ISO_PLATE_TYPES.ALIQUOT, ISO_PLATE_TYPES.PREPARATION,
+                      ISO_PLATE_TYPES.ALIQUOT)
+        return params
+
+    def _store_result(self, result_record):
+        self._results.append(result_record[self.RACK_BARCODE_INDEX])
@@ -41,12 +41,36 @@ from thelma.entities.status import ITEM_STATUSES
 
 __docformat__ = 'reStructuredText en'
 
-__all__ = ['_LabIsoWriterExecutorTool',
+__all__ = ['LabIsoProcessingData',
+           '_LabIsoWriterExecutorTool',
            'WriterExecutorIsoJob',
            'WriterExecutorLabIso',
            'LabIsoPlateVerifier']
 
 
+class LabIsoProcessingData(object):
+    """
+    Stores the converted layouts shared by the processing of several lab
+    ISOs and ISO jobs of the same ISO request (the final layouts of the ISOs
+    and the layouts of the preparation plates). Each layout is converted only
+    once and then reused by all :class:`_LabIsoWriterExecutorTool` instances
+    the object is passed to.
+
+    The layouts are derived from the rack layouts stored in the DB. Tools
+    receiving them must treat them as read-only (this includes the lists
+    held by their working positions).
+    """
+
+    def __init__(self):
+        """
+        Constructor.
+        """
+        #: The final layouts mapped onto ISOs.
+        self.final_layouts = dict()
+        #: The preparation plate layouts mapped onto plate labels.
+        self.preparation_layouts = dict()
+
+
 class _LabIsoWriterExecutorTool(StockTransferWriterExecutor):
     """
     A base class for tool dealing with the lab ISO Job and lab ISO processing
@@ -74,7 +98,7 @@ class _LabIsoWriterExecutorTool(StockTransferWriterExecutor):
     #: worklist label without ticket number.
     FILE_NAME_TRANSFER = '%s_%s.csv'
 
-    def __init__(self, entity, mode, user=None, **kw):
+    def __init__(self, entity, mode, user=None, processing_data=None, **kw):
         """
         Constructor:
 
@@ -89,10 +113,21 @@ class _LabIsoWriterExecutorTool(StockTransferWriterExecutor):
             execution mode).
         :type user: :class:`thelma.entities.user.User`
         :default user: *None*
+
+        :param processing_data: Converted layouts shared with the processing
+            of other ISOs and ISO jobs (optional).
+        :type processing_data: :class:`LabIsoProcessingData`
+        :default processing_data: *None*
         """
         StockTransferWriterExecutor.__init__(self, entity=entity, mode=mode,
                                              user=user, **kw)
+        #: Converted layouts shared with the processing of other ISOs and
+        #: ISO jobs (if *None* the layouts are converted by the tool itself).
+        self.processing_data = processing_data
 
+        #: The layout data used for the current run
+        #: (:class:`LabIsoProcessingData`).
+        self._processing_data = None
         #: The lab ISO requests the entity belongs to.
         self._iso_request = None
         #: The final layout for each ISO in this entity mapped onto ISOs.
@@ -129,6 +164,7 @@ class _LabIsoWriterExecutorTool(StockTransferWriterExecutor):
 
     def reset(self):
         StockTransferWriterExecutor.reset(self)
+        self._processing_data = None
         self._iso_request = None
         self.__final_layouts = dict()
         self._processing_order = None
@@ -164,8 +200,15 @@ class _LabIsoWriterExecutorTool(StockTransferWriterExecutor):
         Checks the initialisation values.
         """
         StockTransferWriterExecutor._check_input(self)
+        if not self.processing_data is None:
+            self._check_input_class('processing data', self.processing_data,
+                                    LabIsoProcessingData)
         if not self.has_errors():
             self._iso_request = self.entity.iso_request
+            if self.processing_data is None:
+                self._processing_data = LabIsoProcessingData()
+            else:
+                self._processing_data = self.processing_data
 
     def __fetch_final_layouts(self):
         """
@@ -173,16 +216,20 @@ class _LabIsoWriterExecutorTool(StockTransferWriterExecutor):
         """
         self.add_debug('Get final ISO layouts ...')
 
+        shared_layouts = self._processing_data.final_layouts
         isos = self._get_isos()
         for iso in isos:
-            converter = FinalLabIsoLayoutConverter(iso.rack_layout,
-                                                   parent=self)
-            layout = converter.get_result()
+            layout = shared_layouts.get(iso)
+            if layout is None:
+                converter = FinalLabIsoLayoutConverter(iso.rack_layout,
+                                                       parent=self)
+                layout = converter.get_result()
             if layout is None:
                 msg = 'Error when trying to convert final layout for ISO ' \
                       '"%s".' % (iso.label)
                 self.add_error(msg)
             else:
+                shared_layouts[iso] = layout
                 self.__final_layouts[iso] = layout
 
     def _get_isos(self):
@@ -263,18 +310,19 @@ class _LabIsoWriterExecutorTool(StockTransferWriterExecutor):
                 self.add_error(msg)
                 return None
             if not isinstance(iso_plate, (IsoAliquotPlate, LibraryPlate)):
-                converter = LabIsoPrepLayoutConverter(iso_plate.rack_layout,
-                                                      parent=self)
-                layout = converter.get_result()
+                layout = self.__get_preparation_layout(iso_plate)
                 if layout is None:
-                    msg = 'Error when trying to convert layout of plate "%s"!' \
-                          % (plate.label)
-                    self.add_error(msg)
                     return None
                 else:
                     self.__plate_layouts[plate.label] = layout
 
         elif verify:
+            if layout is None and \
+                    isinstance(iso_plate, (IsoPreparationPlate,
+                                           IsoJobPreparationPlate)):
+                layout = self.__get_preparation_layout(iso_plate)
+                if layout is None: return None
+                self.__plate_layouts[plate.label] = layout
             verifier = LabIsoPlateVerifier(iso_plate,
                                            self.ENTITY_CLS == IsoJob,
                                            lab_iso_layout=layout,
@@ -310,6 +358,26 @@ class _LabIsoWriterExecutorTool(StockTransferWriterExecutor):
         add_list_map_element(self.__rack_containers, rack_marker,
                              rack_container)
 
+    def __get_preparation_layout(self, iso_plate):
+        """
+        Returns the layout of the given preparation plate (converted only
+        once per :class:`LabIsoProcessingData` object).
+        """
+        plate = iso_plate.rack
+        shared_layouts = self._processing_data.preparation_layouts
+        layout = shared_layouts.get(plate.label)
+        if layout is None:
+            converter = LabIsoPrepLayoutConverter(iso_plate.rack_layout,
+                                                  parent=self)
+            layout = converter.get_result()
+            if layout is None:
+                msg = 'Error when trying to convert layout of plate "%s"!' \
+                      % (plate.label)
+                self.add_error(msg)
+            else:
+                shared_layouts[plate.label] = layout
+        return layout
+
     def _get_stock_racks(self):
         """
         Stock racks are stored in the :attr:`_stock_racks` map. Stock racks
@@ -942,7 +1010,9 @@ class LabIsoPlateVerifier(BaseRackVerifier):
                 # we prepare in preparation plate for an ISO and
                 # floatings are always part of the ISO processing
                 continue
-            all_tts = plate_pos.transfer_targets
+            # Copy the list: the layout may be shared with other tools (see
+            # :class:`LabIsoProcessingData`).
+            all_tts = list(plate_pos.transfer_targets)
             if not is_final_plate:
                 all_tts.extend(plate_pos.external_targets)
             if len(all_tts) < 1:
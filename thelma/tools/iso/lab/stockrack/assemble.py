@@ -18,6 +18,7 @@ from thelma.tools.iso.lab.base import LABELS
 from thelma.tools.iso.lab.base import create_instructions_writer
 from thelma.tools.stock.base import get_stock_rack_size
 from thelma.tools.stock.base import get_stock_rack_shape
+from thelma.tools.stock.tubepicking import TubeSnapshot
 from thelma.tools.writers import merge_csv_streams
 from thelma.tools.iso.lab.stockrack.base \
     import _StockRackAssignerIsoJob
@@ -125,6 +126,9 @@ class _StockRackAssembler(_StockRackAssigner):
         #: Stores the stock tube container items for each required pool
         #: sorted by stock rack (marker).
         self._tubes_by_rack = dict()
+        #: The :class:`TubeSnapshot` for the picked tubes (shared by the
+        #: optimizer and the writers).
+        self._tube_snapshot = None
 
         #: The stream for each generated file mapped onto file name.
         self.__stream_map = None
@@ -134,6 +138,7 @@ class _StockRackAssembler(_StockRackAssigner):
     def reset(self):
         _StockRackAssigner.reset(self)
         self._tubes_by_rack = dict()
+        self._tube_snapshot = None
         self.__stream_map = dict()
         self.__zip_stream = None
 
@@ -181,6 +186,7 @@ class _StockRackAssembler(_StockRackAssigner):
             msg = 'Error when trying to pick stock tubes.'
             self.add_error(msg)
         else:
+            self._tube_snapshot = picker.get_tube_snapshot()
             missing_pools = picker.get_missing_pools()
             if len(missing_pools) > 0:
                 self._react_on_missing_pools(missing_pools)
@@ -259,6 +265,7 @@ class _StockRackAssembler(_StockRackAssigner):
                                     stock_tube_containers=container_map,
                                     target_rack_shape=rack_shape,
                                     rack_marker_map=marker_map,
+                                    tube_snapshot=self._tube_snapshot,
                                     parent=self)
         stock_rack_layout = optimizer.get_result()
         if stock_rack_layout is None:
@@ -422,6 +429,7 @@ class _StockRackAssembler(_StockRackAssigner):
                       rack_barcode=barcode,
                       stock_rack_layout=self._stock_rack_layouts[rack_marker],
                       stock_tube_containers=container_map,
+                      tube_snapshot=self._tube_snapshot,
                       parent=self)
             msg = 'Error when trying to write XL20 worklist stream for ' \
                   'rack "%s"!' % (rack_marker)
@@ -450,6 +458,7 @@ class _StockRackAssembler(_StockRackAssigner):
                     stock_rack_layouts=self._stock_rack_layouts,
                     excluded_racks=self.excluded_racks,
                     requested_tubes=self.requested_tubes,
+                    tube_snapshot=self._tube_snapshot,
                     parent=self)
         summary_msg = 'Error when trying to write summary stream!'
         self.__generate_stream(summary_writer, self.FILE_NAME_XL20_SUMMARY,
@@ -807,7 +816,7 @@ class LabIsoXL20WorklistWriter(BaseXL20WorklistWriter):
     NAME = 'Lab ISO XL20 Worklist Writer'
 
     def __init__(self, rack_barcode, stock_rack_layout,
-                 stock_tube_containers, parent=None):
+                 stock_tube_containers, tube_snapshot=None, parent=None):
         """
         Constructor.
 
@@ -816,6 +825,10 @@ class LabIsoXL20WorklistWriter(BaseXL20WorklistWriter):
         :param stock_tube_containers: The stock tube container for each pool
             in the layout.
         :type stock_tube_containers: map
+        :param tube_snapshot: The source tube data (optional). If there is
+            no snapshot the data is taken from the tube candidates of the
+            containers.
+        :type tube_snapshot: :class:`TubeSnapshot`
         """
         BaseXL20WorklistWriter.__init__(self, parent=parent)
         #: The barcode of the target rack (= the stock rack).
@@ -824,10 +837,15 @@ class LabIsoXL20WorklistWriter(BaseXL20WorklistWriter):
         self.stock_rack_layout = stock_rack_layout
         #: The stock tube container for each pool in the layout.
         self.stock_tube_containers = stock_tube_containers
+        #: The source tube data (optional).
+        self.tube_snapshot = tube_snapshot
 
     def _check_input(self):
         self._check_input_class('destination rack barcode', self.rack_barcode,
                                 basestring)
+        if not self.tube_snapshot is None:
+            self._check_input_class('tube snapshot', self.tube_snapshot,
+                                    TubeSnapshot)
         self._check_input_class('stock rack layout', self.stock_rack_layout,
                                 StockRackLayout)
         self._check_input_map_classes(self.stock_tube_containers,
@@ -847,10 +865,14 @@ class LabIsoXL20WorklistWriter(BaseXL20WorklistWriter):
                 no_container.append(pool.id)
                 continue
             container = self.stock_tube_containers[pool]
-            tube_candidate = container.tube_candidate
-            self._source_position_values.append(tube_candidate.rack_position)
-            self._source_rack_values.append(tube_candidate.rack_barcode)
-            self._tube_barcode_values.append(tube_candidate.tube_barcode)
+            tube_data = container.tube_candidate
+            if not self.tube_snapshot is None:
+                record = self.tube_snapshot.get_record(tube_data.tube_barcode)
+                if not record is None:
+                    tube_data = record
+            self._source_position_values.append(tube_data.rack_position)
+            self._source_rack_values.append(tube_data.rack_barcode)
+            self._tube_barcode_values.append(tube_data.tube_barcode)
             self._dest_rack_values.append(self.rack_barcode)
             self._dest_position_values.append(sr_pos.rack_position)
 
@@ -907,7 +929,7 @@ class LabIsoXL20SummaryWriter(TxtWriter):
 
     def __init__(self, entity, stock_tube_containers,
                  stock_rack_layouts, excluded_racks, requested_tubes,
-                 parent=None):
+                 tube_snapshot=None, parent=None):
         """
         Constructor.
 
@@ -923,6 +945,10 @@ class LabIsoXL20SummaryWriter(TxtWriter):
         :param requested_tubes: A list of barcodes from stock tubes that are
             supposed to be used.
         :type requested_tubes: A list of rack barcodes.
+        :param tube_snapshot: The source tube data including the rack
+            locations (optional). If there is no snapshot the data is taken
+            from the stock tube containers.
+        :type tube_snapshot: :class:`TubeSnapshot`
         """
         TxtWriter.__init__(self, parent=parent)
         #: The ISO or the ISO job for which to generate the summary.
@@ -938,6 +964,8 @@ class LabIsoXL20SummaryWriter(TxtWriter):
         self.stock_tube_containers = stock_tube_containers
         #: Contains the target positions for each pool.
         self.stock_rack_layouts = stock_rack_layouts
+        #: The source tube data (optional).
+        self.tube_snapshot = tube_snapshot
 
     def _check_input(self):
         if not isinstance(self.entity, (LabIso, IsoJob)):
@@ -955,6 +983,9 @@ class LabIsoXL20SummaryWriter(TxtWriter):
                                        basestring, may_be_empty=True)
         self._check_input_list_classes('requested tube', self.requested_tubes,
                                        basestring, may_be_empty=True)
+        if not self.tube_snapshot is None:
+            self._check_input_class('tube snapshot', self.tube_snapshot,
+                                    TubeSnapshot)
 
     def _write_stream_content(self):
         """
@@ -1091,13 +1122,20 @@ class LabIsoXL20SummaryWriter(TxtWriter):
         self._write_headline(self.SOURCE_RACKS_HEADER)
 
         location_map = dict()
-        for container in self.stock_tube_containers.values():
-            tube_candidate = container.tube_candidate
-            rack_barcode = tube_candidate.rack_barcode
-            if location_map.has_key(rack_barcode): continue
-            location = container.location
-            if location is None: location = 'unknown location'
-            location_map[rack_barcode] = location
+        if not self.tube_snapshot is None:
+            for record in self.tube_snapshot:
+                if location_map.has_key(record.rack_barcode): continue
+                location = record.location
+                if location is None: location = 'unknown location'
+                location_map[record.rack_barcode] = location
+        else:
+            for container in self.stock_tube_containers.values():
+                tube_candidate = container.tube_candidate
+                rack_barcode = tube_candidate.rack_barcode
+                if location_map.has_key(rack_barcode): continue
+                location = container.location
+                if location is None: location = 'unknown location'
+                location_map[rack_barcode] = location
 
         lines = []
         for rack_barcode in sorted(location_map.keys()):
@@ -1133,7 +1171,7 @@ class LabIsoStockRackOptimizer(BiomekLayoutOptimizer):
     TRANSFER_ITEM_CLASS = LabIsoStockTransferItem
 
     def __init__(self, stock_tube_containers, target_rack_shape,
-                 rack_marker_map, parent=None):
+                 rack_marker_map, tube_snapshot=None, parent=None):
         """
         Constructor.
 
@@ -1145,6 +1183,10 @@ class LabIsoStockRackOptimizer(BiomekLayoutOptimizer):
             can occur in the :attr:`stock_tube_containers`.
         :param dict rack_marker_map: The rack marker for each plate label that
             can occur in the stock tube containers.
+        :param tube_snapshot: The data of the picked tubes (optional). If
+            it is passed, a pool without tube record counts as pool without
+            tube candidate.
+        :type tube_snapshot: :class:`TubeSnapshot`
         """
         BiomekLayoutOptimizer.__init__(self, parent=parent)
         #: The stock tube containers mapped onto pools.
@@ -1154,6 +1196,8 @@ class LabIsoStockRackOptimizer(BiomekLayoutOptimizer):
         #: The rack marker for each plate label that can occur in the
         #: :attr:`stock_tube_containers`.
         self.rack_marker_map = rack_marker_map
+        #: The data of the picked tubes (optional).
+        self.tube_snapshot = tube_snapshot
         #: Stores the transfer targets for each pool.
         self.__transfer_targets = None
 
@@ -1169,6 +1213,9 @@ class LabIsoStockRackOptimizer(BiomekLayoutOptimizer):
                                 RackShape)
         self._check_input_map_classes(self.rack_marker_map, 'rack marker map',
                     'plate label', basestring, 'rack marker', basestring)
+        if not self.tube_snapshot is None:
+            self._check_input_class('tube snapshot', self.tube_snapshot,
+                                    TubeSnapshot)
 
     def _find_hash_values(self):
         """
@@ -1183,7 +1230,7 @@ class LabIsoStockRackOptimizer(BiomekLayoutOptimizer):
         no_tube_candidate = []
 
         for pool, container in self.stock_tube_containers.iteritems():
-            if container.tube_candidate is None:
+            if self.__get_tube_barcode(container) is None:
                 no_tube_candidate.append(pool.id)
                 continue
             self._hash_values.add(pool.id)
@@ -1257,7 +1304,7 @@ class LabIsoStockRackOptimizer(BiomekLayoutOptimizer):
             if sr_map.has_key(rack_pos): return None
             sr_pos = StockRackPosition(rack_position=rack_pos,
                            molecule_design_pool=pool,
-                           tube_barcode=container.tube_candidate.tube_barcode,
+                           tube_barcode=self.__get_tube_barcode(container),
                            transfer_targets=tts)
             sr_map[rack_pos] = sr_pos
 
@@ -1270,9 +1317,23 @@ class LabIsoStockRackOptimizer(BiomekLayoutOptimizer):
         """
         pool = working_pos.molecule_design_pool
         tts = self.__transfer_targets[pool]
-        tube_barcode = self.stock_tube_containers[pool].tube_candidate.\
-                       tube_barcode
+        tube_barcode = self.__get_tube_barcode(self.stock_tube_containers[pool])
         sr_pos = StockRackPosition(rack_position=rack_pos, transfer_targets=tts,
                         molecule_design_pool=pool, tube_barcode=tube_barcode)
         self._source_layout.add_position(sr_pos)
         return sr_pos
+
+    def __get_tube_barcode(self, container):
+        """
+        Returns the barcode of the tube picked for the given container (or
+        *None* if there is no tube candidate or no snapshot record for it).
+        """
+        tube_candidate = container.tube_candidate
+        if tube_candidate is None:
+            tube_barcode = None
+        else:
+            tube_barcode = tube_candidate.tube_barcode
+            if not self.tube_snapshot is None \
+                        and not tube_barcode in self.tube_snapshot:
+                tube_barcode = None
+        return tube_barcode
@@ -6,22 +6,18 @@ Deals with the final tube picking for lab ISOs.
 
 AAB
 """
-from everest.entities.utils import get_root_aggregate
-from everest.querying.specifications import cntd
 from thelma.tools.semiconstants import ITEM_STATUS_NAMES
 from thelma.tools.base import SessionTool
 from thelma.tools.iso.lab.stockrack.base import StockTubeContainer
-from thelma.tools.stock.base import RackLocationQuery
 from thelma.tools.stock.base import STOCK_DEAD_VOLUME
 from thelma.tools.stock.tubepicking import SinglePoolQuery
-from thelma.tools.stock.tubepicking import TubeCandidate
+from thelma.tools.stock.tubepicking import TubeSnapshot
+from thelma.tools.stock.tubepicking import TubeSnapshotQuery
 from thelma.tools.utils.base import add_list_map_element
 from thelma.tools.utils.base import are_equal_values
 from thelma.tools.utils.base import get_trimmed_string
 from thelma.tools.utils.base import is_smaller_than
-from thelma.interfaces import ITube
 from thelma.entities.moleculedesign import MoleculeDesignPool
-from thelma.entities.sample import StockSample
 
 
 __docformat__ = 'reStructuredText en'
@@ -34,6 +30,11 @@ class LabIsoXL20TubePicker(SessionTool):
     Checks whether the stock tube scheduled by the :class:`LabIsoBuilder` are
     still valid and replaces them by other tubes, if necessary.
 
+    Tube data is fetched with :class:`TubeSnapshotQuery` statements instead
+    of through the tube aggregate. The data of all picked tubes (including
+    the rack locations) is made available as :class:`TubeSnapshot`
+    (see :func:`get_tube_snapshot`).
+
     **Return Value:** The updated :class:`StockTubeContainer` objects (with a
         tube candidate added).
     """
@@ -69,9 +70,6 @@ class LabIsoXL20TubePicker(SessionTool):
         #: A list of barcodes from stock tubes that are supposed to be used
         #: (for fixed positions).
         self.requested_tubes = requested_tubes
-        #: The tube aggregate is used to check tubes for specified tube
-        #: barcodes.
-        self.__tube_agg = None
         #: Maps molecule design pools onto pool IDs.
         self.__pool_map = None
         #: The molecule design pools of the requested tubes.
@@ -83,8 +81,10 @@ class LabIsoXL20TubePicker(SessionTool):
         #: Stores message infos for tubes that have been replaced because the
         #: original rack has been excluded mapped onto pool IDs.
         self.__excluded_tubes = None
-        #: The tubes (that have not been replaced) mapped onto tube barcodes.
-        self.__tube_map = None
+        #: The barcodes of the tubes found in the DB.
+        self.__found_tubes = None
+        #: The :class:`TubeSnapshot` for all picked tubes.
+        self.__tube_snapshot = None
         #: Contains pools for which no tube has been found.
         self.__missing_pools = None
         # Intermediate warning and error messages
@@ -95,13 +95,13 @@ class LabIsoXL20TubePicker(SessionTool):
 
     def reset(self):
         SessionTool.reset(self)
-        self.__tube_agg = get_root_aggregate(ITube)
         self.__pool_map = dict()
         self.__requested_tube_map = dict()
         self.__volume_map = dict()
         self.__replaced_tube_containers = []
         self.__excluded_tubes = dict()
-        self.__tube_map = dict()
+        self.__found_tubes = set()
+        self.__tube_snapshot = None
         self.__insuffient_volume_requested = dict()
         self.__insuffient_volume_scheduled = dict()
         self.__conc_mismatch_requested = []
@@ -122,7 +122,7 @@ class LabIsoXL20TubePicker(SessionTool):
             self.__find_new_tubes()
         if not self.has_errors():
             self.__record_messages()
-            self.__fetch_rack_locations()
+            self.__create_tube_snapshot()
         if not self.has_errors():
             self.add_info('Tube selection completed.')
             self.return_value = self.stock_tube_containers
@@ -133,6 +133,13 @@ class LabIsoXL20TubePicker(SessionTool):
         """
         return self._get_additional_value(self.__missing_pools)
 
+    def get_tube_snapshot(self):
+        """
+        Returns the :class:`TubeSnapshot` for all picked tubes (tube, rack,
+        position, volume, concentration and location data).
+        """
+        return self._get_additional_value(self.__tube_snapshot)
+
     def __check_input(self):
         """
         Checks the initialisation types.
@@ -377,65 +384,65 @@ class LabIsoXL20TubePicker(SessionTool):
                    % (tube_type, self._get_joined_str(details))
             self.add_warning(msg)
 
-    def __fetch_rack_locations(self):
+    def __create_tube_snapshot(self):
         """
-        Searches and adds the location for the selected candidates.
+        Fetches the data of all picked tubes (including the rack locations)
+        in a single query and adds the locations to the containers.
         """
-        self.add_debug('Fetch stock rack locations ...')
+        self.add_debug('Fetch stock tube data ...')
 
-        rack_barcodes = dict()
+        tube_barcodes = []
         for container in self.stock_tube_containers.values():
             if container.tube_candidate is None: continue
-            rack_barcode = container.tube_candidate.rack_barcode
-            add_list_map_element(rack_barcodes, rack_barcode, container)
+            tube_barcodes.append(container.tube_candidate.tube_barcode)
 
-        query = None
-        if len(rack_barcodes) > 0:
-            query = RackLocationQuery(rack_barcodes=rack_barcodes.keys())
+        if len(tube_barcodes) < 1:
+            self.__tube_snapshot = TubeSnapshot()
+        else:
+            query = TubeSnapshotQuery(tube_barcodes=tube_barcodes)
             self._run_query(query, base_error_msg='Error when trying to ' \
-                                                  'fetch rack locations: ')
-        if not self.has_errors() and not query is None:
-            results = query.get_query_results()
-            for rack_barcode, location in results.iteritems():
-                for container in rack_barcodes[rack_barcode]:
-                    container.location = location
+                                              'fetch stock tube data: ')
+            if not self.has_errors():
+                self.__tube_snapshot = query.get_query_results()
+        if not self.has_errors():
+            for container in self.stock_tube_containers.values():
+                if container.tube_candidate is None: continue
+                record = self.__tube_snapshot.get_record(
+                                        container.tube_candidate.tube_barcode)
+                if not record is None:
+                    container.location = record.location
 
     def __get_tube_candidates_for_tubes(self, tube_barcodes, tube_type):
         """
-        As far as possible we use the tube aggregate to fetch tubes from the
-        DB. The tubes for the barcodes are converted into :class:`TubeCandidate`
-        objects and mapped onto pools.
+        The data for the tube barcodes is fetched with a
+        :class:`TubeSnapshotQuery`. The records are converted into
+        :class:`TubeCandidate` objects and mapped onto pools.
         Valid tubes must contain stock samples and be managed.
         """
-        self.__tube_agg.filter = cntd(barcode=tube_barcodes)
-        iterator = self.__tube_agg.iterator()
         candidate_map = dict()
+        if len(tube_barcodes) < 1:
+            return candidate_map
+        query = TubeSnapshotQuery(tube_barcodes=tube_barcodes)
+        self._run_query(query, base_error_msg='Error when trying to fetch ' \
+                                              '%s tubes: ' % (tube_type))
+        if self.has_errors():
+            return candidate_map
         no_stock_sample = []
         not_managed = []
-        while True:
-            try:
-                tube = iterator.next()
-            except StopIteration:
-                break
-            else:
-                if not tube.item_status == ITEM_STATUS_NAMES.MANAGED.upper():
-                    not_managed.append(tube.barcode)
-                    continue
-                sample = tube.sample
-                if not isinstance(sample, StockSample):
-                    no_stock_sample.append(tube.barcode)
-                    continue
-                pool = sample.molecule_design_pool
-                tc = TubeCandidate(pool_id=pool.id,
-                                   rack_barcode=tube.location.rack.barcode,
-                                   rack_position=tube.location.position,
-                                   tube_barcode=tube.barcode,
-                                   concentration=sample.concentration,
-                                   volume=sample.volume)
-                # we could store the pool itself to (instead of its ID), but
-                # for some reason the pool entities are not recognised as equal
-                add_list_map_element(candidate_map, pool.id, tc)
-                self.__tube_map[tube.barcode] = tube
+        managed_status = ITEM_STATUS_NAMES.MANAGED.upper()
+        for record in query.get_query_results():
+            self.__found_tubes.add(record.tube_barcode)
+            if not record.item_status == managed_status:
+                not_managed.append(record.tube_barcode)
+                continue
+            if record.pool_id is None:
+                no_stock_sample.append(record.tube_barcode)
+                continue
+            tc = query.get_query_results().get_tube_candidate(
+                                                        record.tube_barcode)
+            # we could store the pool itself to (instead of its ID), but
+            # for some reason the pool entities are not recognised as equal
+            add_list_map_element(candidate_map, record.pool_id, tc)
 
         if len(no_stock_sample) > 0:
             msg = 'The following %s tubes do not contain stock ' \
@@ -451,7 +458,7 @@ class LabIsoXL20TubePicker(SessionTool):
 
         not_found = []
         for tube_barcode in tube_barcodes:
-            if not self.__tube_map.has_key(tube_barcode):
+            if not tube_barcode in self.__found_tubes:
                 not_found.append(tube_barcode)
         if len(not_found) > 0:
             msg = 'The following %s tubes have not been found in the DB: %s.' \
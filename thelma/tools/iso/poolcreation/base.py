@@ -36,6 +36,7 @@ __docformat__ = 'reStructuredText en'
 __all__ = ['LABELS',
            'DILUENT_INFO',
            'VolumeCalculator',
+           'PoolCreationVolumePlan',
            'StockSampleCreationParameters',
            'StockSampleCreationPosition',
            'StockSampleCreationLayout',
@@ -145,11 +146,83 @@ class LABELS(_ISO_LABELS_BASE):
 DILUENT_INFO = 'annealing buffer'
 
 
+class PoolCreationVolumePlan(object):
+    """
+    The volumes (*in ul*) determined by a :class:`VolumeCalculator` for one
+    combination of target volume, target concentration, number of designs
+    and single design stock concentration.
+
+    These parameters are the same for all pools (and hence all rack
+    positions) of a stock sample creation ISO request, so one plan serves
+    the planning tools and the worklist writers for all pools of the
+    request.
+
+    All attributes are immutable.
+    """
+    def __init__(self, stock_transfer_volume, buffer_volume, target_volume,
+                 adjusted_target_volume, number_designs):
+        self.__stock_transfer_volume = stock_transfer_volume
+        self.__buffer_volume = buffer_volume
+        self.__target_volume = target_volume
+        self.__adjusted_target_volume = adjusted_target_volume
+        self.__number_designs = number_designs
+
+    @property
+    def stock_transfer_volume(self):
+        """
+        The volume taken from each single design stock tube.
+        """
+        return self.__stock_transfer_volume
+
+    @property
+    def buffer_volume(self):
+        """
+        The buffer volume added to each pool stock tube (*None* if no buffer
+        is required).
+        """
+        return self.__buffer_volume
+
+    @property
+    def adjusted_target_volume(self):
+        """
+        The adjusted target volume (*None* if the requested target volume
+        did not need to be adjusted).
+        """
+        return self.__adjusted_target_volume
+
+    @property
+    def final_volume(self):
+        """
+        The final volume in each pool stock tube.
+        """
+        if self.__adjusted_target_volume is None:
+            result = self.__target_volume
+        else:
+            result = self.__adjusted_target_volume
+        return result
+
+    @property
+    def total_stock_transfer_volume(self):
+        """
+        The volume taken from the stock for one pool (all designs).
+        """
+        return self.__stock_transfer_volume * self.__number_designs
+
+    def __repr__(self):
+        str_format = '<%s stock transfer volume: %s, buffer volume: %s, ' \
+                     'final volume: %s>'
+        params = (self.__class__.__name__, self.__stock_transfer_volume,
+                  self.__buffer_volume, self.final_volume)
+        return str_format % params
+
+
 class VolumeCalculator(object):
     """
     Calculates the volume that has to be transferred from a single design
     stock tube to a future pool stock tube (for the given volume, concentration,
     and number of designs).
+
+    The results are also available as :class:`PoolCreationVolumePlan`.
     """
 
     def __init__(self, target_volume, target_concentration, number_designs,
@@ -210,6 +283,34 @@ class VolumeCalculator(object):
             stock_concentration=single_design_stock_concentration)
         return cls(**kw)
 
+    @classmethod
+    def get_volume_plan_for_iso_request(cls, iso_request):
+        """
+        Returns the :class:`PoolCreationVolumePlan` for the given
+        pool :class:`StockSampleIsoRequest`.
+
+        :raises ValueError: if the values of the ISO request are not
+            compatible (see :func:`calculate`)
+        """
+        return cls.from_iso_request(iso_request).get_volume_plan()
+
+    def get_volume_plan(self):
+        """
+        Runs the calculation and returns its results as
+        :class:`PoolCreationVolumePlan`.
+
+        :raises ValueError: if the values are not compatible (see
+            :func:`calculate`)
+        """
+        self.calculate()
+        return PoolCreationVolumePlan(
+                        stock_transfer_volume=self.__stock_transfer_vol,
+                        buffer_volume=self.__buffer_volume,
+                        target_volume=self.__target_volume,
+                        adjusted_target_volume=\
+                                    self.get_adjusted_target_volume(),
+                        number_designs=self.__number_designs)
+
     def calculate(self):
         """
         Determines the volumes for the annealing buffer and also the
@@ -411,17 +512,18 @@ class StockSampleCreationPosition(MoleculeDesignPoolPosition):
         """
         return self.molecule_design_pool
 
-    def get_parameter_tag(self, parameter):
+    def get_parameter_tag_key(self, parameter):
         """
         The method needs to be overwritten because the value for the molecule
         designs tag is a concatenated string. Position types are not important
         """
         if parameter == self.PARAMETER_SET.MOLECULE_DESIGNS:
-            return self.__get_molecule_designs_tag()
+            return self.__get_molecule_designs_tag_key()
         elif parameter == self.PARAMETER_SET.STOCK_TUBE_BARCODES:
-            return self.__get_stock_barcodes_tag()
+            return self.__get_stock_barcodes_tag_key()
         else:
-            return MoleculeDesignPoolPosition.get_parameter_tag(self, parameter)
+            return MoleculeDesignPoolPosition.get_parameter_tag_key(self,
+                                                                    parameter)
 
     @classmethod
     def __get_molecule_designs_tag_value(cls, molecule_designs):
@@ -437,14 +539,14 @@ class StockSampleCreationPosition(MoleculeDesignPoolPosition):
         """
         return self.__get_molecule_designs_tag_value(self.molecule_designs)
 
-    def __get_molecule_designs_tag(self):
+    def __get_molecule_designs_tag_key(self):
         """
         This parameter requires a special method because the value for the
         molecule designs tag is a concatenated string.
         """
-        return Tag(self.PARAMETER_SET.DOMAIN,
-                   self.PARAMETER_SET.MOLECULE_DESIGNS,
-                   self.get_molecule_designs_tag_value())
+        return (self.PARAMETER_SET.DOMAIN,
+                self.PARAMETER_SET.MOLECULE_DESIGNS,
+                Tag.normalize_value(self.get_molecule_designs_tag_value()))
 
     @classmethod
     def validate_molecule_designs(cls, pool, md_tag_value):
@@ -465,14 +567,14 @@ class StockSampleCreationPosition(MoleculeDesignPoolPosition):
         """
         return self.DELIMITER.join(self.stock_tube_barcodes)
 
-    def __get_stock_barcodes_tag(self):
+    def __get_stock_barcodes_tag_key(self):
         """
         This parameter requires a special method because the value for the
         stock barcodes tag is a concatenated string.
         """
-        return Tag(self.PARAMETER_SET.DOMAIN,
-                   self.PARAMETER_SET.STOCK_TUBE_BARCODES,
-                   self.get_stock_barcodes_tag_value())
+        return (self.PARAMETER_SET.DOMAIN,
+                self.PARAMETER_SET.STOCK_TUBE_BARCODES,
+                Tag.normalize_value(self.get_stock_barcodes_tag_value()))
 
     @classmethod
     def get_tube_barcodes_from_tag_value(cls, tube_barcode_tag_value):
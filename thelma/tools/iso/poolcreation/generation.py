@@ -318,10 +318,13 @@ class StockSampleCreationWorklistGenerator(BaseTool):
         # Creates a :class:`PlannedSampleDilution` for each rack position
         # in a 8x12 rack shape.
         self.add_debug('Create transfers ...')
-        self._run_and_record_error(self.volume_calculator.calculate,
+        volume_plan = self._run_and_record_error(
+                            self.volume_calculator.get_volume_plan,
                             'Error when trying to determine buffer volume: ',
                             ValueError)
-        buffer_volume = self.volume_calculator.get_buffer_volume()
+        if volume_plan is None:
+            return
+        buffer_volume = volume_plan.buffer_volume
         if buffer_volume is not None:
             volume = buffer_volume / VOLUME_CONVERSION_FACTOR
             wl_label = LABELS.create_buffer_worklist_label(
@@ -129,14 +129,12 @@ class StockSampleCreationIsoPopulator(IsoProvider):
         # Runs the optimizer which finds stock tube for the single molecule
         # designs. The optimizer returns a list of :class:`PoolCandidate`
         # objects (in order of the optimizing completion).
-        volume_calculator = \
-            VolumeCalculator.from_iso_request(self.iso_request)
-        self._run_and_record_error(volume_calculator.calculate,
-                   base_msg='Unable to determine stock transfer volume: ',
-                   error_types=ValueError)
+        volume_plan = self._run_and_record_error(
+                    VolumeCalculator.get_volume_plan_for_iso_request,
+                    base_msg='Unable to determine stock transfer volume: ',
+                    error_types=ValueError, iso_request=self.iso_request)
         if not self.has_errors():
-            take_out_volume = \
-                volume_calculator.get_single_design_stock_transfer_volume()
+            take_out_volume = volume_plan.stock_transfer_volume
             optimizer = StockSampleCreationTubePicker(
                     self._queued_pools,
                     self.__single_design_stock_concentration,
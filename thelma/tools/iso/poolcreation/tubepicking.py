@@ -6,17 +6,24 @@ Deals with tube picking optimisation for pool stock sample creations.
 
 AAB
 """
+from collections import OrderedDict
+from collections import deque
+
+from thelma.tools.stock.base import STOCK_DEAD_VOLUME
+from thelma.tools.stock.base import STOCK_ITEM_STATUS
 from thelma.tools.stock.tubepicking import OptimizingQuery
 from thelma.tools.stock.tubepicking import TubePicker
+from thelma.tools.utils.base import CONCENTRATION_CONVERSION_FACTOR
 from thelma.tools.utils.base import CustomQuery
+from thelma.tools.utils.base import VOLUME_CONVERSION_FACTOR
 from thelma.tools.utils.base import add_list_map_element
 from thelma.tools.utils.base import create_in_term_for_db_queries
-from collections import OrderedDict
 
 __docformat__ = 'reStructuredText en'
 
 __all__ = ['StockSampleCreationTubePicker',
            'PoolCandidate',
+           'PoolCandidateAssigner',
            'SingleDesignPoolQuery',
            'PoolGenerationOptimizationQuery']
 
@@ -43,61 +50,45 @@ class StockSampleCreationTubePicker(TubePicker):
                             excluded_racks=excluded_racks,
                             requested_tubes=requested_tubes,
                             parent=parent)
-        #: The pool candidates mapped onto pool IDs.
-        self.__pool_candidates = None
-        #: Maps multi-pool IDs onto molecule design IDs. ATTENTION: a multi
-        #: molecule design pool can point to several set pools! For this reason,
-        #: multi-pool IDs are stored in lists.
-        self.__md_map = None
+        #: Distributes the tube candidates over the pool candidates
+        #: (:class:`PoolCandidateAssigner`).
+        self.__assigner = None
         #: Maps molecule design IDs onto single molecule design pool IDs.
         self.__single_pool_map = None
-        #: If an siRNA is used in several pools this map will store the data
-        #: of which ISO candidate has been used for which one.
-        self.__multi_pool_tube_candidates = None
-        #: Set of IDs that have been picked.
-        self.__picked_pool_ids = None
 
     def reset(self):
         TubePicker.reset(self)
         self._picked_candidates = []
-        self.__pool_candidates = {}
-        self.__md_map = dict()
+        self.__assigner = None
         self.__single_pool_map = dict()
-        self.__multi_pool_tube_candidates = dict()
-        self.__picked_pool_ids = set()
 
     def _create_pool_map(self):
         """
         We do not look for stock samples for the new pools but for the single
         design pools they are composed of.
         """
-        self.__create_pool_candidates()
-        self.__get_single_pools()
-
-    def __create_pool_candidates(self):
-        # Initialises empty pool candidates (without stock sample data and
-        #candidates) for every pool to be generate.
         self.add_debug('Initialise library candidates ...')
-        for pool in self.molecule_design_pools:
-            pool_cand = PoolCandidate(pool)
-            self.__pool_candidates[pool.id] = pool_cand
-            for md_id in pool_cand.get_molecule_design_ids():
-                add_list_map_element(self.__md_map, md_id, pool.id)
+        self.__assigner = PoolCandidateAssigner(
+                            [PoolCandidate(pool)
+                             for pool in self.molecule_design_pools],
+                            self.requested_tubes)
+        self._picked_candidates = self.__assigner.completed_candidates
+        self.__get_single_pools()
 
     def __get_single_pools(self):
         # Determines the single pool (ID) for each requested molecule design.
         # Uses the :class:`SingleDesignPoolQuery`.
         self.add_debug('Get single molecule design pool ...')
-        query = \
-            SingleDesignPoolQuery(molecule_design_ids=self.__md_map.keys())
+        md_ids = self.__assigner.get_molecule_design_ids()
+        query = SingleDesignPoolQuery(molecule_design_ids=md_ids)
         self._run_query(query,
                         base_error_msg='Error when trying to query ' \
                                         'single molecule design pools: ')
         if not self.has_errors():
             self.__single_pool_map = query.get_query_results()
-            if not len(self.__single_pool_map) == len(self.__md_map):
+            if not len(self.__single_pool_map) == len(md_ids):
                 missing_ids = []
-                for md_id in self.__md_map.keys():
+                for md_id in md_ids:
                     if not self.__single_pool_map.has_key(md_id):
                         missing_ids.append(md_id)
                 msg = 'Could not find single molecule design pool for the ' \
@@ -107,33 +98,33 @@ class StockSampleCreationTubePicker(TubePicker):
             else:
                 self._pool_map = self.__single_pool_map
 
+    def _get_stock_samples(self):
+        """
+        The stock samples are selected within the optimizing query (see
+        :class:`PoolGenerationOptimizationQuery`).
+        """
+        pass
+
+    def _create_optimizing_query(self):
+        return PoolGenerationOptimizationQuery(
+                                    pool_ids=self._pool_map.keys(),
+                                    concentration=self.stock_concentration,
+                                    minimum_volume=self.take_out_volume)
+
+    def _run_optimizer(self):
+        TubePicker._run_optimizer(self)
+        if not self.has_errors():
+            # Candidates in excluded racks are not used and hence do not
+            # count as found.
+            found_pools = set([tube_candidate.pool_id for tube_candidate
+                               in self._unsorted_candidates
+                               if not tube_candidate.rack_barcode
+                                    in self.excluded_racks])
+            self._check_found_pools(found_pools)
+
     def _store_candidate_data(self, tube_candidate):
-        # Adds an ISO candidate to an library candidate and moves the
-        # library candidate once it is completed.
-        single_pool_id = tube_candidate.pool_id
-        md_id = self.__single_pool_map[single_pool_id]
-        pool_ids = self.__md_map[md_id]
-        if len(pool_ids) == 1:
-            pool_id = pool_ids[0]
-        else:
-            for ambi_pool_id in pool_ids:
-                pool_id = None
-                if not self.__multi_pool_tube_candidates.has_key(ambi_pool_id):
-                    self.__multi_pool_tube_candidates[ambi_pool_id] = \
-                                                            tube_candidate
-                    pool_id = ambi_pool_id
-                if pool_id is None:
-                    pool_id = pool_ids[0]
-        pool_cand = self.__pool_candidates[pool_id]
-        is_requested = tube_candidate.tube_barcode in self.requested_tubes
-        if not pool_cand.has_tube_candidate(md_id):
-            pool_cand.set_tube_candidate(md_id, tube_candidate)
-        elif is_requested:
-            pool_cand.replace_candidate(md_id, tube_candidate)
-        if pool_cand.is_completed() \
-           and not pool_cand.pool_id in self.__picked_pool_ids:
-            self.__picked_pool_ids.add(pool_cand.pool_id)
-            self._picked_candidates.append(pool_cand)
+        md_id = self.__single_pool_map[tube_candidate.pool_id]
+        self.__assigner.add_tube_candidate(md_id, tube_candidate)
 
     def _sort_candidates(self):
         """
@@ -168,6 +159,8 @@ class PoolCandidate(object):
             md_id = md.id
             self.__single_pools[md_id] = None
             self.__candidates[md_id] = None
+        #: The number of molecule designs still lacking a candidate.
+        self.__missing_count = len(self.__candidates)
 
     @property
     def pool(self):
@@ -218,8 +211,14 @@ class PoolCandidate(object):
             msg = 'The candidate for molecule design %i has already been set ' \
                   '(library pool %i).' % (md_id, self.__pool.id)
             raise AttributeError(msg)
-        if self.__candidates[md_id] is None:
-            self.__candidates[md_id] = candidate
+        self.__candidates[md_id] = candidate
+        self.__missing_count -= 1
+
+    def get_tube_candidate(self, md_id):
+        """
+        Returns the tube candidate for the given molecule design ID (or *None*).
+        """
+        return self.__candidates[md_id]
 
     def replace_candidate(self, md_id, candidate):
         """
@@ -233,12 +232,7 @@ class PoolCandidate(object):
         Checks whether there are ISO candidates for all molecule designs in
         the pool to create.
         """
-        result = True
-        for candidate in self.__candidates.values():
-            if candidate is None:
-                result = False
-                break
-        return result
+        return self.__missing_count == 0
 
     def get_tube_barcodes(self):
         """
@@ -277,6 +271,77 @@ class PoolCandidate(object):
             raise AttributeError(attr)
 
 
+class PoolCandidateAssigner(object):
+    """
+    Distributes tube candidates for single molecule design pools over
+    :class:`PoolCandidate` objects in a single keyed pass.
+
+    For each molecule design, there is a queue of the pool candidates that
+    still lack a candidate for it (in the order the pool candidates have
+    been passed). A tube candidate is handed to the first pool candidate in
+    the queue; pool candidates are collected in the order of completion.
+    Once all pool candidates have a candidate for a design, requested tubes
+    replace the first candidate that has not been requested itself.
+    """
+    def __init__(self, pool_candidates, requested_tubes):
+        """
+        Constructor.
+
+        :param list pool_candidates: The :class:`PoolCandidate` objects.
+        :param requested_tubes: Barcodes of the tubes that are supposed to
+            be used.
+        """
+        #: The pool candidates mapped onto pool IDs.
+        self.__pool_candidates = dict()
+        #: Maps multi-pool IDs onto molecule design IDs. ATTENTION: a multi
+        #: molecule design pool can point to several set pools! For this
+        #: reason, multi-pool IDs are stored in lists.
+        self.__md_map = OrderedDict()
+        for pool_cand in pool_candidates:
+            self.__pool_candidates[pool_cand.pool_id] = pool_cand
+            for md_id in pool_cand.get_molecule_design_ids():
+                add_list_map_element(self.__md_map, md_id, pool_cand.pool_id)
+        #: Maps queues of the IDs of the pools that still lack a candidate
+        #: for a molecule design onto molecule design IDs.
+        self.__open_pool_map = dict([(md_id, deque(pool_ids))
+                                     for (md_id, pool_ids)
+                                     in self.__md_map.iteritems()])
+        self.__requested_tubes = requested_tubes
+        #: The completed pool candidates in the order of completion.
+        self.completed_candidates = []
+
+    def get_molecule_design_ids(self):
+        """
+        Returns the IDs of all molecule designs of the pool candidates.
+        """
+        return self.__md_map.keys()
+
+    def add_tube_candidate(self, md_id, tube_candidate):
+        """
+        Hands the given tube candidate for the given molecule design to the
+        next pool candidate still lacking a candidate for it.
+        """
+        open_pool_ids = self.__open_pool_map[md_id]
+        if len(open_pool_ids) > 0:
+            pool_cand = self.__pool_candidates[open_pool_ids.popleft()]
+            pool_cand.set_tube_candidate(md_id, tube_candidate)
+            if pool_cand.is_completed():
+                self.completed_candidates.append(pool_cand)
+        elif tube_candidate.tube_barcode in self.__requested_tubes:
+            for pool_id in self.__md_map[md_id]:
+                pool_cand = self.__pool_candidates[pool_id]
+                current = pool_cand.get_tube_candidate(md_id)
+                if not current.tube_barcode in self.__requested_tubes:
+                    pool_cand.replace_candidate(md_id, tube_candidate)
+                    break
+
+    def __repr__(self):
+        str_format = '<%s pools: %i, completed: %i>'
+        params = (self.__class__.__name__, len(self.__pool_candidates),
+                  len(self.completed_candidates))
+        return str_format % params
+
+
 class SingleDesignPoolQuery(CustomQuery):
     """
     This query is used to find single molecule design pools for all molecule
@@ -325,47 +390,82 @@ class SingleDesignPoolQuery(CustomQuery):
 
 
 class PoolGenerationOptimizationQuery(OptimizingQuery):
-    pass
-
-#    """
-#    This :class:`TubePickingQuery` aims find tubes for the single molecule
-#    design pools required to generate the pools. At this, it tries to
-#    minimise the number of racks that have to be used in the stock.
-#
-#    Unlike as in the normal :class:`OptimizingQuery` we do not care for
-#    sample volumes.
-#
-#    The results are converted into :class:`TubeCandidates` and stored in
-#    a list.
-#    """
-#
-#    QUERY_TEMPLATE = '''
-#    SELECT DISTINCT stock_sample.molecule_design_set_id AS pool_id,
-#           rack_tube_counts.rack_barcode AS rack_barcode,
-#           rack_position.row AS row_index,
-#           rack_position.col AS column_index,
-#           rack_tube_counts.desired_count AS total_candidates,
-#           stock_sample.concentration AS concentration
-#    FROM stock_sample, sample, tube, tube_location, rack_position
-#         (SELECT xr.rack_id, xr.barcode AS rack_barcode,
-#                   COUNT(xc.container_id) AS desired_count
-#          FROM rack xr, tube_location xtl, container xc, sample xs,
-#               stock_sample xss
-#          WHERE xr.rack_id = xtl.rack_id
-#          AND xc.container_id = xtl.container_id
-#          AND xc.container_id = xs.container_id
-#          AND xs.sample_id = xss.sample_id
-#          AND xs.sample_id IN %s
-#          GROUP BY xr.rack_id, xr.barcode
-#          HAVING COUNT(xc.container_id) > 0 ) AS rack_tube_counts
-#    WHERE tube_location.rack_id = rack_tube_counts.rack_id
-#    AND rack_position.rack_position_id = tube_location.rack_position_id
-#    AND tube.container_id = tube_location.container_id
-#    AND tube.container_id = sample.container_id
-#    AND sample.sample_id = stock_sample.sample_id
-#    AND sample.sample_id IN %s
-#    ORDER BY rack_tube_counts.desired_count desc,
-#        rack_tube_counts.rack_barcode'''
-#
-#    COLUMN_NAMES = ['pool_id', 'rack_barcode', 'row_index', 'column_index',
-#                    'tube_barcode', 'total_candidates', 'concentration']
+    """
+    This :class:`OptimizingQuery` selects the suitable stock samples for the
+    single molecule design pools required to generate the pools and ranks
+    their tubes in one statement. The samples are determined once (in a
+    common table expression) instead of being passed back and forth as ID
+    list.
+
+    The results are converted into :class:`TubeCandidates` and stored in
+    a list.
+    """
+    QUERY_TEMPLATE = '''
+    WITH stock_candidate AS (
+        SELECT ss.molecule_design_set_id AS pool_id,
+               ss.concentration AS concentration,
+               s.volume AS volume,
+               s.container_id AS container_id
+        FROM stock_sample ss
+        INNER JOIN sample s ON s.sample_id = ss.sample_id
+        INNER JOIN container c ON c.container_id = s.container_id
+        WHERE ss.molecule_design_set_id IN %s
+        AND ss.concentration = %s
+        AND s.volume >= %s
+        AND c.item_status = '%s')
+    SELECT DISTINCT sc.pool_id AS pool_id,
+           rack_tube_counts.rack_barcode AS rack_barcode,
+           rp.row_index AS row_index,
+           rp.column_index AS column_index,
+           t.barcode AS tube_barcode,
+           rack_tube_counts.desired_count AS total_candidates,
+           sc.concentration AS concentration,
+           sc.volume AS volume
+    FROM stock_candidate sc
+    INNER JOIN tube t ON t.container_id = sc.container_id
+    INNER JOIN tube_location tl ON tl.container_id = sc.container_id
+    INNER JOIN rack_position rp ON rp.rack_position_id = tl.rack_position_id
+    INNER JOIN (SELECT xtl.rack_id, xr.barcode AS rack_barcode,
+                       COUNT(DISTINCT xsc.pool_id) AS desired_count
+                FROM stock_candidate xsc
+                INNER JOIN tube_location xtl
+                    ON xtl.container_id = xsc.container_id
+                INNER JOIN rack xr ON xr.rack_id = xtl.rack_id
+                GROUP BY xtl.rack_id, xr.barcode) AS rack_tube_counts
+        ON rack_tube_counts.rack_id = tl.rack_id
+    ORDER BY rack_tube_counts.desired_count desc,
+        rack_tube_counts.rack_barcode;
+    '''
+
+    def __init__(self, pool_ids, concentration, minimum_volume=None):
+        """
+        Constructor:
+
+        :param pool_ids: The single molecule design pool IDs for which to
+            find tubes.
+        :type pool_ids: collection of :class:`int`
+
+        :param concentration: The concentration of the stock sample *in nM*.
+        :type concentration: positive number, unit nM
+
+        :param minimum_volume: The minimum volume the tube must have *in ul* -
+            the dead volume of the stock is added to it automatically.
+        :type minimum_volume: positive number, unit ul
+        """
+        OptimizingQuery.__init__(self, sample_ids=None)
+        #: The single molecule design pool IDs for which to find tubes.
+        self.pool_ids = pool_ids
+        #: The concentration of the stock sample *in nM*.
+        self.concentration = concentration
+        #: The minimum volume the tube must have *in ul* - the dead volume of
+        #: the stock is added to it automatically.
+        self.minimum_volume = minimum_volume
+        if minimum_volume is None:
+            self.minimum_volume = 0
+
+    def _get_params_for_sql_statement(self):
+        pool_str = create_in_term_for_db_queries(self.pool_ids)
+        conc = self.concentration / CONCENTRATION_CONVERSION_FACTOR
+        vol = (self.minimum_volume + STOCK_DEAD_VOLUME) \
+              / VOLUME_CONVERSION_FACTOR
+        return (pool_str, conc, vol, STOCK_ITEM_STATUS)
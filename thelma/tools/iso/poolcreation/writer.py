@@ -266,13 +266,12 @@ class StockSampleCreationIsoWorklistWriter(BaseTool):
                         break
                 if not self.has_errors() and not volume is None:
                     self.__buffer_volume = volume * VOLUME_CONVERSION_FACTOR
-        volume_calculator = \
-            VolumeCalculator.from_iso_request(self.iso.iso_request)
-        self._run_and_record_error(volume_calculator.calculate,
-                       base_msg='Unable to determine stock transfer volume: ',
-                       error_types=ValueError)
-        self.__stock_take_out_volume = \
-            volume_calculator.get_single_design_stock_transfer_volume()
+        volume_plan = self._run_and_record_error(
+                    VolumeCalculator.get_volume_plan_for_iso_request,
+                    base_msg='Unable to determine stock transfer volume: ',
+                    error_types=ValueError, iso_request=self.iso.iso_request)
+        if not volume_plan is None:
+            self.__stock_take_out_volume = volume_plan.stock_transfer_volume
 
     def __get_tube_racks(self):
         # Fetches the tube racks for the rack barcodes.
@@ -4,6 +4,9 @@ See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
 
 :Date: May 2011
 """
+from collections import deque
+from heapq import merge
+from itertools import count
 import logging
 
 from pyramid.compat import native_
@@ -19,10 +22,26 @@ class MessageRecorder(object):
     Abstract base class for all message recording classes.
 
     The message recorder passes on all messages to the logging framework. In
-    addition, it keeps a stack of all messages recorded during its lifetime.
+    addition, it keeps a stack of all warnings and errors recorded during its
+    lifetime and a bounded buffer with the most recent low-severity (info
+    and debug) messages.
+
+    Messages may be passed with lazy arguments ('%' style, like for the
+    logging framework) or as callables returning the message; they are only
+    formatted if the message is actually recorded or logged. Low-severity
+    messages below the :attr:`LOW_SEVERITY_RECORDING_LEVEL` are dropped right
+    away unless the logger is enabled for their level.
     """
     #: A name passed by the object used to group the recorded messages.
     NAME = None
+    #: Messages with a level below this level are stored in the bounded
+    #: low-severity buffer instead of the message stack.
+    LOW_SEVERITY_THRESHOLD = logging.WARNING
+    #: The maximum number of low-severity messages kept.
+    LOW_SEVERITY_BUFFER_SIZE = 1000
+    #: Low-severity messages below this level are only processed if the
+    #: logger is enabled for them.
+    LOW_SEVERITY_RECORDING_LEVEL = logging.INFO
 
     def __init__(self, parent=None):
         """
@@ -42,10 +61,19 @@ class MessageRecorder(object):
         #: If this is set to *True* :meth:`has_errors` will return `True`
         #: in the next call.
         self.abort_execution = False
-        #: The message stack of this recorder. This will only contain
-        #: messages if this is a root recorder (i.e., :param:`parent` is
-        #: `None`).
+        #: The message stack of this recorder (warnings and errors). This will
+        #: only contain messages if this is a root recorder (i.e.,
+        #: :param:`parent` is `None`).
         self._message_stack = []
+        #: The most recent low-severity messages (root recorder only).
+        self._low_severity_messages = \
+                            deque(maxlen=self.LOW_SEVERITY_BUFFER_SIZE)
+        #: The number of messages passed for each logging level (root
+        #: recorder only).
+        self._message_counts = dict()
+        #: Provides sequence numbers to restore the order of messages from
+        #: the stack and the low-severity buffer (root recorder only).
+        self._message_counter = count()
         #
         if parent is None:
             # This is a root recorder - create a logger for it.
@@ -79,10 +107,25 @@ class MessageRecorder(object):
     def get_messages(self, logging_level=logging.WARNING):
         """
         Returns all messages having the given severity level or more.
+
+        Low-severity messages are only available as long as they are in the
+        bounded low-severity buffer.
+        """
+        root = self._root_recorder
+        # pylint:disable=W0212
+        if logging_level >= self.LOW_SEVERITY_THRESHOLD:
+            evts = root._message_stack
+        else:
+            evts = merge(root._message_stack, root._low_severity_messages)
+        # pylint:enable=W0212
+        return [msg for (_, log_lvl, msg) in evts if log_lvl >= logging_level]
+
+    def get_message_count(self, logging_level):
+        """
+        Returns the number of messages passed with the given logging level
+        (including messages that have not been recorded).
         """
-        return [msg
-                for (log_lvl, msg) in self._root_recorder._message_stack # pylint:disable=W0212
-                if log_lvl >= logging_level]
+        return self._root_recorder._message_counts.get(logging_level, 0) # pylint:disable=W0212
 
     def has_errors(self):
         """
@@ -120,58 +163,84 @@ class MessageRecorder(object):
         self._error_count = 0
         self.abort_execution = False
         self._message_stack = []
+        self._low_severity_messages = \
+                            deque(maxlen=self.LOW_SEVERITY_BUFFER_SIZE)
+        self._message_counts = dict()
 
-    def add_critical_error(self, message):
+    def add_critical_error(self, message, *args):
         """
         Records a critical error.
 
-        :param str message: Message to record.
+        :param str message: Message to record (or a callable returning it).
+        :param args: Lazy arguments for the message.
         """
-        self.__record_message(logging.CRITICAL, message)
+        self.__record_message(logging.CRITICAL, message, args)
 
-    def add_error(self, message):
+    def add_error(self, message, *args):
         """
         Records an error.
 
-        :param str message: Message to record.
+        :param str message: Message to record (or a callable returning it).
+        :param args: Lazy arguments for the message.
         """
-        self.__record_message(logging.ERROR, message)
+        self.__record_message(logging.ERROR, message, args)
 
-    def add_warning(self, message):
+    def add_warning(self, message, *args):
         """
         Records a warning.
 
-        :param str message: Message to record.
+        :param str message: Message to record (or a callable returning it).
+        :param args: Lazy arguments for the message.
         """
-        self.__record_message(logging.WARNING, message)
+        self.__record_message(logging.WARNING, message, args)
 
-    def add_info(self, message):
+    def add_info(self, message, *args):
         """
         Records an info message.
 
-        :param str message: Message to record.
+        :param str message: Message to record (or a callable returning it).
+        :param args: Lazy arguments for the message.
         """
-        self.__record_message(logging.INFO, message)
+        self.__record_message(logging.INFO, message, args)
 
-    def add_debug(self, message):
+    def add_debug(self, message, *args):
         """
         Records a debug message.
 
-        :param str message: Message to record.
+        :param str message: Message to record (or a callable returning it).
+        :param args: Lazy arguments for the message.
         """
-        self.__record_message(logging.DEBUG, message)
+        self.__record_message(logging.DEBUG, message, args)
 
-    def __record_message(self, logging_level, message):
+    def __record_message(self, logging_level, message, args):
+        root = self._root_recorder
+        # pylint:disable=W0212
+        counts = root._message_counts
+        counts[logging_level] = counts.get(logging_level, 0) + 1
         do_record = True
-        if logging_level >= logging.ERROR:
-            do_record = not self._disable_err_warn_rec
-            if do_record:
-                self._error_count += 1
-            self.abort_execution = True
+        if logging_level < self.LOW_SEVERITY_THRESHOLD:
+            do_log = root._logger.isEnabledFor(logging_level)
+            if not do_log \
+                    and logging_level < self.LOW_SEVERITY_RECORDING_LEVEL:
+                return
+        else:
+            do_log = True
+            if logging_level >= logging.ERROR:
+                do_record = not self._disable_err_warn_rec
+                if do_record:
+                    self._error_count += 1
+                self.abort_execution = True
         if do_record:
+            if callable(message):
+                message = message()
+            if args:
+                message = message % args
             msg = "%s - %s" % (self.__name, native_(message))
-            evt = (logging_level, msg)
-             # pylint:disable=W0212
-            self._root_recorder._message_stack.append(evt)
-            self._root_recorder._logger.log(*evt)
-            # pylint:enable=W0212
+            evt = (next(root._message_counter), logging_level, msg)
+            if logging_level < self.LOW_SEVERITY_THRESHOLD:
+                root._low_severity_messages.append(evt)
+            else:
+                root._message_stack.append(evt)
+            if do_log:
+                root._logger.log(logging_level, msg)
+        # pylint:enable=W0212
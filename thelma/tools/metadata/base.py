@@ -12,6 +12,7 @@ from thelma.tools.semiconstants import get_min_transfer_volume
 from thelma.tools.semiconstants import get_positions_for_shape
 from thelma.tools.semiconstants import get_reservoir_specs_standard_96
 from thelma.tools.worklists.base import get_dynamic_dead_volume
+from thelma.tools.utils.base import CustomQuery
 from thelma.tools.utils.base import VOLUME_CONVERSION_FACTOR
 from thelma.tools.utils.base import add_list_map_element
 from thelma.tools.utils.base import get_converted_number
@@ -38,7 +39,8 @@ __all__ = ['TransfectionParameters',
            'TransfectionLayout',
            'TransfectionLayoutConverter',
            'TransfectionSectorAssociator',
-           'TransfectionAssociationData']
+           'TransfectionAssociationData',
+           'ExperimentMetadataTagQuery']
 
 
 class TransfectionParameters(IsoRequestParameters):
@@ -1195,3 +1197,40 @@ class TransfectionAssociationData(IsoRequestAssociationData):
         else:
             self._remove_none_sectors(self.__iso_concentrations)
 
+
+
+class ExperimentMetadataTagQuery(CustomQuery):
+    """
+    Fetches the IDs of all tags used in the design rack layouts of an
+    experiment metadata in one query.
+    """
+    QUERY_TEMPLATE = \
+        'SELECT DISTINCT tg.tag_id AS tag_id ' \
+        'FROM experiment_design ed ' \
+        'INNER JOIN experiment_design_rack edr ' \
+            'ON edr.experiment_design_id = ed.experiment_design_id ' \
+        'INNER JOIN tagged_rack_position_set trps ' \
+            'ON trps.rack_layout_id = edr.rack_layout_id ' \
+        'INNER JOIN tagging tg ON tg.tagged_id = trps.tagged_id ' \
+        'WHERE ed.experiment_metadata_id = %i'
+
+    #: The query result column (required to parse the query results).
+    COLUMN_NAMES = ('tag_id',)
+    #: The index of the tag ID within the query result.
+    TAG_ID_INDEX = 0
+
+    def __init__(self, experiment_metadata_id):
+        """
+        Constructor.
+
+        :param int experiment_metadata_id: The ID of the experiment metadata.
+        """
+        CustomQuery.__init__(self)
+        #: The ID of the experiment metadata.
+        self.experiment_metadata_id = experiment_metadata_id
+
+    def _get_params_for_sql_statement(self):
+        return (self.experiment_metadata_id)
+
+    def _store_result(self, result_record):
+        self._results.append(result_record[self.TAG_ID_INDEX])
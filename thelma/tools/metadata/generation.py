@@ -34,6 +34,8 @@ from thelma.tools.metadata.base import TransfectionLayoutConverter
 from thelma.tools.metadata.base import TransfectionParameters
 from thelma.tools.metadata.transfectionlayoutfinder \
     import TransfectionLayoutFinder
+from thelma.tools.metadata.worklist \
+    import EXPERIMENT_WORKLIST_PARAMETERS
 from thelma.tools.metadata.worklist \
     import ExperimentWorklistGenerator
 from thelma.tools.stock.base import get_default_stock_concentration
@@ -157,6 +159,11 @@ class ExperimentMetadataGenerator(BaseTool):
         #: must not be changed anymore.
         self.__has_experiment_jobs = None
 
+        #: The existing design racks whose layout and worklists are not
+        #: changed by the upload mapped onto their labels (these entities are
+        #: kept in place).
+        self.__unchanged_design_racks = None
+
         #: States whether it is possible to use the BioMek for the mastermix
         #: preparation.
         self.supports_mastermix = None
@@ -174,6 +181,7 @@ class ExperimentMetadataGenerator(BaseTool):
         self._design_rack_associations = None
         self.__has_isos = None
         self.__has_experiment_jobs = None
+        self.__unchanged_design_racks = dict()
         self.supports_mastermix = None
         self._iso_plate_specs = None
 
@@ -248,11 +256,15 @@ class ExperimentMetadataGenerator(BaseTool):
                 self._set_iso_plate_specs()
 
             if not self.has_errors(): self._check_iso_concentrations()
+            if self.HAS_EXPERIMENT_DESIGN and not self.has_errors():
+                self.__find_unchanged_design_racks()
             if self.SUPPORTED_EXPERIMENT_TYPE \
                         in EXPERIMENT_SCENARIOS.EXPERIMENT_MASTERMIX_TYPES and \
                         not self.has_errors():
                 self.__generate_worklists()
             if not self.has_errors(): self._determine_plate_number()
+        elif self.HAS_EXPERIMENT_DESIGN and not self.has_errors():
+            self.__find_unchanged_design_racks()
 
         if not self.has_errors(): self.__check_blocked_entities()
 
@@ -529,6 +541,69 @@ class ExperimentMetadataGenerator(BaseTool):
             self.add_warning(msg)
         self._iso_plate_specs = rs
 
+    def __find_unchanged_design_racks(self):
+        # Finds the existing design racks that would be regenerated
+        # unchanged by this upload: the design rack layout and the ISO
+        # layout are the same and the existing worklists (if any) carry the
+        # current labels. These design racks (incl. their worklist series)
+        # are kept in place.
+        existing_design = self.experiment_metadata.experiment_design
+        if existing_design is None or \
+                        len(existing_design.experiment_design_racks) < 1:
+            return
+        if not self.__has_unchanged_iso_layout():
+            return
+        self.add_debug('Look for unchanged design racks ...')
+        rack_worklists_expected = self.SUPPORTED_EXPERIMENT_TYPE \
+                    in EXPERIMENT_SCENARIOS.EXPERIMENT_MASTERMIX_TYPES and \
+                    EXPERIMENT_WORKLIST_PARAMETERS.STORAGE_LOCATIONS.get(
+                        self.SUPPORTED_EXPERIMENT_TYPE) == \
+                    EXPERIMENT_WORKLIST_PARAMETERS.EXPERIMENT_DESIGN_RACK
+        existing_racks = dict([(design_rack.label, design_rack)
+                               for design_rack
+                               in existing_design.experiment_design_racks])
+        for design_rack in self._experiment_design.experiment_design_racks:
+            existing_rack = existing_racks.get(design_rack.label)
+            if existing_rack is None:
+                continue
+            worklist_series = existing_rack.worklist_series
+            if worklist_series is None:
+                if rack_worklists_expected:
+                    continue
+            else:
+                label_prefix = '%s-%s' % (self.experiment_metadata.label,
+                                          design_rack.label)
+                if not rack_worklists_expected or \
+                        [wl for wl in worklist_series.get_sorted_worklists()
+                         if not wl.label.startswith(label_prefix)]:
+                    continue
+            if existing_rack.rack_layout.content_digest == \
+                            design_rack.rack_layout.content_digest:
+                self.__unchanged_design_racks[design_rack.label] = \
+                                                            existing_rack
+        if len(self.__unchanged_design_racks) > 0:
+            self.add_info(lambda: '%i of %i design racks are unchanged and '
+                          'are kept (%s).'
+                          % (len(self.__unchanged_design_racks),
+                             len(self._experiment_design.\
+                                 experiment_design_racks),
+                             ', '.join(sorted(self.__unchanged_design_racks))))
+
+    def __has_unchanged_iso_layout(self):
+        # Checks whether the ISO layout of the existing ISO request is equal
+        # to the parsed one.
+        existing_iso_request = self.experiment_metadata.lab_iso_request
+        if self._iso_request is None or existing_iso_request is None:
+            return self._iso_request is None and existing_iso_request is None
+        converter = TransfectionLayoutConverter(
+                                        existing_iso_request.rack_layout,
+                                        parent=self)
+        # The existing layout might be outdated; we simply do not reuse
+        # anything in this case.
+        converter.disable_error_and_warning_recording()
+        layout = converter.get_result()
+        return not layout is None and layout == self._source_layout
+
     def __generate_worklists(self):
         # Generates the worklists for the mastermix and cell plate preparation
         # and attaches them to the experiment design or the design racks.
@@ -541,6 +616,8 @@ class ExperimentMetadataGenerator(BaseTool):
                                         self.supports_mastermix,
                                         design_rack_associations=
                                             self._design_rack_associations,
+                                        unchanged_design_rack_labels=
+                                            set(self.__unchanged_design_racks),
                                         parent=self)
         self._experiment_design = generator.get_result()
         if self._experiment_design is None:
@@ -678,6 +755,10 @@ class ExperimentMetadataGenerator(BaseTool):
     def __update_metadata(self):
         # Generates the metadata entity.
         self.add_debug('Update metadata entity ...')
+        existing_design = self.experiment_metadata.experiment_design
+        if not existing_design is None and \
+                                not self._experiment_design is None:
+            self.__merge_experiment_design(existing_design)
         self.experiment_metadata.experiment_design = self._experiment_design
         if not self._iso_request is None:
             new_iso_rack_layout = \
@@ -699,11 +780,39 @@ class ExperimentMetadataGenerator(BaseTool):
                 # in the layout and changing the design pool set.
                 existing_ir = self.experiment_metadata.lab_iso_request
                 existing_ir.label = self._iso_request.label
-                existing_ir.rack_layout = new_iso_rack_layout
+                if not existing_ir.rack_layout.content_digest == \
+                                        new_iso_rack_layout.content_digest:
+                    existing_ir.rack_layout = new_iso_rack_layout
                 existing_ir.expected_number_isos = \
                             self._iso_request.expected_number_isos
                 existing_ir.molecule_design_pool_set = self._pool_set
 
+    def __merge_experiment_design(self, existing_design):
+        # Transfers the new design racks and worklists into the existing
+        # experiment design. Unchanged design racks and worklist series
+        # are kept (the entities are not replaced).
+        design_racks = []
+        for design_rack in self._experiment_design.experiment_design_racks:
+            existing_rack = self.__unchanged_design_racks.get(
+                                                        design_rack.label)
+            if existing_rack is None:
+                design_racks.append(design_rack)
+            else:
+                design_racks.append(existing_rack)
+        existing_design.experiment_design_racks = design_racks
+        existing_design.rack_shape = self._experiment_design.rack_shape
+        old_series = existing_design.worklist_series
+        new_series = self._experiment_design.worklist_series
+        if old_series is None or new_series is None or \
+                    not old_series.content_digest == new_series.content_digest:
+            existing_design.worklist_series = new_series
+        if len(self.__unchanged_design_racks) > 0:
+            self.add_info('Kept %i unchanged design racks (%i racks '
+                          'replaced).', len(self.__unchanged_design_racks),
+                          len(design_racks) \
+                          - len(self.__unchanged_design_racks))
+        self._experiment_design = existing_design
+
 
 class ExperimentMetadataGeneratorOpti(ExperimentMetadataGenerator):
     """
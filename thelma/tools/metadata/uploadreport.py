@@ -149,7 +149,7 @@ class ExperimentMetadataAssignmentWriter(CsvWriter):
 
     def __store_design_rack_value(self, label):
         # Stores the values for a particular design rack.
-        self.add_debug('Store values for design rack %s ...' % (label))
+        self.add_debug('Store values for design rack %s ...', label)
         tf_layout = self.association_layouts[label]
         concentrations = self.final_concentrations[label]
         missing_final_concentration = []
@@ -7,6 +7,7 @@ translation of ISO plates into experiment plates.
 
 October 2011, AAB
 """
+import time
 
 from thelma.tools.semiconstants import EXPERIMENT_SCENARIOS
 from thelma.tools.semiconstants import PIPETTING_SPECS_NAMES
@@ -24,6 +25,7 @@ from thelma.entities.experiment import ExperimentMetadataType
 from thelma.entities.liquidtransfer import PlannedRackSampleTransfer
 from thelma.entities.liquidtransfer import PlannedSampleDilution
 from thelma.entities.liquidtransfer import PlannedSampleTransfer
+from thelma.entities.liquidtransfer import PlannedWorklist
 from thelma.entities.liquidtransfer import WorklistSeries
 from thelma.entities.liquidtransfer import WorklistSeriesMember
 
@@ -118,7 +120,7 @@ class ExperimentWorklistGenerator(BaseTool):
 
     def __init__(self, experiment_design, label, source_layout, scenario,
                  supports_mastermix, design_rack_associations=None,
-                 parent=None):
+                 unchanged_design_rack_labels=None, parent=None):
         """
         Constructor.
 
@@ -136,6 +138,10 @@ class ExperimentWorklistGenerator(BaseTool):
             create worklists for OptiMem and reagent dilution.
         :param design_rack_associations: Maps design rack labels to well
             association maps (created by the :class:`WellAssociator`).
+        :param unchanged_design_rack_labels: The labels of the design racks
+            whose existing worklist series are kept by the caller (no
+            worklists are generated for these racks).
+        :type unchanged_design_rack_labels: :class:`set`
         """
         BaseTool.__init__(self, parent=parent)
         #: The experiment design for which to generate the worklist series.
@@ -151,6 +157,11 @@ class ExperimentWorklistGenerator(BaseTool):
         self.supports_mastermix = supports_mastermix
         #: Maps well association maps onto design rack labels.
         self.design_rack_associations = design_rack_associations
+        #: The labels of the design racks whose existing worklist series
+        #: are kept.
+        if unchanged_design_rack_labels is None:
+            unchanged_design_rack_labels = set()
+        self.unchanged_design_rack_labels = unchanged_design_rack_labels
         #: The worklist series for the experiment design (if applicable).
         self.__design_series = None
         #: The worklist series for each experiment design rack.
@@ -284,23 +295,97 @@ class ExperimentWorklistGenerator(BaseTool):
     def __generate_cell_plate_worklist_for_racks(self, transfer_index,
                                                  cell_index):
         # Generates the cell plate worklists for the experiment design racks
-        # as storage locations.
+        # as storage locations. The worklists are only generated once for
+        # all design racks with the same completed layout; the other design
+        # racks get worklists with their own labels sharing the planned
+        # liquid transfers (a planned worklist can only be member of one
+        # worklist series).
         self.add_debug('Create cell plate worklists for design racks ...')
+        # Maps the generated worklists and their generation time onto
+        # layout keys.
+        generated_worklists = {}
+        reused_count = 0
+        reused_transfer_count = 0
+        saved_time = 0
+        content_digests = set()
         for design_rack in self.experiment_design.experiment_design_racks:
+            if design_rack.label in self.unchanged_design_rack_labels:
+                continue
             worklist_series = WorklistSeries()
             completed_layout = self.design_rack_associations[design_rack.label]
             label = '%s-%s' % (self.label, design_rack.label)
-            transfer_generator = \
+            layout_key = self.__get_layout_key(completed_layout)
+            if not layout_key in generated_worklists:
+                start_time = time.time()
+                transfer_generator = \
                     _BiomekTransferWorklistGenerator(label, completed_layout,
                                                      parent=self)
-            self.__generate_transfer_worklist(transfer_generator,
-                                              transfer_index, worklist_series)
-            cell_generator = _CellSuspensionWorklistGenerator(label,
-                                                              completed_layout,
-                                                              parent=self)
-            self.__generate_cell_worklist(cell_generator, cell_index,
-                                          worklist_series)
+                transfer_worklist = self.__generate_transfer_worklist(
+                            transfer_generator, transfer_index,
+                            worklist_series)
+                cell_generator = \
+                    _CellSuspensionWorklistGenerator(label, completed_layout,
+                                                     parent=self)
+                cell_worklist = self.__generate_cell_worklist(cell_generator,
+                                            cell_index, worklist_series)
+                if self.has_errors():
+                    break
+                generated_worklists[layout_key] = \
+                    (transfer_worklist, cell_worklist,
+                     time.time() - start_time)
+                content_digests.add(transfer_worklist.content_digest)
+                content_digests.add(cell_worklist.content_digest)
+            else:
+                transfer_worklist, cell_worklist, generation_time = \
+                                            generated_worklists[layout_key]
+                for worklist, generator_cls, worklist_index in \
+                        ((transfer_worklist, _BiomekTransferWorklistGenerator,
+                          transfer_index),
+                         (cell_worklist, _CellSuspensionWorklistGenerator,
+                          cell_index)):
+                    self.__copy_worklist(worklist, '%s%s'
+                                         % (label,
+                                            generator_cls.WORKLIST_SUFFIX),
+                                         worklist_index, worklist_series)
+                    reused_transfer_count += \
+                                    len(worklist.planned_liquid_transfers)
+                reused_count += 1
+                saved_time += generation_time
             design_rack.worklist_series = worklist_series
+        if reused_count > 0:
+            self.add_info('The worklists of %i design rack(s) have been '
+                          'copied from design racks with the same layout '
+                          '(%i distinct worklist contents, %i planned '
+                          'liquid transfers and about %.2f s of worklist '
+                          'generation saved).',
+                          reused_count, len(content_digests),
+                          reused_transfer_count, saved_time)
+
+    def __get_layout_key(self, completed_layout):
+        # The key comprises everything the design rack worklist generators
+        # read from a completed layout (the source and target positions of
+        # the non-empty positions).
+        positions = []
+        for rack_pos, tf_pos in completed_layout.iterpositions():
+            if tf_pos.is_empty:
+                continue
+            positions.append((rack_pos.label,
+                              tuple(sorted([pos.label for pos
+                                            in tf_pos.cell_plate_positions]))))
+        return frozenset(positions)
+
+    def __copy_worklist(self, worklist, label, worklist_index,
+                        worklist_series):
+        # Creates a new worklist with the given label and the content of the
+        # given worklist.
+        copied_worklist = PlannedWorklist(label, worklist.transfer_type,
+                                worklist.pipetting_specs,
+                                planned_liquid_transfers=
+                                    list(worklist.planned_liquid_transfers))
+        # FIXME: Using instantiation for side effect.
+        WorklistSeriesMember(planned_worklist=copied_worklist,
+                             worklist_series=worklist_series,
+                             index=worklist_index)
 
     def __generate_transfer_worklist(self, generator, worklist_index,
                                      worklist_series):
@@ -315,6 +400,7 @@ class ExperimentWorklistGenerator(BaseTool):
             WorklistSeriesMember(planned_worklist=worklist,
                                  worklist_series=worklist_series,
                                  index=worklist_index)
+        return worklist
 
     def __generate_cell_worklist(self, generator, worklist_index,
                                  worklist_series):
@@ -328,6 +414,7 @@ class ExperimentWorklistGenerator(BaseTool):
             WorklistSeriesMember(planned_worklist=worklist,
                                  worklist_series=worklist_series,
                                  index=worklist_index)
+        return worklist
 
 
 class _OptimemWorklistGenerator(PlannedWorklistGenerator):
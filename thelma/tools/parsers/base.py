@@ -5,6 +5,7 @@ See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
 
 """
 from StringIO import StringIO
+from bisect import bisect_right
 
 from pyramid.compat import ascii_native_
 from pyramid.compat import string_types
@@ -26,6 +27,7 @@ __all__ = ['BaseParser',
            'RackPositionParsingContainer',
            'TxtFileParser',
            'ExcelFileParser',
+           'ExcelSheetGrid',
            'ExcelParsingContainer',
            'ExcelSheetParsingContainer',
            'LayoutParsingContainer',
@@ -238,6 +240,13 @@ class ExcelFileParser(BaseParser): # still abstract pylint: disable=W0223
         BaseParser.__init__(self, stream, parent=parent)
         #: The sheet that is parsed at the moment.
         self.sheet = None
+        #: The grid snapshots (:class:`ExcelSheetGrid`) of the sheets
+        #: accessed so far mapped onto the sheets.
+        self.__sheet_grids = {}
+
+    def reset(self):
+        BaseParser.reset(self)
+        self.__sheet_grids = {}
 
     def open_workbook(self):
         """
@@ -324,46 +333,40 @@ class ExcelFileParser(BaseParser): # still abstract pylint: disable=W0223
         """
         return sheet.ncols
 
+    def get_sheet_grid(self, sheet):
+        """
+        Returns the grid snapshot of the given sheet. The snapshot is created
+        when the sheet is accessed for the first time.
+
+        :rtype: :class:`ExcelSheetGrid`
+        """
+        grid = self.__sheet_grids.get(sheet)
+        if grid is None:
+            grid = ExcelSheetGrid(sheet)
+            self.__sheet_grids[sheet] = grid
+        return grid
+
     def get_cell_value(self, sheet, row_index, column_index):
         """
         Returns the value of the specified in the given sheet.
         Converts the passed cell value either into
         a ascii string (if basestring) or a number (if non_string).
         """
-        cell_value = sheet.cell_value(row_index, column_index)
-        cell_name = '%s%i' % (label_from_number(column_index + 1),
-                              row_index + 1)
-        sheet_name = self.get_sheet_name(sheet)
-        conv_value = None
-        if isinstance(cell_value, string_types):
-            try:
-                conv_value = ascii_native_(cell_value)
-            except UnicodeEncodeError:
-                msg = 'Unknown character in cell %s (sheet "%s"). Remove ' \
-                      'or replace the character, please.' \
-                      % (cell_name, sheet_name)
-                self.add_error(msg)
-            else:
-                if conv_value == '':
-                    conv_value = None
-                else:
-                    # Try to convert to an int or float.
-                    try:
-                        conv_value = int(conv_value)
-                    except ValueError:
-                        try:
-                            conv_value = float(conv_value)
-                        except ValueError:
-                            pass
-        elif isinstance(cell_value, (float, int)):
-            if is_valid_number(value=cell_value, is_integer=True):
-                conv_value = int(cell_value)
-            else:
-                conv_value = cell_value
-        else:
+        grid = self.get_sheet_grid(sheet)
+        conv_value = grid.rows[row_index][column_index]
+        if conv_value is ExcelSheetGrid.UNKNOWN_CHARACTER:
+            msg = 'Unknown character in cell %s (sheet "%s"). Remove ' \
+                  'or replace the character, please.' \
+                  % (self.get_cell_name(row_index, column_index),
+                     grid.sheet_name)
+            self.add_error(msg)
+            conv_value = None
+        elif conv_value is ExcelSheetGrid.UNKNOWN_CONTENT:
             msg = 'There is some unknown content in cell %s (sheet %s).' \
-                  % (cell_name, sheet_name)
+                  % (self.get_cell_name(row_index, column_index),
+                     grid.sheet_name)
             self.add_error(msg)
+            conv_value = None
         return conv_value
 
     @staticmethod
@@ -395,6 +398,85 @@ class ExcelFileParser(BaseParser): # still abstract pylint: disable=W0223
         return msg
 
 
+class ExcelSheetGrid(object):
+    """
+    Snapshot of the converted cell values of an Excel sheet.
+
+    All cells are read and converted in one pass: strings are converted into
+    ASCII strings (empty strings into *None*) and, if possible, into numbers;
+    integral numbers are converted into integers. Cells that can not be
+    converted hold one of the markers :attr:`UNKNOWN_CHARACTER` and
+    :attr:`UNKNOWN_CONTENT` (the parser records the error when the cell is
+    accessed).
+
+    The grid also indexes the anchors of layout blocks (an "A" cell with a
+    1 in the cell to the upper right).
+    """
+    #: Marks a string cell containing non-ASCII characters.
+    UNKNOWN_CHARACTER = object()
+    #: Marks a cell that is neither a string nor a number.
+    UNKNOWN_CONTENT = object()
+
+    def __init__(self, sheet):
+        #: The name of the sheet.
+        self.sheet_name = sheet.name
+        #: The number of rows.
+        self.row_number = sheet.nrows
+        #: The number of columns.
+        self.column_number = sheet.ncols
+        #: The converted cell values (list of rows).
+        self.rows = [[self.__convert(cell_value)
+                      for cell_value in sheet.row_values(row_index)]
+                     for row_index in range(self.row_number)]
+        #: The sorted column indices of the layout anchors mapped onto row
+        #: indices.
+        self.__layout_anchor_map = self.__find_layout_anchors()
+
+    def get_layout_anchor_columns(self, row_index):
+        """
+        Returns the sorted column indices of the layout anchors (the cells
+        holding the first row label of a layout block) in the given row.
+        """
+        return self.__layout_anchor_map.get(row_index, [])
+
+    def __convert(self, cell_value):
+        if isinstance(cell_value, string_types):
+            if cell_value == '':
+                conv_value = None
+            else:
+                try:
+                    conv_value = ascii_native_(cell_value)
+                except UnicodeEncodeError:
+                    conv_value = self.UNKNOWN_CHARACTER
+                else:
+                    # Try to convert to an int or float.
+                    try:
+                        conv_value = int(conv_value)
+                    except ValueError:
+                        try:
+                            conv_value = float(conv_value)
+                        except ValueError:
+                            pass
+        elif isinstance(cell_value, (float, int)):
+            if is_valid_number(value=cell_value, is_integer=True):
+                conv_value = int(cell_value)
+            else:
+                conv_value = cell_value
+        else:
+            conv_value = self.UNKNOWN_CONTENT
+        return conv_value
+
+    def __find_layout_anchors(self):
+        anchor_map = {}
+        for row_index in range(1, self.row_number):
+            row = self.rows[row_index]
+            upper_row = self.rows[row_index - 1]
+            for col_index in range(self.column_number - 1):
+                if row[col_index] == 'A' and upper_row[col_index + 1] == 1:
+                    add_list_map_element(anchor_map, row_index, col_index)
+        return anchor_map
+
+
 class ExcelParsingContainer(ParsingContainer):
     """
     Abstract class for intermediate data storage when parsing Excel files.
@@ -764,9 +846,12 @@ class ExcelLayoutSheetParsingContainer(ExcelSheetParsingContainer):
         self._current_row = 1
         self._end_reached = False
         layout_found = False
+        grid = self._parser.get_sheet_grid(self._sheet)
+        tag_rows = sorted(self._tags_by_row.keys())
         while not self._end_reached:
-            for col_index in range(self.__max_tag_column_index,
-                                   self._col_number):
+            for col_index in grid.get_layout_anchor_columns(self._current_row):
+                if col_index < self.__max_tag_column_index:
+                    continue
                 if self._parser.has_errors():
                     break
                 layout_container = self.__get_layout(col_index)
@@ -775,20 +860,15 @@ class ExcelLayoutSheetParsingContainer(ExcelSheetParsingContainer):
                 if layout_container is None:
                     continue
                 layout_found = True
-                # associate tags
-                tag_definitions = None
-                for row_index in sorted(self._tags_by_row.keys(),
-                                        reverse=True):
-                    if row_index > self._current_row:
-                        continue
-                    tag_definitions = self._tags_by_row[row_index]
-                    break
-                if tag_definitions is None:
+                # associate tags (of the closest definition above the layout)
+                tag_row_pos = bisect_right(tag_rows, self._current_row)
+                if tag_row_pos == 0:
                     msg = 'Unable to find tags (factors) for layout in row ' \
                           '%i! Please check the alignment of your layouts!' \
                           % (self._current_row + 1)
                     self._create_error(msg)
                     break
+                tag_definitions = self._tags_by_row[tag_rows[tag_row_pos - 1]]
                 if len(tag_definitions) > 0:
                     self._parse_layout_codes(layout_container, tag_definitions)
             self._step_to_next_row()
@@ -208,7 +208,7 @@ class ExperimentDesignParser(ExcelMoleculeDesignPoolLayoutParser):
         """
         Parses one sheet.
         """
-        self.add_info('Start parsing of "%s" sheet ...' % (sheet_name))
+        self.add_info('Start parsing of "%s" sheet ...', sheet_name)
         self.sheet = self.get_sheet_by_name(workbook, sheet_name)
         sheet_container = _ExperimentDesignSheetParsingContainer(self,
                                                                 self.sheet)
@@ -3,13 +3,11 @@ This file is part of the TheLMA (THe Laboratory Management Application) project.
 See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
 
 """
-from pyramid.compat import iteritems_
-
 from everest.entities.utils import get_root_aggregate
-from everest.querying.specifications import eq
 from thelma.interfaces import IRack
 from thelma.tools.base import BaseTool
 from thelma.tools.semiconstants import get_item_status_managed
+from thelma.tools.utils.racksamples import get_rack_sample_operations
 
 
 __docformat__ = 'reStructuredText en'
@@ -26,22 +24,20 @@ class PlateCopier(BaseTool):
         self.__transfer_volume = float(transfer_volume) * 1e-6
 
     def run(self):
-        src_rack = self.__get_rack(self.__source_barcode)
-        for tgt_bc in self.__target_barcodes:
-            tgt_rack = self.__get_rack(tgt_bc)
-            for pos, src_cnt_loc in iteritems_(src_rack.container_positions):
-                if not src_cnt_loc.container is None:
-                    src_cnt = src_cnt_loc.container
-                    if not src_cnt.sample is None:
-                        src_smpl = src_cnt.sample
-                        tgt_cnt = tgt_rack.container_positions[pos]
-                        tgt_smpl = tgt_cnt.make_sample(self.__transfer_volume)
-                        for sm in src_smpl.sample_molecules:
-                            tgt_smpl.make_sample_molecule(sm.molecule,
-                                                          sm.concentration)
-            tgt_rack.status = get_item_status_managed()
-
-    def __get_rack(self, barcode):
+        self.reset()
         rack_agg = get_root_aggregate(IRack)
-        rack_agg.filter = eq(barcode=barcode)
-        return next(rack_agg.iterator())
+        src_rack = self.__get_rack(rack_agg, self.__source_barcode)
+        tgt_racks = [self.__get_rack(rack_agg, tgt_bc)
+                     for tgt_bc in self.__target_barcodes]
+        if not self.has_errors():
+            sample_ops = get_rack_sample_operations()
+            sample_ops.copy_samples(src_rack, tgt_racks,
+                                    self.__transfer_volume)
+            for tgt_rack in tgt_racks:
+                tgt_rack.status = get_item_status_managed()
+
+    def __get_rack(self, rack_agg, barcode):
+        rack = rack_agg.get_by_slug(barcode)
+        if rack is None:
+            self.add_error('Rack with barcode "%s" does not exist.' % barcode)
+        return rack
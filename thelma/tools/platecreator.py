@@ -3,18 +3,18 @@ This file is part of the TheLMA (THe Laboratory Management Application) project.
 See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
 
 """
-from collections import defaultdict
+import csv
 
 from everest.entities.utils import get_root_aggregate
 from everest.querying.specifications import cntd
-from everest.querying.specifications import eq
 from thelma.tools.semiconstants import get_item_status_managed
-from thelma.tools.semiconstants import get_rack_position_from_label
+from thelma.tools.semiconstants import get_rack_position_from_indices
 from thelma.tools.base import BaseTool
-from thelma.tools.stock.tubepicking import TubePicker
+from thelma.tools.stock.tubepicking import DefaultConcentrationTubePicker
+from thelma.tools.utils.racksamples import get_rack_sample_operations
+from thelma.tools.utils.racksector import RackSectorTranslator
 from thelma.interfaces import IMoleculeDesignPool
 from thelma.interfaces import IRack
-from thelma.interfaces import ITube
 
 
 __docformat__ = 'reStructuredText en'
@@ -22,93 +22,123 @@ __all__ = ['PlateCreator96To384'
            ]
 
 class PlateCreator96To384(BaseTool):
+    """
+    Stamps stock samples for the pools in a set of 96-well layout files into
+    the sectors (Z-configuration) of a 384-well (4 sectors) or 1536-well
+    (16 sectors) target plate.
+
+    The layout files are CSV files with a header row and the row label in
+    the first column. The layout files for 384-well targets can be passed
+    one by one (*layout_filename_q1* to *layout_filename_q4*); for other
+    targets, pass all layout files in sector order as comma-separated
+    *layout_filenames* list.
+    """
     NAME = 'Plate Creator 96 -> 384'
-    ROW_LABELS = [chr(ord('A') + c) for c in range(16)]
-    def __init__(self, iso_concentration, iso_volume, layout_filename_q1,
-                 layout_filename_q2, layout_filename_q3, layout_filename_q4,
-                 target_barcode, parent=None):
+    #: The number of positions of the source layouts.
+    NUMBER_SOURCE_POSITIONS = 96
+
+    def __init__(self, iso_concentration, iso_volume, layout_filename_q1=None,
+                 layout_filename_q2=None, layout_filename_q3=None,
+                 layout_filename_q4=None, target_barcode=None,
+                 layout_filenames=None, parent=None):
         BaseTool.__init__(self, parent=parent)
         self.__iso_concentration = float(iso_concentration) * 1e-9
         self.__iso_volume = float(iso_volume) * 1e-6
-        self.__layout_filename_q1 = layout_filename_q1
-        self.__layout_filename_q2 = layout_filename_q2
-        self.__layout_filename_q3 = layout_filename_q3
-        self.__layout_filename_q4 = layout_filename_q4
+        if layout_filenames is None:
+            self.__layout_filenames = [layout_filename_q1, layout_filename_q2,
+                                       layout_filename_q3, layout_filename_q4]
+        else:
+            self.__layout_filenames = [lfn.strip() for lfn
+                                       in layout_filenames.split(',')]
         self.__target_barcode = target_barcode
 
     def run(self):
-        layout_map = {}
-        for sector, lfn in enumerate((self.__layout_filename_q1,
-                                      self.__layout_filename_q2,
-                                      self.__layout_filename_q3,
-                                      self.__layout_filename_q4)):
-            layout_map.update(self.__parse_layout_file(sector, lfn))
-        pool_map = self.__get_md_pool_map(set(layout_map.values()))
-        stock_conc_map = self.__find_stock_concentrations(pool_map)
-        pool_tube_barcode_map = self.__get_tube_barcode_map(pool_map,
-                                                            stock_conc_map)
-        tube_map = self.__get_tube_map(pool_tube_barcode_map.values())
-        tgt_rack = self.__get_target_rack(self.__target_barcode)
-        for pos_label, pool_id in layout_map.iteritems():
-            pos = get_rack_position_from_label(pos_label)
-            cnt = tgt_rack.container_positions[pos]
-            smpl = cnt.make_sample(self.__iso_volume)
-            tube = tube_map[pool_tube_barcode_map[pool_id]]
-            sm_conc = \
-                self.__iso_concentration / len(tube.sample.sample_molecules)
-            for sm in tube.sample.sample_molecules:
-                smpl.make_sample_molecule(sm.molecule, sm_conc)
-        tgt_rack.status = get_item_status_managed()
+        self.reset()
+        tgt_rack = get_root_aggregate(IRack).get_by_slug(self.__target_barcode)
+        if tgt_rack is None:
+            self.add_error('Rack with barcode "%s" does not exist.'
+                           % self.__target_barcode)
+            return
+        number_sectors = self.__get_number_sectors(tgt_rack)
+        if self.has_errors():
+            return
+        pos_pool_map = {}
+        for sector, lfn in enumerate(self.__layout_filenames):
+            translator = RackSectorTranslator(
+                                number_sectors, 0, sector,
+                                behaviour=RackSectorTranslator.MANY_TO_ONE)
+            pos_pool_map.update(self.__parse_layout_file(translator, lfn))
+        if self.has_errors():
+            return
+        pool_tube_barcode_map = \
+                self.__get_tube_barcode_map(set(pos_pool_map.values()))
+        if self.has_errors():
+            return
+        pos_tube_map = {}
+        for pos, pool_id in pos_pool_map.iteritems():
+            tube_barcode = pool_tube_barcode_map.get(pool_id)
+            if tube_barcode is None:
+                self.add_error('Could not find a stock tube for pool %i.'
+                               % pool_id)
+                continue
+            pos_tube_map[pos] = tube_barcode
+        if not self.has_errors():
+            sample_ops = get_rack_sample_operations()
+            sample_ops.stamp_samples(tgt_rack, pos_tube_map,
+                                     self.__iso_volume,
+                                     self.__iso_concentration)
+            tgt_rack.status = get_item_status_managed()
 
-    def __parse_layout_file(self, sector, layout_filename):
-        with open(layout_filename, 'rU') as lf:
-            buf = lf.readlines()
+    def __get_number_sectors(self, tgt_rack):
+        number_sectors, remainder = divmod(tgt_rack.rack_shape.size,
+                                           self.NUMBER_SOURCE_POSITIONS)
+        if not remainder == 0 or not number_sectors in (4, 16):
+            self.add_error('Unsupported target rack shape: %s.'
+                           % tgt_rack.rack_shape.name)
+        elif not len(self.__layout_filenames) == number_sectors \
+                or None in self.__layout_filenames:
+            self.add_error('The target rack has %i sectors but %i layout '
+                           'files have been passed.'
+                           % (number_sectors,
+                              len([lfn for lfn in self.__layout_filenames
+                                   if not lfn is None])))
+        return number_sectors
+
+    def __parse_layout_file(self, translator, layout_filename):
+        # Maps pool IDs onto the target rack positions of the sector the
+        # translator has been set up for.
         pos_map = {}
-        offset_row, offset_col = divmod(sector, 2)
-        for row_idx, line in enumerate(buf[1:]):
-            values = line.strip().split(',')
-            row_label = self.ROW_LABELS[row_idx * 2 + offset_row]
-            line_pos_map = \
-                dict([("%s%d" % (row_label, col_idx * 2 + offset_col + 1),
-                       int(pool_id))
-                      for (col_idx, pool_id) in enumerate(values[1:])
-                      if not pool_id == ''])
-            pos_map.update(line_pos_map)
+        try:
+            with open(layout_filename, 'rU') as lf:
+                rows = list(csv.reader(lf))
+        except IOError as err:
+            self.add_error('Could not read layout file %s: %s.'
+                           % (layout_filename, err.strerror))
+            return pos_map
+        for row_idx, values in enumerate(rows[1:]):
+            for col_idx, value in enumerate(values[1:]):
+                value = value.strip()
+                if value == '':
+                    continue
+                try:
+                    pool_id = int(value)
+                except ValueError:
+                    self.add_error('Invalid pool ID "%s" in layout file %s.'
+                                   % (value, layout_filename))
+                    continue
+                src_pos = get_rack_position_from_indices(row_idx, col_idx)
+                pos_map[translator.translate(src_pos)] = pool_id
         return pos_map
 
-    def __find_stock_concentrations(self, pool_map):
-        conc_map = defaultdict(list)
-        for pool in pool_map.itervalues():
-            # The tube picker tool expects concentrations in nM.
-            s_conc = pool.default_stock_concentration * 1e9
-            conc_map[s_conc].append(pool.id)
-        return conc_map
-
-    def __get_md_pool_map(self, pool_ids):
+    def __get_tube_barcode_map(self, pool_ids):
         agg = get_root_aggregate(IMoleculeDesignPool)
         agg.filter = cntd(id=pool_ids)
-        return dict([(md.id, md) for md in agg.iterator()])
-
-    def __get_tube_barcode_map(self, pool_map, stock_concentration_map):
-        pool_tube_bc_map = {}
-        for conc, pool_ids in stock_concentration_map.iteritems():
-            pools = [pool_map[pool_id] for pool_id in pool_ids]
-            conc_ptbc_map = self.__run_tube_picker(pools, conc)
-            pool_tube_bc_map.update(conc_ptbc_map)
-        return pool_tube_bc_map
-
-    def __run_tube_picker(self, pools, conc):
-        tube_picker = TubePicker(pools, conc, parent=self)
+        pools = list(agg.iterator())
+        tube_picker = DefaultConcentrationTubePicker(pools, parent=self)
+        candidate_map = tube_picker.get_result()
+        if candidate_map is None:
+            self.add_error('Error when trying to pick stock tubes.')
+            return None
         return dict([(pool.id, tbs[0].tube_barcode)
-                     for (pool, tbs) in tube_picker.get_result().iteritems()
+                     for (pool, tbs) in candidate_map.iteritems()
                      if len(tbs) > 0])
-
-    def __get_tube_map(self, tube_barcodes):
-        tb_agg = get_root_aggregate(ITube)
-        tb_agg.filter = cntd(barcode=tube_barcodes)
-        return dict([(tb.barcode, tb) for tb in tb_agg.iterator()])
-
-    def __get_target_rack(self, barcode):
-        rack_agg = get_root_aggregate(IRack)
-        rack_agg.filter = eq(barcode=barcode)
-        return next(rack_agg.iterator())
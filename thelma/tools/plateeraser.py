@@ -3,14 +3,11 @@ This file is part of the TheLMA (THe Laboratory Management Application) project.
 See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
 
 """
-from pyramid.compat import itervalues_
-
 from everest.entities.utils import get_root_aggregate
-from everest.querying.specifications import eq
-from everest.repositories.rdb.session import ScopedSessionMaker
 from thelma.interfaces import IRack
 from thelma.tools.base import BaseTool
 from thelma.tools.semiconstants import get_item_status_future
+from thelma.tools.utils.racksamples import get_rack_sample_operations
 
 
 __docformat__ = 'reStructuredText en'
@@ -24,16 +21,17 @@ class PlateEraser(BaseTool):
         self.__barcodes = barcodes.split(',')
 
     def run(self):
-        sess = ScopedSessionMaker()
-        for bc in self.__barcodes:
-            rack = self.__get_rack(bc)
-            for src_cnt in itervalues_(rack.container_positions):
-                if not src_cnt is None:
-                    if not src_cnt.sample is None:
-                        sess.delete(src_cnt.sample)
-            rack.status = get_item_status_future()
-
-    def __get_rack(self, barcode):
+        self.reset()
         rack_agg = get_root_aggregate(IRack)
-        rack_agg.filter = eq(barcode=barcode)
-        return next(rack_agg.iterator())
+        racks = []
+        for bc in self.__barcodes:
+            rack = rack_agg.get_by_slug(bc)
+            if rack is None:
+                self.add_error('Rack with barcode "%s" does not exist.' % bc)
+            else:
+                racks.append(rack)
+        if not self.has_errors():
+            sample_ops = get_rack_sample_operations()
+            sample_ops.erase_samples(racks)
+            for rack in racks:
+                rack.status = get_item_status_future()
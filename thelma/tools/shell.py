@@ -43,7 +43,6 @@ from thelma.interfaces import ISampleRegistrationItem
 from thelma.interfaces import IStockSampleCreationIso
 from thelma.interfaces import IStockSampleCreationIsoRequest
 from thelma.interfaces import ISupplierSampleRegistrationItem
-from thelma.interfaces import ITube
 from thelma.interfaces import ITubeTransferWorklist
 from thelma.interfaces import IUser
 from thelma.run import create_config
@@ -58,6 +57,7 @@ from thelma.tools.iso.poolcreation.writer \
 from thelma.tools.writers import write_zip_archive
 from zope.interface import providedBy as provided_by # pylint: disable=E0611,F0401
 from zope.sqlalchemy import ZopeTransactionExtension # pylint: disable=E0611,F0401
+from zope.sqlalchemy import mark_changed # pylint: disable=E0611,F0401
 
 
 __docformat__ = 'reStructuredText en'
@@ -401,10 +401,10 @@ class EmptyTubeRegistrarToolCommand(ToolCommand): # no __init__ pylint: disable=
 
     @classmethod
     def finalize(cls, tool, options):
-        if not tool.has_errors():
-            tube_agg = get_root_aggregate(ITube)
-            for tube in tool.return_value:
-                tube_agg.add(tube)
+        if not tool.has_errors() and len(tool.return_value) > 0:
+            # The tubes are inserted in bulk, bypassing the ORM; make sure
+            # the transaction manager commits the session.
+            mark_changed(session_maker())
 
 
 class _RegistrarCommand(ToolCommand): # no __init__ pylint: disable=W0232
@@ -943,14 +943,34 @@ class StockAuditToolCommand(ToolCommand): # no __init__ pylint: disable=W0232
     option_defs = [('--molecule-type',
                     'molecule_type',
                     dict(help='Molecule type to create a stock audit report '
-                              'for.',
+                              'for. Several types can be passed as a comma '
+                              'separated list; use ALL to create reports '
+                              'for all known molecule types. The reports '
+                              'for different types are created '
+                              'concurrently.',
                          type='string')
                     ),
                    ('--output-file',
                     'output_file',
                     dict(help='Output file to write the stock audit report '
-                              'to.')
-                    )
+                              'to. If more than one molecule type is '
+                              'requested, a "%s" placeholder in the file '
+                              'name is replaced with the molecule type '
+                              'name.')
+                    ),
+                   ('--compress',
+                    'compress',
+                    dict(help='If set, the output file(s) are gzip '
+                              'compressed.',
+                         action='store_true',
+                         default=False)
+                    ),
+                   ('--batch-size',
+                    'batch_size',
+                    dict(help='Number of records to fetch at a time from '
+                              'the database.',
+                         type='int')
+                    ),
                    ]
 
 
@@ -1100,7 +1120,20 @@ class RackSampleTransferExecutor(ToolCommand):
                    ]
 
 
-class PlateCreator96To384(ToolCommand):
+class _RackSampleOperationsCommand(ToolCommand): # no __init__ pylint: disable=W0232
+    """
+    Base class for commands running tools that create or remove rack samples
+    through :mod:`thelma.tools.utils.racksamples`.
+    """
+    @classmethod
+    def finalize(cls, tool, options):
+        if not tool.has_errors():
+            # The samples are written in bulk, bypassing the ORM; make sure
+            # the transaction manager commits the session.
+            mark_changed(session_maker())
+
+
+class PlateCreator96To384(_RackSampleOperationsCommand):
     name = 'platecreator96to384'
     tool = 'thelma.tools.platecreator:PlateCreator96To384'
 
@@ -1124,6 +1157,14 @@ class PlateCreator96To384(ToolCommand):
                     dict(help='File for layout of Q4.',
                          type='string')
                     ),
+                   ('--layout-filenames',
+                    'layout_filenames',
+                    dict(help='Layout files for all sectors of the target '
+                              'plate in sector order (comma-separated '
+                              'list; replaces the single quadrant options, '
+                              'required for 1536-well targets).',
+                         type='string')
+                    ),
                    ('--target-barcode',
                     'target_barcode',
                     dict(help='Target plate barcode.',
@@ -1142,7 +1183,7 @@ class PlateCreator96To384(ToolCommand):
                     ]
 
 
-class PlateCopier96To384(ToolCommand):
+class PlateCopier96To384(_RackSampleOperationsCommand):
     name = 'platecopier'
     tool = 'thelma.tools.platecopier:PlateCopier'
 
@@ -1164,7 +1205,7 @@ class PlateCopier96To384(ToolCommand):
                     ]
 
 
-class PlateEraser96To384(ToolCommand):
+class PlateEraser96To384(_RackSampleOperationsCommand):
     name = 'plateeraser'
     tool = 'thelma.tools.plateeraser:PlateEraser'
 
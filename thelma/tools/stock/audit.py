@@ -5,11 +5,20 @@ See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
 Stock audit - report amount and concentration for stock samples by
 molecule type.
 """
+from Queue import Empty
+from Queue import Queue
 from collections import OrderedDict
 from csv import Dialect
-from csv import DictWriter
 from csv import QUOTE_NONNUMERIC
 from csv import register_dialect
+from csv import writer
+from operator import itemgetter
+import gzip
+import os
+from threading import Thread
+import time
+
+from sqlalchemy.sql.expression import text
 
 from everest.repositories.rdb.session import ScopedSessionMaker as Session
 from thelma.tools.base import BaseTool
@@ -147,41 +156,229 @@ class StockAuditReporter(BaseTool):
                              amount='Amount',
                              supplier='Supplier',
                              initialamount='Initial Amount')
-    def __init__(self, molecule_type, output_file, parent=None):
+    #: Additional (molecule type specific) columns.
+    CUSTOM_COLUMNS = \
+        {'SIRNA' : [('library', 'Ambion Library'),
+                    ('modification', 'Modification'),
+                    ('silencerselect', 'Silencer Select')],
+         'MIRNA_INHI' : [('library', 'Library Y/N')],
+         'MIRNA_MIMI' : [('library', 'Library Y/N')],
+         }
+    #: Use this as molecule type to run the audit for all known types.
+    ALL_MOLECULE_TYPES = 'ALL'
+    #: Default number of records fetched per round trip from the
+    #: server-side cursor.
+    BATCH_SIZE = 5000
+    #: A progress message is recorded every time this many records have
+    #: been written for a molecule type.
+    PROGRESS_INTERVAL = 50000
+
+    def __init__(self, molecule_type, output_file, compress=False,
+                 batch_size=None, parent=None):
+        """
+        Constructor.
+
+        :param molecule_type: Molecule type name(s) to create the audit
+            report for. Several types may be passed as comma separated
+            string or as a sequence; use :attr:`ALL_MOLECULE_TYPES` to
+            report on all known types. The queries for the different
+            types are run concurrently, each on its own connection.
+        :param str output_file: Output file name. If more than one
+            molecule type is requested, the file name may contain a "%s"
+            placeholder for the molecule type name; otherwise, the type
+            name is inserted before the file extension.
+        :param bool compress: Flag indicating whether the output file(s)
+            should be gzip compressed.
+        :default compress: *False*
+        :param int batch_size: Number of records fetched at a time from
+            the database.
+        :default batch_size: *None* (use :attr:`BATCH_SIZE`)
+        """
         BaseTool.__init__(self, parent=parent)
         self.__molecule_type = molecule_type
         self.__output_file = output_file
+        self.__compress = compress
+        if batch_size is None:
+            batch_size = self.BATCH_SIZE
+        self.__batch_size = batch_size
 
     def reset(self):
         self.__molecule_type = None
         self.__output_file = None
 
     def run(self):
-        session = Session()
-        query = self.QUERY_TEMPLATE % self.CUSTOM_BITS[self.__molecule_type]
-        self.add_info('Running stock query for %s molecules.\n%s' %
-                      (self.__molecule_type, query))
-        records = session.execute(query)
-        column_map = self.COLUMN_MAP.copy()
-        if self.__molecule_type == 'SIRNA':
-            column_map['library'] = 'Ambion Library'
-            column_map['modification'] = 'Modification'
-            column_map['silencerselect'] = 'Silencer Select'
-        elif self.__molecule_type in ('MIRNA_INHI', 'MIRNA_MIMI'):
-            column_map['library'] = 'Library Y/N'
-        csv_file = open(self.__output_file, 'w')
-        with csv_file:
-            csv_writer = DictWriter(csv_file, column_map.values(),
-                                    dialect='audit')
-            self.add_info('Exporting audit report to file "%s".'
-                          % self.__output_file)
-            number_records = 0
-            csv_writer.writeheader()
-            for record in records:
-                # Translate keys to labels.
-                rec_map = {}
-                for key, label in column_map.iteritems():
-                    rec_map[label] = record[key]
-                csv_writer.writerow(rec_map)
-                number_records += 1
-            self.add_info('Wrote %d records to file.' % number_records)
+        mt_names = self.__get_molecule_type_names()
+        if not self.has_errors():
+            jobs = [_StockAuditJob(mt_name,
+                                   self.__get_output_file_name(mt_name,
+                                                               mt_names),
+                                   self.__get_query(mt_name),
+                                   self.__get_columns(mt_name),
+                                   self.__batch_size,
+                                   self.PROGRESS_INTERVAL)
+                    for mt_name in mt_names]
+            self.__run_jobs(jobs)
+
+    def __get_molecule_type_names(self):
+        mt_names = self.__molecule_type
+        if isinstance(mt_names, basestring):
+            if mt_names.upper() == self.ALL_MOLECULE_TYPES:
+                mt_names = sorted(self.CUSTOM_BITS.keys())
+            else:
+                mt_names = [mt_name.strip().upper()
+                            for mt_name in mt_names.split(',')
+                            if mt_name.strip()]
+        unknown = sorted([mt_name for mt_name in mt_names
+                          if not mt_name in self.CUSTOM_BITS])
+        if len(unknown) > 0:
+            self.add_error('Unknown molecule type(s) for stock audit: %s. '
+                           'Known types: %s.'
+                           % (', '.join(unknown),
+                              ', '.join(sorted(self.CUSTOM_BITS.keys()))))
+        elif len(mt_names) == 0:
+            self.add_error('No molecule type given for stock audit.')
+        return mt_names
+
+    def __get_output_file_name(self, mt_name, mt_names):
+        fn = self.__output_file
+        if '%s' in fn:
+            fn = fn % mt_name
+        elif len(mt_names) > 1:
+            root, ext = os.path.splitext(fn)
+            fn = '%s_%s%s' % (root, mt_name, ext)
+        if self.__compress and not fn.endswith('.gz'):
+            fn += '.gz'
+        return fn
+
+    def __get_query(self, mt_name):
+        return self.QUERY_TEMPLATE % self.CUSTOM_BITS[mt_name]
+
+    def __get_columns(self, mt_name):
+        return self.COLUMN_MAP.items() \
+               + self.CUSTOM_COLUMNS.get(mt_name, [])
+
+    def __run_jobs(self, jobs):
+        engine = Session().get_bind()
+        progress_queue = Queue()
+        threads = []
+        start_time = time.time()
+        for job in jobs:
+            self.add_info('Running stock query for %s molecules.\n%s',
+                          job.molecule_type, job.query)
+            self.add_info('Exporting audit report to file "%s".',
+                          job.output_file)
+            thread = Thread(target=job.run, args=(engine, progress_queue),
+                            name='stockaudit-%s' % job.molecule_type)
+            thread.start()
+            threads.append(thread)
+        # Relay progress messages from the worker threads until all jobs
+        # are done; messages are only ever recorded from this thread.
+        while any([thread.is_alive() for thread in threads]):
+            try:
+                msg = progress_queue.get(timeout=1)
+            except Empty:
+                continue
+            self.add_info(msg)
+        for thread in threads:
+            thread.join()
+        while not progress_queue.empty():
+            self.add_info(progress_queue.get())
+        total_records = 0
+        for job in jobs:
+            if not job.error is None:
+                self.add_error('Error running stock audit for %s '
+                               'molecules: %s' % (job.molecule_type,
+                                                  job.error))
+            else:
+                total_records += job.record_count
+                self.add_info('Wrote %d %s records to file "%s" '
+                              '(%.1f records/s).', job.record_count,
+                              job.molecule_type, job.output_file,
+                              job.records_per_second)
+        elapsed = time.time() - start_time
+        if not self.has_errors():
+            self.add_info('Wrote %d records for %d molecule type(s) in '
+                          '%.1f s (%.1f records/s).', total_records,
+                          len(jobs), elapsed,
+                          total_records / max(elapsed, 1e-6))
+            self.return_value = dict([(job.molecule_type, job.output_file)
+                                      for job in jobs])
+
+
+class _StockAuditJob(object):
+    """
+    Runs the stock audit query for a single molecule type on its own
+    database connection and streams the result records to a (optionally
+    gzip compressed) CSV file.
+
+    Records are fetched in batches from a server-side (named) cursor so that
+    the client never buffers the complete result set.
+    """
+    def __init__(self, molecule_type, output_file, query, columns,
+                 batch_size, progress_interval):
+        #: The molecule type name.
+        self.molecule_type = molecule_type
+        #: The name of the file to write to.
+        self.output_file = output_file
+        #: The SQL audit query for the molecule type.
+        self.query = query
+        #: List of (column key, column label) tuples.
+        self.columns = columns
+        self.__batch_size = batch_size
+        self.__progress_interval = progress_interval
+        #: The number of records written.
+        self.record_count = 0
+        #: The time (in seconds) spent on the job.
+        self.elapsed_time = 0.0
+        #: Error message (if an exception occurred).
+        self.error = None
+
+    @property
+    def records_per_second(self):
+        return self.record_count / max(self.elapsed_time, 1e-6)
+
+    def run(self, engine, progress_queue):
+        start_time = time.time()
+        try:
+            conn = engine.connect()
+            try:
+                self.__write(conn, progress_queue, start_time)
+            finally:
+                conn.close()
+        except Exception, exc: # catch all pylint: disable=W0703
+            self.error = str(exc)
+        self.elapsed_time = time.time() - start_time
+
+    def __write(self, conn, progress_queue, start_time):
+        # The stream_results option makes psycopg2 use a named server-side
+        # cursor.
+        result = conn.execution_options(stream_results=True) \
+                                        .execute(text(self.query))
+        keys = list(result.keys())
+        # Build the record -> row conversion once instead of translating
+        # keys to labels for every record.
+        getter = itemgetter(*[keys.index(key) for (key, _) in self.columns])
+        if self.output_file.endswith('.gz'):
+            out_file = gzip.open(self.output_file, 'wb')
+        else:
+            out_file = open(self.output_file, 'wb')
+        with out_file:
+            csv_writer = writer(out_file, dialect='audit')
+            csv_writer.writerow([label for (_, label) in self.columns])
+            next_progress = self.__progress_interval
+            while True:
+                records = result.fetchmany(self.__batch_size)
+                if not records:
+                    break
+                csv_writer.writerows([getter(record) for record in records])
+                self.record_count += len(records)
+                if self.record_count >= next_progress:
+                    next_progress += self.__progress_interval
+                    elapsed = time.time() - start_time
+                    progress_queue.put('%s: %d records written '
+                                       '(%.1f records/s).'
+                                       % (self.molecule_type,
+                                          self.record_count,
+                                          self.record_count
+                                          / max(elapsed, 1e-6)))
+        result.close()
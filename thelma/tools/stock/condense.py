@@ -9,6 +9,9 @@ stock racks that can be used for ISO generation.
 AAB
 """
 from StringIO import StringIO
+from bisect import bisect_left
+from bisect import bisect_right
+from bisect import insort
 from datetime import datetime
 
 from everest.repositories.rdb.session import ScopedSessionMaker
@@ -36,6 +39,7 @@ __docformat__ = "reStructuredText en"
 __all__ = ['StockCondenser',
            'STOCK_CONDENSE_ROLES',
            'StockCondenseRack',
+           'StockCondenseRackIndex',
            'CondenseRackQuery',
            'RackContainerQuery',
            'StockCondenseReportWriter']
@@ -92,7 +96,8 @@ class StockCondenser(SessionTool):
         if excluded_racks is None: self.excluded_racks = []
         #: The number of positions in a stock rack.
         self.__stock_rack_size = None
-        #: Maps :class:`StockCondenseRack` objects onto tube counts.
+        #: Index of the :class:`StockCondenseRack` objects by tube count
+        #: (:class:`StockCondenseRackIndex`).
         self.__tube_count_map = None
         #: Maps donor racks onto rack barcodes.
         self.__donor_racks = None
@@ -188,7 +193,11 @@ class StockCondenser(SessionTool):
             query = CondenseRackQuery()
             self._run_query(query, 'Error when running rack query: ')
             if not self.has_errors():
-                self.__tube_count_map = query.get_query_results()
+                self.__tube_count_map = StockCondenseRackIndex(
+                                                    self.__stock_rack_size)
+                for tube_count, racks in \
+                            query.get_query_results().iteritems():
+                    self.__tube_count_map.add_racks(tube_count, racks)
                 if len(self.__tube_count_map) < 0:
                     msg = 'The rack query did not return any racks!'
                     self.add_error(msg)
@@ -219,21 +228,15 @@ class StockCondenser(SessionTool):
                         len(self.__donor_racks) >= self.racks_to_empty:
                 self.__stop_associations = True
                 break
-            tube_counts = self.__tube_count_map.keys()
-            tube_counts.sort()
-            tube_count = tube_counts[0]
+            tube_count = self.__tube_count_map.get_min_tube_count()
             if tube_count > (self.__stock_rack_size / 2):
                 break
-            condense_racks = self.__tube_count_map[tube_count]
-            potential_donor = condense_racks.pop()
-            if len(condense_racks) == 0:
-                del self.__tube_count_map[tube_count]
+            potential_donor = self.__tube_count_map.pop_rack(tube_count)
             if potential_donor.rack_barcode in self.excluded_racks:
                 continue
             found_associations = self.__find_rack_association(potential_donor)
             if not found_associations:
-                add_list_map_element(self.__tube_count_map, tube_count,
-                                     potential_donor)
+                self.__tube_count_map.add_rack(tube_count, potential_donor)
                 break
 
     def __find_rack_association(self, donor_rack):
@@ -275,8 +278,8 @@ class StockCondenser(SessionTool):
             self.__receiver_racks[receiver_barcode] = receiver
             resulting_receiver_tubes = receiver.resulting_tube_count
             if resulting_receiver_tubes < self.__stock_rack_size:
-                add_list_map_element(self.__tube_count_map,
-                                     resulting_receiver_tubes, receiver)
+                self.__tube_count_map.add_rack(resulting_receiver_tubes,
+                                               receiver)
 
         self.__donor_racks[donor_rack.rack_barcode] = donor_rack
         return True
@@ -285,7 +288,7 @@ class StockCondenser(SessionTool):
         # Finds a rack to take up tubes of a donor rack.
         # try to find an excat match
         receiver_tube_count = self.__stock_rack_size - donor_tube_count
-        receiver = self.__get_rack_for_tube_count(receiver_tube_count)
+        receiver = self.__tube_count_map.pop_rack(receiver_tube_count)
         if not receiver is None:
             return receiver
         if self.__look_for_exact_matches:
@@ -299,37 +302,9 @@ class StockCondenser(SessionTool):
                       '%i)!' % (len(self.__donor_racks))
                 self.add_error(msg)
             return None
-        # try to find a rack with less free positions
-        while receiver_tube_count < self.__stock_rack_size:
-            receiver_tube_count += 1
-            if receiver_tube_count == self.__stock_rack_size: # no rack
-                break
-            receiver = self.__get_rack_for_tube_count(receiver_tube_count)
-            if not receiver is None:
-                return receiver
-        # take a rack with more free positions
-        # There is at least one rack left ...
-        receiver_tube_count = self.__stock_rack_size - donor_tube_count
-        while receiver_tube_count > 0:
-            receiver_tube_count -= 1
-            receiver = self.__get_rack_for_tube_count(receiver_tube_count)
-            if not receiver is None:
-                return receiver
-        return None
-
-    def __get_rack_for_tube_count(self, tube_count):
-        # Obtains a rack for a certain tube count (to be used as receiver
-        # racks). The element is removed from the pool.
-        if self.__tube_count_map.has_key(tube_count):
-            receiver_list = self.__tube_count_map[tube_count]
-            receiver = receiver_list.pop()
-            if len(receiver_list) < 1:
-                receiver_list = None
-                del self.__tube_count_map[tube_count]
-            result = receiver
-        else:
-            result = None
-        return result
+        # Try to find a rack with less free positions; if there is none,
+        # take a rack with more free positions.
+        return self.__tube_count_map.pop_best_fit_rack(receiver_tube_count)
 
     def __fetch_tube_data(self):
         # Finds the barcodes and positions for the tube of the picked racks
@@ -557,6 +532,110 @@ class StockCondenseRack(object):
         return str_format % params
 
 
+class StockCondenseRackIndex(object):
+    """
+    Indexes :class:`StockCondenseRack` objects by their tube count.
+
+    Racks are kept in one bucket per tube count; the tube counts of all
+    non-empty buckets are kept in a sorted list so that the smallest tube
+    count and the best fitting tube count for a receiver can be looked up
+    by bisection instead of scanning all possible tube counts.
+    """
+    def __init__(self, stock_rack_size):
+        """
+        Constructor.
+
+        :param int stock_rack_size: The number of positions in a stock rack.
+        """
+        #: The number of positions in a stock rack.
+        self.stock_rack_size = stock_rack_size
+        #: Lists of racks mapped onto tube counts.
+        self.__buckets = dict()
+        #: The sorted tube counts of all non-empty buckets.
+        self.__tube_counts = []
+
+    def add_rack(self, tube_count, rack):
+        """
+        Adds a rack for the given tube count.
+        """
+        bucket = self.__buckets.get(tube_count)
+        if bucket is None:
+            bucket = []
+            self.__buckets[tube_count] = bucket
+            insort(self.__tube_counts, tube_count)
+        bucket.append(rack)
+
+    def add_racks(self, tube_count, racks):
+        """
+        Adds several racks for the given tube count (in the passed order).
+        """
+        for rack in racks:
+            self.add_rack(tube_count, rack)
+
+    def pop_rack(self, tube_count):
+        """
+        Removes and returns the most recently added rack for the given tube
+        count.
+
+        :return: :class:`StockCondenseRack` or *None* if there is no rack
+            with this tube count.
+        """
+        bucket = self.__buckets.get(tube_count)
+        if bucket is None:
+            result = None
+        else:
+            result = bucket.pop()
+            if len(bucket) < 1:
+                del self.__buckets[tube_count]
+                del self.__tube_counts[bisect_left(self.__tube_counts,
+                                                   tube_count)]
+        return result
+
+    def pop_best_fit_rack(self, tube_count):
+        """
+        Removes and returns a rack for a receiver that should ideally have
+        the given tube count. The rack with the next larger tube count (below
+        the stock rack size) is preferred; if there is none, the rack with
+        the next smaller tube count is returned.
+
+        :return: :class:`StockCondenseRack` or *None* if there are no racks
+            left.
+        """
+        tube_counts = self.__tube_counts
+        index = bisect_right(tube_counts, tube_count)
+        if index < len(tube_counts) \
+                    and tube_counts[index] < self.stock_rack_size:
+            result = self.pop_rack(tube_counts[index])
+        else:
+            index = bisect_left(tube_counts, tube_count)
+            if index > 0:
+                result = self.pop_rack(tube_counts[index - 1])
+            else:
+                result = None
+        return result
+
+    def get_min_tube_count(self):
+        """
+        Returns the smallest tube count for which there are racks (or *None*
+        if the index is empty).
+        """
+        if len(self.__tube_counts) > 0:
+            result = self.__tube_counts[0]
+        else:
+            result = None
+        return result
+
+    def __len__(self):
+        # The number of distinct tube counts (like the length of a
+        # tube count map).
+        return len(self.__tube_counts)
+
+    def __repr__(self):
+        str_format = '<%s tube counts: %s>'
+        params = (self.__class__.__name__, self.__tube_counts)
+        return str_format % params
+
+
 class CondenseRackQuery(CustomQuery):
     """
     Runs the first query (number of tubes per stock rack) and converts the
@@ -6,40 +6,94 @@ Empty tube sample registrar.
 
 Created on November 30, 2012.
 """
+from collections import namedtuple
+import glob
+import os
+
+from sqlalchemy.sql.expression import text
+
 from everest.entities.utils import get_root_aggregate
-from everest.querying.specifications import eq
+from everest.repositories.rdb.session import ScopedSessionMaker as Session
+from thelma.entities.container import CONTAINER_TYPES
+from thelma.interfaces import IContainerSpecs
+from thelma.interfaces import IItemStatus
+from thelma.tools.base import SessionTool
 from thelma.tools.parsers.rackscanning import RackScanningParser
 from thelma.tools.semiconstants import ITEM_STATUS_NAMES
 from thelma.tools.semiconstants import get_rack_position_from_label
-from thelma.tools.base import BaseTool
-from thelma.interfaces import IContainerSpecs
-from thelma.interfaces import IItemStatus
-from thelma.interfaces import IRack
-from thelma.entities.container import Tube
-import glob
-import os
+from thelma.tools.utils.base import CustomQuery
+from thelma.tools.utils.base import create_in_term_for_db_queries
+
 
 __docformat__ = 'reStructuredText en'
-__all__ = ['EmptyTubeRegistrar',
+__all__ = ['EmptyTubeRecord',
+           'EmptyTubeRegistrar',
+           'ScannedRackQuery',
+           'ExistingTubeBarcodeQuery',
+           'ContainerIdQuery',
            ]
 
 
-class EmptyTubeRegistrar(BaseTool):
+#: A tube registered by the :class:`EmptyTubeRegistrar` (the rack position
+#: is a :class:`thelma.entities.rack.RackPosition`).
+EmptyTubeRecord = namedtuple('EmptyTubeRecord',
+                             ['tube_barcode', 'rack_barcode', 'rack_id',
+                              'rack_position'])
+
+
+class EmptyTubeRegistrar(SessionTool):
+    """
+    Registers the empty tubes listed in a directory of rack scanning files.
+
+    All scanned tubes are validated with one query for the tube barcodes and
+    one query for the racks. The containers, tubes and tube locations are
+    then inserted in bulk (no entities are created).
+
+    **Return Value:** list of :class:`EmptyTubeRecord` objects
+    """
     # FIXME: Make these configurable.
     STATUS = ITEM_STATUS_NAMES.MANAGED.lower()
     SPECS = 'matrix0500'
     NAME = 'Empty Tube Registrar'
+
+    #: The statements inserting the new tubes.
+    INSERT_STATEMENTS = [
+        'INSERT INTO container (container_id, container_specs_id, ' \
+        'item_status, container_type) VALUES (:container_id, ' \
+        ':container_specs_id, :item_status, :container_type)',
+        'INSERT INTO tube (container_id, barcode) ' \
+        'VALUES (:container_id, :tube_barcode)',
+        'INSERT INTO tube_location (container_id, rack_id, ' \
+        'rack_position_id) VALUES (:container_id, :rack_id, ' \
+        ':rack_position_id)']
+
     def __init__(self, scanfile_directory, parent=None):
-        BaseTool.__init__(self, parent=parent)
+        SessionTool.__init__(self, parent=parent)
         self.__scanfile_directory = os.path.realpath(scanfile_directory)
+        #: The scanned (rack barcode, position label, tube barcode) triples.
+        self.__scanned_tubes = None
+        #: The tubes to register.
+        self.__tube_records = None
+
+    def reset(self):
+        SessionTool.reset(self)
+        self.__scanned_tubes = []
+        self.__tube_records = []
 
     def run(self):
-        rack_agg = get_root_aggregate(IRack)
-        is_agg = get_root_aggregate(IItemStatus)
-        status = is_agg.get_by_slug(self.STATUS)
-        cnt_specs_agg = get_root_aggregate(IContainerSpecs)
-        cnt_specs = cnt_specs_agg.get_by_slug(self.SPECS)
-        tubes = []
+        self.reset()
+        self.__parse_scan_files()
+        if not self.has_errors():
+            self.__check_tube_barcodes()
+        if not self.has_errors():
+            self.__check_racks()
+        if not self.has_errors() and len(self.__tube_records) > 0:
+            self.__insert_tubes()
+        if not self.has_errors():
+            self.return_value = self.__tube_records
+
+    def __parse_scan_files(self):
+        # Collects the scanned tubes of all rack scanning files.
         for scan_fn in glob.glob("%s/*.txt" % self.__scanfile_directory):
             strm = open(scan_fn, 'r')
             try:
@@ -51,37 +105,221 @@ class EmptyTubeRegistrar(BaseTool):
                 raise RuntimeError('Could not parse rack scan file "%s". '
                                    'Error messages: %s'
                                    % (scan_fn, self.get_messages()))
-            rack_agg.filter = eq(barcode=prs.rack_barcode)
-            try:
-                rack = rack_agg.iterator().next()
-            except StopIteration:
-                self.add_error('Rack with barcode "%s" does not exist.'
-                               % prs.rack_barcode)
-                continue
-            if not rack.specs.has_tubes:
-                self.add_error('Rack with barcode "%s" is not a tube '
-                               'rack.' % rack.barcode)
-                continue
             for pos_label, barcode in prs.position_map.iteritems():
                 if barcode is None:
                     continue
-                pos = get_rack_position_from_label(pos_label)
-                # FIXME: Enable this test once pulling a tube by barcode is
-                #        fast.
-#                if tube_agg.get_by_slug(barcode):
-#                    self.add_error('Tube with barcode "%s" already '
-#                                   'exists.' % barcode)
-#                    continue
-                if not rack.is_empty(pos):
-                    self.add_error('Trying to place a tube in an occupied '
-                                   'position (%s on rack %s).' %
-                                   (pos_label, rack.barcode))
-                    continue
-                tube = Tube.create_from_rack_and_position(cnt_specs, status,
-                                                          barcode, rack, pos)
-                tubes.append(tube)
-                self.add_info('Creating tube with barcode %s at '
-                              'position %s in rack %s.' %
-                              (barcode, pos_label, rack.barcode))
-        if not self.has_errors():
-            self.return_value = tubes
+                self.__scanned_tubes.append((prs.rack_barcode, pos_label,
+                                             barcode))
+
+    def __check_tube_barcodes(self):
+        # Makes sure the tube barcodes are unique and not registered yet.
+        tube_barcodes = set()
+        duplicates = set()
+        for scanned_tube in self.__scanned_tubes:
+            tube_barcode = scanned_tube[2]
+            if tube_barcode in tube_barcodes:
+                duplicates.add(tube_barcode)
+            tube_barcodes.add(tube_barcode)
+        if len(duplicates) > 0:
+            self.add_error('The following tube barcodes occur more than '
+                           'once in the scan files: %s.'
+                           % (', '.join(sorted(duplicates))))
+        elif len(tube_barcodes) > 0:
+            query = ExistingTubeBarcodeQuery(tube_barcodes)
+            self._run_query(query, 'Error when trying to look up existing '
+                                   'tube barcodes: ')
+            if not self.has_errors():
+                for tube_barcode in sorted(query.get_query_results()):
+                    self.add_error('Tube with barcode "%s" already exists.'
+                                   % tube_barcode)
+
+    def __check_racks(self):
+        # Makes sure the racks exist, are tube racks and that the scanned
+        # positions are empty.
+        rack_barcodes = set([scanned_tube[0]
+                             for scanned_tube in self.__scanned_tubes])
+        if len(rack_barcodes) < 1:
+            return
+        query = ScannedRackQuery(rack_barcodes)
+        self._run_query(query, 'Error when trying to look up racks: ')
+        if self.has_errors():
+            return
+        rack_map = query.get_query_results()
+        for rack_barcode in sorted(rack_barcodes):
+            if not rack_map.has_key(rack_barcode):
+                self.add_error('Rack with barcode "%s" does not exist.'
+                               % rack_barcode)
+            elif not rack_map[rack_barcode].has_tubes:
+                self.add_error('Rack with barcode "%s" is not a tube '
+                               'rack.' % rack_barcode)
+        for rack_barcode, pos_label, tube_barcode in self.__scanned_tubes:
+            scanned_rack = rack_map.get(rack_barcode)
+            if scanned_rack is None or not scanned_rack.has_tubes:
+                continue
+            pos = get_rack_position_from_label(pos_label)
+            if pos.label in scanned_rack.occupied_positions:
+                self.add_error('Trying to place a tube in an occupied '
+                               'position (%s on rack %s).' %
+                               (pos_label, rack_barcode))
+                continue
+            self.__tube_records.append(
+                        EmptyTubeRecord(tube_barcode=tube_barcode,
+                                        rack_barcode=rack_barcode,
+                                        rack_id=scanned_rack.rack_id,
+                                        rack_position=pos))
+            self.add_info('Creating tube with barcode %s at '
+                          'position %s in rack %s.',
+                          tube_barcode, pos_label, rack_barcode)
+
+    def __insert_tubes(self):
+        # Inserts the containers, tubes and tube locations with one
+        # statement (executemany) per table.
+        is_agg = get_root_aggregate(IItemStatus)
+        status = is_agg.get_by_slug(self.STATUS)
+        cnt_specs_agg = get_root_aggregate(IContainerSpecs)
+        cnt_specs = cnt_specs_agg.get_by_slug(self.SPECS)
+        query = ContainerIdQuery(len(self.__tube_records))
+        self._run_query(query, 'Error when trying to reserve container '
+                               'IDs: ')
+        if self.has_errors():
+            return
+        container_ids = query.get_query_results()
+        params = []
+        for container_id, tube_record in zip(container_ids,
+                                             self.__tube_records):
+            params.append(dict(container_id=container_id,
+                               container_specs_id=cnt_specs.id,
+                               item_status=status.id,
+                               container_type=CONTAINER_TYPES.TUBE,
+                               tube_barcode=tube_record.tube_barcode,
+                               rack_id=tube_record.rack_id,
+                               rack_position_id=tube_record.rack_position.id))
+        session = Session()
+        for statement in self.INSERT_STATEMENTS:
+            session.execute(text(statement), params)
+
+
+#: The data of a rack looked up by the :class:`ScannedRackQuery` (the
+#: occupied positions are a set of rack position labels).
+ScannedRack = namedtuple('ScannedRack',
+                         ['rack_id', 'has_tubes', 'occupied_positions'])
+
+
+class ScannedRackQuery(CustomQuery):
+    """
+    Fetches the ID, the tube rack flag and the occupied positions of a set of
+    racks in a single statement.
+
+    The results are stored in a dictionary (:class:`ScannedRack` tuples
+    mapped onto rack barcodes).
+    """
+    QUERY_TEMPLATE = '''
+    SELECT r.barcode AS rack_barcode,
+        r.rack_id AS rack_id,
+        rs.has_movable_subitems AS has_tubes,
+        rp.label AS position_label
+    FROM rack r
+        INNER JOIN rack_specs rs ON rs.rack_specs_id = r.rack_specs_id
+        LEFT OUTER JOIN tube_location tl ON tl.rack_id = r.rack_id
+        LEFT OUTER JOIN rack_position rp
+            ON rp.rack_position_id = tl.rack_position_id
+    WHERE r.barcode IN %s
+    '''
+
+    COLUMN_NAMES = ['rack_barcode', 'rack_id', 'has_tubes',
+                    'position_label']
+
+    RESULT_COLLECTION_CLS = dict
+
+    def __init__(self, rack_barcodes):
+        """
+        Constructor:
+
+        :param rack_barcodes: The barcodes of the racks to look up.
+        :type rack_barcodes: collection of :class:`basestring`
+        """
+        CustomQuery.__init__(self)
+        #: The barcodes of the racks to look up.
+        self.rack_barcodes = rack_barcodes
+
+    def _get_params_for_sql_statement(self):
+        return create_in_term_for_db_queries(self.rack_barcodes,
+                                             as_string=True)
+
+    def _store_result(self, result_record):
+        rack_barcode, rack_id, has_tubes, position_label = result_record
+        scanned_rack = self._results.get(rack_barcode)
+        if scanned_rack is None:
+            scanned_rack = ScannedRack(rack_id=rack_id, has_tubes=has_tubes,
+                                       occupied_positions=set())
+            self._results[rack_barcode] = scanned_rack
+        if not position_label is None:
+            scanned_rack.occupied_positions.add(position_label)
+
+
+class ExistingTubeBarcodeQuery(CustomQuery):
+    """
+    Returns the subset of the given tube barcodes that are already
+    registered.
+
+    The results are stored in a set.
+    """
+    QUERY_TEMPLATE = '''
+    SELECT t.barcode AS tube_barcode
+    FROM tube t
+    WHERE t.barcode IN %s
+    '''
+
+    COLUMN_NAMES = ['tube_barcode']
+
+    RESULT_COLLECTION_CLS = set
+
+    def __init__(self, tube_barcodes):
+        """
+        Constructor:
+
+        :param tube_barcodes: The tube barcodes to check.
+        :type tube_barcodes: collection of :class:`basestring`
+        """
+        CustomQuery.__init__(self)
+        #: The tube barcodes to check.
+        self.tube_barcodes = tube_barcodes
+
+    def _get_params_for_sql_statement(self):
+        return create_in_term_for_db_queries(self.tube_barcodes,
+                                             as_string=True)
+
+    def _store_result(self, result_record):
+        self._results.add(result_record[0])
+
+
+class ContainerIdQuery(CustomQuery):
+    """
+    Reserves the given number of container IDs from the container ID
+    sequence.
+
+    The results are stored in a list.
+    """
+    QUERY_TEMPLATE = '''
+    SELECT nextval(pg_get_serial_sequence('container', 'container_id'))
+        AS container_id
+    FROM generate_series(1, %i)
+    '''
+
+    COLUMN_NAMES = ['container_id']
+
+    def __init__(self, number_ids):
+        """
+        Constructor:
+
+        :param int number_ids: The number of container IDs to reserve.
+        """
+        CustomQuery.__init__(self)
+        #: The number of container IDs to reserve.
+        self.number_ids = number_ids
+
+    def _get_params_for_sql_statement(self):
+        return self.number_ids
+
+    def _store_result(self, result_record):
+        self._results.append(result_record[0])
@@ -323,7 +323,7 @@ class SampleRegistrar(RegistrationTool):
         tube_agg = get_root_aggregate(ITube)
         bcs = [getattr(sri, 'tube_barcode')
                for sri in self.registration_items]
-        self.add_debug('Checking tubes. Barcodes: %s' % bcs)
+        self.add_debug('Checking tubes. Barcodes: %s', bcs)
         tube_agg.filter = cntd(barcode=bcs)
         tube_map = dict([(tube.barcode, tube)
                          for tube in tube_agg.iterator()])
@@ -349,8 +349,8 @@ class SampleRegistrar(RegistrationTool):
             sri.container = container
 
     def __make_new_rack(self, sample_registration_item):
-        self.add_debug('Creating new rack for registration barcode %s.'
-                       % sample_registration_item.rack_barcode)
+        self.add_debug('Creating new rack for registration barcode %s.',
+                       sample_registration_item.rack_barcode)
         kw = dict(label='',
                   specs=self.__rack_specs,
                   status=self.__status)
@@ -365,8 +365,8 @@ class SampleRegistrar(RegistrationTool):
         return rack
 
     def __make_new_tube(self, sample_registration_item):
-        self.add_debug('Creating new tube with barcode %s'
-                       % sample_registration_item.tube_barcode)
+        self.add_debug('Creating new tube with barcode %s',
+                       sample_registration_item.tube_barcode)
         kw = dict(specs=self.__container_specs,
                   status=self.__status)
         kw['barcode'] = sample_registration_item.tube_barcode
@@ -465,8 +465,8 @@ class SampleRegistrar(RegistrationTool):
         self.add_debug('Reading rack scanning files.')
         rsl_map = {}
         for rack_scanning_filename in self.__validation_files:
-            self.add_debug('Reading rack scanning file %s.'
-                           % rack_scanning_filename)
+            self.add_debug('Reading rack scanning file %s.',
+                           rack_scanning_filename)
             with open(rack_scanning_filename, 'rU') as rs_stream:
                 parser_handler = AnyRackScanningParserHandler(rs_stream,
                                                               parent=self)
@@ -642,8 +642,8 @@ class SupplierSampleRegistrar(RegistrationTool):
             self.add_error(mdp_registrar.get_messages(logging.ERROR))
 
     def __process_supplier_molecule_designs(self):
-        self.add_debug('Processing %d new supplier molecule designs.'
-                       % len(self.__new_smd_sri_map))
+        self.add_debug('Processing %d new supplier molecule designs.',
+                       len(self.__new_smd_sri_map))
         smd_agg = get_root_aggregate(ISupplierMoleculeDesign)
         new_smds = []
         for key, sris in self.__new_smd_sri_map.iteritems():
@@ -860,8 +860,8 @@ class MoleculeDesignRegistrar(RegistrationTool):
                 continue
             else:
                 cs_map[cs_key] = cs
-        self.add_debug('Creating %d new molecule designs.'
-                       % len(self.__new_mdris))
+        self.add_debug('Creating %d new molecule designs.',
+                       len(self.__new_mdris))
         for mdris in self.__new_mdris:
             md_structs = []
             # By definition, all mdris for a given hash have the same
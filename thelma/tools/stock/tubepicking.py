@@ -14,6 +14,7 @@ also possible to try to minimize the number of stock racks used instead.
 AAB
 """
 from collections import OrderedDict
+from collections import namedtuple
 
 from sqlalchemy.orm.collections import InstrumentedSet
 
@@ -34,13 +35,18 @@ from thelma.entities.moleculedesign import MoleculeDesignPool
 __docformat__ = 'reStructuredText en'
 
 __all__ = ['StockSampleQuery',
+           'DefaultConcentrationStockSampleQuery',
            'TubePoolQuery',
            'TubeCandidate',
+           'TubeSnapshotRecord',
+           'TubeSnapshot',
+           'TubeSnapshotQuery',
            'TubePickingQuery',
            'SinglePoolQuery',
            'MultiPoolQuery',
            'OptimizingQuery',
-           'TubePicker']
+           'TubePicker',
+           'DefaultConcentrationTubePicker']
 
 
 class StockSampleQuery(CustomQuery):
@@ -114,6 +120,52 @@ class StockSampleQuery(CustomQuery):
         add_list_map_element(self._results, pool_id, stock_sample_id)
 
 
+class DefaultConcentrationStockSampleQuery(StockSampleQuery):
+    """
+    This query is used to find suitable stock samples (as IDs) for a list of
+    molecule designs pools, each at the default stock concentration of the
+    pool. Pools with different stock concentrations can be handled by the
+    same query.
+
+    The results are stored in a dictionary (stock sample IDs mapped onto pool
+    IDs).
+    """
+    QUERY_TEMPLATE = '''
+    SELECT ss.molecule_design_set_id AS pool_id,
+           ss.sample_id AS stock_sample_id
+    FROM stock_sample ss, molecule_design_pool mdp, sample s, container c
+    WHERE ss.molecule_design_set_id IN %s
+    AND mdp.molecule_design_set_id = ss.molecule_design_set_id
+    AND ss.concentration = mdp.default_stock_concentration
+    AND s.sample_id = ss.sample_id
+    AND s.volume >= %s
+    AND c.container_id = s.container_id
+    AND c.item_status = '%s'
+    '''
+
+    def __init__(self, pool_ids, minimum_volume=None):
+        """
+        Constructor:
+
+        :param pool_ids: The molecule design pool IDs for which you want to
+            find stock samples.
+        :type pool_ids: collection of :class:`int`
+
+        :param minimum_volume: The minimum volume the tube must have *in ul* -
+            the dead volume of the stock is added to it automatically.
+            If you do pass a minimum volume all samples are accepted.
+        :type minimum_volume: positive number, unit ul
+        """
+        StockSampleQuery.__init__(self, pool_ids, None,
+                                  minimum_volume=minimum_volume)
+
+    def _get_params_for_sql_statement(self):
+        pool_str = create_in_term_for_db_queries(self.pool_ids)
+        vol = (self.minimum_volume + STOCK_DEAD_VOLUME) \
+              / VOLUME_CONVERSION_FACTOR
+        return (pool_str, vol, STOCK_ITEM_STATUS)
+
+
 class TubePoolQuery(CustomQuery):
     """
     This query is used to find the pool IDs for a set of tubes.
@@ -251,6 +303,185 @@ class TubeCandidate(object):
             and other.concentration == self.__concentration
 
 
+#: A snapshot of the data of a stock tube (volume in ul, concentration in
+#: nM). The pool ID is *None* if the tube does not contain a stock sample,
+#: the location is *None* if the tube rack has no barcoded location.
+TubeSnapshotRecord = namedtuple('TubeSnapshotRecord',
+                                ['tube_barcode', 'item_status', 'pool_id',
+                                 'rack_barcode', 'rack_position', 'volume',
+                                 'concentration', 'location'])
+
+
+class TubeSnapshot(object):
+    """
+    A compact, read-only collection of :class:`TubeSnapshotRecord` objects
+    (one per tube) that can be looked up by tube barcode and by pool ID.
+
+    Using a snapshot instead of tube entities avoids lazy loading of samples,
+    tube locations, racks and rack locations for each individual tube.
+    """
+    def __init__(self):
+        #: The records in the order in which they have been added.
+        self.__records = []
+        #: Maps record indices onto tube barcodes.
+        self.__barcode_index = dict()
+        #: Maps lists of record indices onto pool IDs.
+        self.__pool_index = dict()
+
+    def add_record(self, record):
+        """
+        Adds a :class:`TubeSnapshotRecord`. Records for tube barcodes that
+        are already present are ignored.
+        """
+        if not record.tube_barcode in self.__barcode_index:
+            index = len(self.__records)
+            self.__records.append(record)
+            self.__barcode_index[record.tube_barcode] = index
+            if not record.pool_id is None:
+                add_list_map_element(self.__pool_index, record.pool_id, index)
+
+    def get_record(self, tube_barcode):
+        """
+        Returns the record for the given tube barcode (or *None*).
+        """
+        index = self.__barcode_index.get(tube_barcode)
+        if index is None:
+            result = None
+        else:
+            result = self.__records[index]
+        return result
+
+    def get_records_for_pool(self, pool_id):
+        """
+        Returns the records for all tubes containing the given pool.
+        """
+        return [self.__records[index]
+                for index in self.__pool_index.get(pool_id, [])]
+
+    def get_tube_candidate(self, tube_barcode):
+        """
+        Converts the record for the given tube barcode into a
+        :class:`TubeCandidate` (or returns *None* if there is no such tube
+        or if the tube does not contain a stock sample).
+        """
+        record = self.get_record(tube_barcode)
+        if record is None or record.pool_id is None:
+            result = None
+        else:
+            result = TubeCandidate(pool_id=record.pool_id,
+                        rack_barcode=record.rack_barcode,
+                        rack_position=record.rack_position,
+                        tube_barcode=record.tube_barcode,
+                        concentration=record.concentration
+                                      / CONCENTRATION_CONVERSION_FACTOR,
+                        volume=record.volume / VOLUME_CONVERSION_FACTOR)
+        return result
+
+    def get_rack_barcodes(self):
+        """
+        Returns the set of rack barcodes of all tubes in the snapshot.
+        """
+        return set([record.rack_barcode for record in self.__records])
+
+    def __contains__(self, tube_barcode):
+        return tube_barcode in self.__barcode_index
+
+    def __iter__(self):
+        return iter(self.__records)
+
+    def __len__(self):
+        return len(self.__records)
+
+    def __repr__(self):
+        str_format = '<%s number of tubes: %i>'
+        params = (self.__class__.__name__, len(self.__records))
+        return str_format % params
+
+
+class TubeSnapshotQuery(CustomQuery):
+    """
+    Fetches the tube, sample, rack position and rack location data for a
+    set of tubes in a single statement.
+
+    The results are stored in a :class:`TubeSnapshot`.
+    """
+    QUERY_TEMPLATE = '''
+    SELECT t.barcode AS tube_barcode,
+        c.item_status AS item_status,
+        ss.molecule_design_set_id AS pool_id,
+        r.barcode AS rack_barcode,
+        rp.row_index AS row_index,
+        rp.column_index AS column_index,
+        s.volume AS volume,
+        ss.concentration AS concentration,
+        bl.name AS location_name,
+        bl.index AS location_index
+    FROM tube t
+        INNER JOIN container c ON c.container_id = t.container_id
+        LEFT OUTER JOIN sample s ON s.container_id = t.container_id
+        LEFT OUTER JOIN stock_sample ss ON ss.sample_id = s.sample_id
+        LEFT OUTER JOIN tube_location tl ON tl.container_id = t.container_id
+        LEFT OUTER JOIN rack_position rp
+            ON rp.rack_position_id = tl.rack_position_id
+        LEFT OUTER JOIN rack r ON r.rack_id = tl.rack_id
+        LEFT OUTER JOIN rack_barcoded_location rbl ON rbl.rack_id = r.rack_id
+        LEFT OUTER JOIN barcoded_location bl
+            ON bl.barcoded_location_id = rbl.barcoded_location_id
+    WHERE t.barcode IN %s
+    '''
+
+    COLUMN_NAMES = ['tube_barcode', 'item_status', 'pool_id', 'rack_barcode',
+                    'row_index', 'column_index', 'volume', 'concentration',
+                    'location_name', 'location_index']
+
+    RESULT_COLLECTION_CLS = TubeSnapshot
+
+    def __init__(self, tube_barcodes):
+        """
+        Constructor:
+
+        :param tube_barcodes: The barcodes of the tubes to fetch.
+        :type tube_barcodes: collection of :class:`basestring`
+        """
+        CustomQuery.__init__(self)
+        #: The barcodes of the tubes to fetch.
+        self.tube_barcodes = tube_barcodes
+
+    def _get_params_for_sql_statement(self):
+        return create_in_term_for_db_queries(self.tube_barcodes,
+                                             as_string=True)
+
+    def _store_result(self, result_record):
+        (tube_barcode, item_status, pool_id, rack_barcode, row_index,
+         column_index, volume, concentration, location_name,
+         location_index) = result_record
+        if row_index is None or column_index is None:
+            rack_pos = None
+        else:
+            rack_pos = get_rack_position_from_indices(row_index=row_index,
+                                                  column_index=column_index)
+        if not volume is None:
+            volume = volume * VOLUME_CONVERSION_FACTOR
+        if not concentration is None:
+            concentration = concentration * CONCENTRATION_CONVERSION_FACTOR
+        if not location_name is None and not location_index is None:
+            location_name += ', index: %s' % (location_index)
+        record = TubeSnapshotRecord(tube_barcode=tube_barcode,
+                                    item_status=item_status,
+                                    pool_id=pool_id,
+                                    rack_barcode=rack_barcode,
+                                    rack_position=rack_pos,
+                                    volume=volume,
+                                    concentration=concentration,
+                                    location=location_name)
+        self._results.add_record(record)
+
+    def __repr__(self):
+        str_format = '<%s number of tube barcodes: %s>'
+        params = (self.__class__.__name__, len(self.tube_barcodes))
+        return str_format % params
+
+
 class TubePickingQuery(CustomQuery): # pylint: disable=W0223
     """
     An abstract class creating and running a DB query that picks stock tubes
@@ -624,7 +855,7 @@ class TubePicker(SessionTool):
             self._create_pool_map()
         if not self.has_errors():
             self._get_stock_samples()
-        if not self.has_errors() and len(self._stock_samples) > 0:
+        if not self.has_errors():
             self._run_optimizer()
         if not self.has_errors():
             self._look_for_missing_candidates()
@@ -654,16 +885,22 @@ class TubePicker(SessionTool):
             msg = 'The stock take out volume must be a positive number ' \
                   '(obtained: %s) or None.' % (self.take_out_volume)
             self.add_error(msg)
-        if not is_valid_number(self.stock_concentration):
-            msg = 'The stock concentration must be a positive number ' \
-                  '(obtained: %s).' % (self.stock_concentration)
-            self.add_error(msg)
+        self._check_stock_concentration()
         self._check_input_list_classes('excluded rack', self.excluded_racks,
                                        basestring, may_be_empty=True)
         if self._check_input_list_classes('requested tube',
                     self.requested_tubes, basestring, may_be_empty=True):
             self.requested_tubes = set(self.requested_tubes)
 
+    def _check_stock_concentration(self):
+        """
+        Checks the stock concentration.
+        """
+        if not is_valid_number(self.stock_concentration):
+            msg = 'The stock concentration must be a positive number ' \
+                  '(obtained: %s).' % (self.stock_concentration)
+            self.add_error(msg)
+
     def _create_pool_map(self):
         """
         Queries only return IDs that why we store a lookup.
@@ -688,27 +925,33 @@ class TubePicker(SessionTool):
             for pool_id, stock_sample_ids in sample_map.iteritems():
                 found_pools.add(pool_id)
                 self._stock_samples.extend(stock_sample_ids)
+            self._check_found_pools(found_pools)
 
-            if len(found_pools) < 1:
-                msg = 'Did not find any candidate!'
-                self.add_error(msg)
-            elif not len(found_pools) == len(self._pool_map):
-                missing_pools = []
-                for pool_id, md_id in self._pool_map.iteritems():
-                    if not pool_id in found_pools:
-                        missing_pools.append('%s (md: %s)' % (pool_id, md_id))
-                msg = 'Could not find suitable source stock tubes for the ' \
-                      'following molecule design pools: %s.' \
-                      % (', '.join(sorted(missing_pools)))
-                self.add_warning(msg)
+    def _check_found_pools(self, found_pools):
+        """
+        Records an error if there are no stock samples at all and a warning
+        for pools without stock samples.
+        """
+        if len(found_pools) < 1:
+            msg = 'Did not find any candidate!'
+            self.add_error(msg)
+        elif not len(found_pools) == len(self._pool_map):
+            missing_pools = []
+            for pool_id, md_id in self._pool_map.iteritems():
+                if not pool_id in found_pools:
+                    missing_pools.append('%s (md: %s)' % (pool_id, md_id))
+            msg = 'Could not find suitable source stock tubes for the ' \
+                  'following molecule design pools: %s.' \
+                  % (', '.join(sorted(missing_pools)))
+            self.add_warning(msg)
 
     def _run_optimizer(self):
         """
-        Runs the actual optimising query (by default we use the
-        :class:`OptimizingQuery`).
+        Runs the actual optimising query (see
+        :func:`_create_optimizing_query`).
         """
         self.add_debug('Run optimizing query ...')
-        query = OptimizingQuery(sample_ids=self._stock_samples)
+        query = self._create_optimizing_query()
         self._run_query(query, 'Error when trying to run optimizing query: ')
         if not self.has_errors():
             self._unsorted_candidates = query.get_query_results()
@@ -722,6 +965,13 @@ class TubePicker(SessionTool):
         else:
             self._sort_candidates()
 
+    def _create_optimizing_query(self):
+        """
+        Returns the optimizing query to run (by default an
+        :class:`OptimizingQuery` for the :attr:`_stock_samples`).
+        """
+        return OptimizingQuery(sample_ids=self._stock_samples)
+
     def _store_candidate_data(self, candidate):
         """
         Stores the candidate in the :attr:`_picked_candidates` map. Subclasses
@@ -776,3 +1026,61 @@ class TubePicker(SessionTool):
             msg = 'Unable to find valid tubes for the following pools: ' \
                   '%s.' % (self._get_joined_str(diff, is_strs=False))
             self.add_warning(msg)
+
+
+class DefaultConcentrationTubePicker(TubePicker):
+    """
+    Picks tubes for a set of molecule design pools, each at the default
+    stock concentration of the pool. Unlike the super class, pools with
+    different stock concentrations are picked together (one stock sample
+    query and one optimizing query for all pools).
+
+    **Return Value:** the candidates objects
+    """
+    NAME = 'Default Concentration Tube Picker'
+
+    def __init__(self, molecule_design_pools, take_out_volume=None,
+                 excluded_racks=None, requested_tubes=None, parent=None):
+        """
+        Constructor.
+
+        :param set molecule_design_pools: Set of molecule design pools
+            (:class:`thelma.entities.moleculedesign.MoleculeDesignPool`) for
+            which to run the query.
+        :type molecule_design_pools: :class:`set` of molecule design pools
+
+        :param int take_out_volume: The volume that shall be removed from the
+            stock sample *in ul* (positive number; may be *None*, in which
+            case we do not filter for at least stock dead volume).
+        :param list excluded_racks: List of barcodes from stock racks that shall
+            not be used for molecule design picking.
+        :param list requested_tubes: List of barcodes from stock tubes that are
+            supposed to be used.
+        """
+        TubePicker.__init__(self, molecule_design_pools, None,
+                            take_out_volume=take_out_volume,
+                            excluded_racks=excluded_racks,
+                            requested_tubes=requested_tubes,
+                            parent=parent)
+
+    def _check_stock_concentration(self):
+        """
+        The stock concentrations are taken from the pools.
+        """
+        pass
+
+    def _get_stock_samples(self):
+        """
+        Determines suitable stock samples. Suitable tubes must be managed,
+        and have the default stock concentration of their pool.
+        """
+        self.add_debug('Get stock samples ...')
+        query = DefaultConcentrationStockSampleQuery(
+                                    pool_ids=self._pool_map.keys(),
+                                    minimum_volume=self.take_out_volume)
+        self._run_query(query, 'Error when trying to query stock samples: ')
+        if not self.has_errors():
+            sample_map = query.get_query_results()
+            for stock_sample_ids in sample_map.itervalues():
+                self._stock_samples.extend(stock_sample_ids)
+            self._check_found_pools(set(sample_map.keys()))
@@ -29,6 +29,7 @@ from thelma.entities.utils import get_user
 __docformat__ = "reStructuredText en"
 __all__ = ['ParameterSet',
            'ParameterAliasValidator',
+           'TagPool',
            'WorkingPosition',
            'WorkingLayout',
            'MoleculeDesignPoolParameters',
@@ -198,6 +199,50 @@ class ParameterAliasValidator(object):
         return str_format % params
 
 
+class TagPool(object):
+    """
+    Interns tag keys (*(domain, predicate, value)* tuples, see
+    :func:`WorkingPosition.get_tag_keys`) during a layout conversion: each
+    distinct key is mapped onto an integer ID and gets exactly one
+    :class:`Tag` entity, however many positions share it.
+
+    Tags are entities that become part of a DB session, so the pool must not
+    outlive the conversion it is created for.
+    """
+    def __init__(self):
+        #: Maps tag IDs onto tag keys.
+        self.__id_map = dict()
+        #: The tag keys in the order of their IDs.
+        self.__tag_keys = []
+        #: The tags created so far mapped onto tag IDs.
+        self.__tags = dict()
+
+    def get_tag_id(self, tag_key):
+        """
+        Returns the ID for the given tag key (a new ID is assigned to unknown
+        keys).
+        """
+        tag_id = self.__id_map.get(tag_key)
+        if tag_id is None:
+            tag_id = len(self.__tag_keys)
+            self.__id_map[tag_key] = tag_id
+            self.__tag_keys.append(tag_key)
+        return tag_id
+
+    def get_tag(self, tag_id):
+        """
+        Returns the (shared) :class:`Tag` for the given tag ID.
+        """
+        tag = self.__tags.get(tag_id)
+        if tag is None:
+            tag = Tag(*self.__tag_keys[tag_id])
+            self.__tags[tag_id] = tag
+        return tag
+
+    def __len__(self):
+        return len(self.__tag_keys)
+
+
 class WorkingPosition(object):
     """
     Working position comprise a rack position and some additional information
@@ -246,14 +291,16 @@ class WorkingPosition(object):
         parameter_values = self._get_parameter_values_map()
         return parameter_values[parameter]
 
-    def get_parameter_tag(self, parameter):
+    def get_parameter_tag_key(self, parameter):
         """
-        Returns the tags for requested parameter.
+        Returns the tag key (a *(domain, predicate, value)* tuple) for the
+        requested parameter.
 
         :param parameter: A parameter from the :attr:`ParameterSet` associated
             to this working position type.
         :type parameter: :class:`string`
-        :return: the tag displaying the data for the parameter
+        :return: the tag key for the parameter (or *None* if there is no tag
+            for this parameter)
         """
         value = self.get_parameter_value(parameter)
 
@@ -266,26 +313,60 @@ class WorkingPosition(object):
             value = self.get_value_string(value)
 
         domain = self.PARAMETER_SET.DOMAIN_MAP[parameter]
-        return Tag(domain, parameter, value)
+        return (domain, parameter, Tag.normalize_value(value))
 
-    def get_tag_set(self):
+    def get_parameter_tag(self, parameter):
         """
-        Returns the tag set for this working position.
+        Returns the tags for requested parameter.
+
+        :param parameter: A parameter from the :attr:`ParameterSet` associated
+            to this working position type.
+        :type parameter: :class:`string`
+        :return: the tag displaying the data for the parameter
+        """
+        tag_key = self.get_parameter_tag_key(parameter)
+        if tag_key is None:
+            return None
+        return Tag(*tag_key)
+
+    def get_tag_keys(self):
         """
-        tag_set = set()
+        Returns the tag keys (*(domain, predicate, value)* tuples) for this
+        working position.
+
+        The keys are not cached because the parameter values may change
+        without an assignment (e.g. lists of transfer targets or the IDs of
+        entities that have not been flushed yet); layouts request them once
+        per position and operation.
+
+        :rtype: :class:`frozenset`
+        """
+        return frozenset(self._create_tag_keys())
+
+    def _create_tag_keys(self):
+        """
+        Returns the tag keys for all parameters (see :func:`get_tag_keys`).
+        """
+        tag_keys = set()
         for parameter in self.PARAMETER_SET.REQUIRED:
-            tag = self.get_parameter_tag(parameter)
-            if tag is None: continue
-            tag_set.add(tag)
+            tag_key = self.get_parameter_tag_key(parameter)
+            if tag_key is None: continue
+            tag_keys.add(tag_key)
 
         for parameter in self.PARAMETER_SET.ALL:
             if parameter in self.PARAMETER_SET.REQUIRED: continue
             if self.get_parameter_value(parameter) is None: continue
-            tag = self.get_parameter_tag(parameter)
-            if tag is None: continue
-            tag_set.add(tag)
+            tag_key = self.get_parameter_tag_key(parameter)
+            if tag_key is None: continue
+            tag_keys.add(tag_key)
+
+        return tag_keys
 
-        return tag_set
+    def get_tag_set(self):
+        """
+        Returns the tag set for this working position.
+        """
+        return set([Tag(*tag_key) for tag_key in self.get_tag_keys()])
 
     def has_tag(self, tag):
         """
@@ -296,8 +377,7 @@ class WorkingPosition(object):
 
         :return: :class:`boolean`
         """
-        tag_set = self.get_tag_set()
-        return tag in tag_set
+        return (tag.domain, tag.predicate, tag.value) in self.get_tag_keys()
 
     def _get_parameter_values_map(self):
         """
@@ -441,11 +521,12 @@ class WorkingLayout(object):
 
         :rtype: set of :class:`thelma.entities.tagging.Tag`
         """
-        tags = set()
+        tag_pool = TagPool()
+        tag_ids = set()
         for working_position in self._position_map.values():
-            for tag in working_position.get_tag_set():
-                if not tag in tags: tags.add(tag)
-        return tags
+            for tag_key in working_position.get_tag_keys():
+                tag_ids.add(tag_pool.get_tag_id(tag_key))
+        return set([tag_pool.get_tag(tag_id) for tag_id in tag_ids])
 
     def get_positions(self):
         """
@@ -512,26 +593,30 @@ class WorkingLayout(object):
         Creates a list of tagged rack position sets for this layout.
         """
 
-        tag_map = dict()
+        tag_pool = TagPool()
+        position_map = dict()
         for rack_position, working_position in self._position_map.iteritems():
-            for tag in working_position.get_tag_set():
-                if not tag_map.has_key(tag): tag_map[tag] = set()
-                tag_map[tag].add(rack_position)
+            for tag_key in working_position.get_tag_keys():
+                tag_id = tag_pool.get_tag_id(tag_key)
+                if not position_map.has_key(tag_id):
+                    position_map[tag_id] = set()
+                position_map[tag_id].add(rack_position)
 
         rps_map = dict()
         rps_tag_map = dict()
-        for tag, pos_set in tag_map.iteritems():
+        for tag_id, pos_set in position_map.iteritems():
             rack_pos_set = RackPositionSet.from_positions(pos_set)
             hash_value = rack_pos_set.hash_value
             if not rps_map.has_key(hash_value):
                 rps_map[hash_value] = rack_pos_set
                 rps_tag_map[hash_value] = set()
-            rps_tag_map[hash_value].add(tag)
+            rps_tag_map[hash_value].add(tag_id)
 
         tagged_rack_position_sets = []
         for hash_value in rps_map.keys():
             rack_pos_set = rps_map[hash_value]
-            tags = rps_tag_map[hash_value]
+            tags = set([tag_pool.get_tag(tag_id)
+                        for tag_id in rps_tag_map[hash_value]])
             trps = TaggedRackPositionSet(tags, rack_pos_set, self._user)
             tagged_rack_position_sets.append(trps)
 
@@ -949,28 +1034,29 @@ class MoleculeDesignPoolPosition(WorkingPosition):
         """
         return cls.PARAMETER_SET.is_valid_mock_value(value, parameter)
 
-    def get_tag_set(self):
+    def _create_tag_keys(self):
         """
         Empty and untreated position return only the position type tag.
         All other return all value tags.
         """
         if self.is_empty and not self.is_untreated_type:
-            tset = set([self.get_parameter_tag(self.PARAMETER_SET.POS_TYPE)])
+            tag_keys = set([self.get_parameter_tag_key(
+                                            self.PARAMETER_SET.POS_TYPE)])
         else:
-            tset = WorkingPosition.get_tag_set(self)
-        return tset
+            tag_keys = WorkingPosition._create_tag_keys(self)
+        return tag_keys
 
-    def get_parameter_tag(self, parameter):
+    def get_parameter_tag_key(self, parameter):
         """
         The return value for position types is *None* if
         :attr:`EXPOSE_POSITION_TYPE` is *False*.
         """
         if parameter == self.PARAMETER_SET.POS_TYPE and \
                                             not self.EXPOSE_POSITION_TYPE:
-            tag = None
+            tag_key = None
         else:
-            tag = WorkingPosition.get_parameter_tag(self, parameter)
-        return tag
+            tag_key = WorkingPosition.get_parameter_tag_key(self, parameter)
+        return tag_key
 
     def _get_parameter_values_map(self):
         """
@@ -1416,9 +1502,9 @@ class TransferPosition(MoleculeDesignPoolPosition):
         for tt in target_list: targets.append(tt.target_info)
         return self.TARGETS_DELIMITER.join(sorted(targets))
 
-    def get_targets_tag(self, parameter_name=None):
+    def get_targets_tag_key(self, parameter_name=None):
         """
-        Returns the transfer target tag for the specified parameter
+        Returns the transfer target tag key for the specified parameter
         (by default: :attr:`TRANSFER_TARGETS`).
 
         Invokes :func:`get_targets_tag_value`.
@@ -1434,8 +1520,20 @@ class TransferPosition(MoleculeDesignPoolPosition):
                 raise AttributeError(msg)
             else:
                 return None
-        return Tag(self.PARAMETER_SET.DOMAIN_MAP[parameter_name],
-                   parameter_name, value)
+        return (self.PARAMETER_SET.DOMAIN_MAP[parameter_name],
+                parameter_name, Tag.normalize_value(value))
+
+    def get_targets_tag(self, parameter_name=None):
+        """
+        Returns the transfer target tag for the specified parameter
+        (by default: :attr:`TRANSFER_TARGETS`).
+
+        Invokes :func:`get_targets_tag_key`.
+        """
+        tag_key = self.get_targets_tag_key(parameter_name)
+        if tag_key is None:
+            return None
+        return Tag(*tag_key)
 
     @classmethod
     def parse_target_tag_value(cls, target_tag_value):
@@ -1461,17 +1559,17 @@ class TransferPosition(MoleculeDesignPoolPosition):
                 hash_values.add(tt.hash_value)
         return target_list
 
-    def get_parameter_tag(self, parameter):
+    def get_parameter_tag_key(self, parameter):
         """
         The method needs to be overwritten because the value for the molecule
         designs tag is a concatenated string.
         """
         if parameter in self.PARAMETER_SET.TRANSFER_TARGET_PARAMETERS:
-            tag = self.get_targets_tag(parameter)
+            tag_key = self.get_targets_tag_key(parameter)
         else:
-            tag = MoleculeDesignPoolPosition.get_parameter_tag(self,
-                                                               parameter)
-        return tag
+            tag_key = MoleculeDesignPoolPosition.get_parameter_tag_key(self,
+                                                                   parameter)
+        return tag_key
 
     def _get_parameter_values_map(self):
         """
@@ -0,0 +1,365 @@
+"""
+This file is part of the TheLMA (THe Laboratory Management Application) project.
+See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
+
+Set-based sample operations on whole racks.
+
+Created on Oct 19, 2026.
+"""
+from sqlalchemy.orm.attributes import instance_dict
+from sqlalchemy.orm.attributes import instance_state
+from sqlalchemy.orm.util import identity_key
+from sqlalchemy.sql.expression import text
+
+from everest.entities.utils import get_root_aggregate
+from everest.querying.specifications import cntd
+from everest.repositories.rdb.aggregate import RdbAggregate
+from everest.repositories.rdb.session import ScopedSessionMaker as Session
+from thelma.entities.container import Container
+from thelma.entities.sample import SAMPLE_TYPES
+from thelma.interfaces import IRack
+from thelma.interfaces import ISample
+from thelma.interfaces import ITube
+from thelma.tools.utils.base import create_in_term_for_db_queries
+
+
+__docformat__ = 'reStructuredText en'
+__all__ = ['RackSampleOperations',
+           'RdbRackSampleOperations',
+           'EntityRackSampleOperations',
+           'get_rack_sample_operations',
+           ]
+
+
+class RackSampleOperations(object):
+    """
+    Abstract base class for operations creating or removing the samples of
+    whole racks.
+
+    All volumes are given in l and all concentrations in M. Samples already
+    present in the target containers are replaced. The operations do not
+    alter the status of the racks.
+    """
+    def copy_samples(self, source_rack, target_racks, volume):
+        """
+        Copies all samples of the source rack to the containers in the same
+        positions of the target racks. The new samples have the given volume
+        and the sample molecule concentrations of their source samples.
+
+        :param source_rack: The rack to copy the samples from.
+        :type source_rack: :class:`thelma.entities.rack.Rack`
+        :param target_racks: The racks to copy the samples to.
+        :type target_racks: sequence of :class:`thelma.entities.rack.Rack`
+        :param float volume: The volume of the new samples.
+        :return: The number of created samples.
+        """
+        raise NotImplementedError('Abstract method.')
+
+    def erase_samples(self, racks):
+        """
+        Removes all samples from the containers of the given racks.
+
+        :param racks: The racks to erase.
+        :type racks: sequence of :class:`thelma.entities.rack.Rack`
+        :return: The number of removed samples.
+        """
+        raise NotImplementedError('Abstract method.')
+
+    def stamp_samples(self, target_rack, position_tube_map, volume,
+                      concentration):
+        """
+        Creates samples in the given positions of the target rack containing
+        the molecules of the samples in the mapped stock tubes. The total
+        concentration is split evenly among the molecules of a sample.
+
+        :param target_rack: The rack to create the samples in.
+        :type target_rack: :class:`thelma.entities.rack.Rack`
+        :param position_tube_map: Maps source tube barcodes onto target rack
+            positions.
+        :type position_tube_map: :class:`dict`
+        :param float volume: The volume of the new samples.
+        :param float concentration: The total molecule concentration of the
+            new samples.
+        :return: The number of created samples.
+        """
+        raise NotImplementedError('Abstract method.')
+
+
+class RdbRackSampleOperations(RackSampleOperations):
+    """
+    Runs the rack sample operations as a few INSERT ... SELECT and DELETE
+    statements. No entities are loaded or created. Samples that are replaced
+    by a copy or stamp operation are deleted first (as if the new samples
+    had been created with :func:`Container.make_sample`). Afterwards, the
+    sample of all containers of the affected racks that are present in the
+    session is expired (and deleted samples are expunged) so that the next
+    access reloads the new state.
+    """
+    #: Selects the IDs of the target plate samples that are replaced by the
+    #: :attr:`COPY_SAMPLE_STATEMENT`.
+    COPY_TARGET_SAMPLE_QUERY = '''
+    SELECT ts.sample_id
+    FROM well sw
+        INNER JOIN sample ss ON ss.container_id = sw.container_id
+        INNER JOIN well tw ON tw.rack_position_id = sw.rack_position_id
+        INNER JOIN sample ts ON ts.container_id = tw.container_id
+    WHERE sw.rack_id = :source_rack_id
+        AND tw.rack_id IN %(target_rack_ids)s
+    '''
+
+    #: Copies the samples of a source plate to the same positions of a set of
+    #: target plates.
+    COPY_SAMPLE_STATEMENT = '''
+    INSERT INTO sample (sample_type, container_id, volume)
+    SELECT '%(sample_type)s', tw.container_id, :volume
+    FROM well sw
+        INNER JOIN sample ss ON ss.container_id = sw.container_id
+        INNER JOIN well tw ON tw.rack_position_id = sw.rack_position_id
+    WHERE sw.rack_id = :source_rack_id
+        AND tw.rack_id IN %(target_rack_ids)s
+    '''
+
+    #: Copies the molecules of the source plate samples to the samples created
+    #: by the :attr:`COPY_SAMPLE_STATEMENT`.
+    COPY_SAMPLE_MOLECULE_STATEMENT = '''
+    INSERT INTO sample_molecule (sample_id, molecule_id, concentration)
+    SELECT ts.sample_id, sm.molecule_id, sm.concentration
+    FROM well sw
+        INNER JOIN sample ss ON ss.container_id = sw.container_id
+        INNER JOIN sample_molecule sm ON sm.sample_id = ss.sample_id
+        INNER JOIN well tw ON tw.rack_position_id = sw.rack_position_id
+        INNER JOIN sample ts ON ts.container_id = tw.container_id
+    WHERE sw.rack_id = :source_rack_id
+        AND tw.rack_id IN %(target_rack_ids)s
+    '''
+
+    #: Selects the IDs of the containers of a set of racks (plates and tube
+    #: racks).
+    RACK_CONTAINER_QUERY = '''
+    SELECT w.container_id FROM well w
+    WHERE w.rack_id IN %(rack_ids)s
+    UNION ALL
+    SELECT tl.container_id FROM tube_location tl
+    WHERE tl.rack_id IN %(rack_ids)s
+    '''
+
+    #: Selects the IDs of the samples in the containers of a set of racks
+    #: (plates and tube racks).
+    RACK_SAMPLE_QUERY = '''
+    SELECT s.sample_id
+    FROM sample s
+    WHERE s.container_id IN (%s)
+    ''' % RACK_CONTAINER_QUERY
+
+    #: Removes a set of samples (the sample molecules are removed by the
+    #: database cascade; stock sample records have to be removed
+    #: explicitly).
+    DELETE_SAMPLE_STATEMENTS = [
+        'DELETE FROM stock_sample WHERE sample_id IN %(sample_ids)s',
+        'DELETE FROM sample WHERE sample_id IN %(sample_ids)s']
+
+    #: Selects the IDs of the target plate samples that are replaced by the
+    #: :attr:`STAMP_SAMPLE_STATEMENT`.
+    STAMP_TARGET_SAMPLE_QUERY = '''
+    SELECT ts.sample_id
+    FROM (VALUES %(position_tube_values)s)
+            AS pt (rack_position_id, tube_barcode)
+        INNER JOIN well tw ON tw.rack_position_id = pt.rack_position_id
+        INNER JOIN sample ts ON ts.container_id = tw.container_id
+        INNER JOIN tube t ON t.barcode = pt.tube_barcode
+        INNER JOIN sample ss ON ss.container_id = t.container_id
+    WHERE tw.rack_id = :target_rack_id
+    '''
+
+    #: Creates empty samples in the positions of a target plate that are
+    #: mapped onto a source tube holding a sample.
+    STAMP_SAMPLE_STATEMENT = '''
+    INSERT INTO sample (sample_type, container_id, volume)
+    SELECT '%(sample_type)s', tw.container_id, :volume
+    FROM (VALUES %(position_tube_values)s)
+            AS pt (rack_position_id, tube_barcode)
+        INNER JOIN well tw ON tw.rack_position_id = pt.rack_position_id
+        INNER JOIN tube t ON t.barcode = pt.tube_barcode
+        INNER JOIN sample ss ON ss.container_id = t.container_id
+    WHERE tw.rack_id = :target_rack_id
+    '''
+
+    #: Adds the molecules of the source tube samples to the samples created
+    #: by the :attr:`STAMP_SAMPLE_STATEMENT`.
+    STAMP_SAMPLE_MOLECULE_STATEMENT = '''
+    INSERT INTO sample_molecule (sample_id, molecule_id, concentration)
+    SELECT ts.sample_id, sm.molecule_id,
+        :concentration / count(*) OVER (PARTITION BY ts.sample_id)
+    FROM (VALUES %(position_tube_values)s)
+            AS pt (rack_position_id, tube_barcode)
+        INNER JOIN well tw ON tw.rack_position_id = pt.rack_position_id
+        INNER JOIN sample ts ON ts.container_id = tw.container_id
+        INNER JOIN tube t ON t.barcode = pt.tube_barcode
+        INNER JOIN sample ss ON ss.container_id = t.container_id
+        INNER JOIN sample_molecule sm ON sm.sample_id = ss.sample_id
+    WHERE tw.rack_id = :target_rack_id
+    '''
+
+    def copy_samples(self, source_rack, target_racks, volume):
+        if len(target_racks) < 1:
+            return 0
+        params = dict(source_rack_id=source_rack.id, volume=volume)
+        subs = dict(sample_type=SAMPLE_TYPES.BASIC,
+                    target_rack_ids=self.__get_rack_id_term(target_racks))
+        session = Session()
+        deleted_ids = self.__delete_samples(
+                                session, self.COPY_TARGET_SAMPLE_QUERY % subs,
+                                params)
+        result = session.execute(text(self.COPY_SAMPLE_STATEMENT % subs),
+                                 params)
+        session.execute(text(self.COPY_SAMPLE_MOLECULE_STATEMENT % subs),
+                        params)
+        self.__expire_samples(session, target_racks, deleted_ids)
+        return result.rowcount
+
+    def erase_samples(self, racks):
+        if len(racks) < 1:
+            return 0
+        subs = dict(rack_ids=self.__get_rack_id_term(racks))
+        session = Session()
+        deleted_ids = self.__delete_samples(session,
+                                            self.RACK_SAMPLE_QUERY % subs)
+        self.__expire_samples(session, racks, deleted_ids)
+        return len(deleted_ids)
+
+    def stamp_samples(self, target_rack, position_tube_map, volume,
+                      concentration):
+        if len(position_tube_map) < 1:
+            return 0
+        params = dict(target_rack_id=target_rack.id, volume=volume,
+                      concentration=concentration)
+        value_terms = []
+        for idx, (pos, tube_barcode) in \
+                    enumerate(sorted(position_tube_map.iteritems())):
+            value_terms.append('(:rack_position_id_%i, :tube_barcode_%i)'
+                               % (idx, idx))
+            params['rack_position_id_%i' % idx] = pos.id
+            params['tube_barcode_%i' % idx] = tube_barcode
+        subs = dict(sample_type=SAMPLE_TYPES.BASIC,
+                    position_tube_values=', '.join(value_terms))
+        session = Session()
+        deleted_ids = self.__delete_samples(
+                                session,
+                                self.STAMP_TARGET_SAMPLE_QUERY % subs, params)
+        result = session.execute(text(self.STAMP_SAMPLE_STATEMENT % subs),
+                                 params)
+        session.execute(text(self.STAMP_SAMPLE_MOLECULE_STATEMENT % subs),
+                        params)
+        self.__expire_samples(session, [target_rack], deleted_ids)
+        return result.rowcount
+
+    def __get_rack_id_term(self, racks):
+        return create_in_term_for_db_queries([rack.id for rack in racks])
+
+    def __delete_samples(self, session, sample_query, params=None):
+        # Deletes the samples selected by the given query and returns their
+        # IDs.
+        if params is None:
+            params = dict()
+        sample_ids = set([row[0] for row in
+                          session.execute(text(sample_query), params)])
+        if len(sample_ids) > 0:
+            subs = dict(sample_ids=create_in_term_for_db_queries(sample_ids))
+            for statement in self.DELETE_SAMPLE_STATEMENTS:
+                session.execute(text(statement % subs))
+        return sample_ids
+
+    def __expire_samples(self, session, racks, deleted_sample_ids):
+        # The statements bypass the session, so the sample of every loaded
+        # container of the given racks has to be reloaded on next access.
+        # Deleted samples (and their sample molecules) are removed from the
+        # session.
+        subs = dict(rack_ids=self.__get_rack_id_term(racks))
+        for row in session.execute(text(self.RACK_CONTAINER_QUERY % subs)):
+            container = session.identity_map.get(
+                                            identity_key(Container, row[0]))
+            if container is None:
+                continue
+            sample = instance_dict(container).get('sample')
+            if sample is None:
+                sample_identity = None
+            else:
+                # Accessing the (possibly expired) ID would try to reload
+                # the deleted record.
+                sample_identity = instance_state(sample).identity
+            if not sample_identity is None and \
+                    sample_identity[0] in deleted_sample_ids:
+                sample_mols = instance_dict(sample).get('sample_molecules')
+                for sample_mol in sample_mols or []:
+                    if sample_mol in session:
+                        session.expunge(sample_mol)
+                if sample in session:
+                    session.expunge(sample)
+            session.expire(container, ['sample'])
+
+
+class EntityRackSampleOperations(RackSampleOperations):
+    """
+    Runs the rack sample operations on the sample entities (used with the
+    memory repository).
+    """
+    def copy_samples(self, source_rack, target_racks, volume):
+        cnt = 0
+        for target_rack in target_racks:
+            for pos, src_cnt in source_rack.container_positions.iteritems():
+                if src_cnt is None or src_cnt.sample is None:
+                    continue
+                tgt_cnt = target_rack.container_positions.get(pos)
+                if tgt_cnt is None:
+                    continue
+                tgt_smpl = tgt_cnt.make_sample(volume)
+                for sm in src_cnt.sample.sample_molecules:
+                    tgt_smpl.make_sample_molecule(sm.molecule,
+                                                  sm.concentration)
+                cnt += 1
+        return cnt
+
+    def erase_samples(self, racks):
+        sample_agg = get_root_aggregate(ISample)
+        cnt = 0
+        for rack in racks:
+            for container in rack.container_positions.itervalues():
+                if container is None or container.sample is None:
+                    continue
+                sample_agg.remove(container.sample)
+                container.sample = None
+                cnt += 1
+        return cnt
+
+    def stamp_samples(self, target_rack, position_tube_map, volume,
+                      concentration):
+        tube_agg = get_root_aggregate(ITube)
+        tube_agg.filter = cntd(barcode=set(position_tube_map.values()))
+        tube_map = dict([(tube.barcode, tube) for tube in tube_agg.iterator()])
+        cnt = 0
+        for pos, tube_barcode in position_tube_map.iteritems():
+            tgt_cnt = target_rack.container_positions.get(pos)
+            tube = tube_map.get(tube_barcode)
+            if tgt_cnt is None or tube is None or tube.sample is None:
+                continue
+            tgt_smpl = tgt_cnt.make_sample(volume)
+            sms = tube.sample.sample_molecules
+            for sm in sms:
+                tgt_smpl.make_sample_molecule(sm.molecule,
+                                              concentration / len(sms))
+            cnt += 1
+        return cnt
+
+
+def get_rack_sample_operations():
+    """
+    Returns the rack sample operations matching the repository the rack
+    aggregate is stored in.
+
+    :return: :class:`RackSampleOperations`
+    """
+    if isinstance(get_root_aggregate(IRack), RdbAggregate):
+        ops = RdbRackSampleOperations()
+    else:
+        ops = EntityRackSampleOperations()
+    return ops
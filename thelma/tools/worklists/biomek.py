@@ -11,8 +11,10 @@ from math import ceil
 from thelma.tools.semiconstants import get_pipetting_specs_biomek
 from thelma.tools.semiconstants import get_positions_for_shape
 from thelma.tools.worklists.base import EmptyPositionManager
+from thelma.tools.worklists.writers import WorklistRow
 from thelma.tools.worklists.writers import WorklistWriter
 from thelma.tools.writers import CsvColumnParameters
+from thelma.tools.writers import CsvWriter
 from thelma.tools.utils.base import VOLUME_CONVERSION_FACTOR
 from thelma.tools.utils.base import get_trimmed_string
 from thelma.tools.utils.base import round_up
@@ -27,7 +29,8 @@ __docformat__ = 'reStructuredText en'
 
 __all__ = ['BiomekWorklistWriter',
            'SampleTransferWorklistWriter',
-           'SampleDilutionWorklistWriter']
+           'SampleDilutionWorklistWriter',
+           'BiomekWorklistRowWriter']
 
 
 class BiomekWorklistWriter(WorklistWriter):
@@ -55,6 +58,12 @@ class BiomekWorklistWriter(WorklistWriter):
     TARGET_POS_INDEX = 3
     #: The index for the transfer volume.
     TRANSFER_VOLUME_INDEX = 4
+    #: The name of the optional diluent info column.
+    DILUENT_INFO_HEADER = 'DiluentInformation'
+    #: The index of the optional diluent info column.
+    DILUENT_INFO_INDEX = 5
+    #: Shall the diluent info column be written?
+    INCLUDE_DILUENT_INFO = False
 
     def __init__(self, planned_worklist, target_rack,
                  pipetting_specs=None, ignored_positions=None, parent=None):
@@ -64,48 +73,64 @@ class BiomekWorklistWriter(WorklistWriter):
                                 parent=parent)
         if self.pipetting_specs is None:
             self.pipetting_specs = get_pipetting_specs_biomek()
-        # These are the CsvColumnParameters for the worklists.
-        self._source_rack_values = None
-        self._source_pos_values = None
-        self._target_rack_values = None
-        self._target_pos_values = None
-        self._volume_values = None
-
-    def reset(self):
-        """
-        Resets all values escept for input values.
-        """
-        WorklistWriter.reset(self)
-        self._source_rack_values = []
-        self._source_pos_values = []
-        self._target_rack_values = []
-        self._target_pos_values = []
-        self._volume_values = []
 
     def _init_column_maps(self):
         """
         Initialises the CsvColumnParameters object for the
         :attr:`_column_map_list`.
         """
+        self._column_map_list = self.create_column_map_list(
+                                        self._worklist_rows,
+                                        self.INCLUDE_DILUENT_INFO)
+        self.add_info('Column generation complete.')
+
+    @classmethod
+    def create_column_map_list(cls, worklist_rows, include_diluent_info):
+        """
+        Converts the passed worklist rows into a column map list for a
+        Biomek worklist file.
+
+        :param list worklist_rows: The :class:`WorklistRow` objects to write.
+        :param bool include_diluent_info: Add a diluent information column?
+        :return: list of :class:`CsvColumnParameters`
+        """
+        source_rack_values = []
+        source_pos_values = []
+        target_rack_values = []
+        target_pos_values = []
+        volume_values = []
+        diluent_info_values = []
+        for row in worklist_rows:
+            source_rack_values.append(row.source_rack_barcode)
+            source_pos_values.append(row.source_position.label)
+            target_rack_values.append(row.target_rack_barcode)
+            target_pos_values.append(row.target_position.label)
+            volume_values.append(get_trimmed_string(row.volume))
+            diluent_info_values.append(row.diluent_info)
         source_rack_column = CsvColumnParameters.create_csv_parameter_map(
-                    self.SOURCE_RACK_INDEX, self.SOURCE_RACK_HEADER,
-                    self._source_rack_values)
+                    cls.SOURCE_RACK_INDEX, cls.SOURCE_RACK_HEADER,
+                    source_rack_values)
         source_pos_column = CsvColumnParameters.create_csv_parameter_map(
-                    self.SOURCE_POS_INDEX, self.SOURCE_POS_HEADER,
-                    self._source_pos_values)
+                    cls.SOURCE_POS_INDEX, cls.SOURCE_POS_HEADER,
+                    source_pos_values)
         target_rack_column = CsvColumnParameters.create_csv_parameter_map(
-                    self.TARGET_RACK_INDEX, self.TARGET_RACK_HEADER,
-                    self._target_rack_values)
+                    cls.TARGET_RACK_INDEX, cls.TARGET_RACK_HEADER,
+                    target_rack_values)
         target_pos_column = CsvColumnParameters.create_csv_parameter_map(
-                    self.TARGET_POS_INDEX, self.TARGET_POS_HEADER,
-                    self._target_pos_values)
+                    cls.TARGET_POS_INDEX, cls.TARGET_POS_HEADER,
+                    target_pos_values)
         volume_column = CsvColumnParameters.create_csv_parameter_map(
-                    self.TRANSFER_VOLUME_INDEX, self.TRANSFER_VOLUME_HEADER,
-                    self._volume_values)
-        self._column_map_list = [source_rack_column, source_pos_column,
-                                 target_rack_column, target_pos_column,
-                                 volume_column]
-        self.add_info('Column generation complete.')
+                    cls.TRANSFER_VOLUME_INDEX, cls.TRANSFER_VOLUME_HEADER,
+                    volume_values)
+        column_map_list = [source_rack_column, source_pos_column,
+                           target_rack_column, target_pos_column,
+                           volume_column]
+        if include_diluent_info:
+            diluent_info_column = CsvColumnParameters.create_csv_parameter_map(
+                    cls.DILUENT_INFO_INDEX, cls.DILUENT_INFO_HEADER,
+                    diluent_info_values)
+            column_map_list.append(diluent_info_column)
+        return column_map_list
 
 
 class SampleTransferWorklistWriter(BiomekWorklistWriter):
@@ -158,9 +183,9 @@ class SampleTransferWorklistWriter(BiomekWorklistWriter):
             self._source_dead_volume = well_specs.dead_volume \
                                        * VOLUME_CONVERSION_FACTOR
 
-    def _generate_column_values(self):
+    def _generate_worklist_rows(self):
         """
-        This method generates the value lists for the CSV columns.
+        This method generates the worklist rows.
         """
         source_rack_barcode = self.source_rack.barcode
         target_rack_barcode = self.target_rack.barcode
@@ -171,12 +196,10 @@ class SampleTransferWorklistWriter(BiomekWorklistWriter):
             if not self._check_transfer_volume(pt.volume, pt.target_position,
                                                pt.source_position):
                 continue
-            self._source_rack_values.append(source_rack_barcode)
-            self._source_pos_values.append(pt.source_position.label)
-            self._target_rack_values.append(target_rack_barcode)
-            self._target_pos_values.append(pt.target_position.label)
-            volume = get_trimmed_string(pt.volume * VOLUME_CONVERSION_FACTOR)
-            self._volume_values.append(volume)
+            row = WorklistRow(source_rack_barcode, pt.source_position,
+                              target_rack_barcode, pt.target_position,
+                              pt.volume * VOLUME_CONVERSION_FACTOR)
+            self._worklist_rows.append(row)
 
     def __get_sorted_transfers(self):
         """
@@ -214,10 +237,7 @@ class SampleDilutionWorklistWriter(BiomekWorklistWriter):
     """
     NAME = 'Biomek Dilution Worklist Writer'
     TRANSFER_TYPE = TRANSFER_TYPES.SAMPLE_DILUTION
-    #: The name of the optional diluent info column.
-    DILUENT_INFO_HEADER = 'DiluentInformation'
-    #: The index of the optional diluent info column.
-    DILUENT_INFO_INDEX = 5
+    INCLUDE_DILUENT_INFO = True
 
     def __init__(self, planned_worklist, target_rack, source_rack_barcode,
                  reservoir_specs, pipetting_specs=None,
@@ -239,8 +259,6 @@ class SampleDilutionWorklistWriter(BiomekWorklistWriter):
         self.reservoir_specs = reservoir_specs
         #: The maximum volume of source rack container.
         self._source_max_volume = None
-        #: Values for a column presenting diluent information.
-        self._diluent_info_values = None
         #: Maps source position amounts (volumes) onto diluents.
         self._diluent_map = None
         #: Maps total diluent amounts (volumes) onto diluents.
@@ -263,7 +281,6 @@ class SampleDilutionWorklistWriter(BiomekWorklistWriter):
         """
         BiomekWorklistWriter.reset(self)
         self._source_max_volume = None
-        self._diluent_info_values = []
         self._amount_map = dict()
         self._diluent_map = dict()
         self.__has_split_volumes = False
@@ -294,9 +311,9 @@ class SampleDilutionWorklistWriter(BiomekWorklistWriter):
         self.__emtpy_pos_manager = EmptyPositionManager(
                                     rack_shape=self.reservoir_specs.rack_shape)
 
-    def _generate_column_values(self):
+    def _generate_worklist_rows(self):
         """
-        This method generates the value lists for the CSV columns.
+        This method generates the worklist rows.
         """
         target_rack_barcode = self.target_rack.barcode
         sorted_transfers = self.__get_sorted_transfers()
@@ -312,12 +329,10 @@ class SampleDilutionWorklistWriter(BiomekWorklistWriter):
                                                 pt.diluent_info, volume, i)
                 if self.has_errors():
                     break
-                self._source_rack_values.append(self.source_rack_barcode)
-                self._source_pos_values.append(source_pos.label)
-                self._volume_values.append(get_trimmed_string(volume))
-                self._target_rack_values.append(target_rack_barcode)
-                self._target_pos_values.append(pt.target_position.label)
-                self._diluent_info_values.append(pt.diluent_info)
+                row = WorklistRow(self.source_rack_barcode, source_pos,
+                                  target_rack_barcode, pt.target_position,
+                                  volume, diluent_info=pt.diluent_info)
+                self._worklist_rows.append(row)
         if self.__has_split_volumes:
             msg = 'Some dilution volumes exceed the allowed maximum transfer ' \
                   'volume of %s ul. The dilution volumes have been distributed ' \
@@ -403,15 +418,39 @@ class SampleDilutionWorklistWriter(BiomekWorklistWriter):
         if not source_pos is None:
             self._amount_map[source_pos] = volume + self._source_dead_volume
 
-    def _init_column_maps(self):
+
+class BiomekWorklistRowWriter(CsvWriter):
+    """
+    Serialises a list of :class:`WorklistRow` objects (e.g. the merged rows
+    of several worklist writers) into a Biomek worklist file. The diluent
+    info column is added if the rows provide diluent information.
+
+    **Return Value:** Stream for an CSV file.
+    """
+    NAME = 'Biomek Worklist Row Writer'
+
+    def __init__(self, worklist_rows, parent=None):
         """
-        Initialises the CsvColumnParameters object for the
-        :attr:`_column_map_list`.
+        Constructor.
+
+        :param list worklist_rows: The :class:`WorklistRow` objects to write.
         """
-        BiomekWorklistWriter._init_column_maps(self)
-        diluent_info_column = \
-            CsvColumnParameters.create_csv_parameter_map(
-                        self.DILUENT_INFO_INDEX, self.DILUENT_INFO_HEADER,
-                        self._diluent_info_values)
-        self._column_map_list.append(diluent_info_column)
+        CsvWriter.__init__(self, parent=parent)
+        #: The :class:`WorklistRow` objects to write.
+        self.worklist_rows = worklist_rows
+
+    def _init_column_map_list(self):
+        """
+        Creates the :attr:`_column_map_list`.
+        """
+        if self._check_input_list_classes('worklist row', self.worklist_rows,
+                                          WorklistRow):
+            include_diluent_info = False
+            for row in self.worklist_rows:
+                if not row.diluent_info is None:
+                    include_diluent_info = True
+                    break
+            self._column_map_list = BiomekWorklistWriter.\
+                create_column_map_list(self.worklist_rows,
+                                       include_diluent_info)
 
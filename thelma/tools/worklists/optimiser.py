@@ -6,6 +6,8 @@ Tools for layout optimisations.
 
 AAB
 """
+from random import Random
+
 from thelma.tools.semiconstants import RACK_SHAPE_NAMES
 from thelma.tools.semiconstants import get_384_rack_shape
 from thelma.tools.semiconstants import get_96_rack_shape
@@ -20,7 +22,8 @@ __docformat__ = 'reStructuredText en'
 __all__ = ['TransferItem',
            'BiomekLayoutOptimizer',
            'TransferSubcolumn',
-           'SourceSubcolumn']
+           'SourceSubcolumn',
+           'ColumnPackingSolver']
 
 
 class TransferItem(object):
@@ -86,6 +89,12 @@ class BiomekLayoutOptimizer(BaseTool):
     the two target positions must have a minimum row distance of 1 and the
     column must be split into \'subcolumns\'.
 
+    The greedy distribution of the subcolumns is followed by a bin packing
+    search (see :class:`ColumnPackingSolver`) with at most
+    :attr:`packing_iterations` iterations and the plan using fewer source
+    columns (and pipetting steps) is used. The search is deterministic, so
+    equal inputs always result in equal layouts.
+
     **Return Value:** The optimised source layout.
     """
 
@@ -93,6 +102,9 @@ class BiomekLayoutOptimizer(BaseTool):
     SOURCE_LAYOUT_CLS = WorkingLayout
     #: The used :class:`TransferItem` subclass.
     TRANSFER_ITEM_CLASS = TransferItem
+    #: The default number of iterations for the column packing search.
+    #: If this is *None*, only the greedy distribution is used.
+    PACKING_ITERATIONS = 500
 
     def __init__(self, parent=None):
         BaseTool.__init__(self, parent=parent)
@@ -121,6 +133,20 @@ class BiomekLayoutOptimizer(BaseTool):
         #: Stores :class:`SourceSubcolumn` objects managing the remaining free
         #: positions for the source transfection layout.
         self.__free_positions = None
+        #: The number of iterations for the column packing search (*None*
+        #: disables the search).
+        self.packing_iterations = self.PACKING_ITERATIONS
+        #: The transfer items of the target subcolumns of all target layouts
+        #: (used to count pipetting steps).
+        self.__target_subcolumns = None
+        #: The transfer items of the subcolumns to distribute (in the order
+        #: of distribution).
+        self.__packing_subcolumns = None
+        #: The planned (rack position, working position) tuples.
+        self.__planned_positions = None
+        #: The number of source columns and pipetting steps of the final
+        #: plan.
+        self.__plan_statistics = None
 
     def reset(self):
         BaseTool.reset(self)
@@ -133,6 +159,10 @@ class BiomekLayoutOptimizer(BaseTool):
         self.__subcolumn_tids = dict()
         self.__subcolumn_lengths = dict()
         self.__free_positions = None
+        self.__target_subcolumns = []
+        self.__packing_subcolumns = []
+        self.__planned_positions = []
+        self.__plan_statistics = None
 
     def run(self):
         """
@@ -153,10 +183,23 @@ class BiomekLayoutOptimizer(BaseTool):
                 self.__split_into_subcolumns()
                 self.__sort_subcolumns()
                 self.__distribute_source_columns()
+                if not self.has_errors():
+                    self.__search_column_packing()
+                if not self.has_errors():
+                    self.__add_planned_positions()
         if not self.has_errors():
             self.return_value = self._source_layout
             self.add_info('Layout optimisation completed.')
 
+    def get_plan_statistics(self):
+        """
+        Returns the number of used source columns and the number of Biomek
+        pipetting steps of the source layout (as dictionary with the keys
+        'columns' and 'steps') or *None* if the layout has been created
+        by one-to-one sorting.
+        """
+        return self._get_additional_value(self.__plan_statistics)
+
     def _check_input(self):
         """
         Checks the initialisation values.
@@ -264,6 +307,8 @@ class BiomekLayoutOptimizer(BaseTool):
                 subcolumns = self.__split_column(working_positions,
                                                  column_index)
                 for subcolumn in subcolumns:
+                    self.__target_subcolumns.append(
+                                                list(subcolumn.transfer_items))
                     self.__store_subcolumns(subcolumn)
 
     def __split_column(self, sorted_working_positions, column_index):
@@ -338,6 +383,10 @@ class BiomekLayoutOptimizer(BaseTool):
             found_before.add(subcolumn)
             add_list_map_element(self.__subcolumn_lengths, len(subcolumn),
                                  subcolumn)
+        for length in sorted(self.__subcolumn_lengths.keys(), reverse=True):
+            for subcolumn in sorted(self.__subcolumn_lengths[length]):
+                self.__packing_subcolumns.append(
+                                            list(subcolumn.transfer_items))
 
     def __distribute_source_columns(self):
         """
@@ -368,6 +417,65 @@ class BiomekLayoutOptimizer(BaseTool):
             else:
                 self.__subcolumn_lengths[length] = subcolumns
 
+    def __search_column_packing(self):
+        """
+        Evaluates the greedy plan and - if packing iterations are enabled -
+        tries to find a plan with fewer source columns or pipetting steps
+        by means of a :class:`ColumnPackingSolver`.
+        """
+        # Transfer items are encoded as integers (in hash value order).
+        tids = dict()
+        for tid_list in self.__packing_subcolumns:
+            for tid in tid_list:
+                tids[tid.hash_value] = tid
+        item_ids = dict([(hash_value, i) for (i, hash_value)
+                         in enumerate(sorted(tids.keys()))])
+        encode = lambda tid_list: [item_ids[tid.hash_value]
+                                   for tid in tid_list]
+        bins = [(ssc.column_index, list(ssc.free_row_indices)) for ssc in
+                SourceSubcolumn.from_rack_shape(
+                                rack_shape=self.__source_rack_shape,
+                                min_row_distance=self.__src_min_row_distance)]
+        solver = ColumnPackingSolver(
+                    subcolumns=[encode(tid_list)
+                                for tid_list in self.__packing_subcolumns],
+                    bins=bins,
+                    target_subcolumns=[encode(tid_list) for tid_list
+                                       in self.__target_subcolumns],
+                    row_step=self.__src_min_row_distance + 1)
+        positions = dict([(item_ids[self.TRANSFER_ITEM_CLASS(
+                                    working_pos=working_pos).hash_value],
+                           (rack_pos.row_index, rack_pos.column_index))
+                          for (rack_pos, working_pos)
+                          in self.__planned_positions])
+        greedy_score = solver.evaluate(positions)
+        self.__plan_statistics = dict(columns=greedy_score[0],
+                                      steps=greedy_score[1])
+        if self.packing_iterations is None:
+            return
+        positions, score = solver.solve(self.packing_iterations)
+        if positions is None:
+            return
+        msg = 'Column packing search: %i columns and %i pipetting steps ' \
+              '(greedy distribution: %i columns and %i pipetting steps).' \
+              % (score + greedy_score)
+        self.add_info(msg)
+        if score < greedy_score:
+            id_map = dict([(item_id, tids[hash_value]) for (hash_value,
+                                                item_id) in item_ids.items()])
+            self.__planned_positions = \
+                [(get_rack_position_from_indices(row_index, column_index),
+                  id_map[item_id].working_pos)
+                 for (item_id, (row_index, column_index))
+                 in sorted(positions.items())]
+            self.__plan_statistics = dict(columns=score[0], steps=score[1])
+
+    def __add_planned_positions(self):
+        """
+        Adds the planned positions to the source layout.
+        """
+        for rack_pos, working_pos in self.__planned_positions:
+            self._add_source_position(rack_pos, working_pos)
         if not len(self._source_layout) == len(self._hash_values):
             msg = 'The number of final source positions (%i) does not match ' \
                   'the number of distinct hash values (%i). This should ' \
@@ -435,7 +543,7 @@ class BiomekLayoutOptimizer(BaseTool):
         """
         for tid in transfer_subcolumn.transfer_items:
             rack_pos = source_subcolumn.get_position()
-            self._add_source_position(rack_pos, tid.working_pos)
+            self.__planned_positions.append((rack_pos, tid.working_pos))
 
     def _add_source_position(self, rack_pos, working_pos): #pylint: disable=W0613
         """
@@ -604,3 +712,167 @@ class SourceSubcolumn(object):
         params = (self.__class__.__name__, self.column_index,
                   self.free_row_indices)
         return str_format % params
+
+
+class ColumnPackingSolver(object):
+    """
+    Distributes transfer subcolumns onto source subcolumns (bin packing)
+    and improves the distribution by local search for a given number of
+    iterations.
+
+    Transfer items are encoded as integers. A plan is scored by the number
+    of source columns it uses and the number of Biomek pipetting steps it
+    requires (in this order). The number of pipetting steps is the number of
+    uninterrupted runs within the target subcolumns: two neighbouring items
+    of a target subcolumn can be pipetted in the same movement if they are
+    placed in the same source column with a row distance of
+    :attr:`row_step`.
+    """
+    def __init__(self, subcolumns, bins, target_subcolumns, row_step,
+                 seed=0):
+        """
+        Constructor.
+
+        :param list subcolumns: The transfer subcolumns to distribute (lists
+            of item IDs).
+        :param list bins: The source subcolumns as (column index, list of
+            free row indices) tuples.
+        :param list target_subcolumns: The target subcolumns of all target
+            layouts (lists of item IDs) in target row order.
+        :param int row_step: The row distance of neighbouring source
+            positions that can be pipetted in the same movement.
+        :param int seed: Seed for the random number generator (the search is
+            reproducible for a given seed and number of iterations).
+        """
+        #: The transfer subcolumns to distribute.
+        self.subcolumns = subcolumns
+        #: The source subcolumns (column index, free row indices).
+        self.bins = bins
+        #: The target subcolumns used to count pipetting steps.
+        self.target_subcolumns = target_subcolumns
+        #: The row distance of neighbouring source positions.
+        self.row_step = row_step
+        self.__random = Random(seed)
+
+    def evaluate(self, positions):
+        """
+        Scores a plan.
+
+        :param dict positions: (row index, column index) tuples mapped onto
+            item IDs.
+        :return: (number of source columns, number of pipetting steps)
+        """
+        columns = set([column_index for (_, column_index)
+                       in positions.itervalues()])
+        steps = 0
+        for item_ids in self.target_subcolumns:
+            if len(item_ids) < 1:
+                continue
+            steps += 1
+            last_row, last_column = positions[item_ids[0]]
+            for item_id in item_ids[1:]:
+                row, column = positions[item_id]
+                if not (column == last_column
+                        and row == last_row + self.row_step):
+                    steps += 1
+                last_row, last_column = row, column
+        return (len(columns), steps)
+
+    def pack(self, order):
+        """
+        Packs the subcolumns in the given order. Each subcolumn is placed
+        into the fullest source subcolumn that can take it completely
+        (preferring source columns that are already in use); if there is none,
+        it is split over the source subcolumns with the most free positions.
+
+        :param list order: Indices of the :attr:`subcolumns`.
+        :return: (row index, column index) tuples mapped onto item IDs or
+            *None* if the items do not fit into the bins.
+        """
+        free_rows = [list(row_indices) for (_, row_indices) in self.bins]
+        used_columns = set()
+        positions = dict()
+        for subcolumn_index in order:
+            remaining = self.subcolumns[subcolumn_index]
+            while len(remaining) > 0:
+                best_fit = None
+                largest = None
+                for bin_index, rows in enumerate(free_rows):
+                    number_free = len(rows)
+                    if number_free < 1:
+                        continue
+                    column_index = self.bins[bin_index][0]
+                    is_new = not column_index in used_columns
+                    if number_free >= len(remaining):
+                        key = (is_new, number_free, bin_index)
+                        if best_fit is None or key < best_fit[0]:
+                            best_fit = (key, bin_index)
+                    key = (is_new, -number_free, bin_index)
+                    if largest is None or key < largest[0]:
+                        largest = (key, bin_index)
+                if best_fit is None and largest is None:
+                    return None
+                if best_fit is None:
+                    bin_index = largest[1]
+                else:
+                    bin_index = best_fit[1]
+                rows = free_rows[bin_index]
+                column_index = self.bins[bin_index][0]
+                used_columns.add(column_index)
+                number_placed = min(len(rows), len(remaining))
+                for item_id in remaining[:number_placed]:
+                    positions[item_id] = (rows.pop(0), column_index)
+                remaining = remaining[number_placed:]
+        return positions
+
+    def solve(self, max_iterations):
+        """
+        Searches the best plan within the given number of local search
+        iterations (the result only depends on the input, the seed and the
+        number of iterations).
+        The search starts with a first-fit-decreasing packing and then
+        perturbs the packing order (moving or swapping subcolumns), keeping
+        every order that does not worsen the score.
+
+        :return: The best plan ((row index, column index) tuples mapped onto
+            item IDs) and its score (see :func:`evaluate`) or (*None*, *None*)
+            if no packing order fitting into the bins has been found.
+        """
+        order = sorted(range(len(self.subcolumns)),
+                       key=lambda i: (-len(self.subcolumns[i]), i))
+        best_positions = self.pack(order)
+        if best_positions is None:
+            best_score = None
+        else:
+            best_score = self.evaluate(best_positions)
+        current_order = order
+        current_score = best_score
+        number_subcolumns = len(order)
+        iteration = 0
+        while number_subcolumns > 1 and iteration < max_iterations:
+            iteration += 1
+            candidate_order = list(current_order)
+            i = self.__random.randrange(number_subcolumns)
+            j = self.__random.randrange(number_subcolumns)
+            if self.__random.random() < 0.5:
+                candidate_order[i], candidate_order[j] = \
+                                candidate_order[j], candidate_order[i]
+            else:
+                candidate_order.insert(j, candidate_order.pop(i))
+            positions = self.pack(candidate_order)
+            if positions is None:
+                continue
+            score = self.evaluate(positions)
+            if current_score is None or score <= current_score:
+                current_order = candidate_order
+                current_score = score
+                if best_score is None or score < best_score:
+                    best_score = score
+                    best_positions = positions
+        return best_positions, best_score
+
+    def __repr__(self):
+        str_format = '<%s subcolumns: %i, bins: %i>'
+        params = (self.__class__.__name__, len(self.subcolumns),
+                  len(self.bins))
+        return str_format % params
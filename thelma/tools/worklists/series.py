@@ -21,6 +21,7 @@ from thelma.tools.worklists.execution \
     import SampleDilutionWorklistExecutor
 from thelma.tools.worklists.execution \
     import SampleTransferWorklistExecutor
+from thelma.tools.worklists.writers import WorklistWriter
 from thelma.tools.writers import LINEBREAK_CHAR
 from thelma.tools.writers import create_zip_archive
 from thelma.tools.writers import merge_csv_streams
@@ -451,15 +452,25 @@ class _SeriesWorklistWriter(_SeriesTool):
     :Note: The worklists must be provided as :class:`_LiquidTransferJob`
         objects.
 
+    If :attr:`serialize_worklists` is *False*, worklist writers do not
+    create streams. Instead, the tool stores their
+    :class:`thelma.tools.worklists.writers.WorklistRow` lists (see
+    :func:`get_worklist_row_map`).
+
     **Return Value:** A map with key = job index, value = worklist stream.
     """
 
     NAME = 'Series Worklist Writer'
 
-    def __init__(self, transfer_jobs, parent=None):
+    def __init__(self, transfer_jobs, serialize_worklists=True, parent=None):
         _SeriesTool.__init__(self, transfer_jobs, user=None, parent=parent)
+        #: If *False* the tool stores worklist rows instead of streams
+        #: for :class:`WorklistWriter` jobs.
+        self.serialize_worklists = serialize_worklists
         #: Stores the generated streams (mapped onto indices).
         self._stream_map = None
+        #: Stores the generated worklist rows (mapped onto indices).
+        self._worklist_row_map = None
         #: The stream for the rack transfers (if there are any).
         self._rack_transfer_stream = None
         #: The index of the first rack transfer job (if any, there might be
@@ -476,6 +487,7 @@ class _SeriesWorklistWriter(_SeriesTool):
         """
         _SeriesTool.reset(self)
         self._stream_map = dict()
+        self._worklist_row_map = dict()
         self._rack_transfer_stream = None
         self._rack_transfer_index = None
         self._rack_transfer_count = 0
@@ -494,6 +506,18 @@ class _SeriesWorklistWriter(_SeriesTool):
             self.return_value = self._stream_map
             self.add_info('Series worklist generation completed.')
 
+    def get_worklist_row_map(self):
+        """
+        Returns the worklist rows generated for each job index (only
+        populated if :attr:`serialize_worklists` is *False*).
+
+        :return: lists of :class:`WorklistRow` objects mapped onto job
+            indices or *None* if there are errors.
+        """
+        if self.return_value is None:
+            return None
+        return self._worklist_row_map
+
     def __write_worklists(self):
         # Writes the worklists files for the passed jobss (in the right order;
         # execution is carried out after each worklist stream creation).
@@ -512,6 +536,16 @@ class _SeriesWorklistWriter(_SeriesTool):
                 msg = 'Unable to find a writer for transfer job "%s".' \
                       % (transfer_job)
                 self.add_warning(msg)
+            elif not self.serialize_worklists \
+                                    and isinstance(writer, WorklistWriter):
+                worklist_rows = writer.get_worklist_rows()
+                if worklist_rows is None:
+                    msg = 'Error when trying to generate rows for worklist ' \
+                          '"%s".' % (transfer_job.planned_worklist.label)
+                    self.add_error(msg)
+                    break
+                else:
+                    self._worklist_row_map[job_index] = worklist_rows
             else:
                 stream = writer.get_result()
                 if stream is None:
@@ -814,6 +848,10 @@ class SerialWriterExecutorTool(BaseTool):
     #: This placeholder is used to mark streams and executed items for
     #: rack sample transfer jobs.
     _RACK_SAMPLE_TRANSFER_MARKER = 'rack_sample_transfer'
+    #: If *False*, worklist writers only generate worklist rows (stored in
+    #: :attr:`_worklist_rows`). Subclasses are then responsible for
+    #: serialising the rows when building the file map.
+    _SERIALIZE_WORKLISTS = True
 
     def __init__(self, mode, user=None, parent=None):
         """
@@ -835,13 +873,20 @@ class SerialWriterExecutorTool(BaseTool):
         self._transfer_jobs = None
         #: The worklists for each rack sample transfer job index.
         self._rack_transfer_worklists = None
+        #: The worklist rows mapped onto job indices (printing mode only,
+        #: see :attr:`_SERIALIZE_WORKLISTS`).
+        self._worklist_rows = None
         #: The indices of all rack sample transfer jobs.
         self.__rack_transfer_indices = None
+        #: If *False*, printing mode returns the file map instead of a
+        #: zip stream (see :func:`get_worklist_files`).
+        self.__create_archive = True
 
     def reset(self):
         BaseTool.reset(self)
         self._transfer_jobs = dict()
         self._rack_transfer_worklists = dict()
+        self._worklist_rows = dict()
         self.__rack_transfer_indices = set()
 
     def run(self):
@@ -857,6 +902,22 @@ class SerialWriterExecutorTool(BaseTool):
             else:
                 self._execute_worklists()
 
+    def get_worklist_files(self):
+        """
+        Runs the tool in printing mode and returns the worklist file streams
+        mapped onto file names instead of a zip stream. This allows callers
+        to add the files to an archive of their own.
+
+        :return: file streams mapped onto file names or *None* if there
+            are errors.
+        """
+        self.__create_archive = False
+        try:
+            self.run()
+        finally:
+            self.__create_archive = True
+        return self.return_value
+
     @classmethod
     def create_writer(cls, **kw):
         """
@@ -909,7 +970,10 @@ class SerialWriterExecutorTool(BaseTool):
             rack_transfer_stream = self._get_rack_transfer_stream(stream_map)
         if not self.has_errors():
             file_map = self._get_file_map(merge_map, rack_transfer_stream)
-        if not self.has_errors():
+        if not self.has_errors() and not self.__create_archive:
+            self.return_value = file_map
+            self.add_info('Serial working print completed.')
+        elif not self.has_errors():
             zip_stream = StringIO()
             create_zip_archive(zip_stream, file_map)
             self.return_value = zip_stream
@@ -917,13 +981,16 @@ class SerialWriterExecutorTool(BaseTool):
 
     def __run_serial_writer(self):
         # Runs the seiral worklist writer.
-        writer = _SeriesWorklistWriter(self._transfer_jobs, parent=self)
+        writer = _SeriesWorklistWriter(self._transfer_jobs,
+                        serialize_worklists=self._SERIALIZE_WORKLISTS,
+                        parent=self)
         stream_map = writer.get_result()
         if stream_map is None:
             msg = 'Error when running serial worklist printer.'
             self.add_error(msg)
             result = None
         else:
+            self._worklist_rows = writer.get_worklist_row_map()
             result = stream_map
         return result
 
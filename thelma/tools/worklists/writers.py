@@ -21,13 +21,65 @@ from thelma.entities.rack import RackPosition
 
 __docformat__ = 'reStructuredText en'
 
-__all__ = ['WorklistWriter']
+__all__ = ['WorklistRow',
+           'WorklistWriter']
+
+
+class WorklistRow(object):
+    """
+    A single line of a pipetting worklist (in-memory representation).
+
+    Worklist writers generate rows first. The rows can be consumed
+    directly (e.g. for merging or volume calculations); they only need
+    to be serialised when the final file is written.
+    """
+    def __init__(self, source_rack_barcode, source_position,
+                 target_rack_barcode, target_position, volume,
+                 diluent_info=None):
+        """
+        Constructor.
+
+        :param str source_rack_barcode: The barcode of the source rack or
+            reservoir.
+        :param source_position: The source position.
+        :type source_position: :class:`thelma.entities.rack.RackPosition`
+        :param str target_rack_barcode: The barcode of the target rack.
+        :param target_position: The target position.
+        :type target_position: :class:`thelma.entities.rack.RackPosition`
+        :param float volume: The transfer volume in ul.
+        :param str diluent_info: The diluent info (dilutions only).
+        :default diluent_info: *None*
+        """
+        #: The barcode of the source rack or reservoir.
+        self.source_rack_barcode = source_rack_barcode
+        #: The source position (:class:`RackPosition`).
+        self.source_position = source_position
+        #: The barcode of the target rack.
+        self.target_rack_barcode = target_rack_barcode
+        #: The target position (:class:`RackPosition`).
+        self.target_position = target_position
+        #: The transfer volume in ul.
+        self.volume = volume
+        #: The diluent info (dilutions only, *None* for transfers).
+        self.diluent_info = diluent_info
+
+    def __repr__(self):
+        str_format = '<%s %s:%s -> %s:%s, volume: %s ul, diluent: %s>'
+        params = (self.__class__.__name__, self.source_rack_barcode,
+                  self.source_position.label, self.target_rack_barcode,
+                  self.target_position.label,
+                  get_trimmed_string(self.volume), self.diluent_info)
+        return str_format % params
 
 
 class WorklistWriter(CsvWriter):
     """
     An abstract tool for the generation of pipetting worklist files.
 
+    The writer generates a list of :class:`WorklistRow` objects first. These
+    rows are then converted into CSV columns. Callers that want to postpone
+    serialisation can obtain the rows via :func:`get_worklist_rows`.
+
     **Return Value:** Stream for an CSV file.
     """
 
@@ -85,6 +137,8 @@ class WorklistWriter(CsvWriter):
         self._min_transfer_volume = None
         #: The maximum transfer volume used in ul.
         self._max_transfer_volume = None
+        #: The generated worklist rows (:class:`WorklistRow`).
+        self._worklist_rows = None
         # Intermediate data storage for errors.
         self._transfer_volume_too_small = None
         self._transfer_volume_too_large = None
@@ -104,6 +158,7 @@ class WorklistWriter(CsvWriter):
         self._source_containers = dict()
         self._source_volumes = dict()
         self._source_dead_volume = None
+        self._worklist_rows = []
         # Intermediate data storage for errors.
         self._transfer_volume_too_small = []
         self._transfer_volume_too_large = []
@@ -112,11 +167,34 @@ class WorklistWriter(CsvWriter):
         self._target_volume_too_large = []
         self._target_container_missing = []
 
+    def get_worklist_rows(self):
+        """
+        Generates the worklist rows without serialising them.
+
+        :return: list of :class:`WorklistRow` objects or *None* if there
+            are errors.
+        """
+        self.reset()
+        self.__create_worklist_rows()
+        if self.has_errors():
+            result = None
+        else:
+            result = self._worklist_rows
+        return result
+
     def _init_column_map_list(self):
         """
         Creates the :attr:`_column_map_list` for the CSV writer.
         """
         self.add_info('Start column generation for worklist file ...')
+        self.__create_worklist_rows()
+        if not self.has_errors():
+            self._init_column_maps()
+        if not self.has_errors():
+            self.add_info('Column generation completed ...')
+
+    def __create_worklist_rows(self):
+        # Checks the input and generates the :attr:`_worklist_rows`.
         self._check_input()
         if not self.has_errors():
             self._init_target_data()
@@ -124,12 +202,8 @@ class WorklistWriter(CsvWriter):
             self.__check_planned_liquid_transfers()
         if not self.has_errors():
             self.__set_transfer_volume_range()
-            self._generate_column_values()
+            self._generate_worklist_rows()
             self._record_errors()
-        if not self.has_errors():
-            self._init_column_maps()
-        if not self.has_errors():
-            self.add_info('Column generation completed ...')
 
     def _check_input(self):
         """
@@ -184,11 +258,12 @@ class WorklistWriter(CsvWriter):
             self._max_transfer_volume = VOLUME_CONVERSION_FACTOR \
                                     * self.pipetting_specs.max_transfer_volume
 
-    def _generate_column_values(self):
+    def _generate_worklist_rows(self):
         """
-        This method generates the value lists for the CSV columns.
+        This method generates the :class:`WorklistRow` objects for the
+        worklist (see :attr:`_worklist_rows`).
         """
-        self.add_error('Abstract method: _generate_column_values()')
+        self.add_error('Abstract method: _generate_worklist_rows()')
 
     def __check_planned_liquid_transfers(self):
         # Checks whether all planned transfers in the worklist have the
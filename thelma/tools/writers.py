@@ -20,6 +20,7 @@ __all__ = ['LINEBREAK_CHAR',
            'CsvColumnParameters',
            'TxtWriter',
            'create_zip_archive',
+           'add_zip_archive_entries',
            'read_zip_archive',
            'merge_csv_streams']
 
@@ -420,16 +421,30 @@ def create_zip_archive(zip_stream, stream_map):
     :return: zip archive
     """
     archive = zipfile.ZipFile(zip_stream, 'a', zipfile.ZIP_DEFLATED, False)
+    add_zip_archive_entries(archive, stream_map)
+    archive.close()
+
+    return archive
+
+
+def add_zip_archive_entries(archive, stream_map):
+    """
+    Writes the given file streams into an open zip archive. This allows
+    for building an archive incrementally (the archive must be closed by
+    the caller).
+
+    :param archive: The open zip archive.
+    :type archive: :class:`zipfile.ZipFile`
 
+    :param stream_map: The file streams mapped onto file names.
+    :type stream_map: :class:`dict`
+    """
     for zip_fn, stream in stream_map.iteritems():
         archive.writestr(zip_fn, stream.read())
 
     # Mark the files as having been created on Windows so that
     # Unix permissions are not inferred as 0000
     for zfile in archive.filelist: zfile.create_system = 0
-    archive.close()
-
-    return archive
 
 
 def read_zip_archive(zip_stream):
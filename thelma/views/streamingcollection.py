@@ -0,0 +1,134 @@
+"""
+This file is part of the TheLMA (THe Laboratory Management Application) project.
+See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
+
+Custom view streaming large collections.
+"""
+from pyramid.compat import bytes_
+from pyramid.httpexceptions import HTTPBadRequest
+from pyramid.httpexceptions import HTTPOk
+from pyramid.threadlocal import manager
+from sqlalchemy.orm import class_mapper
+from sqlalchemy.orm import sessionmaker
+
+from everest.entities.utils import get_entity_class
+from everest.mime import JsonMime
+from everest.repositories.rdb.session import ScopedSessionMaker as Session
+from everest.representers.utils import as_representer
+from everest.resources.utils import as_member
+from everest.views.getcollection import GetCollectionView
+from thelma.entities.aggregates import KeysetIterator
+from thelma.interfaces import IPlate
+from thelma.interfaces import IRack
+from thelma.interfaces import IStockSample
+from thelma.interfaces import ITube
+from thelma.interfaces import ITubeRack
+from zope.interface import providedBy as provided_by # pylint: disable=E0611,F0401
+
+
+__docformat__ = 'reStructuredText en'
+__all__ = ['GetStreamingCollectionView',
+           ]
+
+
+class GetStreamingCollectionView(GetCollectionView):
+    """
+    Streaming GET view for large collections.
+
+    The members are returned as a JSON array in the order of an indexed key
+    attribute. They are fetched in keyset paginated chunks (see
+    :class:`thelma.entities.aggregates.KeysetIterator`) and written to the
+    response one at a time while the response is sent, so memory use does
+    not depend on the size of the collection.
+
+    Request parameters (both optional):
+
+    after
+        Only members with a key greater than this are returned (pass the
+        key of the last member received to continue a previous request).
+    size
+        The maximum number of members to return.
+
+    The name of the key attribute is returned in the *X-Keyset-Key* header.
+    Filter and order parameters are not supported.
+
+    The response body is generated after the request transaction has ended,
+    so the members are fetched with a dedicated (read-only) session that is
+    opened and closed by the response iterator.
+    """
+    #: The key attribute used for the keyset pagination of each supported
+    #: collection interface (more specific interfaces first).
+    KEY_ATTRIBUTES = [(ITubeRack, 'barcode'),
+                      (IPlate, 'barcode'),
+                      (IRack, 'barcode'),
+                      (ITube, 'barcode'),
+                      (IStockSample, 'id'),
+                      ]
+    #: The number of members fetched per query.
+    CHUNK_SIZE = 1000
+
+    def __call__(self):
+        ifc, key_attribute = self.__get_key_attribute()
+        if ifc is None:
+            raise HTTPBadRequest('Streaming is not supported for this '
+                                 'collection.').exception
+        params = self.request.params
+        after = params.get('after')
+        if not after is None and key_attribute == 'id':
+            after = self.__convert_int_param('after', after)
+        limit = params.get('size')
+        if not limit is None:
+            limit = self.__convert_int_param('size', limit)
+        entity_class = get_entity_class(ifc)
+        iterator = KeysetIterator(entity_class, key_attribute,
+                                  after=after, limit=limit,
+                                  chunk_size=self.CHUNK_SIZE)
+        engine = Session().get_bind(mapper=class_mapper(entity_class))
+        response = self.request.response
+        response.status = self._status(HTTPOk)
+        response.content_type = JsonMime.mime_type_string
+        response.headers['X-Keyset-Key'] = key_attribute
+        response.app_iter = self.__generate_representation(iterator, engine)
+        return response
+
+    def __get_key_attribute(self):
+        ifcs = list(provided_by(self.context))
+        for ifc, key_attribute in self.KEY_ATTRIBUTES:
+            if ifc in ifcs:
+                break
+        else:
+            ifc = key_attribute = None
+        return ifc, key_attribute
+
+    def __convert_int_param(self, name, value):
+        try:
+            value = int(value)
+        except ValueError:
+            raise HTTPBadRequest('Invalid value for parameter "%s": %s.'
+                                 % (name, value)).exception
+        return value
+
+    def __generate_representation(self, iterator, engine):
+        # The response body is generated after the view has returned and the
+        # request transaction has been committed; the thread locals (used
+        # e.g. to generate URLs) have to be restored. The scoped session
+        # belongs to the transaction manager, so the iteration uses a
+        # session of its own which is rolled back and closed when we are
+        # done.
+        manager.push(dict(request=self.request,
+                          registry=self.request.registry))
+        session = sessionmaker(bind=engine, autoflush=False)()
+        iterator.session = session
+        try:
+            rpr = None
+            sep = '['
+            for entity in iterator:
+                member = as_member(entity, parent=self.context)
+                if rpr is None:
+                    rpr = as_representer(member, JsonMime)
+                yield sep + bytes_(rpr.to_string(member), 'utf-8')
+                sep = ','
+            yield '[]' if rpr is None else ']'
+        finally:
+            session.close()
+            manager.pop()